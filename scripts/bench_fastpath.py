@@ -0,0 +1,112 @@
+import asyncio
+import argparse
+import json
+import os
+import sys
+import time
+from pyasn1.codec.ber import encoder
+from pysnmp.carrier.asyncio.dgram import udp
+from pysnmp.entity import config
+from pysnmp.entity.rfc3413 import ntfrcv
+from pysnmp.proto import api, rfc1902
+
+# プロジェクトルートをPYTHONPATHに追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.resolver import MibResolver
+from src.listener import TrapListener
+from src.fastpath import FastPathHandler, FastPathUdpTransport
+
+V2C = api.PROTOCOL_MODULES[api.SNMP_VERSION_2C]
+
+class CountingQueue:
+    """
+    Dispatcherの代わりに受け取ったTrap数だけを数える受信キュー。
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def set_flow_control(self, pause_reading, resume_reading):
+        pass
+
+    def put(self, trap_data):
+        self.count += 1
+        return True
+
+def build_datagram(pdu_class, request_id):
+    pdu = pdu_class()
+    V2C.apiPDU.set_defaults(pdu)
+    V2C.apiPDU.set_request_id(pdu, request_id)
+    V2C.apiPDU.set_varbinds(pdu, [
+        (rfc1902.ObjectName('1.3.6.1.2.1.1.3.0'), rfc1902.TimeTicks(12345)),
+        (rfc1902.ObjectName('1.3.6.1.6.3.1.1.4.1.0'), rfc1902.ObjectName('1.3.6.1.6.3.1.1.5.3')),
+        (rfc1902.ObjectName('1.3.6.1.2.1.2.2.1.1.1'), rfc1902.Integer(1)),
+        (rfc1902.ObjectName('1.3.6.1.2.1.1.5.0'), rfc1902.OctetString('Test Trap Message')),
+    ])
+    message = V2C.Message()
+    V2C.apiMessage.set_defaults(message)
+    V2C.apiMessage.set_community(message, 'public')
+    V2C.apiMessage.set_pdu(message, pdu)
+    return encoder.encode(message)
+
+async def run_mode(name, fast_path, pdu_class, resolver, args):
+    """
+    UDPソケットを経由せず、トランスポートの datagram_received に直接データグラムを渡して
+    1コアあたりの処理性能を計測します。
+    """
+    queue = CountingQueue()
+    listener = TrapListener(resolver, None, ingest_queue=queue)
+    if fast_path:
+        listener.fast_path = FastPathHandler(listener._process_trap, 'public')
+        transport = FastPathUdpTransport(listener.fast_path)
+    else:
+        transport = udp.UdpTransport()
+    transport = transport.openServerMode(('127.0.0.1', 0))
+    config.addTransport(listener.snmpEngine, udp.domainName, transport)
+    config.addV1System(listener.snmpEngine, 'my-area', 'public')
+    ntfrcv.NotificationReceiver(listener.snmpEngine, listener._cbFun)
+
+    datagrams = [build_datagram(pdu_class, i + 1) for i in range(256)]
+    address = ('127.0.0.1', 40000)
+
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    for i in range(args.count):
+        transport.datagram_received(datagrams[i % len(datagrams)], address)
+        if i % 100 == 0:
+            # SnmpEngine 経由の場合はイベントループ上で処理されるため、定期的にループを回す
+            await asyncio.sleep(0)
+    while queue.count < args.count and time.perf_counter() - started < 60:
+        await asyncio.sleep(0)
+    elapsed = time.perf_counter() - started
+    cpu_elapsed = time.process_time() - cpu_started
+
+    transport.closeTransport()
+    return {
+        "benchmark": "fastpath",
+        "mode": name,
+        "traps": args.count,
+        "processed": queue.count,
+        "traps_per_sec": round(queue.count / elapsed, 1),
+        "traps_per_cpu_sec": round(queue.count / cpu_elapsed, 1) if cpu_elapsed else None,
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description='Benchmark the native BER fast path against the pysnmp engine.')
+    parser.add_argument('--count', type=int, default=20000, help='Number of datagrams per mode')
+    args = parser.parse_args()
+
+    resolver = MibResolver()
+    modes = [
+        ("pysnmp-trap", False, V2C.TrapPDU),
+        ("fastpath-trap", True, V2C.TrapPDU),
+        ("pysnmp-inform", False, V2C.InformRequestPDU),
+        ("fastpath-inform", True, V2C.InformRequestPDU),
+    ]
+    for mode in modes:
+        result = await run_mode(*mode, resolver, args)
+        print(json.dumps(result))
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,263 @@
+import asyncio
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from aiohttp import web
+from pysnmp.proto import rfc1902
+
+# プロジェクトルートをPYTHONPATHに追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config import settings
+from src.resolver import MibResolver
+from src.dispatcher import Dispatcher
+from src.stdout_sink import StdoutSink
+from src.formatters import build_formatter
+from src.trap_record import TrapRecord
+from tests.send_trap import OID_IF_INDEX, OID_IF_ADMIN_STATUS, OID_IF_OPER_STATUS
+
+# tests/send_trap.py の linkDown と同じ変数
+VARBINDS = [
+    (rfc1902.ObjectName('1.3.6.1.2.1.1.3.0'), rfc1902.TimeTicks(12345)),
+    (rfc1902.ObjectName('1.3.6.1.6.3.1.1.4.1.0'), rfc1902.ObjectName('1.3.6.1.6.3.1.1.5.3')),
+    (rfc1902.ObjectName(OID_IF_INDEX), rfc1902.Integer(1)),
+    (rfc1902.ObjectName(OID_IF_ADMIN_STATUS), rfc1902.Integer(2)),
+    (rfc1902.ObjectName(OID_IF_OPER_STATUS), rfc1902.Integer(2)),
+]
+
+def result(name, iterations, elapsed, **extra):
+    return {
+        "benchmark": "micro",
+        "name": name,
+        "iterations": iterations,
+        "ns_per_op": round(elapsed * 1e9 / iterations, 1),
+        "ops_per_sec": round(iterations / elapsed, 1),
+        **extra
+    }
+
+def bench_resolve(resolver, name, iterations, oid_variants):
+    """
+    MibResolver.resolve を Trap の変数の組に対して繰り返し呼び出します。
+    oid_variants を増やすと末尾のインデックスが変わり、キャッシュのヒット率が下がります。
+    """
+    varbinds = []
+    for i in range(oid_variants):
+        for oid, value in VARBINDS:
+            if i:
+                oid = rfc1902.ObjectName(tuple(oid) + (i,))
+            varbinds.append((oid, value))
+
+    started = time.perf_counter()
+    count = 0
+    while count < iterations:
+        for oid, value in varbinds:
+            resolver.resolve(oid, value)
+        count += len(varbinds)
+    elapsed = time.perf_counter() - started
+    return result(name, count, elapsed, cache=resolver.cache_info())
+
+def row_varbinds(index):
+    """
+    テーブルの行についての通知 (列のOIDのインデックスだけがTrapごとに異なる)。
+    """
+    row = (1, 3, 6, 1, 6, 3, 13, 1, 1, 1)  # SNMP-NOTIFICATION-MIB::snmpNotifyEntry
+    return [
+        (rfc1902.ObjectName('1.3.6.1.2.1.1.3.0'), rfc1902.TimeTicks(12345 + index)),
+        (rfc1902.ObjectName('1.3.6.1.6.3.1.1.4.1.0'), rfc1902.ObjectName('1.3.6.1.6.3.1.1.5.1')),
+        (rfc1902.ObjectName(row + (2, index)), rfc1902.OctetString(b"paging")),
+        (rfc1902.ObjectName(row + (3, index)), rfc1902.Integer(1)),
+        (rfc1902.ObjectName(row + (4, index)), rfc1902.Integer(3)),
+        (rfc1902.ObjectName(row + (5, index)), rfc1902.Integer(1)),
+    ]
+
+def bench_resolve_trap(name, iterations, indexes):
+    """
+    Trap 1件の変数の解決を、変数ごとの resolve_variable と resolve_trap (テンプレート) で比較します。
+    indexes を増やすと、変数のOIDの種類が解決キャッシュの大きさを超えます。
+    """
+    traps = [row_varbinds(i) for i in range(1, indexes + 1)]
+    results = []
+    for mode in ("per_varbind", "template"):
+        resolver = MibResolver()
+        resolver.mibBuilder.loadModules('SNMPv2-MIB', 'SNMP-NOTIFICATION-MIB')
+        if mode == "per_varbind":
+            resolve = lambda var_binds: [resolver.resolve_variable(oid, value) for oid, value in var_binds]
+        else:
+            resolve = resolver.resolve_trap
+        for var_binds in traps[:1000]:
+            resolve(var_binds)
+
+        started = time.perf_counter()
+        count = 0
+        while count < iterations:
+            for var_binds in traps:
+                resolve(var_binds)
+            count += len(traps)
+        elapsed = time.perf_counter() - started
+        results.append(result(f"{name}_{mode}", count, elapsed, varbinds=len(traps[0]), cache=resolver.cache_info()))
+    return results
+
+# 値の整形の比較対象 (名前, 構文クラス名, 列挙値, 値)
+FORMAT_CASES = [
+    ("integer", ("Integer32",), None, rfc1902.Integer(42)),
+    ("enum", ("Integer32",), {1: "up", 2: "down", 3: "testing"}, rfc1902.Integer(2)),
+    ("display_string", ("DisplayString",), None, rfc1902.OctetString(b"GigabitEthernet0/1")),
+    ("mac_address", ("MacAddress",), None, rfc1902.OctetString(b"\x00\x11\x22\x33\x44\x55")),
+    ("date_and_time", ("DateAndTime",), None, rfc1902.OctetString(bytes([7, 232, 3, 15, 13, 5, 9, 3, 43, 9, 0]))),
+    ("timeticks", ("TimeTicks",), None, rfc1902.TimeTicks(9000123)),
+    ("object_identifier", ("ObjectIdentifier",), None, rfc1902.ObjectName("1.3.6.1.6.3.1.1.5.3")),
+]
+
+def bench_format(iterations):
+    """
+    構文ごとに生成した整形関数と value.prettyPrint() の1件あたりの処理時間を比較します。
+    """
+    results = []
+    for name, syntax, enums, value in FORMAT_CASES:
+        formatter = build_formatter(syntax, enums)
+
+        started = time.perf_counter()
+        for _ in range(iterations):
+            value.prettyPrint()
+        pretty = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for _ in range(iterations):
+            formatter(value)
+        typed = time.perf_counter() - started
+
+        results.append(result(
+            f"format_{name}", iterations, typed,
+            pretty_ns_per_op=round(pretty * 1e9 / iterations, 1),
+            value=formatter(value)[0], pretty_value=value.prettyPrint()
+        ))
+    return results
+
+def make_trap(resolver, i):
+    # TrapListener と同じ内部表現 (辞書への変換は Dispatcher.dispatch で行われる)
+    return TrapRecord(
+        "192.0.2.1", 162, "v2c",
+        tuple(resolver.resolve_variable(oid, value) for oid, value in VARBINDS),
+        time.time(), extra={"seq": i}
+    )
+
+async def bench_dispatch_stdout(resolver, iterations):
+    """
+    stdout出力モードの Dispatcher.dispatch (書き込み先は破棄用のバッファ)。
+    """
+    settings.output_mode = "stdout"
+    dispatcher = Dispatcher()
+    dispatcher.stdout_sink = StdoutSink(
+        stream=io.BytesIO(), buffer_bytes=settings.stdout_buffer_bytes,
+        flush_interval_ms=settings.stdout_flush_interval_ms, encoder=settings.stdout_json_encoder
+    )
+    traps = [make_trap(resolver, i) for i in range(iterations)]
+
+    started = time.perf_counter()
+    for trap in traps:
+        await dispatcher.dispatch(trap)
+    elapsed = time.perf_counter() - started
+    await dispatcher.close()
+    return result("dispatch_stdout", iterations, elapsed, encoder=dispatcher.stdout_sink.encoder)
+
+async def bench_dispatch_file(resolver, iterations):
+    """
+    ファイル出力モードの Dispatcher.dispatch (一時ディレクトリに書き込み、圧縮の完了までを含む)。
+    """
+    settings.output_mode = "file"
+    with tempfile.TemporaryDirectory() as directory:
+        settings.file_dir = directory
+        settings.file_max_bytes = 1024 * 1024
+        dispatcher = Dispatcher()
+        await dispatcher.initialize()
+        traps = [make_trap(resolver, i) for i in range(iterations)]
+
+        started = time.perf_counter()
+        for trap in traps:
+            await dispatcher.dispatch(trap)
+        dispatch_elapsed = time.perf_counter() - started
+        await dispatcher.close()
+        elapsed = time.perf_counter() - started
+        stats = dispatcher.file_sink.stats()
+    return result(
+        "dispatch_file", iterations, dispatch_elapsed,
+        compression=settings.file_compression, total_seconds=round(elapsed, 3),
+        rotations=stats["rotations"], bytes_written=stats["bytes_written"],
+        compressed_bytes=stats["compressed_bytes"]
+    )
+
+async def bench_dispatch_webhook(resolver, iterations, batch_size):
+    """
+    Webhook出力モードの Dispatcher.dispatch (送信先はローカルのスタンドイン)。
+    """
+    async def handler(request):
+        await request.read()
+        return web.Response(text="ok")
+
+    app = web.Application()
+    app.router.add_post("/hook", handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    settings.output_mode = "webhook"
+    settings.webhook_url = f"http://127.0.0.1:{port}/hook"
+    settings.webhook_batch_size = batch_size
+    dispatcher = Dispatcher()
+    await dispatcher.initialize()
+    traps = [make_trap(resolver, i) for i in range(iterations)]
+
+    started = time.perf_counter()
+    for trap in traps:
+        await dispatcher.dispatch(trap)
+    await dispatcher.close()
+    elapsed = time.perf_counter() - started
+    await runner.cleanup()
+    return result(f"dispatch_webhook_batch{batch_size}", iterations, elapsed)
+
+async def main():
+    parser = argparse.ArgumentParser(description='Microbenchmarks for MibResolver.resolve and Dispatcher.dispatch.')
+    parser.add_argument('--iterations', type=int, default=100000, help='Operations per resolve benchmark')
+    parser.add_argument('--dispatch-iterations', type=int, default=20000, help='Operations per dispatch benchmark')
+    parser.add_argument('--output', help='Append the JSON results to this file')
+    args = parser.parse_args()
+
+    results = []
+    resolver = MibResolver()
+    results.append(bench_resolve(resolver, "resolve_cached", args.iterations, 1))
+    results.append(bench_resolve(resolver, "resolve_many_oids", args.iterations, 5000))
+    results.extend(bench_resolve_trap("resolve_trap", args.iterations // 10, 1))
+    results.extend(bench_resolve_trap("resolve_trap_many_rows", args.iterations // 10, 20000))
+
+    value_format = settings.value_format
+    settings.value_format = "pretty"
+    results.append(bench_resolve(MibResolver(), "resolve_cached_pretty", args.iterations, 1))
+    settings.value_format = value_format
+    results.extend(bench_format(args.iterations))
+
+    cache_size = settings.resolve_cache_size
+    settings.resolve_cache_size = 0
+    results.append(bench_resolve(MibResolver(), "resolve_uncached", args.iterations // 10, 1))
+    settings.resolve_cache_size = cache_size
+
+    results.append(await bench_dispatch_stdout(resolver, args.dispatch_iterations))
+    results.append(await bench_dispatch_file(resolver, args.dispatch_iterations))
+    results.append(await bench_dispatch_webhook(resolver, args.dispatch_iterations // 10, 1))
+    results.append(await bench_dispatch_webhook(resolver, args.dispatch_iterations, 100))
+
+    env = {"python": platform.python_version(), "machine": platform.machine()}
+    with open(args.output, "a", encoding="utf-8") if args.output else open(os.devnull, "w") as f:
+        for item in results:
+            line = json.dumps({**item, **env})
+            print(line)
+            f.write(line + "\n")
+
+if __name__ == '__main__':
+    asyncio.run(main())
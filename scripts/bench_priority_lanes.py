@@ -0,0 +1,106 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+# プロジェクトルートをPYTHONPATHに追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.ingest import IngestQueue, Lane
+
+
+class SlowDispatcher:
+    """
+    1件ごとに一定時間かかる出力先を再現し、受け付けからの遅延をレーンごとに記録するDispatcher。
+    """
+
+    def __init__(self, service_ms):
+        self.service = service_ms / 1000
+        self.latencies = {"critical": [], "bulk": []}
+
+    async def dispatch(self, trap_data):
+        await asyncio.sleep(self.service)
+        self.latencies[trap_data["lane"]].append(time.monotonic() - trap_data["received"])
+
+
+def by_lane(trap_data):
+    return trap_data["lane"]
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * p))] * 1000, 2)
+
+
+async def produce(ingest_queue, args):
+    """
+    bulk を出力先の処理能力を超えるレートで、critical を低いレートで送り続けます。
+    """
+    started = time.monotonic()
+    sent = {"critical": 0, "bulk": 0}
+    rates = {"critical": args.critical_rate, "bulk": args.bulk_rate}
+    while True:
+        now = time.monotonic()
+        elapsed = now - started
+        if elapsed >= args.duration:
+            return
+        for lane, rate in rates.items():
+            while sent[lane] < elapsed * rate:
+                sent[lane] += 1
+                ingest_queue.put({"lane": lane, "received": now})
+        await asyncio.sleep(0.001)
+
+
+async def run(mode, args):
+    dispatcher = SlowDispatcher(args.service_ms)
+    if mode == "single":
+        # 変更前と同じ1本のキュー (全てのTrapが同じ順番待ちに並ぶ)
+        lanes = [Lane("single", args.capacity, "drop-newest")]
+        ingest_queue = IngestQueue(dispatcher, workers=args.workers, lanes=lanes)
+    else:
+        lanes = [Lane("critical", args.capacity // 10, "drop-oldest", weight=args.weight),
+                 Lane("bulk", args.capacity, "drop-newest")]
+        ingest_queue = IngestQueue(dispatcher, workers=args.workers, lanes=lanes, scheduler=mode,
+                                   classifier=by_lane)
+    await ingest_queue.start()
+    await produce(ingest_queue, args)
+    stats = ingest_queue.stats()
+    await ingest_queue.drain(timeout=0)
+
+    critical = dispatcher.latencies["critical"]
+    bulk = dispatcher.latencies["bulk"]
+    return {
+        "benchmark": "priority_lanes",
+        "mode": mode,
+        "critical_dispatched": len(critical),
+        "critical_p50_ms": percentile(critical, 0.5),
+        "critical_p99_ms": percentile(critical, 0.99),
+        "bulk_dispatched": len(bulk),
+        "bulk_p99_ms": percentile(bulk, 0.99),
+        "dropped": stats["dropped"],
+        "lanes": stats.get("lanes")
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure critical trap latency while bulk traffic saturates the queue.')
+    parser.add_argument('--duration', type=float, default=5.0, help='Seconds of sustained load per mode')
+    parser.add_argument('--workers', type=int, default=4, help='Dispatch workers')
+    parser.add_argument('--service-ms', type=float, default=2.0, help='Time the output takes per trap')
+    parser.add_argument('--bulk-rate', type=float, default=4000, help='Bulk traps per second')
+    parser.add_argument('--critical-rate', type=float, default=50, help='Critical traps per second')
+    parser.add_argument('--capacity', type=int, default=2000, help='Queue (bulk lane) capacity')
+    parser.add_argument('--weight', type=int, default=8, help='Critical lane weight for the weighted scheduler')
+    parser.add_argument('--modes', default="single,weighted,strict", help='Comma separated modes')
+    args = parser.parse_args()
+
+    for mode in args.modes.split(","):
+        print(json.dumps(asyncio.run(run(mode, args))))
+
+
+if __name__ == '__main__':
+    main()
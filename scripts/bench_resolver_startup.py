@@ -0,0 +1,87 @@
+import argparse
+import glob
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import pysnmp
+
+# プロジェクトルート
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 子プロセスで実行する処理: 起動 (インポート・MibResolverの初期化) から最初のTrapの変数を解決するまでの時間を計測する
+CHILD = '''
+import json, time
+started = time.perf_counter()
+from pysnmp.proto import rfc1902
+from src.resolver import MibResolver
+resolver = MibResolver()
+initialized = time.perf_counter()
+varbinds = [
+    (rfc1902.ObjectName("1.3.6.1.2.1.1.3.0"), rfc1902.TimeTicks(12345)),
+    (rfc1902.ObjectName("1.3.6.1.6.3.1.1.4.1.0"), rfc1902.ObjectName("1.3.6.1.6.3.1.1.5.3")),
+    (rfc1902.ObjectName("1.3.6.1.2.1.2.2.1.1.3"), rfc1902.Integer(3)),
+]
+results = [resolver.resolve(oid, value) for oid, value in varbinds]
+finished = time.perf_counter()
+print(json.dumps({
+    "init_seconds": round(initialized - started, 4),
+    "first_trap_seconds": round(finished - started, 4),
+    "snapshot": resolver.mibBuilder is None,
+    "modules": resolver.module_count(),
+}))
+'''
+
+
+def copy_pysnmp_mibs(directory):
+    """
+    pysnmp 同梱のコンパイル済みMIBモジュールをベンチマーク用のMIBディレクトリにコピーします。
+    """
+    source = os.path.join(os.path.dirname(pysnmp.__file__), "smi", "mibs")
+    for path in glob.glob(os.path.join(source, "*.py")):
+        if not os.path.basename(path).startswith("__init__"):
+            shutil.copy(path, directory)
+
+
+def run(mode, mib_dir, snapshot_path):
+    env = dict(os.environ, MIB_DIR=mib_dir, RESOLVER_MODE="mib", MIB_LOAD_MODE="eager")
+    if snapshot_path:
+        env["RESOLVER_SNAPSHOT_PATH"] = snapshot_path
+    else:
+        env.pop("RESOLVER_SNAPSHOT_PATH", None)
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD], cwd=ROOT, env=env, check=True, capture_output=True, text=True
+    ).stdout
+    return {"benchmark": "resolver_startup", "mode": mode, **json.loads(output.strip().splitlines()[-1])}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the time from start-up to the first resolved trap.')
+    parser.add_argument('--mib-dir', help='Compiled MIB directory (default: a copy of the MIBs bundled with pysnmp)')
+    parser.add_argument('--runs', type=int, default=3, help='Runs per mode')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        mib_dir = args.mib_dir
+        if mib_dir is None:
+            mib_dir = os.path.join(directory, "mibs")
+            os.makedirs(mib_dir)
+            copy_pysnmp_mibs(mib_dir)
+        snapshot_path = os.path.join(directory, "resolver_snapshot.bin")
+
+        results = []
+        for _ in range(args.runs):
+            results.append(run("no-snapshot", mib_dir, None))
+        # 最初の実行はMIBモジュールをロードしてスナップショットを書き出す
+        results.append(run("snapshot-cold", mib_dir, snapshot_path))
+        for _ in range(args.runs):
+            results.append(run("snapshot-warm", mib_dir, snapshot_path))
+
+    for result in results:
+        print(json.dumps(result))
+
+
+if __name__ == '__main__':
+    main()
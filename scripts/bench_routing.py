@@ -0,0 +1,121 @@
+import argparse
+import ipaddress
+import json
+import os
+import random
+import sys
+import time
+
+# プロジェクトルートをPYTHONPATHに追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.formatters import format_generic
+from src.router import Router
+from src.trap_record import OidInfo, PrettyVariable, TrapRecord, SNMP_TRAP_OID
+
+TRAP_OID_INFO = OidInfo(SNMP_TRAP_OID, "SNMPv2-MIB", "snmpTrapOID", "0", format_generic, "ObjectName")
+SEVERITY_INFO = OidInfo("1.3.6.1.4.1.99999.2.1.0", "BENCH-MIB", "benchSeverity", "0", format_generic, "Integer32")
+SINKS = {"paging": {"type": "webhook"}, "archive": {"type": "file"}}
+
+
+def make_rules(count):
+    """
+    ベンダーごとのTrapのサブツリーと送信元ネットワークの組み合わせのルールを生成します (10件に1件は変数の条件付き)。
+    """
+    rules = []
+    for i in range(count):
+        rule = {
+            "trap_oid": f"1.3.6.1.4.1.{1000 + i}.0",
+            "source": f"10.{i // 256 % 256}.{i % 256}.0/24",
+            "sinks": ["paging" if i % 2 else "archive"]
+        }
+        if i % 10 == 0:
+            rule["varbinds"] = [{"name": "benchSeverity", "equals": ["1", "2"]}]
+        rules.append(rule)
+    return rules
+
+
+def make_traps(count, rule_count, rng):
+    traps = []
+    for _ in range(count):
+        i = rng.randrange(rule_count)
+        # 半数はいずれかのルールに一致し、残りは送信元が一致しない
+        network = i if rng.random() < 0.5 else i + 1
+        trap_oid = f"1.3.6.1.4.1.{1000 + i}.0.{rng.randrange(1, 20)}"
+        source = f"10.{network // 256 % 256}.{network % 256}.{rng.randrange(1, 255)}"
+        traps.append(TrapRecord(source, 162, "v2c", (
+            PrettyVariable(TRAP_OID_INFO, trap_oid),
+            PrettyVariable(SEVERITY_INFO, str(rng.randrange(1, 6))),
+        )))
+    return traps
+
+
+class LinearRouter:
+    """
+    比較用: ルールを定義順に1件ずつ評価する素朴な実装。
+    """
+
+    def __init__(self, rules):
+        self.rules = [
+            (rule["trap_oid"], ipaddress.ip_network(rule["source"]), rule.get("varbinds"), tuple(rule["sinks"]))
+            for rule in rules
+        ]
+
+    def route(self, trap):
+        trap_oid = trap.trap_oid
+        source = ipaddress.ip_address(trap.source_ip)
+        for prefix, network, varbinds, sinks in self.rules:
+            if trap_oid != prefix and not trap_oid.startswith(prefix + "."):
+                continue
+            if source not in network:
+                continue
+            if varbinds and not any(
+                v.name == varbinds[0]["name"] and v.value in varbinds[0]["equals"] for v in trap.variables
+            ):
+                continue
+            return sinks
+        return ("default",)
+
+
+def bench(name, router, traps, repeat):
+    route = router.route
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for trap in traps:
+            route(trap)
+    elapsed = time.perf_counter() - started
+    count = len(traps) * repeat
+    return {"ns_per_match": round(elapsed * 1e9 / count, 1), "matches": count}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure routing match time against the number of rules.')
+    parser.add_argument('--rules', default="10,100,1000,10000", help='Comma separated rule counts')
+    parser.add_argument('--traps', type=int, default=2000, help='Distinct traps per rule count')
+    parser.add_argument('--repeat', type=int, default=10, help='Passes over the traps')
+    parser.add_argument('--linear-max', type=int, default=1000, help='Largest rule count for the linear baseline')
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    for rule_count in (int(x) for x in args.rules.split(",")):
+        rules = make_rules(rule_count)
+        traps = make_traps(args.traps, rule_count, rng)
+
+        started = time.perf_counter()
+        router = Router(rules, sinks=SINKS)
+        compile_seconds = time.perf_counter() - started
+
+        linear = LinearRouter(rules)
+        # 2つの実装が同じシンクを返すことを確認する
+        agree = all(router.match(t.source_ip, t.trap_oid, t.variables) == linear.route(t) for t in traps)
+
+        print(json.dumps({"benchmark": "routing", "mode": "compiled", "rules": rule_count,
+                          "compile_seconds": round(compile_seconds, 3), "agrees_with_linear": agree,
+                          **bench("compiled", router, traps, args.repeat)}))
+        if rule_count <= args.linear_max:
+            print(json.dumps({"benchmark": "routing", "mode": "linear", "rules": rule_count,
+                              **bench("linear", linear, traps, max(1, args.repeat // 10))}))
+
+
+if __name__ == '__main__':
+    main()
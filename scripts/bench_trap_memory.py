@@ -0,0 +1,124 @@
+import argparse
+import gc
+import json
+import logging
+import os
+import sys
+import tracemalloc
+from datetime import datetime, timezone
+from pysnmp.proto import rfc1902
+
+# プロジェクトルートをPYTHONPATHに追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.resolver import MibResolver
+from src.listener import TrapListener
+from tests.send_trap import OID_IF_INDEX, OID_IF_ADMIN_STATUS, OID_IF_OPER_STATUS
+
+
+class CaptureQueue:
+    """
+    受信キューの代わりにTrapを保持するだけのキュー (シンクが詰まって滞留している状態を再現する)。
+    """
+
+    def __init__(self):
+        self.items = []
+
+    def put(self, trap_data):
+        self.items.append(trap_data)
+        return True
+
+
+def make_varbinds(i, interfaces):
+    # tests/send_trap.py の linkDown と同じ変数 (インターフェース番号はTrapごとに変える)
+    if_index = i % interfaces + 1
+    return [
+        (rfc1902.ObjectName('1.3.6.1.2.1.1.3.0'), rfc1902.TimeTicks(12345 + i)),
+        (rfc1902.ObjectName('1.3.6.1.6.3.1.1.4.1.0'), rfc1902.ObjectName('1.3.6.1.6.3.1.1.5.3')),
+        (rfc1902.ObjectName(OID_IF_INDEX[:-1] + str(if_index)), rfc1902.Integer(if_index)),
+        (rfc1902.ObjectName(OID_IF_ADMIN_STATUS[:-1] + str(if_index)), rfc1902.Integer(2)),
+        (rfc1902.ObjectName(OID_IF_OPER_STATUS[:-1] + str(if_index)), rfc1902.Integer(2)),
+    ]
+
+
+def build_dicts(resolver, traps):
+    """
+    変更前の TrapListener と同じく、変数ごとの辞書を持つTrapの辞書を作ります。
+    """
+    queue = CaptureQueue()
+    for address, varbinds in traps:
+        queue.put({
+            "source_ip": address[0],
+            "source_port": address[1],
+            "snmp_version": "v2c",
+            "variables": [resolver.resolve(name, val) for name, val in varbinds],
+            "timestamp": datetime.now(timezone.utc).isoformat()
+        })
+    return queue
+
+
+def build_records(resolver, traps):
+    """
+    TrapListener._process_trap で TrapRecord を作ります。
+    """
+    queue = CaptureQueue()
+    listener = TrapListener(resolver, None, ingest_queue=queue)
+    for address, varbinds in traps:
+        listener._process_trap(address, "v2c", varbinds)
+    return queue
+
+
+def measure(mode, build, resolver, traps):
+    build(resolver, traps[:1000])  # 解決キャッシュを温めておく
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    queue = build(resolver, traps)
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    count = len(queue.items)
+    return {
+        "benchmark": "trap_memory",
+        "mode": mode,
+        "traps": count,
+        "bytes_per_trap": round(retained / count),
+        "to_dict_equal": None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure memory retained per queued trap.')
+    parser.add_argument('--traps', type=int, default=20000, help='Number of queued traps')
+    parser.add_argument('--sources', type=int, default=100, help='Number of distinct source addresses')
+    parser.add_argument('--interfaces', type=int, default=48, help='Number of distinct interface indexes')
+    args = parser.parse_args()
+
+    # 受信ごとのログ出力は計測対象外にする
+    logging.disable(logging.INFO)
+
+    resolver = MibResolver()
+    # 送信元アドレスの文字列は受信ごとに新しく作られるため、ここでもTrapごとに生成する
+    traps = [
+        ((f"10.0.{i % args.sources // 256}.{i % args.sources % 256}", 162), make_varbinds(i, args.interfaces))
+        for i in range(args.traps)
+    ]
+
+    results = [
+        measure("dict", build_dicts, resolver, traps),
+        measure("record", build_records, resolver, traps),
+    ]
+
+    # 出力 (シンクに渡す辞書) がタイムスタンプ以外は同じであることを確認する
+    expected = build_dicts(resolver, traps[:100]).items
+    actual = [trap.to_dict() for trap in build_records(resolver, traps[:100]).items]
+    for item in expected + actual:
+        item.pop("timestamp")
+    results[1]["to_dict_equal"] = expected == actual
+
+    for result in results:
+        print(json.dumps(result))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pysnmp.entity import engine, config
+from pysnmp.proto.api import v2c
+
+# プロジェクトルートをPYTHONPATHに追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.usm import UsmUser, UsmCredentials, lookup_auth_protocol, lookup_priv_protocol
+
+# 認証・暗号化プロトコルの組み合わせ (ユーザーごとに順番に割り当てる)
+PROFILES = [("sha", "aes"), ("sha256", "aes"), ("sha512", "aes256"), ("md5", "des")]
+
+def make_users(count, engines_per_user):
+    users = []
+    for i in range(count):
+        auth, priv = PROFILES[i % len(PROFILES)]
+        engine_ids = [bytes.fromhex("80000000") + (i * engines_per_user + j).to_bytes(4, "big")
+                      for j in range(engines_per_user)]
+        users.append(UsmUser(f"user{i}", auth, f"auth-passphrase-{i}", priv, f"priv-passphrase-{i}",
+                             engine_ids=engine_ids))
+    return users
+
+def bench_pysnmp(count, engines_per_user):
+    """
+    従来と同じくパスフレーズを config.add_v3_user に渡して登録する (pysnmp がキーを生成する)。
+    """
+    snmp_engine = engine.SnmpEngine()
+    started = time.perf_counter()
+    for i in range(count):
+        auth, priv = PROFILES[i % len(PROFILES)]
+        for j in range(engines_per_user):
+            engine_id = bytes.fromhex("80000000") + (i * engines_per_user + j).to_bytes(4, "big")
+            config.add_v3_user(
+                snmp_engine, f"user{i}",
+                lookup_auth_protocol(auth)[0], f"auth-passphrase-{i}",
+                lookup_priv_protocol(priv), f"priv-passphrase-{i}",
+                securityEngineId=v2c.OctetString(engine_id)
+            )
+    elapsed = time.perf_counter() - started
+    return {"benchmark": "usm_startup", "mode": "pysnmp-passphrase", "users": count,
+            "engines_per_user": engines_per_user, "seconds": round(elapsed, 3)}
+
+def bench_credentials(mode, users, engines_per_user, cache_path):
+    credentials = UsmCredentials(users, key_cache_path=cache_path)
+    started = time.perf_counter()
+    credentials.register(engine.SnmpEngine())
+    elapsed = time.perf_counter() - started
+    return {"benchmark": "usm_startup", "mode": mode, "users": len(users),
+            "engines_per_user": engines_per_user, "seconds": round(elapsed, 3), **credentials.stats()}
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure SNMPv3 user registration time at start-up.')
+    parser.add_argument('--users', type=int, default=1000, help='Number of USM users')
+    parser.add_argument('--engines-per-user', type=int, default=1, help='Authoritative engine IDs per user')
+    parser.add_argument('--skip-pysnmp', action='store_true', help='Skip the pysnmp passphrase baseline')
+    args = parser.parse_args()
+
+    users = make_users(args.users, args.engines_per_user)
+    results = []
+    if not args.skip_pysnmp:
+        results.append(bench_pysnmp(args.users, args.engines_per_user))
+    with tempfile.TemporaryDirectory() as directory:
+        cache_path = os.path.join(directory, "usm-keys.json")
+        results.append(bench_credentials("no-cache", users, args.engines_per_user, None))
+        results.append(bench_credentials("cache-cold", users, args.engines_per_user, cache_path))
+        results.append(bench_credentials("cache-warm", users, args.engines_per_user, cache_path))
+    for result in results:
+        print(json.dumps({**result, "cpus": os.cpu_count()}))
+
+if __name__ == '__main__':
+    main()
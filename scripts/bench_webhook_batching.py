@@ -0,0 +1,114 @@
+import asyncio
+import argparse
+import json
+import os
+import sys
+import time
+from aiohttp import web
+
+# プロジェクトルートをPYTHONPATHに追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config import settings
+from src.dispatcher import Dispatcher
+from src.ingest import IngestQueue
+
+# 比較するモード: (名前, batch_size, format, compression)
+MODES = [
+    ("single", 1, "json", "none"),
+    ("batch-json", 100, "json", "none"),
+    ("batch-ndjson-gzip", 100, "ndjson", "gzip"),
+]
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+async def run_mode(name, batch_size, body_format, compression, args):
+    """
+    ローカルのWebhookスタンドインに対して、指定モードでTrapを送信し結果を計測します。
+    """
+    requests = 0
+    latencies = []
+
+    async def handler(request):
+        nonlocal requests
+        received = time.perf_counter_ns()
+        requests += 1
+        body = await request.read()
+        if request.headers.get("Content-Type") == "application/x-ndjson":
+            items = [json.loads(line) for line in body.splitlines()]
+        else:
+            items = json.loads(body)
+            if isinstance(items, dict):
+                items = [items]
+        for item in items:
+            latencies.append((received - item["sent_ns"]) / 1e6)
+        return web.Response(text="ok")
+
+    app = web.Application()
+    app.router.add_post("/hook", handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    settings.output_mode = "webhook"
+    settings.webhook_url = f"http://127.0.0.1:{port}/hook"
+    settings.webhook_batch_size = batch_size
+    settings.webhook_batch_linger_ms = args.linger_ms
+    settings.webhook_batch_format = body_format
+    settings.webhook_compression = compression
+
+    dispatcher = Dispatcher()
+    await dispatcher.initialize()
+    ingest_queue = IngestQueue(dispatcher, maxsize=args.count, workers=args.workers, overflow_policy="block")
+    await ingest_queue.start()
+
+    interval = 1.0 / args.rate if args.rate else 0
+    started = time.perf_counter()
+    for i in range(args.count):
+        ingest_queue.put({
+            "source_ip": "127.0.0.1",
+            "variables": [{"oid": "1.3.6.1.2.1.1.3.0", "value": str(i)}],
+            "sent_ns": time.perf_counter_ns()
+        })
+        if interval:
+            await asyncio.sleep(max(0, started + (i + 1) * interval - time.perf_counter()))
+        elif i % 100 == 0:
+            await asyncio.sleep(0)
+
+    await ingest_queue.drain(timeout=60)
+    await dispatcher.close()
+    elapsed = time.perf_counter() - started
+    await runner.cleanup()
+
+    return {
+        "benchmark": "webhook_batching",
+        "mode": name,
+        "traps": args.count,
+        "delivered": len(latencies),
+        "requests": requests,
+        "requests_per_trap": round(requests / args.count, 4),
+        "traps_per_sec": round(len(latencies) / elapsed, 1),
+        "latency_p50_ms": round(percentile(latencies, 50), 3),
+        "latency_p99_ms": round(percentile(latencies, 99), 3),
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description='Benchmark webhook delivery with and without batching.')
+    parser.add_argument('--count', type=int, default=5000, help='Number of traps per mode')
+    parser.add_argument('--rate', type=float, default=0, help='Target traps/sec (0 = as fast as possible)')
+    parser.add_argument('--workers', type=int, default=4, help='Number of dispatcher workers')
+    parser.add_argument('--linger-ms', type=int, default=20, help='Batch linger time in milliseconds')
+    args = parser.parse_args()
+
+    for mode in MODES:
+        result = await run_mode(*mode, args)
+        print(json.dumps(result))
+
+if __name__ == '__main__':
+    asyncio.run(main())
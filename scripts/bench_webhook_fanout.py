@@ -0,0 +1,101 @@
+import asyncio
+import argparse
+import json
+import os
+import sys
+import time
+from aiohttp import web
+
+# プロジェクトルートをPYTHONPATHに追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config import settings
+from src.dispatcher import Dispatcher
+from src.ingest import IngestQueue
+
+# 比較するモード: (名前, webhook_mode, 遅い送信先を含めるか)
+MODES = [
+    ("single-fast", "fanout", False),
+    ("fanout", "fanout", True),
+    ("round-robin", "round-robin", True),
+    ("least-loaded", "least-loaded", True),
+]
+
+async def start_collector(delay):
+    """
+    応答までに delay 秒かかるWebhookスタンドインを起動します。
+    """
+    received = []
+
+    async def handler(request):
+        await request.read()
+        await asyncio.sleep(delay)
+        received.append(time.perf_counter())
+        return web.Response(text="ok")
+
+    app = web.Application()
+    app.router.add_post("/hook", handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/hook", received
+
+async def run_mode(name, mode, with_slow, args):
+    """
+    速い送信先と遅い送信先に対して、指定モードでTrapを送信し受信スループットを計測します。
+    """
+    fast_runner, fast_url, fast_received = await start_collector(0)
+    slow_runner, slow_url, slow_received = await start_collector(args.slow_ms / 1000)
+
+    settings.output_mode = "webhook"
+    settings.webhook_batch_size = 1
+    settings.webhook_mode = mode
+    settings.webhook_max_in_flight = args.max_in_flight
+    # 遅い送信先には個別の同時送信数上限を設定する
+    settings.webhook_urls = f"{fast_url},{slow_url}|{args.slow_max_in_flight}" if with_slow else fast_url
+
+    dispatcher = Dispatcher()
+    await dispatcher.initialize()
+    ingest_queue = IngestQueue(dispatcher, maxsize=args.count, workers=args.workers, overflow_policy="block")
+    await ingest_queue.start()
+
+    started = time.perf_counter()
+    for i in range(args.count):
+        ingest_queue.put({"source_ip": "127.0.0.1", "variables": [{"oid": "1.3.6.1.2.1.1.3.0", "value": str(i)}]})
+        if i % 100 == 0:
+            await asyncio.sleep(0)
+    await ingest_queue.drain(timeout=120)
+    elapsed = time.perf_counter() - started
+    stats = dispatcher.stats()["webhook"]
+    await dispatcher.close()
+    await fast_runner.cleanup()
+    await slow_runner.cleanup()
+
+    return {
+        "benchmark": "webhook_fanout",
+        "mode": name,
+        "traps": args.count,
+        "slow_ms": args.slow_ms,
+        "traps_per_sec": round(args.count / elapsed, 1),
+        "fast_received": len(fast_received),
+        "slow_received": len(slow_received),
+        "slow_shed": stats.get("endpoint1", {}).get("shed", 0),
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description='Benchmark multi-endpoint webhook delivery with one slow collector.')
+    parser.add_argument('--count', type=int, default=5000, help='Number of traps per mode')
+    parser.add_argument('--workers', type=int, default=4, help='Number of dispatcher workers')
+    parser.add_argument('--slow-ms', type=int, default=500, help='Response delay of the slow collector in milliseconds')
+    parser.add_argument('--max-in-flight', type=int, default=64, help='Default concurrency cap per endpoint')
+    parser.add_argument('--slow-max-in-flight', type=int, default=2, help='Concurrency cap of the slow collector')
+    args = parser.parse_args()
+
+    for mode in MODES:
+        result = await run_mode(*mode, args)
+        print(json.dumps(result))
+
+if __name__ == '__main__':
+    asyncio.run(main())
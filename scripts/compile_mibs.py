@@ -1,17 +1,182 @@
 import os
+import re
 import sys
-import glob
+import json
+import time
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 from pysmi.reader import FileReader, HttpReader
-from pysmi.searcher import StubSearcher
+from pysmi.searcher import StubSearcher, PyFileSearcher
 from pysmi.writer import PyFileWriter
 from pysmi.parser import SmiStarParser
 from pysmi.codegen import PySnmpCodeGen
 from pysmi.compiler import MibCompiler
+import pysmi
 
-def compile_mibs(src_dir, dest_dir):
+# プロジェクトルートをPYTHONPATHに追加 (src.oid_index を使用するため)
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_ROOT)
+
+from src.oid_index import collect_oid_entries, write_oid_index, INDEX_FILENAME
+from src.mib_registry import collect_module_prefixes, write_registry, REGISTRY_FILENAME
+
+# 標準MIB (SNMPv2-SMI など) のASN.1ソースを同梱したディレクトリ (オフラインでの依存解決に使用)
+STANDARD_MIB_DIR = os.path.join(PROJECT_ROOT, "mibs", "standard")
+HTTP_SOURCE = 'https://mibs.pysnmp.com/asn1/@mib@'
+# コンパイル済みモジュールのソースハッシュを記録するキャッシュファイル
+CACHE_FILENAME = ".compile_cache.json"
+MIB_EXTENSIONS = ('.mib', '.my', '.txt')
+
+# pysmi が生成しない (実装側で提供される) モジュール
+BUILTIN_MIBS = set(PySnmpCodeGen.baseMibs) | set(PySnmpCodeGen.fakeMibs)
+
+_COMMENT_RE = re.compile(r'--.*?(?:--|$)', re.MULTILINE)
+_MODULE_RE = re.compile(r'([A-Za-z][\w-]*)\s+DEFINITIONS\s*(?:IMPLICIT\s+TAGS\s*)?::=\s*BEGIN')
+_IMPORTS_RE = re.compile(r'\bIMPORTS\b(.*?);', re.DOTALL)
+_FROM_RE = re.compile(r'\bFROM\s+([A-Za-z][\w-]*)')
+
+
+def scan_sources(src_dir):
+    """
+    MIBソースディレクトリを再帰的に探索し、各ファイルのモジュール名とIMPORTSを抽出します。
+
+    Returns:
+        dict: {モジュール名: {"file": ファイル名 (拡張子なし), "path": パス, "dir": ディレクトリ, "imports": [...]}}
+    """
+    modules = {}
+    for root, dirs, files in os.walk(src_dir):
+        for f in sorted(files):
+            # 拡張子チェック (.mib, .my, .txt)
+            if not f.endswith(MIB_EXTENSIONS) or f.startswith('.'):
+                continue
+            path = os.path.join(root, f)
+            stem = os.path.splitext(f)[0]
+            with open(path, encoding='utf-8', errors='replace') as fh:
+                text = _COMMENT_RE.sub('', fh.read())
+
+            match = _MODULE_RE.search(text)
+            name = match.group(1) if match else stem
+            imports = set()
+            imports_match = _IMPORTS_RE.search(text, match.end() if match else 0)
+            if imports_match:
+                imports.update(_FROM_RE.findall(imports_match.group(1)))
+            imports.discard(name)
+            modules[name] = {"file": stem, "path": path, "dir": root, "imports": sorted(imports)}
+    return modules
+
+
+def dependency_levels(modules):
+    """
+    ローカルのモジュールを依存関係順のバッチ (レベル) に分割します。
+    同じレベルのモジュールは互いに依存しないため並列にコンパイルできます。
+    循環依存しているモジュールは最後のレベルにまとめます。
+    """
+    remaining = {name: {d for d in info["imports"] if d in modules} for name, info in modules.items()}
+    levels = []
+    done = set()
+    while remaining:
+        level = sorted(name for name, deps in remaining.items() if deps <= done)
+        if not level:
+            level = sorted(remaining)
+        levels.append(level)
+        done.update(level)
+        for name in level:
+            del remaining[name]
+    return levels
+
+
+def source_hashes(modules, levels):
+    """
+    各モジュールのソースと、依存するローカルモジュールのハッシュから内容ハッシュを計算します。
+    依存先のMIBが変更された場合も再コンパイルされるよう、依存先のハッシュを含めます。
+    """
+    hashes = {}
+    for level in levels:
+        for name in level:
+            digest = hashlib.sha256()
+            digest.update(f"pysmi-{pysmi.__version__}\n".encode())
+            with open(modules[name]["path"], 'rb') as fh:
+                digest.update(fh.read())
+            for dep in modules[name]["imports"]:
+                digest.update(f"\n{dep}:{hashes.get(dep, '')}".encode())
+            hashes[name] = digest.hexdigest()
+    return hashes
+
+
+def _load_cache(dest_dir):
+    try:
+        with open(os.path.join(dest_dir, CACHE_FILENAME), encoding='utf-8') as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(dest_dir, cache):
+    path = os.path.join(dest_dir, CACHE_FILENAME)
+    with open(path + '.tmp', 'w', encoding='utf-8') as fh:
+        json.dump(cache, fh, indent=1, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def _make_compiler(source_dirs, dest_dir, offline):
+    mibCompiler = MibCompiler(
+        SmiStarParser(),
+        PySnmpCodeGen(),
+        PyFileWriter(dest_dir)
+    )
+    mibCompiler.add_sources(*[FileReader(d, recursive=False) for d in source_dirs])
+    if not offline:
+        # 標準的なMIBソースも追加（依存関係解決のため）
+        # 注: インターネット接続が必要
+        mibCompiler.add_sources(HttpReader(HTTP_SOURCE))
+    # 実装側で提供されるモジュールと、コンパイル済みのモジュールは再生成しない
+    mibCompiler.add_searchers(StubSearcher(*PySnmpCodeGen.baseMibs), PyFileSearcher(dest_dir))
+    return mibCompiler
+
+
+def compile_module(file_name, source_dirs, dest_dir, offline):
+    """
+    1つのMIBモジュールをコンパイルします (プロセスプールのワーカーで実行)。
+    依存モジュールは前のレベルでコンパイル済みのため、解析のみ行い再生成しません。
+
+    Returns:
+        tuple: (ファイル名, ステータス, 所要秒数, エラーメッセージ)
+    """
+    started = time.perf_counter()
+    try:
+        mibCompiler = _make_compiler(source_dirs, dest_dir, offline)
+        results = mibCompiler.compile(file_name, noDeps=True, rebuild=True)
+        status = results.get(file_name)
+        if status is None:
+            # ファイル名とモジュール名が異なる場合
+            status = next((s for name, s in results.items() if name not in BUILTIN_MIBS), 'missing')
+        error = getattr(status, 'error', None)
+        failed_deps = sorted(name for name, s in results.items() if s in ('missing', 'failed') and name != file_name)
+        if str(status) != 'compiled' and failed_deps:
+            error = f"{error or status}; unresolved imports: {', '.join(failed_deps)}"
+        return file_name, str(status), time.perf_counter() - started, str(error) if error else None
+    except Exception as e:
+        return file_name, 'failed', time.perf_counter() - started, str(e)
+
+
+def compile_external(names, source_dirs, dest_dir, offline):
+    """
+    ローカルに存在しない依存モジュール (標準MIBなど) を、その依存も含めてコンパイルします。
+    """
+    if not names:
+        return {}
+    mibCompiler = _make_compiler(source_dirs, dest_dir, offline)
+    return {name: str(status) for name, status in mibCompiler.compile(*names).items()}
+
+
+def compile_mibs(src_dir, dest_dir, jobs=None, offline=False, standard_dirs=None, force=False, report_path=None):
     """
     指定されたソースディレクトリにあるすべてのMIBファイルをコンパイルし、
     指定された出力ディレクトリに保存します。
+
+    モジュールは依存関係順のバッチに分割してプロセスプールで並列にコンパイルし、
+    ソースの内容ハッシュが前回と同じモジュールはスキップします。
     """
     if not os.path.exists(src_dir):
         print(f"Source directory not found: {src_dir}")
@@ -20,110 +185,159 @@ def compile_mibs(src_dir, dest_dir):
     if not os.path.exists(dest_dir):
         os.makedirs(dest_dir)
 
-    print(f"Initializing MibCompiler with output to {dest_dir}")
-    # pysmiのMibCompilerを使用
-    mibCompiler = MibCompiler(
-        SmiStarParser(),
-        PySnmpCodeGen(),
-        PyFileWriter(dest_dir)
-    )
+    jobs = jobs or os.cpu_count() or 1
+    if standard_dirs is None:
+        standard_dirs = [STANDARD_MIB_DIR] if os.path.isdir(STANDARD_MIB_DIR) else []
 
-    # ローカルのMIBソースディレクトリを探索して追加
+    # ローカルのMIBソースディレクトリを探索
     print(f"Scanning source directory: {src_dir}")
-    source_dirs = set()
-    mib_modules = []
-    
-    # os.walkで再帰的に探索
-    for root, dirs, files in os.walk(src_dir):
-        # MIBファイルを含むディレクトリをソースとして追加するため記録
-        has_mib = False
-        for f in files:
-            # 拡張子チェック (.mib, .my, .txt)
-            if f.endswith(('.mib', '.my', '.txt')) and not f.startswith('.'):
-                has_mib = True
-                filename = os.path.basename(f)
-                # 拡張子を取り除く
-                module_name = os.path.splitext(filename)[0]
-                mib_modules.append(module_name)
-        
-        if has_mib:
-            source_dirs.add(root)
-    
-    if not source_dirs:
+    modules = scan_sources(src_dir)
+    if not modules:
         print(f"No MIB files found in {src_dir} or its subdirectories")
         return
 
-    # 各ディレクトリをソースとして追加
+    # ローカル優先で、同梱の標準MIB、(オンライン時は) HTTPの順に依存を解決する
+    source_dirs = sorted({info["dir"] for info in modules.values()}) + list(standard_dirs)
     for d in source_dirs:
         print(f"Adding source directory: {d}")
-        try:
-            # pysmi >= 1.0.0 uses add_sources
-            mibCompiler.add_sources(FileReader(d))
-        except AttributeError:
-            # pysmi < 1.0.0 uses addSources
-            mibCompiler.addSources(FileReader(d))
-
-    # 標準的なMIBソースも追加（依存関係解決のため）
-    # 注: インターネット接続が必要
-    print("Adding HTTP source: https://mibs.pysnmp.com/asn1/@mib@")
-    try:
-        try:
-            mibCompiler.add_sources(HttpReader('https://mibs.pysnmp.com/asn1/@mib@'))
-        except AttributeError:
-            mibCompiler.addSources(HttpReader('https://mibs.pysnmp.com/asn1/@mib@'))
-    except Exception as e:
-        print(f"Warning: Could not add HTTP source: {e}")
+    if offline:
+        print("Offline mode: imports are resolved from local directories only")
+    else:
+        print(f"Adding HTTP source: {HTTP_SOURCE}")
 
-    # 検索パスの設定（ローカル優先）
-    try:
-        mibCompiler.add_searchers(StubSearcher(*list(source_dirs)))
-    except AttributeError:
-        mibCompiler.addSearchers(StubSearcher(*list(source_dirs)))
+    levels = dependency_levels(modules)
+    hashes = source_hashes(modules, levels)
+    cache = {} if force else _load_cache(dest_dir)
 
-    if not mib_modules:
-        print(f"No MIB files found in {src_dir}")
-        return
+    print(f"Compiling {len(modules)} MIB modules from {src_dir} to {dest_dir} "
+          f"({len(levels)} dependency levels, {jobs} jobs)...")
+    started = time.perf_counter()
+
+    # ローカルに無い依存モジュールを先にコンパイルする
+    external = sorted({
+        dep for info in modules.values() for dep in info["imports"]
+        if dep not in modules and dep not in BUILTIN_MIBS
+    })
+    external_results = compile_external(external, source_dirs, dest_dir, offline)
+    for name, status in sorted(external_results.items()):
+        if name in external and status not in ('compiled', 'untouched'):
+            print(f"  [{status.upper()}] {name} (dependency)")
 
-    print(f"Compiling {len(mib_modules)} MIB modules from {src_dir} to {dest_dir}...")
-    
-    # コンパイル実行
+    timings = {}
+    statuses = {}
+    skipped = 0
+    executor = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else None
     try:
-        results = mibCompiler.compile(*mib_modules)
-        
-        success_count = 0
-        fail_count = 0
-        
-        # resultsはdict {module_name: status}
-        for module_name, status in results.items():
-            if status == 'compiled':
-                success_count += 1
-                print(f"  [OK] {module_name}")
-            elif status == 'failed':
-                fail_count += 1
-                print(f"  [FAIL] {module_name}")
-            elif status == 'untouched': # Already up to date
-                print(f"  [SKIP] {module_name} (Up to date)")
-                success_count += 1
+        for level in levels:
+            pending = []
+            for name in level:
+                output = os.path.join(dest_dir, name + '.py')
+                if cache.get(name) == hashes[name] and os.path.exists(output):
+                    statuses[name] = 'untouched'
+                    skipped += 1
+                    print(f"  [SKIP] {name} (Up to date)")
+                else:
+                    pending.append(name)
+
+            args = [(modules[name]["file"], source_dirs, dest_dir, offline) for name in pending]
+            if executor is not None:
+                results = executor.map(compile_module, *zip(*args)) if args else []
             else:
-                # 'borrowed' or other statuses
-                print(f"  [{status}] {module_name}")
-                success_count += 1
-
-        print(f"Compilation finished: {success_count} succeeded, {fail_count} failed.")
-        
-        if fail_count > 0:
-            print("Warning: Some MIBs failed to compile.")
-            
-    except Exception as e:
-        print(f"Error during compilation: {e}")
-        # スクリプト自体のエラーは終了コード1
-        sys.exit(1)
+                results = [compile_module(*a) for a in args]
+
+            for name, (_, status, elapsed, error) in zip(pending, results):
+                statuses[name] = status
+                timings[name] = elapsed
+                if status == 'compiled':
+                    cache[name] = hashes[name]
+                    print(f"  [OK] {name} ({elapsed:.2f}s)")
+                else:
+                    cache.pop(name, None)
+                    print(f"  [{status.upper()}] {name}: {error}")
+            _save_cache(dest_dir, cache)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    elapsed = time.perf_counter() - started
+    compiled = sum(1 for s in statuses.values() if s == 'compiled')
+    failed = [name for name, s in statuses.items() if s not in ('compiled', 'untouched')]
+    print(f"Compilation finished in {elapsed:.1f}s: {compiled} compiled, {skipped} unchanged, {len(failed)} failed.")
+
+    # 所要時間の長いモジュールの一覧
+    slowest = sorted(timings.items(), key=lambda item: item[1], reverse=True)[:20]
+    if slowest:
+        print("Slowest modules:")
+        for name, seconds in slowest:
+            print(f"  {seconds:8.2f}s  {name}")
+
+    if failed:
+        print("Warning: Some MIBs failed to compile.")
+
+    if report_path:
+        with open(report_path, 'w', encoding='utf-8') as fh:
+            json.dump({
+                "elapsed": elapsed,
+                "jobs": jobs,
+                "offline": offline,
+                "levels": len(levels),
+                "modules": {
+                    name: {"status": statuses.get(name), "seconds": timings.get(name), "level": i}
+                    for i, level in enumerate(levels) for name in level
+                },
+                "dependencies": external_results
+            }, fh, indent=1)
+
+    index_path = os.path.join(dest_dir, INDEX_FILENAME)
+    if compiled or external_results and any(s == 'compiled' for s in external_results.values()) \
+            or not os.path.exists(index_path):
+        build_indexes(dest_dir)
+    else:
+        print("No modules changed, keeping existing OID index and MIB registry")
+
+def build_indexes(dest_dir):
+    """
+    コンパイル済みMIBモジュールを一度だけロードし、
+    ランタイムでmmapして使用するOIDインデックスファイルと、
+    遅延ロード用のモジュールレジストリを生成します。
+    """
+    from pysnmp.smi import builder
+
+    mibBuilder = builder.MibBuilder()
+    mibBuilder.addMibSources(builder.DirMibSource(dest_dir))
+
+    module_names = []
+    for filename in sorted(os.listdir(dest_dir)):
+        if filename.endswith('.py') and not filename.startswith('__init__'):
+            module_name = filename[:-3]
+            try:
+                mibBuilder.loadModules(module_name)
+                module_names.append(module_name)
+            except Exception as e:
+                print(f"  [WARN] Could not load {module_name} for OID index: {e}")
+
+    entries = collect_oid_entries(mibBuilder)
+    index_path = os.path.join(dest_dir, INDEX_FILENAME)
+    count = write_oid_index(entries, index_path)
+    print(f"OID index written: {index_path} ({count} entries)")
+
+    registry_path = os.path.join(dest_dir, REGISTRY_FILENAME)
+    write_registry(collect_module_prefixes(mibBuilder, module_names), registry_path)
+    print(f"MIB registry written: {registry_path} ({len(module_names)} modules)")
 
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("Usage: python compile_mibs.py <src_dir> <dest_dir>")
-        sys.exit(1)
-    
-    src_dir = sys.argv[1]
-    dest_dir = sys.argv[2]
-    compile_mibs(src_dir, dest_dir)
+    parser = argparse.ArgumentParser(description='Compile ASN.1 MIB files into pysnmp modules.')
+    parser.add_argument('src_dir', help='Directory containing MIB sources (searched recursively)')
+    parser.add_argument('dest_dir', help='Output directory for compiled modules')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='Number of compiler processes (default: CPU count)')
+    parser.add_argument('--offline', action='store_true',
+                        default=os.environ.get('MIB_COMPILE_OFFLINE', '').lower() in ('1', 'true', 'yes'),
+                        help='Resolve imports only from local directories and the bundled standard MIBs')
+    parser.add_argument('--standard-dir', action='append', dest='standard_dirs',
+                        help=f'Directory with standard MIB sources (default: {STANDARD_MIB_DIR})')
+    parser.add_argument('--force', action='store_true', help='Ignore the compile cache and rebuild every module')
+    parser.add_argument('--report', help='Write per-module status and compile time as JSON to this file')
+    args = parser.parse_args()
+
+    compile_mibs(args.src_dir, args.dest_dir, jobs=args.jobs, offline=args.offline,
+                 standard_dirs=args.standard_dirs, force=args.force, report_path=args.report)
@@ -0,0 +1,370 @@
+import asyncio
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+from aiohttp import web
+from pyasn1.codec.ber import encoder
+from pysnmp.proto import api, rfc1902
+
+# プロジェクトルートをPYTHONPATHに追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tests.send_trap import OID_LINK_DOWN, OID_IF_INDEX, OID_IF_ADMIN_STATUS, OID_IF_OPER_STATUS
+
+V2C = api.PROTOCOL_MODULES[api.SNMP_VERSION_2C]
+
+# 遅延計測用のシーケンス番号を埋め込む変数 (受信側では UNKNOWN として値がそのまま出力される)
+OID_SEQUENCE = '1.3.6.1.4.1.99999.2.1'
+OID_PADDING = '1.3.6.1.4.1.99999.2.2'
+SEQUENCE_PREFIX = "loadgen-"
+SEQUENCE_WIDTH = 16
+PROBE_SEQUENCE = 10 ** SEQUENCE_WIDTH - 1
+# Inform の request-id は4バイト固定長で埋め込めるよう 0x40000000 以上の値を使用する
+REQUEST_ID_BASE = 0x40000000
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+def sequence_value(seq):
+    return f"{SEQUENCE_PREFIX}{seq:0{SEQUENCE_WIDTH}d}"
+
+def build_varbinds(seq, extra_varbinds):
+    """
+    tests/send_trap.py の linkDown と同じ変数に、シーケンス番号と任意数の追加変数を加えます。
+    """
+    varbinds = [
+        (rfc1902.ObjectName('1.3.6.1.2.1.1.3.0'), rfc1902.TimeTicks(0)),
+        (rfc1902.ObjectName('1.3.6.1.6.3.1.1.4.1.0'), rfc1902.ObjectName(OID_LINK_DOWN)),
+        (rfc1902.ObjectName(OID_IF_INDEX), rfc1902.Integer(1)),
+        (rfc1902.ObjectName(OID_IF_ADMIN_STATUS), rfc1902.Integer(2)),
+        (rfc1902.ObjectName(OID_IF_OPER_STATUS), rfc1902.Integer(2)),
+        (rfc1902.ObjectName(OID_SEQUENCE), rfc1902.OctetString(sequence_value(seq))),
+    ]
+    for i in range(extra_varbinds):
+        varbinds.append((rfc1902.ObjectName(f"{OID_PADDING}.{i + 1}"), rfc1902.OctetString(f"padding value {i + 1}")))
+    return varbinds
+
+class DatagramTemplate:
+    """
+    事前にエンコードしたv2cメッセージのシーケンス番号 (と Inform の request-id) を
+    差し替えるだけで送信データを生成するテンプレート。送信側がボトルネックにならないようにする。
+    """
+
+    def __init__(self, inform, community, extra_varbinds):
+        pdu = V2C.InformRequestPDU() if inform else V2C.TrapPDU()
+        V2C.apiPDU.set_defaults(pdu)
+        V2C.apiPDU.set_request_id(pdu, REQUEST_ID_BASE)
+        V2C.apiPDU.set_varbinds(pdu, build_varbinds(0, extra_varbinds))
+        message = V2C.Message()
+        V2C.apiMessage.set_defaults(message)
+        V2C.apiMessage.set_community(message, community)
+        V2C.apiMessage.set_pdu(message, pdu)
+        self.data = encoder.encode(message)
+
+        self.seq_offset = self.data.index(sequence_value(0).encode())
+        self.rid_offset = self.data.index(b"\x02\x04" + REQUEST_ID_BASE.to_bytes(4, "big")) + 2
+
+    def render(self, seq):
+        data = bytearray(self.data)
+        data[self.seq_offset:self.seq_offset + len(SEQUENCE_PREFIX) + SEQUENCE_WIDTH] = sequence_value(seq).encode()
+        data[self.rid_offset:self.rid_offset + 4] = (REQUEST_ID_BASE + seq % REQUEST_ID_BASE).to_bytes(4, "big")
+        return bytes(data)
+
+class SourceProtocol(asyncio.DatagramProtocol):
+    """
+    送信元ソケットごとのプロトコル。Inform の応答数を数えます。
+    """
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def datagram_received(self, data, addr):
+        self.stats["responses"] += 1
+
+class WebhookSink:
+    """
+    受信機の出力先となるローカルのWebhookスタンドイン。到着時刻からエンドツーエンド遅延を計算します。
+    """
+
+    def __init__(self, count):
+        self.sent_ns = [0] * count
+        self.arrived = set()
+        self.latencies = []
+        self.duplicates = 0
+        self.probe_seen = asyncio.Event()
+        self.last_arrival = time.perf_counter()
+        self._runner = None
+        self.url = None
+
+    async def _handle(self, request):
+        received = time.perf_counter_ns()
+        body = await request.read()
+        if request.headers.get("Content-Type") == "application/x-ndjson":
+            items = [json.loads(line) for line in body.splitlines() if line]
+        else:
+            items = json.loads(body)
+            if isinstance(items, dict):
+                items = [items]
+        for item in items:
+            self._record(item, received)
+        return web.Response(text="ok")
+
+    def _record(self, item, received):
+        for variable in item.get("variables", []):
+            value = variable.get("value", "")
+            if not value.startswith(SEQUENCE_PREFIX):
+                continue
+            seq = int(value[len(SEQUENCE_PREFIX):])
+            if seq == PROBE_SEQUENCE:
+                self.probe_seen.set()
+            elif seq in self.arrived:
+                self.duplicates += 1
+            elif 0 <= seq < len(self.sent_ns):
+                self.arrived.add(seq)
+                self.latencies.append((received - self.sent_ns[seq]) / 1e6)
+                self.last_arrival = time.perf_counter()
+            return
+
+    async def start(self, port=0):
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post("/hook", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}/hook"
+
+    async def stop(self):
+        await self._runner.cleanup()
+
+async def open_sources(count, target, stats):
+    """
+    送信元ごとにUDPソケットを作成します。可能な場合は 127.1.x.y の異なるアドレスにバインドし、
+    受信側からは別々の送信元として見えるようにします。
+    """
+    loop = asyncio.get_running_loop()
+    transports = []
+    for i in range(count):
+        local_addr = (f"127.1.{(i // 250) % 250}.{i % 250 + 1}", 0)
+        try:
+            transport, _ = await loop.create_datagram_endpoint(
+                lambda: SourceProtocol(stats), local_addr=local_addr, remote_addr=target
+            )
+        except OSError:
+            transport, _ = await loop.create_datagram_endpoint(
+                lambda: SourceProtocol(stats), local_addr=("127.0.0.1", 0), remote_addr=target
+            )
+        transports.append(transport)
+    return transports
+
+class V3Sender:
+    """
+    SNMPv3 authPriv Trapの送信元。tests/send_trap.py と同じ hlapi を使用しますが、
+    SnmpEngine とトランスポートは送信元ごとに1回だけ作成して使い回します。
+    """
+
+    def __init__(self, args):
+        from pysnmp.hlapi import asyncio as hlapi
+        self.hlapi = hlapi
+        self.args = args
+        # 受信機は送信元のEngine IDごとにユーザーを登録するため、送信元のEngine IDを固定する (USM_ENGINE_IDS に渡す)
+        self.engine = hlapi.SnmpEngine(snmpEngineID=hlapi.OctetString(hexValue=args.v3_engine_id.replace("0x", "")))
+        self.user = hlapi.UsmUserData(
+            args.v3_user, args.v3_auth_key, args.v3_priv_key,
+            authProtocol=hlapi.usmHMACMD5AuthProtocol,
+            privProtocol=hlapi.usmDESPrivProtocol
+        )
+        self.target = None
+
+    async def send(self, seq):
+        hlapi = self.hlapi
+        if self.target is None:
+            self.target = await hlapi.UdpTransportTarget.create((self.args.host, self.args.port))
+        varbinds = build_varbinds(seq, self.args.varbinds)[2:]
+        errorIndication, _, _, _ = await hlapi.send_notification(
+            self.engine, self.user, self.target, hlapi.ContextData(), 'trap',
+            hlapi.NotificationType(hlapi.ObjectIdentity(OID_LINK_DOWN)).add_varbinds(*varbinds)
+        )
+        if errorIndication:
+            raise RuntimeError(str(errorIndication))
+
+def spawn_receiver(args, webhook_url):
+    """
+    受信機 (python -m src.main) をサブプロセスとして起動します。
+    """
+    env = dict(os.environ)
+    env.update({
+        "OUTPUT_MODE": "webhook",
+        "WEBHOOK_URL": webhook_url,
+        "SNMP_VERSION": "both" if args.mode == "v3" else "v2c",
+        "COMMUNITY_STRING": args.community,
+        "USM_USER": args.v3_user,
+        "USM_AUTH_KEY": args.v3_auth_key,
+        "USM_PRIV_KEY": args.v3_priv_key,
+        "USM_ENGINE_IDS": args.v3_engine_id,
+        "PYTHONPATH": os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    })
+    env.setdefault("WEBHOOK_BATCH_SIZE", "100")
+    env.setdefault("WEBHOOK_BATCH_LINGER_MS", "10")
+    for item in args.receiver_env:
+        key, _, value = item.partition("=")
+        env[key] = value
+
+    log = open(args.receiver_log, "wb") if args.receiver_log else subprocess.DEVNULL
+    return subprocess.Popen([sys.executable, "-m", "src.main"], env=env, stdout=log, stderr=log)
+
+async def wait_for_receiver(args, sink, send_probe):
+    """
+    プローブを送信し、Webhookに届くまで待機します (受信機の起動待ち)。
+    """
+    deadline = time.monotonic() + args.startup_timeout
+    while time.monotonic() < deadline:
+        await send_probe()
+        try:
+            await asyncio.wait_for(sink.probe_seen.wait(), 0.5)
+            return
+        except asyncio.TimeoutError:
+            pass
+    raise RuntimeError(f"Receiver did not deliver a probe trap within {args.startup_timeout}s")
+
+async def run(args):
+    sink = WebhookSink(args.count)
+    await sink.start(args.webhook_port)
+
+    receiver = spawn_receiver(args, sink.url) if args.spawn else None
+    stats = {"responses": 0, "send_errors": 0}
+    target = (args.host, args.port)
+
+    try:
+        if args.mode == "v3":
+            senders = [V3Sender(args) for _ in range(args.sources)]
+            semaphore = asyncio.Semaphore(args.concurrency)
+            pending = set()
+
+            async def send_v3(seq):
+                async with semaphore:
+                    try:
+                        await senders[seq % len(senders)].send(seq)
+                    except Exception:
+                        stats["send_errors"] += 1
+
+            def send(seq):
+                task = asyncio.create_task(send_v3(seq))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+
+            async def send_probe():
+                await senders[0].send(PROBE_SEQUENCE)
+        else:
+            template = DatagramTemplate(args.mode == "inform", args.community, args.varbinds)
+            transports = await open_sources(args.sources, target, stats)
+            pending = set()
+
+            def send(seq):
+                transports[seq % len(transports)].sendto(template.render(seq))
+
+            async def send_probe():
+                transports[0].sendto(template.render(PROBE_SEQUENCE))
+
+        if args.spawn or args.probe:
+            await wait_for_receiver(args, sink, send_probe)
+
+        # 送信
+        started = time.perf_counter()
+        seq = 0
+        while seq < args.count:
+            if args.rate:
+                due = min(args.count, int((time.perf_counter() - started) * args.rate) + 1)
+            else:
+                due = min(args.count, seq + args.burst)
+            while seq < due:
+                sink.sent_ns[seq] = time.perf_counter_ns()
+                send(seq)
+                seq += 1
+            await asyncio.sleep(0.001 if args.rate else 0)
+            # v3 は送信自体が遅いため、同時実行数を超えて積み上げない
+            while len(pending) > args.concurrency * 2:
+                await asyncio.sleep(0.001)
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        send_elapsed = time.perf_counter() - started
+
+        # 到着待ち (一定時間新たな到着が無ければ打ち切る)
+        while len(sink.arrived) < args.count and time.perf_counter() - sink.last_arrival < args.settle:
+            await asyncio.sleep(0.05)
+        elapsed = max(sink.last_arrival - started, send_elapsed)
+    finally:
+        if receiver is not None:
+            receiver.send_signal(signal.SIGTERM)
+            try:
+                receiver.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                receiver.kill()
+        await sink.stop()
+
+    received = len(sink.arrived)
+    result = {
+        "benchmark": "loadgen",
+        "mode": args.mode,
+        "sources": args.sources,
+        "varbinds": args.varbinds + 6,
+        "target_rate": args.rate,
+        "sent": args.count,
+        "received": received,
+        "duplicates": sink.duplicates,
+        "loss_rate": round(1 - received / args.count, 6) if args.count else 0.0,
+        "send_rate": round(args.count / send_elapsed, 1) if send_elapsed else None,
+        "traps_per_sec": round(received / elapsed, 1) if elapsed else None,
+        "latency_p50_ms": round(percentile(sink.latencies, 50), 3),
+        "latency_p99_ms": round(percentile(sink.latencies, 99), 3),
+        "send_errors": stats["send_errors"],
+    }
+    if args.mode == "inform":
+        result["inform_responses"] = stats["responses"]
+    return result
+
+async def main():
+    parser = argparse.ArgumentParser(description='Drive the trap receiver at a target rate and measure throughput, latency and loss.')
+    parser.add_argument('--mode', choices=['v2c', 'inform', 'v3'], default='v2c', help='Notification type to send')
+    parser.add_argument('--count', type=int, default=50000, help='Number of notifications to send')
+    parser.add_argument('--rate', type=float, default=0, help='Target notifications/sec (0 = as fast as possible)')
+    parser.add_argument('--burst', type=int, default=200, help='Datagrams sent per loop iteration when --rate is 0')
+    parser.add_argument('--sources', type=int, default=100, help='Number of simulated source addresses')
+    parser.add_argument('--varbinds', type=int, default=0, help='Number of extra varbinds per notification')
+    parser.add_argument('--concurrency', type=int, default=64, help='Concurrent in-flight v3 sends')
+    parser.add_argument('--host', default='127.0.0.1', help='Receiver address')
+    parser.add_argument('--port', type=int, default=162, help='Receiver UDP port')
+    parser.add_argument('--community', default=os.environ.get('COMMUNITY_STRING', 'public'), help='v2c community')
+    parser.add_argument('--v3-user', default='loadgen', help='SNMPv3 user name')
+    parser.add_argument('--v3-auth-key', default='loadgen-auth-key', help='SNMPv3 auth key')
+    parser.add_argument('--v3-priv-key', default='loadgen-priv-key', help='SNMPv3 priv key')
+    parser.add_argument('--v3-engine-id', default='0x8000000001020304', help='SNMPv3 engine ID of the sender')
+    parser.add_argument('--no-spawn', dest='spawn', action='store_false',
+                        help='Do not start the receiver; drive an already running one (its WEBHOOK_URL must point here)')
+    parser.add_argument('--webhook-port', type=int, default=0, help='Port of the local webhook stand-in (0 = any free port)')
+    parser.add_argument('--probe', action='store_true', help='Wait for a probe trap before starting even with --no-spawn')
+    parser.add_argument('--receiver-env', action='append', default=[], metavar='KEY=VALUE',
+                        help='Extra environment for the spawned receiver (e.g. FAST_PATH=true)')
+    parser.add_argument('--receiver-log', help='Write the spawned receiver output to this file')
+    parser.add_argument('--startup-timeout', type=float, default=60, help='Seconds to wait for the receiver to come up')
+    parser.add_argument('--settle', type=float, default=5, help='Seconds without new arrivals before giving up')
+    parser.add_argument('--output', help='Append the JSON result to this file')
+    args = parser.parse_args()
+
+    result = await run(args)
+    line = json.dumps(result)
+    print(line)
+    if args.output:
+        with open(args.output, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+if __name__ == '__main__':
+    asyncio.run(main())
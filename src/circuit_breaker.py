@@ -0,0 +1,75 @@
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class CircuitBreaker:
+    """
+    送信先ごとのサーキットブレーカー。
+
+    連続した失敗が failure_threshold 回に達すると open になり、reset_timeout 秒間は送信を行いません。
+    その後 half-open に移行して1件だけ試行し、成功すれば closed に戻り、失敗すれば再び open になります。
+    """
+
+    def __init__(self, name, failure_threshold, reset_timeout):
+        """
+        Args:
+            name: ログに表示する送信先の名前
+            failure_threshold: open にする連続失敗回数
+            reset_timeout: open から half-open に移行するまでの秒数
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self.opened = 0
+
+    def allow(self) -> bool:
+        """
+        送信してよいかを判定します。half-open の間は試行中の1件のみ許可します。
+        """
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.state = HALF_OPEN
+            self._probing = False
+        if self._probing:
+            return False
+        self._probing = True
+        return True
+
+    def release(self):
+        """
+        half-open の試行が結果を記録せずに終了した (キャンセルされた) 場合に、次の試行を許可します。
+        """
+        self._probing = False
+
+    def record_success(self):
+        if self.state != CLOSED:
+            logger.info(f"Circuit for {self.name} closed")
+        self.state = CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+            self.opened += 1
+            logger.warning(
+                f"Circuit for {self.name} opened after {self.failures} consecutive failures "
+                f"(retry in {self.reset_timeout}s)"
+            )
@@ -15,14 +15,103 @@ class Settings(BaseSettings):
     usm_user: Optional[str] = Field(None, description="SNMP v3 ユーザー名")
     usm_auth_key: Optional[str] = Field(None, description="SNMP v3 認証キー")
     usm_priv_key: Optional[str] = Field(None, description="SNMP v3 暗号化キー")
+    usm_auth_protocol: str = Field("md5", description="usm_user の認証プロトコル (md5, sha, sha224, sha256, sha384, sha512)")
+    usm_priv_protocol: str = Field("des", description="usm_user の暗号化プロトコル (des, 3des, aes, aes192, aes256, aes192-blumenthal, aes256-blumenthal)")
+    usm_credentials_file: Optional[str] = Field(None, description="SNMP v3 ユーザーの認証情報ファイル (JSON)")
+    usm_engine_ids: str = Field("", description="Engine IDを指定していないユーザーを登録する送信元のEngine ID (カンマ区切りの16進)")
+    usm_key_cache_path: Optional[str] = Field(None, description="パスフレーズから生成したマスターキーのキャッシュファイル")
     snmp_engine_id: Optional[str] = Field(None, description="SNMP Engine ID (Hex文字列)")
+    fast_path: bool = Field(False, description="SNMPv1/v2c Trap/Informをpysnmpを介さず直接デコードする高速パスを有効にする")
 
     # 出力設定
-    output_mode: Literal["stdout", "webhook"] = Field("stdout", description="出力モード")
+    output_mode: Literal["stdout", "webhook", "file"] = Field("stdout", description="出力モード")
+    routing_file: Optional[str] = Field(None, description="ルーティング設定ファイル (JSON) のパス。snmpTrapOID・送信元・変数の値でTrapの送信先シンクを振り分ける (未指定でoutput_modeの出力のみ)")
+    stdout_buffer_bytes: int = Field(65536, description="stdout出力のバッファサイズ (この量に達したらまとめて書き込む)")
+    stdout_flush_interval_ms: int = Field(100, description="stdout出力のバッファを書き込むまでの最大待機時間 (ミリ秒, 0でTrapごとに書き込む)")
+    stdout_max_pending_bytes: int = Field(64 * 1024 * 1024, description="stdoutへの書き込み待ちの最大量 (超過分は破棄)")
+    stdout_json_encoder: Literal["auto", "json", "orjson"] = Field("auto", description="stdout出力のJSONエンコーダー (auto: orjsonがあれば使用)")
+    file_dir: str = Field("/var/lib/snmp-trap-receiver/traps", description="file出力のセグメントファイル出力先ディレクトリ")
+    file_prefix: str = Field("traps", description="セグメントファイル名の接頭辞")
+    file_max_bytes: int = Field(256 * 1024 * 1024, description="セグメントをローテーションするサイズ")
+    file_rotate_interval: float = Field(3600.0, description="セグメントをローテーションする経過時間 (秒, 0で時間によるローテーションなし)")
+    file_compression: Literal["gzip", "zstd", "none"] = Field("gzip", description="閉じたセグメントの圧縮方式 (zstdはzstandardがインストールされている場合のみ)")
+    file_retention_files: int = Field(0, description="保持する閉じたセグメントの最大数 (0で無制限)")
+    file_retention_bytes: int = Field(0, description="保持する閉じたセグメントの合計サイズ上限 (0で無制限)")
+    file_write_buffer_bytes: int = Field(1024 * 1024, description="セグメントファイルの書き込みバッファサイズ")
     webhook_url: Optional[str] = Field(None, description="Webhook送信先URL")
+    webhook_urls: str = Field("", description="複数のWebhook送信先 (カンマ区切り, URL|最大同時送信数 で送信先ごとに指定可。指定時は webhook_url より優先)")
+    webhook_mode: Literal["fanout", "round-robin", "least-loaded"] = Field("fanout", description="複数送信先への送信方法 (fanout: 全送信先, round-robin / least-loaded: いずれか1つ)")
+    webhook_max_in_flight: int = Field(64, description="送信先ごとの最大同時送信数のデフォルト値")
+    webhook_pool_size: int = Field(100, description="HTTPコネクションプールの最大接続数 (全送信先の合計, 0で無制限)")
+    webhook_pool_size_per_host: int = Field(0, description="送信先ホストごとの最大接続数 (0で無制限)")
+    webhook_keepalive_timeout: float = Field(30.0, description="アイドル状態のkeep-alive接続を保持する秒数")
+    webhook_dns_cache_ttl: int = Field(300, description="送信先ホスト名のDNS解決結果をキャッシュする秒数")
+    webhook_connect_timeout: float = Field(5.0, description="Webhook送信先への接続タイムアウト (秒)")
+    webhook_timeout: float = Field(10.0, description="Webhookリクエスト全体のタイムアウト (秒)")
+    webhook_breaker_failures: int = Field(5, description="サーキットブレーカーで送信先を遮断する連続失敗回数")
+    webhook_breaker_reset: float = Field(30.0, description="遮断した送信先への送信を再試行するまでの秒数")
+    webhook_batch_size: int = Field(1, description="Webhookバッチ送信の最大件数 (1の場合はTrapごとに送信)")
+    webhook_batch_linger_ms: int = Field(50, description="バッチを送信するまでの最大待機時間 (ミリ秒)")
+    webhook_batch_format: Literal["json", "ndjson"] = Field("json", description="バッチ送信時のボディ形式 (JSON配列 / NDJSON)")
+    webhook_compression: Literal["none", "gzip"] = Field("none", description="バッチ送信時のボディ圧縮")
+
+    # Webhookスプール設定 (spool_dir を指定した場合のみ有効)
+    spool_dir: Optional[str] = Field(None, description="Webhook障害時にTrapを退避するスプールディレクトリ")
+    spool_max_bytes: int = Field(1024 * 1024 * 1024, description="スプールの最大サイズ (超過時は古いセグメントから削除)")
+    spool_segment_bytes: int = Field(16 * 1024 * 1024, description="スプールのセグメントファイルサイズ")
+    spool_fsync_batch: int = Field(100, description="fsyncをまとめて行う書き込み件数")
+    spool_fsync_interval_ms: int = Field(1000, description="未fsyncの書き込みを同期する間隔 (ミリ秒)")
+    spool_replay_batch: int = Field(100, description="スプールから一度に再送する件数")
+    spool_retry_interval: float = Field(5.0, description="再送失敗時に次の再試行まで待機する秒数")
+
+    # 受信ソケット設定
+    listen_addresses: str = Field("0.0.0.0", description="Trapを受信するアドレス (カンマ区切り, 例: 0.0.0.0,[::], 192.0.2.10:1162)")
+    listen_port: int = Field(162, description="ポートを省略した受信アドレスのポート")
+    udp_rcvbuf_bytes: int = Field(0, description="UDPソケットの受信バッファサイズ (0でOSの既定値)")
+    udp_drop_monitor_interval: float = Field(10.0, description="/proc/net/udp からカーネルのドロップ数を読み取る間隔 (秒, 0で無効)")
+
+    # 受信キュー設定
+    ingest_queue_size: int = Field(10000, description="受信キューの最大長")
+    dispatch_workers: int = Field(4, description="Dispatcherワーカー数")
+    overflow_policy: Literal["drop-newest", "drop-oldest", "block"] = Field("drop-newest", description="受信キューが満杯の場合の動作")
+    ingest_lanes_file: Optional[str] = Field(None, description="受信キューの優先度レーン設定ファイル (JSON)")
+    shutdown_drain_timeout: float = Field(10.0, description="終了時に受信キューの送信完了を待つ最大秒数")
+
+    # 受信レート制限設定
+    rate_limit_enabled: bool = Field(False, description="送信元IPごとの受信レート制限を有効にする")
+    rate_limit_rate: float = Field(100.0, description="送信元ごとの許容レート (件/秒)")
+    rate_limit_burst: float = Field(200.0, description="送信元ごとに瞬間的に許容する件数 (トークンバケットの容量)")
+    rate_limit_overrides: str = Field("", description="CIDRごとのレート上書き (例: 10.0.0.0/8=1000:2000,192.0.2.5/32=10)")
+    rate_limit_idle_timeout: float = Field(300.0, description="受信の無い送信元のバケットを破棄するまでの秒数")
+    rate_limit_max_entries: int = Field(100000, description="保持する送信元のバケットの最大数 (超過時は最も長く受信していないものから破棄)")
+
+    # 重複抑止設定
+    dedup_enabled: bool = Field(False, description="同一Trapの繰り返しを抑止し、集約イベントとして送信する")
+    dedup_window: float = Field(60.0, description="同一Trapの重複を抑止する期間 (秒, 最後の1件の受信から数える)")
+    dedup_key_varbinds: str = Field("", description="フィンガープリントに含める変数のオブジェクト名またはOID (カンマ区切り)")
+    dedup_max_entries: int = Field(100000, description="保持するフィンガープリントの最大数 (超過時は最も古いものから集約して追い出す)")
+
+    # マルチプロセス設定
+    worker_processes: int = Field(1, description="ワーカープロセス数 (2以上でSO_REUSEPORTによるマルチプロセス構成)")
+    worker_restart_delay: float = Field(1.0, description="起動直後に異常終了したワーカーを再起動するまでの待機秒数")
+    worker_stats_interval: float = Field(60.0, description="ワーカーの統計情報を集計・出力する間隔 (秒)")
+
+    # メトリクス設定
+    metrics_enabled: bool = Field(False, description="Prometheus形式のメトリクスエンドポイントを有効にする")
+    metrics_host: str = Field("0.0.0.0", description="メトリクスエンドポイントのバインドアドレス")
+    metrics_port: int = Field(9162, description="メトリクスエンドポイントのポート (マルチプロセス構成ではワーカーIDを加算)")
 
     # MIB 設定
     mib_dir: str = Field("/opt/mibs", description="コンパイル済みMIBディレクトリのパス")
+    mib_load_mode: Literal["eager", "lazy"] = Field("eager", description="MIBモジュールのロード方式 (eager: 起動時に全ロード, lazy: 初回参照時にロード)")
+    resolver_mode: Literal["mib", "index"] = Field("mib", description="OID解決モード (mib: pysnmp MIBモジュール, index: 事前生成OIDインデックス)")
+    oid_index_path: Optional[str] = Field(None, description="OIDインデックスファイルのパス (未指定時はMIBディレクトリ内を探索)")
+    resolver_snapshot_path: Optional[str] = Field(None, description="MIBモードで解決状態を保存するスナップショットファイルのパス (MIBディレクトリが変わっていなければ次回起動時にMIBモジュールをロードしない, 未指定で無効)")
+    resolve_cache_size: int = Field(10000, description="OID解決結果キャッシュの最大エントリ数 (0で無効)")
+    trap_template_cache_size: int = Field(1024, description="Trapの種類ごとの変数の並びの解決結果 (テンプレート) の最大数 (0で無効)")
+    mib_reload_enabled: bool = Field(False, description="MIBディレクトリを監視し、コンパイル済みモジュールの変更時に再起動せずリロードする")
+    mib_reload_interval: float = Field(5.0, description="MIBディレクトリを走査する間隔 (秒)")
+    value_format: Literal["typed", "pretty"] = Field("typed", description="変数値の整形方式 (typed: MIBの構文に基づく整形, pretty: pysnmpのprettyPrint)")
 
     class Config:
         env_file = ".env"
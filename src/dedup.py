@@ -0,0 +1,178 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from src.config import settings
+from src.trap_record import TrapRecord, SNMP_TRAP_OID, format_timestamp
+
+logger = logging.getLogger(__name__)
+
+
+class _Entry:
+    __slots__ = ("expires_at", "first_trap", "count", "last_timestamp")
+
+    def __init__(self, expires_at, first_trap):
+        self.expires_at = expires_at
+        self.first_trap = first_trap
+        self.count = 1
+        self.last_timestamp = first_trap.timestamp
+
+
+class Deduplicator:
+    """
+    同一のTrapが短時間に繰り返し送られてくる場合 (リンクのフラップなど) に、
+    最初の1件だけを転送し、以降の重複を抑止して期間終了時に1件の集約イベントを送るステージ。
+
+    Trapの同一性は送信元IP・snmpTrapOID・key_varbinds で指定した変数の値で判定します。
+    各フィンガープリントは最後の1件から window 秒間有効で、重複を受信するたびに期間を延長します
+    (フラップが続く間は抑止を続け、window 秒間途絶えた時点で集約イベントを送ります)。
+    エントリは最後に受信した順に保持されるため、期限切れのエントリは先頭から取り除くだけで済み、
+    max_entries を超えた場合も最も長く受信していないものから追い出します。
+    """
+
+    def __init__(self, window=None, key_varbinds=None, max_entries=None):
+        """
+        Args:
+            window: 重複を抑止する期間 (秒)
+            key_varbinds: フィンガープリントに含める変数のオブジェクト名またはOIDのリスト
+            max_entries: 保持するフィンガープリントの最大数
+        """
+        self.window = window if window is not None else settings.dedup_window
+        if key_varbinds is None:
+            key_varbinds = [k.strip() for k in settings.dedup_key_varbinds.split(",") if k.strip()]
+        self.key_varbinds = tuple(key_varbinds)
+        self.max_entries = max_entries if max_entries is not None else settings.dedup_max_entries
+
+        self._entries = OrderedDict()
+        self._emit = None
+        self._sweep_task = None
+
+        self.forwarded = 0
+        self.suppressed = 0
+        self.summaries = 0
+        self.evicted = 0
+
+    def fingerprint(self, trap_data: TrapRecord):
+        """
+        Trapのフィンガープリント (送信元IP, snmpTrapOID, 指定変数の値...) を返します。
+        """
+        trap_oid = None
+        values = dict.fromkeys(self.key_varbinds)
+        for variable in trap_data.variables:
+            oid = variable.oid
+            if oid == SNMP_TRAP_OID:
+                trap_oid = variable.value
+            elif self.key_varbinds:
+                for key in self.key_varbinds:
+                    if variable.name == key or oid == key or oid.startswith(key + "."):
+                        values[key] = variable.value
+        return (trap_data.source_ip, trap_oid, *values.values())
+
+    def start(self, emit):
+        """
+        期限切れの集約イベントを定期的に送信するタスクを開始します。
+
+        Args:
+            emit: 集約イベントを後段へ渡す関数 emit(trap_data)
+        """
+        self._emit = emit
+        if self._sweep_task is None:
+            self._sweep_task = asyncio.create_task(self._sweep_loop())
+        logger.info(
+            f"Trap deduplication enabled (window={self.window}s, keys={list(self.key_varbinds)}, "
+            f"max_entries={self.max_entries})"
+        )
+
+    def accept(self, trap_data: TrapRecord) -> bool:
+        """
+        Trapを転送すべきかを判定します。
+
+        Returns:
+            bool: 最初の1件 (転送する) の場合は True、重複 (抑止する) の場合は False
+        """
+        now = time.monotonic()
+        self.expire(now)
+
+        key = self.fingerprint(trap_data)
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry.count += 1
+            entry.last_timestamp = trap_data.timestamp
+            # 期限を延長し、期限順 (= 最後に受信した順) を保つため末尾へ移す
+            entry.expires_at = now + self.window
+            self._entries.move_to_end(key)
+            self.suppressed += 1
+            return False
+
+        if len(self._entries) >= self.max_entries:
+            _, oldest = self._entries.popitem(last=False)
+            self.evicted += 1
+            self._summarize(oldest)
+        self._entries[key] = _Entry(now + self.window, trap_data)
+        self.forwarded += 1
+        return True
+
+    def expire(self, now=None):
+        """
+        期間が終了したエントリを取り除き、重複があったものは集約イベントを送信します。
+        """
+        now = time.monotonic() if now is None else now
+        entries = self._entries
+        while entries:
+            key, entry = next(iter(entries.items()))
+            if entry.expires_at > now:
+                break
+            del entries[key]
+            self._summarize(entry)
+
+    def _summarize(self, entry):
+        if entry.count <= 1 or self._emit is None:
+            return
+        first = entry.first_trap
+        # 集約イベントのタイムスタンプは送信時に Dispatcher が付与する
+        summary = TrapRecord(first.source_ip, first.source_port, first.snmp_version, first.variables, extra={
+            "dedup_summary": {
+                "count": entry.count,
+                "suppressed": entry.count - 1,
+                "first_seen": format_timestamp(first.timestamp),
+                "last_seen": format_timestamp(entry.last_timestamp),
+                "window": self.window
+            }
+        }, trap_info=first.trap_info)
+        self.summaries += 1
+        self._emit(summary)
+
+    async def _sweep_loop(self):
+        interval = min(self.window, 1.0)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.expire()
+            except Exception as e:
+                logger.error(f"Failed to expire deduplication entries: {e}")
+
+    def close(self):
+        """
+        定期タスクを停止し、保持中の重複をすべて集約イベントとして送信します。
+        """
+        if self._sweep_task is not None:
+            self._sweep_task.cancel()
+            self._sweep_task = None
+        while self._entries:
+            _, entry = self._entries.popitem(last=False)
+            self._summarize(entry)
+
+    def stats(self):
+        """
+        重複抑止の統計情報を返します。
+
+        Returns:
+            dict: forwarded, suppressed, summaries, evicted, entries
+        """
+        return {
+            "forwarded": self.forwarded,
+            "suppressed": self.suppressed,
+            "summaries": self.summaries,
+            "evicted": self.evicted,
+            "entries": len(self._entries)
+        }
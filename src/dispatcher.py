@@ -1,88 +1,668 @@
 import aiohttp
 import asyncio
+import gzip
+import hashlib
 import json
 import logging
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+import os
+import time
+from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception
 from src.config import settings
+from src.spool import Spool
+from src.stdout_sink import StdoutSink
+from src.file_sink import FileSink
+from src.webhook_pool import WebhookPool, is_permanent_error, is_retryable_error
+from src.trap_record import TrapRecord, as_dict
+from src.router import DEFAULT_SINK, load_router
+from src import metrics
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+def _count_retry(retry_state):
+    """
+    Webhook送信のリトライ回数をメトリクスに記録します (tenacityの before_sleep コールバック)。
+    """
+    metrics.dispatch_retries.inc()
+
 class Dispatcher:
     """
     Trapデータの転送・出力を担当するクラス。
-    標準出力またはWebhookへの送信を行います。
+    標準出力・ファイルまたはWebhookへの送信を行います。
+
+    ルーティングが有効な場合は、Router が決定したシンクへ送信します。
+    名前付きのシンクはそれぞれ出力方式と送信先を個別に持つ Dispatcher で、
+    default シンクはこの Dispatcher 自身の出力 (settings.output_mode) です。
+
+    fanout モードでスプールを使用する場合は、送信先ごとにスプールと再送を持つ Dispatcher
+    (endpoint_sinks) へ転送し、一部の送信先だけが受け取れなかったTrapもその送信先へ再送します。
     """
 
-    def __init__(self):
-        self.session = None
+    def __init__(self, output_mode=None, name=None, webhook_urls=None, webhook_mode=None,
+                 file_dir=None, file_prefix=None, router=None, spool_dir=None):
+        """
+        Args:
+            output_mode: 出力方式 (None の場合は settings.output_mode)
+            name: ルーティングの名前付きシンクとして使用する場合のシンク名
+            webhook_urls: Webhook送信先 (None の場合は settings の値)
+            webhook_mode: Webhook送信モード (None の場合は settings.webhook_mode)
+            file_dir: ファイル出力先ディレクトリ (None の場合は settings.file_dir)
+            file_prefix: セグメントファイル名の接頭辞 (None の場合は settings.file_prefix)
+            router: ルーティングルール (None の場合は settings.routing_file から initialize() で読み込む)
+            spool_dir: スプールディレクトリ (None の場合、既定の出力では settings.spool_dir、名前付きシンクではスプールなし)
+        """
+        self._output_mode = output_mode
+        self.name = name
+        self._webhook_urls = webhook_urls
+        self._webhook_mode = webhook_mode
+        self._file_dir = file_dir
+        self._file_prefix = file_prefix
+        self.router = router
+        self._spool_dir = spool_dir
+        # シンク名 -> Dispatcher
+        self.sinks = {}
+        # fanout + スプール時の送信先ごとの Dispatcher と、完了を待たずに続けている転送タスク
+        self.endpoint_sinks = []
+        self._background = set()
+
+        self.webhook_pool = None
+        self.stdout_sink = None
+        self.file_sink = None
+
+        # バッチ送信用のバッファとリンガータイマー
+        self._batch = []
+        self._linger_task = None
+        self.batches_sent = 0
+        self.batched_traps_sent = 0
+        # 送信先が恒久的に拒否した (4xx応答の) Trap数
+        self.rejected_traps = 0
+
+        # Webhook障害時のディスクスプールと再送タスク・fsyncタスク
+        self.spool = None
+        self._replay_task = None
+        self._sync_task = None
+        self._sync_due = asyncio.Event()
+
+    @property
+    def output_mode(self):
+        return self._output_mode or settings.output_mode
 
     async def initialize(self):
         """
-        非同期HTTPセッションを初期化します。
+        Webhook送信先とHTTPセッション (コネクションプール) を初期化します。
         Webhookモード時のみ必要です。
+        ルーティングが有効な場合は名前付きのシンクも初期化します。
+        """
+        output_mode = self.output_mode
+        # スプールは既定の出力と、spool_dir を指定したシンクでのみ使用する (名前付きのWebhookシンクはメモリ上でリトライする)
+        spool_dir = self._spool_dir or (settings.spool_dir if self.name is None else None)
+        if output_mode == "webhook" and self.webhook_pool is None and not self.endpoint_sinks:
+            pool = self._create_webhook_pool()
+            if spool_dir and pool.mode == "fanout" and len(pool) > 1:
+                await self._initialize_endpoint_sinks(pool, spool_dir)
+            else:
+                self.webhook_pool = pool
+                self.webhook_pool.start()
+
+        if output_mode == "stdout" and self.stdout_sink is None:
+            self.stdout_sink = self._create_stdout_sink()
+
+        if output_mode == "file" and self.file_sink is None:
+            self.file_sink = self._create_file_sink()
+
+        if self.name is None:
+            if self.router is None and settings.routing_file:
+                self.router = load_router(settings.routing_file)
+            if self.router is not None:
+                for name in self.router.sinks:
+                    await self._sink(name).initialize()
+
+        if output_mode == "webhook" and spool_dir and self.spool is None and not self.endpoint_sinks:
+            self.spool = Spool(
+                spool_dir,
+                max_bytes=settings.spool_max_bytes,
+                segment_bytes=settings.spool_segment_bytes,
+                fsync_batch=settings.spool_fsync_batch
+            )
+            self._replay_task = asyncio.create_task(self._replay_loop())
+            self._sync_task = asyncio.create_task(self._sync_loop())
+            logger.info(f"Webhook spool enabled: {spool_dir}")
+
+    async def _initialize_endpoint_sinks(self, pool, spool_dir):
+        """
+        fanout の送信先ごとに、1つの送信先とスプールを持つ Dispatcher を作成します。
+        スプールのディレクトリ名は送信先URLから決めるため、送信先の指定順を変えても別の送信先へ再送することはありません。
+        """
+        used = set()
+        for endpoint in pool.endpoints:
+            key = hashlib.sha1(endpoint.url.encode("utf-8")).hexdigest()[:16]
+            directory = f"endpoint-{key}"
+            # 同じURLを複数指定した場合もスプールは分ける
+            n = 1
+            while directory in used:
+                n += 1
+                directory = f"endpoint-{key}-{n}"
+            used.add(directory)
+            # 1送信先の fanout は、同時送信数の上限やサーキットブレーカーで送れない場合に待たずに失敗するため、
+            # そのTrapはすぐにスプールへ退避される
+            sink = Dispatcher(
+                output_mode="webhook",
+                name=f"endpoint{len(self.endpoint_sinks)}",
+                webhook_urls=[{"url": endpoint.url, "max_in_flight": endpoint.max_in_flight}],
+                webhook_mode="fanout",
+                spool_dir=os.path.join(spool_dir, directory)
+            )
+            await sink.initialize()
+            self.endpoint_sinks.append(sink)
+        self._migrate_spool(spool_dir)
+
+    def _migrate_spool(self, spool_dir):
+        """
+        送信先ごとに分ける前のスプールに残っているTrapを、すべての送信先のスプールへ移します。
         """
-        if settings.output_mode == "webhook" and not self.session:
-            self.session = aiohttp.ClientSession()
+        if not Spool.exists(spool_dir):
+            return
+        spool = Spool(spool_dir, max_bytes=settings.spool_max_bytes, segment_bytes=settings.spool_segment_bytes)
+        moved = 0
+        while spool.has_pending():
+            items, position = spool.read(settings.spool_replay_batch)
+            for sink in self.endpoint_sinks:
+                sink._spool_append(items)
+            spool.commit(position, len(items))
+            moved += len(items)
+        for sink in self.endpoint_sinks:
+            sink.spool.sync()
+        spool.remove()
+        if moved:
+            logger.info(f"Moved {moved} spooled traps to {len(self.endpoint_sinks)} per-endpoint spools")
 
     async def close(self):
         """
         HTTPセッションをクローズします。
+        バッファに残っているバッチは送信してからクローズします。
+        """
+        if self._batch:
+            try:
+                await self._flush_batch()
+            except Exception as e:
+                logger.error(f"Failed to flush webhook batch on close: {e}")
+
+        for task in (self._replay_task, self._sync_task):
+            if task is not None:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        self._replay_task = self._sync_task = None
+
+        if self.spool is not None:
+            self.spool.close()
+
+        if self.stdout_sink is not None:
+            self.stdout_sink.close()
+
+        if self.file_sink is not None:
+            self.file_sink.close()
+
+        if self.webhook_pool is not None:
+            await self.webhook_pool.close()
+
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+        for sink in self.endpoint_sinks:
+            await sink.close()
+
+        for sink in self.sinks.values():
+            await sink.close()
+
+    def _sink(self, name):
         """
-        if self.session:
-            await self.session.close()
+        名前付きのシンク (Dispatcher) を返します。未作成の場合はルーティング設定のシンク定義から作成します。
+        """
+        sink = self.sinks.get(name)
+        if sink is None:
+            spec = self.router.sinks[name]
+            sink = self.sinks[name] = Dispatcher(
+                output_mode=spec["type"],
+                name=name,
+                webhook_urls=spec.get("urls"),
+                webhook_mode=spec.get("mode"),
+                file_dir=spec.get("dir"),
+                file_prefix=spec.get("prefix", name)
+            )
+        return sink
+
+    def stats(self):
+        """
+        送信の統計情報を返します。
+
+        Returns:
+            dict: batches_sent, batched_traps_sent, rejected_traps
+                  (スプール有効時は spool, stdout出力時は stdout, file出力時は file,
+                   Webhook出力時は送信先ごとの webhook,
+                   fanout + スプール時は送信先ごとの endpoint_spools,
+                   ルーティング有効時は routing と名前付きシンクごとの sinks を含む)
+        """
+        stats = {
+            "batches_sent": self.batches_sent,
+            "batched_traps_sent": self.batched_traps_sent,
+            "rejected_traps": self.rejected_traps
+        }
+        if self.spool is not None:
+            stats["spool"] = self.spool.stats()
+        if self.stdout_sink is not None:
+            stats["stdout"] = self.stdout_sink.stats()
+        if self.file_sink is not None:
+            stats["file"] = self.file_sink.stats()
+        if self.webhook_pool is not None:
+            stats["webhook"] = self.webhook_pool.stats()
+        if self.endpoint_sinks:
+            # 送信先ごとの Dispatcher の統計を、送信先1つの Dispatcher と同じ形にまとめる
+            endpoints = [sink.stats() for sink in self.endpoint_sinks]
+            for key in ("batches_sent", "batched_traps_sent", "rejected_traps"):
+                stats[key] += sum(endpoint[key] for endpoint in endpoints)
+            stats["webhook"] = {f"endpoint{i}": endpoint["webhook"]["endpoint0"] for i, endpoint in enumerate(endpoints)}
+            stats["endpoint_spools"] = {f"endpoint{i}": endpoint["spool"] for i, endpoint in enumerate(endpoints)}
+        if self.router is not None:
+            stats["routing"] = self.router.stats()
+        if self.sinks:
+            stats["sinks"] = {name: sink.stats() for name, sink in self.sinks.items()}
+        return stats
 
-    async def dispatch(self, trap_data: dict):
+    async def dispatch(self, trap_data):
         """
         Trapデータを設定された出力先に転送します。
+        ルーティングが有効な場合は、一致したルールのシンクへ転送します
+        (ルーティングは TrapRecord のみが対象で、辞書はそのまま既定の出力へ転送します)。
         
         Args:
-            trap_data: 送信するTrapデータの辞書
+            trap_data: 送信するTrapデータ (TrapRecord または辞書)
+        """
+        if self.router is not None and isinstance(trap_data, TrapRecord):
+            await self._dispatch_routed(trap_data)
+        else:
+            await self._dispatch_output(trap_data)
+
+    async def _dispatch_routed(self, trap: TrapRecord):
         """
+        Routerが決定したシンクへ順に転送します。
+        いずれかのシンクで失敗しても残りのシンクへの転送は行い、最後に例外を送出します。
+        """
+        names = self.router.route(trap)
+        if not names:
+            return
+        data = trap.to_dict()
+        error = None
+        for name in names:
+            try:
+                if name == DEFAULT_SINK:
+                    await self._dispatch_output(data)
+                else:
+                    await self._sink(name).dispatch(data)
+            except Exception as e:
+                error = e
+                logger.error(f"Failed to dispatch trap to sink '{name}': {e}")
+        if error is not None:
+            raise error
+
+    async def _dispatch_output(self, trap_data):
+        """
+        Trapデータをこの Dispatcher の出力先に転送します。
+        """
+        output_mode = self.output_mode
+        started = time.perf_counter()
+        # 内部表現からJSONと同じ形の辞書への変換はシンクに渡す直前に行う
+        trap_data = as_dict(trap_data)
+
         # タイムスタンプの付与
         if "timestamp" not in trap_data:
             trap_data["timestamp"] = datetime.utcnow().isoformat() + "Z"
 
-        if settings.output_mode == "stdout":
-            self._dispatch_stdout(trap_data)
-        elif settings.output_mode == "webhook":
-            await self._dispatch_webhook(trap_data)
+        try:
+            if output_mode == "stdout":
+                self._dispatch_stdout(trap_data)
+            elif output_mode == "file":
+                self._dispatch_file(trap_data)
+            elif output_mode == "webhook":
+                if self.endpoint_sinks:
+                    await self._dispatch_endpoints(trap_data)
+                else:
+                    await self._dispatch_webhook_output(trap_data)
+            else:
+                logger.warning(f"Unknown output mode: {output_mode}")
+        except Exception:
+            metrics.dispatch_results.inc(output_mode, "failure")
+            raise
+        else:
+            metrics.dispatch_results.inc(output_mode, "success")
+        finally:
+            metrics.dispatch_seconds.observe(time.perf_counter() - started)
+
+    async def _dispatch_webhook_output(self, trap_data: dict):
+        """
+        TrapをWebhook送信先に送信します (スプール・バッチ送信の有無に応じて送信方法を選びます)。
+        """
+        if self.spool is not None and self.spool.has_pending():
+            # 再送待ちのTrapがある間は、順序を保つためスプールの末尾に追記する
+            self._spool_append([trap_data])
+        elif settings.webhook_batch_size > 1:
+            await self._add_to_batch(trap_data)
+        elif self.spool is not None:
+            await self._send_or_spool(trap_data)
         else:
-            logger.warning(f"Unknown output mode: {settings.output_mode}")
+            try:
+                await self._dispatch_webhook(trap_data)
+            except aiohttp.ClientResponseError as e:
+                if is_permanent_error(e):
+                    self._reject([trap_data], e)
+                raise
+
+    async def _dispatch_endpoints(self, trap_data: dict):
+        """
+        fanout: 送信先ごとの Dispatcher へ並行して転送し、いずれかの送信先で完了した時点で戻ります。
+        各送信先は送れなかったTrapを自身のスプールに退避して再送するため、
+        残りの送信先への転送は完了を待たずにバックグラウンドで続けます。
+        """
+        tasks = {asyncio.create_task(sink._dispatch_webhook_output(trap_data)) for sink in self.endpoint_sinks}
+        try:
+            done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            # 呼び出し元がキャンセルされても、各送信先への転送 (またはスプールへの退避) は続ける
+            self._keep_in_background(tasks)
+            raise
+        self._keep_in_background(pending)
+        for task in done:
+            if task.exception():
+                raise task.exception()
+
+    def _keep_in_background(self, tasks):
+        for task in tasks:
+            self._background.add(task)
+            task.add_done_callback(self._background_done)
+
+    def _background_done(self, task):
+        self._background.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.error(f"Failed to dispatch trap to webhook endpoint: {task.exception()}")
+
+    def _create_stdout_sink(self):
+        return StdoutSink(
+            buffer_bytes=settings.stdout_buffer_bytes,
+            flush_interval_ms=settings.stdout_flush_interval_ms,
+            max_pending_bytes=settings.stdout_max_pending_bytes,
+            encoder=settings.stdout_json_encoder
+        )
+
+    def _create_webhook_pool(self):
+        return WebhookPool(urls=self._webhook_urls, mode=self._webhook_mode)
+
+    def _create_file_sink(self):
+        return FileSink(
+            self._file_dir or settings.file_dir,
+            prefix=self._file_prefix or settings.file_prefix,
+            max_bytes=settings.file_max_bytes,
+            rotate_interval=settings.file_rotate_interval,
+            compression=settings.file_compression,
+            retention_files=settings.file_retention_files,
+            retention_bytes=settings.file_retention_bytes,
+            write_buffer_bytes=settings.file_write_buffer_bytes,
+            buffer_bytes=settings.stdout_buffer_bytes,
+            flush_interval_ms=settings.stdout_flush_interval_ms,
+            max_pending_bytes=settings.stdout_max_pending_bytes,
+            encoder=settings.stdout_json_encoder
+        )
+
+    def _dispatch_file(self, data: dict):
+        """
+        セグメントファイルにNDJSON形式で出力します。
+        書き込み・ローテーション・圧縮は別スレッドで行われます。
+        """
+        if self.file_sink is None:
+            self.file_sink = self._create_file_sink()
+        try:
+            self.file_sink.write(data)
+        except Exception as e:
+            logger.error(f"Failed to write to file: {e}")
 
     def _dispatch_stdout(self, data: dict):
         """
-        標準出力にJSON形式で出力します。
+        標準出力にNDJSON形式で出力します。
+        書き込みはバッファリングされ、別スレッドでまとめて行われます。
         """
+        if self.stdout_sink is None:
+            self.stdout_sink = self._create_stdout_sink()
         try:
-            print(json.dumps(data, ensure_ascii=False))
+            self.stdout_sink.write(data)
         except Exception as e:
             logger.error(f"Failed to write to stdout: {e}")
 
     @retry(
         stop=stop_after_attempt(3),
         wait=wait_exponential(multiplier=1, min=1, max=10),
-        retry=retry_if_exception_type((aiohttp.ClientError, asyncio.TimeoutError))
+        retry=retry_if_exception(is_retryable_error),
+        before_sleep=_count_retry
     )
     async def _dispatch_webhook(self, data: dict):
         """
         Webhook URLにデータをPOSTします。
-        Tenacityを使用してリトライを行います。
+        Tenacityを使用してリトライを行います (恒久的な拒否はリトライしません)。
+        """
+        await self._post_json(data)
+
+    async def _send_or_spool(self, data: dict):
+        """
+        Webhook URLにデータを1回だけPOSTし、失敗した場合はスプールに書き込みます。
+        リトライはメモリ上では行わず、スプールからの再送で行います。
+        送信先が恒久的に拒否した場合はスプールせず、デッドレターファイルに書き出します。
+        """
+        try:
+            await self._post_json(data)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if is_permanent_error(e):
+                self._reject([data], e)
+                return
+            logger.warning(f"Webhook unavailable, spooling trap: {e}")
+            self._spool_append([data])
+
+    def _spool_append(self, items: list):
+        """
+        Trapをスプールに追記します。fsyncが必要な件数に達した場合は fsync タスクを起こします。
+        """
+        for item in items:
+            if self.spool.append(item):
+                self._sync_due.set()
+
+    async def _sync_loop(self):
+        """
+        スプールの書き込みを fsync_batch 件ごと、または SPOOL_FSYNC_INTERVAL_MS ごとにfsyncするタスク。
+        fsyncは別スレッドで行い、受信処理 (イベントループ) を止めません。
+        """
+        while True:
+            try:
+                await asyncio.wait_for(self._sync_due.wait(), settings.spool_fsync_interval_ms / 1000)
+            except asyncio.TimeoutError:
+                pass
+            self._sync_due.clear()
+            try:
+                await self.spool.sync_async()
+            except OSError as e:
+                logger.error(f"Failed to fsync spool: {e}")
+
+    def _reject(self, items: list, error):
+        """
+        送信先が恒久的に拒否したTrapを記録します。
+        スプール有効時はデッドレターファイルに書き出し、それ以外は破棄します。
+        """
+        self.rejected_traps += len(items)
+        if self.spool is not None:
+            self.spool.dead_letter(items)
+            logger.error(f"Webhook rejected {len(items)} traps, moved to dead letter file: {error}")
+        else:
+            logger.error(f"Webhook rejected {len(items)} traps, discarding: {error}")
+
+    async def _post_json(self, data: dict):
+        """
+        Webhook送信先にデータを1回POSTします。
+        """
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        await self._post_body(body, {"Content-Type": "application/json"}, 1)
+
+    async def _add_to_batch(self, data: dict):
+        """
+        Trapをバッチに追加します。
+        件数が上限に達した場合は呼び出し元でそのまま送信し、
+        それ以外はリンガー時間経過後にタイマーから送信します。
+        """
+        self._batch.append(data)
+        if len(self._batch) >= settings.webhook_batch_size:
+            await self._flush_batch()
+        elif self._linger_task is None:
+            self._linger_task = asyncio.create_task(self._linger())
+
+    async def _linger(self):
+        """
+        リンガー時間の経過後にバッチを送信します。
+        """
+        await asyncio.sleep(settings.webhook_batch_linger_ms / 1000)
+        self._linger_task = None
+        try:
+            await self._flush_batch()
+        except Exception as e:
+            logger.error(f"Failed to send webhook batch: {e}")
+
+    async def _flush_batch(self):
         """
-        if not self.session:
+        バッファ中のTrapを1リクエストにまとめて送信します。
+        """
+        if self._linger_task is not None:
+            self._linger_task.cancel()
+            self._linger_task = None
+
+        batch, self._batch = self._batch, []
+        if not batch:
+            return
+
+        body, headers = self._encode_batch(batch)
+        if self.spool is not None:
+            try:
+                await self._post_body(body, headers, len(batch))
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                # 恒久的な拒否もスプールし、再送時にTrapごとに送り直して拒否されたTrapのみを取り除く
+                logger.warning(f"Webhook unavailable, spooling batch of {len(batch)} traps: {e}")
+                self._spool_append(batch)
+                return
+        else:
+            try:
+                await self._post_batch(body, headers, len(batch))
+            except aiohttp.ClientResponseError as e:
+                if is_permanent_error(e):
+                    self._reject(batch, e)
+                raise
+        self.batches_sent += 1
+        self.batched_traps_sent += len(batch)
+
+    def _encode_batch(self, batch: list):
+        """
+        バッチを設定に応じたボディ (JSON配列 / NDJSON、必要に応じてgzip) に変換します。
+        """
+        if settings.webhook_batch_format == "ndjson":
+            text = "".join(json.dumps(item, ensure_ascii=False) + "\n" for item in batch)
+            headers = {"Content-Type": "application/x-ndjson"}
+        else:
+            text = json.dumps(batch, ensure_ascii=False)
+            headers = {"Content-Type": "application/json"}
+
+        body = text.encode("utf-8")
+        if settings.webhook_compression == "gzip":
+            body = gzip.compress(body, compresslevel=6)
+            headers["Content-Encoding"] = "gzip"
+        return body, headers
+
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=1, max=10),
+        retry=retry_if_exception(is_retryable_error),
+        before_sleep=_count_retry
+    )
+    async def _post_batch(self, body: bytes, headers: dict, count: int):
+        """
+        エンコード済みのバッチをWebhook URLにPOSTします。
+        リトライはバッチ全体に対して行われます。
+        """
+        await self._post_body(body, headers, count)
+
+    async def _post_body(self, body: bytes, headers: dict, count: int):
+        """
+        エンコード済みのボディを送信モードに応じてWebhook送信先に1回POSTします。
+        """
+        if self.webhook_pool is None:
             await self.initialize()
 
-        if not settings.webhook_url:
+        if not self.webhook_pool:
             logger.error("Webhook URL is not configured.")
             return
 
-        try:
-            async with self.session.post(settings.webhook_url, json=data) as response:
-                if response.status >= 400:
-                    logger.error(f"Webhook failed with status {response.status}: {await response.text()}")
-                    response.raise_for_status()
+        await self.webhook_pool.post(body, headers, count)
+
+    async def _replay_loop(self):
+        """
+        スプールに溜まったTrapを古い順に再送するタスク。
+        送信に失敗した場合は一定時間待機してから再試行します。
+        同じ読み出し単位の途中で失敗した場合は再送時に重複することがあります (at-least-once)。
+        送信先が恒久的に拒否したTrapはデッドレターファイルに移して読み出し位置を進めるため、
+        後続のTrapの再送が止まることはありません。
+        """
+        while True:
+            if not self.spool.has_pending():
+                await asyncio.sleep(settings.spool_fsync_interval_ms / 1000)
+                continue
+
+            items, position = self.spool.read(settings.spool_replay_batch)
+            if not items:
+                # 壊れたレコードを読み飛ばしただけの場合も、イベントループを占有しないよう待機する
+                self.spool.commit(position, 0)
+                await asyncio.sleep(settings.spool_fsync_interval_ms / 1000)
+                continue
+            try:
+                rejected = []
+                if settings.webhook_batch_size > 1:
+                    body, headers = self._encode_batch(items)
+                    try:
+                        await self._post_body(body, headers, len(items))
+                    except aiohttp.ClientResponseError as e:
+                        if not is_permanent_error(e):
+                            raise
+                        # どのTrapが拒否されたか分からないため、Trapごとに送り直す
+                        logger.warning(f"Webhook rejected a batch of {len(items)} traps, replaying one by one: {e}")
+                        rejected = await self._replay_items(items)
                 else:
-                    logger.debug(f"Webhook sent successfully: {response.status}")
-        except Exception as e:
-            logger.warning(f"Webhook dispatch failed: {e}")
-            raise
+                    rejected = await self._replay_items(items)
+                self.spool.commit(position, len(items) - len(rejected))
+                logger.debug(f"Replayed {len(items)} traps from spool")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.warning(f"Spool replay failed, retrying in {settings.spool_retry_interval}s: {e}")
+                await asyncio.sleep(settings.spool_retry_interval)
+            except Exception as e:
+                logger.error(f"Unexpected error during spool replay: {e}")
+                await asyncio.sleep(settings.spool_retry_interval)
+
+    async def _replay_items(self, items: list):
+        """
+        スプールのTrapを1件ずつ再送します。恒久的に拒否されたTrapはデッドレターファイルに移します。
+        途中で送信に失敗した場合は、送信済み・デッドレターに移したTrapまで読み出し位置を進めてから例外を送出し、
+        再試行時にそれらを再送 (デッドレターへの重複した書き出し) しないようにします。
+
+        Returns:
+            list: 拒否されたTrap
+        """
+        rejected = []
+        for i, item in enumerate(items):
+            try:
+                await self._post_json(item)
+            except Exception as e:
+                if not is_permanent_error(e):
+                    if i:
+                        _, position = self.spool.read(i)
+                        self.spool.commit(position, i - len(rejected))
+                    raise
+                self._reject([item], e)
+                rejected.append(item)
+        return rejected
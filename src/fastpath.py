@@ -0,0 +1,357 @@
+from pysnmp.carrier.asyncio.dgram import udp, udp6
+import logging
+
+logger = logging.getLogger(__name__)
+
+# SNMPv1/v2c の Trap / InformRequest を、pysnmpのメッセージ処理を通さずに
+# UDPバッファから直接デコードする最小限のBERパーサー。
+# v3 やその他のPDU、デコードできないメッセージは従来通り SnmpEngine に渡す。
+
+# BERタグ
+TAG_INTEGER = 0x02
+TAG_OCTET_STRING = 0x04
+TAG_NULL = 0x05
+TAG_OID = 0x06
+TAG_SEQUENCE = 0x30
+TAG_IPADDRESS = 0x40
+TAG_COUNTER32 = 0x41
+TAG_GAUGE32 = 0x42
+TAG_TIMETICKS = 0x43
+TAG_OPAQUE = 0x44
+TAG_COUNTER64 = 0x46
+TAG_NO_SUCH_OBJECT = 0x80
+TAG_NO_SUCH_INSTANCE = 0x81
+TAG_END_OF_MIB_VIEW = 0x82
+
+# PDUタグ
+PDU_RESPONSE = 0xA2
+PDU_V1_TRAP = 0xA4
+PDU_INFORM = 0xA6
+PDU_V2_TRAP = 0xA7
+
+_NOTIFICATION_PDUS = (PDU_V1_TRAP, PDU_INFORM, PDU_V2_TRAP)
+_UNSIGNED_TAGS = (TAG_COUNTER32, TAG_GAUGE32, TAG_TIMETICKS, TAG_COUNTER64)
+
+# pysnmpの表示形式に合わせた例外値の文字列
+_EXCEPTION_VALUES = {
+    TAG_NO_SUCH_OBJECT: "No Such Object currently exists at this OID",
+    TAG_NO_SUCH_INSTANCE: "No Such Instance currently exists at this OID",
+    TAG_END_OF_MIB_VIEW: "No more variables left in this MIB View",
+}
+
+# RFC 2576 3.1 による v1 Trap から v2 形式への変換で使用するOID
+SYS_UPTIME = (1, 3, 6, 1, 2, 1, 1, 3, 0)
+SNMP_TRAP_OID = (1, 3, 6, 1, 6, 3, 1, 1, 4, 1, 0)
+SNMP_TRAP_ADDRESS = (1, 3, 6, 1, 6, 3, 18, 1, 3, 0)
+SNMP_TRAP_COMMUNITY = (1, 3, 6, 1, 6, 3, 18, 1, 4, 0)
+SNMP_TRAP_ENTERPRISE = (1, 3, 6, 1, 6, 3, 1, 1, 4, 3, 0)
+SNMP_TRAPS = (1, 3, 6, 1, 6, 3, 1, 1, 5)
+
+
+class BerDecodeError(ValueError):
+    """
+    BERデコードに失敗した場合の例外。
+    """
+
+
+class FastValue:
+    """
+    デコード済みの値。prettyPrint() はpysnmpの値オブジェクトと同じ文字列を返します。
+    """
+    __slots__ = ("tag", "value")
+
+    def __init__(self, tag, value):
+        self.tag = tag
+        self.value = value
+
+    def prettyPrint(self):
+        tag, value = self.tag, self.value
+        if tag == TAG_OCTET_STRING or tag == TAG_OPAQUE:
+            for x in value:
+                if x < 32 or x > 126:
+                    return "0x" + value.hex()
+            return value.decode("ascii")
+        if tag == TAG_OID:
+            return ".".join(map(str, value))
+        if tag == TAG_IPADDRESS:
+            return ".".join(map(str, value))
+        if tag == TAG_NULL:
+            return ""
+        if tag in _EXCEPTION_VALUES:
+            return _EXCEPTION_VALUES[tag]
+        return str(value)
+
+    def __str__(self):
+        return self.prettyPrint()
+
+    def __repr__(self):
+        return f"FastValue({self.tag:#x}, {self.value!r})"
+
+
+class FastMessage:
+    """
+    デコード済みのSNMPv1/v2c通知メッセージ。
+    Informへの応答を組み立てるため、元のバッファ上の各要素の位置も保持します。
+    """
+    __slots__ = ("version", "community", "pdu_type", "varbinds", "raw")
+
+    def __init__(self, version, community, pdu_type, varbinds, raw):
+        self.version = version
+        self.community = community
+        self.pdu_type = pdu_type
+        self.varbinds = varbinds
+        self.raw = raw
+
+
+def _read_tlv(data, pos, end):
+    """
+    pos の位置のTLVを読み取り、(タグ, 値の開始位置, 値の終了位置) を返します。
+    """
+    if pos + 2 > end:
+        raise BerDecodeError("truncated TLV")
+    tag = data[pos]
+    if tag & 0x1F == 0x1F:
+        raise BerDecodeError("multi-byte tags are not supported")
+    length = data[pos + 1]
+    pos += 2
+    if length & 0x80:
+        n = length & 0x7F
+        if n == 0 or n > 4 or pos + n > end:
+            raise BerDecodeError("unsupported length encoding")
+        length = int.from_bytes(data[pos:pos + n], "big")
+        pos += n
+    if pos + length > end:
+        raise BerDecodeError("value exceeds buffer")
+    return tag, pos, pos + length
+
+
+def _expect(data, pos, end, expected_tag):
+    tag, start, stop = _read_tlv(data, pos, end)
+    if tag != expected_tag:
+        raise BerDecodeError(f"expected tag {expected_tag:#x}, got {tag:#x}")
+    return start, stop
+
+
+def _decode_oid(data, start, stop):
+    arcs = []
+    value = 0
+    for b in data[start:stop]:
+        value = (value << 7) | (b & 0x7F)
+        if not b & 0x80:
+            arcs.append(value)
+            value = 0
+    if not arcs:
+        raise BerDecodeError("empty OID")
+    first = arcs[0]
+    if first < 40:
+        return (0, first, *arcs[1:])
+    if first < 80:
+        return (1, first - 40, *arcs[1:])
+    return (2, first - 80, *arcs[1:])
+
+
+def _decode_value(tag, data, start, stop):
+    if tag == TAG_INTEGER:
+        return FastValue(tag, int.from_bytes(data[start:stop], "big", signed=True))
+    if tag in _UNSIGNED_TAGS:
+        return FastValue(tag, int.from_bytes(data[start:stop], "big"))
+    if tag == TAG_OCTET_STRING or tag == TAG_OPAQUE:
+        return FastValue(tag, bytes(data[start:stop]))
+    if tag == TAG_OID:
+        return FastValue(tag, _decode_oid(data, start, stop))
+    if tag == TAG_IPADDRESS:
+        if stop - start != 4:
+            raise BerDecodeError("invalid IpAddress length")
+        return FastValue(tag, tuple(data[start:stop]))
+    if tag == TAG_NULL or tag in _EXCEPTION_VALUES:
+        return FastValue(tag, None)
+    raise BerDecodeError(f"unsupported value tag {tag:#x}")
+
+
+def _decode_varbinds(data, start, stop):
+    varbinds = []
+    pos = start
+    while pos < stop:
+        vb_start, vb_stop = _expect(data, pos, stop, TAG_SEQUENCE)
+        oid_start, oid_stop = _expect(data, vb_start, vb_stop, TAG_OID)
+        tag, v_start, v_stop = _read_tlv(data, oid_stop, vb_stop)
+        varbinds.append((_decode_oid(data, oid_start, oid_stop), _decode_value(tag, data, v_start, v_stop)))
+        pos = vb_stop
+    return varbinds
+
+
+def decode_message(data):
+    """
+    UDPデータグラムをSNMPv1/v2cの通知メッセージとしてデコードします。
+
+    Returns:
+        FastMessage: v1 Trap / v2c Trap / v2c InformRequest の場合
+        None: v3 やその他のPDUなど、高速パスで処理しないメッセージの場合
+
+    Raises:
+        BerDecodeError: BERとして不正な場合
+    """
+    end = len(data)
+    msg_start, msg_stop = _expect(data, 0, end, TAG_SEQUENCE)
+
+    ver_start, ver_stop = _expect(data, msg_start, msg_stop, TAG_INTEGER)
+    version = int.from_bytes(data[ver_start:ver_stop], "big")
+    if version not in (0, 1):
+        return None
+
+    com_start, com_stop = _expect(data, ver_stop, msg_stop, TAG_OCTET_STRING)
+    pdu_type, pdu_start, pdu_stop = _read_tlv(data, com_stop, msg_stop)
+    if pdu_type not in _NOTIFICATION_PDUS:
+        return None
+    if (version == 0) != (pdu_type == PDU_V1_TRAP):
+        return None
+
+    community = bytes(data[com_start:com_stop])
+
+    if pdu_type == PDU_V1_TRAP:
+        ent_start, ent_stop = _expect(data, pdu_start, pdu_stop, TAG_OID)
+        addr_start, addr_stop = _expect(data, ent_stop, pdu_stop, TAG_IPADDRESS)
+        gen_start, gen_stop = _expect(data, addr_stop, pdu_stop, TAG_INTEGER)
+        spec_start, spec_stop = _expect(data, gen_stop, pdu_stop, TAG_INTEGER)
+        ts_start, ts_stop = _expect(data, spec_stop, pdu_stop, TAG_TIMETICKS)
+        vbl_start, vbl_stop = _expect(data, ts_stop, pdu_stop, TAG_SEQUENCE)
+
+        enterprise = _decode_oid(data, ent_start, ent_stop)
+        generic = int.from_bytes(data[gen_start:gen_stop], "big", signed=True)
+        specific = int.from_bytes(data[spec_start:spec_stop], "big", signed=True)
+        if generic == 6:
+            trap_oid = enterprise + (0, specific)
+        else:
+            trap_oid = SNMP_TRAPS + (generic + 1,)
+
+        # RFC 2576 3.1 に従い v2 形式の変数リストへ変換 (pysnmpと同じ順序)
+        varbinds = [
+            (SYS_UPTIME, _decode_value(TAG_TIMETICKS, data, ts_start, ts_stop)),
+            (SNMP_TRAP_OID, FastValue(TAG_OID, trap_oid)),
+            (SNMP_TRAP_ADDRESS, _decode_value(TAG_IPADDRESS, data, addr_start, addr_stop)),
+            (SNMP_TRAP_COMMUNITY, FastValue(TAG_OCTET_STRING, community)),
+            (SNMP_TRAP_ENTERPRISE, FastValue(TAG_OID, enterprise)),
+        ]
+        varbinds.extend(_decode_varbinds(data, vbl_start, vbl_stop))
+        return FastMessage(version, community, pdu_type, varbinds, None)
+
+    rid_start, rid_stop = _expect(data, pdu_start, pdu_stop, TAG_INTEGER)
+    _, err_stop = _expect(data, rid_stop, pdu_stop, TAG_INTEGER)
+    _, idx_stop = _expect(data, err_stop, pdu_stop, TAG_INTEGER)
+    vbl_tag, vbl_start, vbl_stop = _read_tlv(data, idx_stop, pdu_stop)
+    if vbl_tag != TAG_SEQUENCE:
+        raise BerDecodeError("expected variable-bindings")
+
+    # Inform応答用に、version/community/request-id/variable-bindings のTLVを保持する
+    raw = (
+        data[msg_start:com_stop],
+        data[pdu_start:rid_stop],
+        data[idx_stop:vbl_stop],
+    )
+    return FastMessage(version, community, pdu_type, _decode_varbinds(data, vbl_start, vbl_stop), raw)
+
+
+def _encode_length(length):
+    if length < 0x80:
+        return bytes((length,))
+    encoded = length.to_bytes((length.bit_length() + 7) // 8, "big")
+    return bytes((0x80 | len(encoded),)) + encoded
+
+
+def encode_response(message):
+    """
+    InformRequestに対するResponse-PDUを組み立てます。
+    request-id と variable-bindings は受信したメッセージのバイト列をそのまま使用します。
+    """
+    header, request_id, varbinds = message.raw
+    pdu_body = bytes(request_id) + b"\x02\x01\x00\x02\x01\x00" + bytes(varbinds)
+    pdu = bytes((PDU_RESPONSE,)) + _encode_length(len(pdu_body)) + pdu_body
+    body = bytes(header) + pdu
+    return bytes((TAG_SEQUENCE,)) + _encode_length(len(body)) + body
+
+
+class FastPathHandler:
+    """
+    SNMPv1/v2c の Trap / InformRequest を高速パスで処理するハンドラ。
+    コミュニティ名の検証とInformへの応答を行い、変数リストをコールバックへ渡します。
+    """
+
+    def __init__(self, process_trap, community):
+        """
+        Args:
+            process_trap: process_trap(transportAddress, snmp_version, varBinds) 形式のコールバック
+            community: 受け付けるコミュニティ名
+        """
+        self.process_trap = process_trap
+        self.community = community.encode("utf-8")
+
+        self.handled = 0
+        self.informs = 0
+        self.bad_community = 0
+        self.passed_through = 0
+
+    def handle(self, transport, datagram, transportAddress):
+        """
+        データグラムを高速パスで処理します。
+
+        Returns:
+            bool: 処理した (SnmpEngineに渡す必要がない) 場合は True
+        """
+        try:
+            message = decode_message(datagram)
+        except (BerDecodeError, IndexError) as e:
+            logger.debug(f"Fast path could not decode datagram from {transportAddress}: {e}")
+            message = None
+
+        if message is None:
+            self.passed_through += 1
+            return False
+
+        if message.community != self.community:
+            # SnmpEngineと同様、コミュニティ名が一致しないメッセージは破棄する
+            self.bad_community += 1
+            logger.debug(f"Bad community name from {transportAddress}")
+            return True
+
+        if message.pdu_type == PDU_INFORM:
+            transport.send_message(encode_response(message), transportAddress)
+            self.informs += 1
+
+        self.handled += 1
+        self.process_trap(transportAddress, "v1" if message.version == 0 else "v2c", message.varbinds)
+        return True
+
+    def stats(self):
+        """
+        高速パスの統計情報を返します。
+        """
+        return {
+            "handled": self.handled,
+            "informs": self.informs,
+            "bad_community": self.bad_community,
+            "passed_through": self.passed_through
+        }
+
+
+class _FastPathTransportMixin:
+    def __init__(self, handler, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fast_path = handler
+
+    def datagram_received(self, datagram, transportAddress):
+        if self.fast_path.handle(self, datagram, transportAddress):
+            return
+        super().datagram_received(datagram, transportAddress)
+
+
+class FastPathUdpTransport(_FastPathTransportMixin, udp.UdpTransport):
+    """
+    受信データグラムをまず高速パスで処理し、処理できなかったものだけを
+    SnmpEngine (pysnmpのメッセージ処理) へ渡すUDPトランスポート。
+    """
+
+
+class FastPathUdp6Transport(_FastPathTransportMixin, udp6.Udp6Transport):
+    """
+    FastPathUdpTransport のIPv6版。
+    """
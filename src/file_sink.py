@@ -0,0 +1,297 @@
+import gzip
+import itertools
+import logging
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+from datetime import datetime, timezone
+from src.stdout_sink import StdoutSink
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstandard はオプション
+    zstandard = None
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows ではセグメントのロックを行わない
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_SUFFIX = ".ndjson"
+COMPRESSED_SUFFIXES = {"gzip": ".gz", "zstd": ".zst", "none": ""}
+
+# セグメントファイル名の連番 (同じプロセスの複数のシンクが同じディレクトリに書き出しても重複しないようプロセス内で共有する)
+_segment_sequence = itertools.count(1)
+
+
+def _compress_gzip(src, dest):
+    with gzip.open(dest, "wb", compresslevel=6) as out:
+        shutil.copyfileobj(src, out, 1024 * 1024)
+
+
+def _compress_zstd(src, dest):
+    with open(dest, "wb") as out:
+        zstandard.ZstdCompressor(level=3).copy_stream(src, out)
+
+
+def _try_lock(f):
+    """
+    セグメントファイルの排他ロックを取得します。
+    書き込み中のセグメントは書き込み側がロックを保持しているため、取得できなかった場合は False を返します。
+    """
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+
+def _in_use(path):
+    """
+    セグメントが他の FileSink (他のワーカープロセスを含む) で書き込み中かを返します。
+    """
+    try:
+        with open(path, "rb") as f:
+            return not _try_lock(f)
+    except FileNotFoundError:
+        return True
+
+
+class FileSink(StdoutSink):
+    """
+    TrapをNDJSONとしてローカルのセグメントファイルへ書き出すシンク。
+
+    バッファリングと書き込みスレッドへの受け渡しは StdoutSink と同じで、Dispatcher.dispatch ではバッファへの追記のみを行います。
+    セグメントが max_bytes に達するか rotate_interval 秒経過するとローテーションし、
+    閉じたセグメントは圧縮スレッドで gzip / zstd に圧縮します。
+    圧縮後のセグメントは retention_files / retention_bytes を超えた分を古いものから削除します。
+
+    書き込み中のセグメントは排他ロック (flock) を保持します。マルチプロセス構成で各ワーカーが同じディレクトリに
+    書き出す場合も、前回の実行の残りの圧縮や保持数による削除はロックされていない (書き込み側が終了した)
+    セグメントのみを対象とするため、他のワーカーが書き込み中のセグメントには触れません。
+    保持数・合計サイズの上限はディレクトリ内の全ワーカーの閉じたセグメントに対して適用されます。
+    """
+
+    thread_name = "file-sink"
+
+    def __init__(self, directory, prefix="traps", max_bytes=256 * 1024 * 1024, rotate_interval=3600,
+                 compression="gzip", retention_files=0, retention_bytes=0, write_buffer_bytes=1024 * 1024,
+                 **kwargs):
+        """
+        Args:
+            directory: セグメントファイルの出力先ディレクトリ
+            prefix: セグメントファイル名の接頭辞
+            max_bytes: セグメントをローテーションするサイズ
+            rotate_interval: セグメントをローテーションする経過時間 (秒, 0で時間によるローテーションなし)
+            compression: 閉じたセグメントの圧縮方式 ("gzip", "zstd", "none")
+            retention_files: 保持する閉じたセグメントの最大数 (0で無制限)
+            retention_bytes: 保持する閉じたセグメントの合計サイズ上限 (0で無制限)
+            write_buffer_bytes: セグメントファイルの書き込みバッファサイズ
+            **kwargs: StdoutSink の引数 (buffer_bytes, flush_interval_ms, max_pending_bytes, encoder)
+        """
+        self.directory = directory
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+        if compression == "zstd" and zstandard is None:
+            logger.warning("zstandard is not installed, compressing segments with gzip")
+            compression = "gzip"
+        self.compression = compression
+        self.retention_files = retention_files
+        self.retention_bytes = retention_bytes
+        self.write_buffer_bytes = write_buffer_bytes
+
+        os.makedirs(directory, exist_ok=True)
+        self._file = None
+        self._path = None
+        self._segment_bytes = 0
+        self._opened_at = 0.0
+
+        self.rotations = 0
+        self.compressed = 0
+        self.compressed_bytes = 0
+        self.deleted = 0
+
+        # 閉じたセグメントの圧縮は書き込みを止めないよう別スレッドで行う
+        self._compress_queue = queue.Queue()
+        self._compressor = threading.Thread(target=self._compress_worker, name="file-sink-compress", daemon=True)
+        self._compressor.start()
+        # 前回の実行で閉じられずに残ったセグメントも圧縮対象にする (書き込み中のものは圧縮時に除外する)
+        for path in self._segments(SEGMENT_SUFFIX):
+            self._compress_queue.put(path)
+
+        # 書き込み先は _write() で切り替えるため、StdoutSink の stream は使用しない
+        super().__init__(**kwargs)
+
+    def _segments(self, suffix):
+        """
+        出力先ディレクトリ内のセグメントファイルを古い順に返します (ファイル名は作成時刻順に並ぶ)。
+        接頭辞が前方一致する他のシンク (例: "traps" に対する "traps-x") のセグメントは含めません。
+        """
+        # {prefix}-{作成時刻}-{pid}-{連番}.ndjson[.gz|.zst] (_open_segment を参照)
+        pattern = re.compile(re.escape(self.prefix) + r"-\d{8}T\d{6}-\d+-\d{6,}" + re.escape(suffix))
+        names = sorted(name for name in os.listdir(self.directory) if pattern.fullmatch(name))
+        return [os.path.join(self.directory, name) for name in names]
+
+    def _open_segment(self):
+        now = datetime.now(timezone.utc)
+        sequence = next(_segment_sequence)
+        name = f"{self.prefix}-{now.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{sequence:06d}{SEGMENT_SUFFIX}"
+        self._path = os.path.join(self.directory, name)
+        self._file = open(self._path, "ab", buffering=self.write_buffer_bytes)
+        # 閉じるまでロックを保持し、他の FileSink から書き込み中であることが分かるようにする
+        _try_lock(self._file)
+        self._segment_bytes = 0
+        self._opened_at = time.monotonic()
+
+    def _close_segment(self):
+        if self._file is None:
+            return
+        # 書き出しに失敗しても、次の書き込みでは新しいセグメントを開く
+        f, self._file = self._file, None
+        f.close()
+        if self._segment_bytes:
+            self._compress_queue.put(self._path)
+        else:
+            os.remove(self._path)
+
+    def _write(self, data):
+        if self._file is not None and (
+            self._segment_bytes >= self.max_bytes or self._expired()
+        ):
+            self._close_segment()
+            self.rotations += 1
+        if self._file is None:
+            self._open_segment()
+        self._file.write(data)
+        self._segment_bytes += len(data)
+
+    def _expired(self):
+        return self.rotate_interval > 0 and time.monotonic() - self._opened_at >= self.rotate_interval
+
+    def _idle_timeout(self):
+        # 受信が途絶えても時間によるローテーションと書き込みバッファのフラッシュを行う
+        return max(self.flush_interval, 0.1)
+
+    def _idle(self):
+        if self._file is None:
+            return
+        if self._expired():
+            self._close_segment()
+            self.rotations += 1
+        else:
+            self._file.flush()
+
+    def _compress_worker(self):
+        while True:
+            path = self._compress_queue.get()
+            if path is None:
+                return
+            try:
+                self._compress(path)
+                self._apply_retention()
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Failed to compress segment {path}: {e}")
+
+    def _compress(self, path):
+        if self.compression == "none":
+            return
+        try:
+            src = open(path, "rb")
+        except FileNotFoundError:
+            # 他のワーカーが圧縮済み
+            return
+        with src:
+            # 書き込み中のセグメントと、ロックを待つ間に他のワーカーが圧縮・削除したセグメントは対象外
+            if not _try_lock(src):
+                logger.debug(f"Segment {path} is being written by another sink, skipping compression")
+                return
+            try:
+                if os.stat(path).st_ino != os.fstat(src.fileno()).st_ino:
+                    return
+            except FileNotFoundError:
+                return
+            dest = path + COMPRESSED_SUFFIXES[self.compression]
+            tmp = dest + ".tmp"
+            if self.compression == "zstd":
+                _compress_zstd(src, tmp)
+            else:
+                _compress_gzip(src, tmp)
+            os.replace(tmp, dest)
+            # ロックを保持したまま削除し、他のワーカーが同じセグメントを圧縮しないようにする
+            os.remove(path)
+        self.compressed += 1
+        self.compressed_bytes += os.path.getsize(dest)
+
+    def _apply_retention(self):
+        """
+        保持数・合計サイズの上限を超えた閉じたセグメントを古いものから削除します。
+        """
+        if not self.retention_files and not self.retention_bytes:
+            return
+        suffix = SEGMENT_SUFFIX + COMPRESSED_SUFFIXES[self.compression]
+        segments = []
+        sizes = []
+        for path in self._segments(suffix):
+            # 圧縮しない場合は書き込み中のセグメントも同じ拡張子のため、ロックで除外する
+            if path == self._path or (suffix == SEGMENT_SUFFIX and _in_use(path)):
+                continue
+            try:
+                sizes.append(os.path.getsize(path))
+            except FileNotFoundError:
+                continue
+            segments.append(path)
+        total = sum(sizes)
+        for i, path in enumerate(segments):
+            over_count = self.retention_files and len(segments) - i > self.retention_files
+            over_bytes = self.retention_bytes and total > self.retention_bytes
+            if not over_count and not over_bytes:
+                break
+            total -= sizes[i]
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # 他のワーカーが削除済み
+                continue
+            self.deleted += 1
+            logger.info(f"Deleted segment {path} (retention)")
+
+    def _finish(self):
+        # セグメントは書き込みスレッドだけが操作する
+        self._close_segment()
+
+    def close(self, timeout=5.0):
+        """
+        バッファを書き出してセグメントを閉じ、圧縮の完了を待ってから停止します。
+        """
+        super().close(timeout)
+        if self._thread.is_alive():
+            # セグメントは書き込みスレッドが書き込みを終えてから閉じる (圧縮は次回の起動時に行う)
+            logger.warning(f"File sink writer did not stop within {timeout}s, segment {self._path} is still open")
+        self._compress_queue.put(None)
+        self._compressor.join(timeout)
+
+    def stats(self):
+        """
+        シンクの統計情報を返します。
+
+        Returns:
+            dict: StdoutSink.stats() に加えて rotations, compressed, compressed_bytes, deleted, segment_bytes
+        """
+        stats = super().stats()
+        stats.update({
+            "rotations": self.rotations,
+            "compressed": self.compressed,
+            "compressed_bytes": self.compressed_bytes,
+            "deleted": self.deleted,
+            "segment_bytes": self._segment_bytes
+        })
+        return stats
@@ -0,0 +1,331 @@
+import ipaddress
+from pyasn1.type import base, univ
+from pysnmp.proto import rfc1902
+from src.fastpath import FastValue, TAG_IPADDRESS
+
+# 書式を持つTEXTUAL-CONVENTION / 型の名前 -> 整形の種類
+# MIBモードでは構文クラスの継承関係 (MRO) をたどり、最初に一致した名前を使用します
+_KINDS = {
+    "DisplayString": "text",
+    "SnmpAdminString": "text",
+    "SnmpTagValue": "text",
+    "Utf8String": "text",
+    "MacAddress": "mac",
+    "PhysAddress": "mac",
+    "DateAndTime": "datetime",
+    "InetAddress": "inet",
+    "InetAddressIPv4": "inet",
+    "InetAddressIPv6": "inet",
+    "IpAddress": "ip",
+    "TimeTicks": "timeticks",
+    "TimeStamp": "timeticks",
+    "TimeInterval": "timeticks",
+}
+
+
+def _fast_native(value):
+    if value.tag == TAG_IPADDRESS:
+        return bytes(value.value)
+    return value.value
+
+
+def _int_or_none(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _asn1_value(value):
+    return value._value
+
+
+def _converter_for(cls):
+    if cls is FastValue:
+        return _fast_native
+    if issubclass(cls, univ.Null):
+        # Null と noSuchObject などの例外値は prettyPrint の表記を使用する
+        return lambda value: None
+    if issubclass(cls, base.SimpleAsn1Type):
+        # asOctets() / int() を経由せず、pyasn1が保持している値 (bytes / int / タプル) を直接参照する
+        return _asn1_value
+    return _int_or_none
+
+
+# 値の型 -> Pythonの値への変換関数
+_converters = {}
+
+
+def native(value):
+    """
+    値オブジェクトをPythonの値 (int / bytes / OIDタプル / None) に変換します。
+    pysnmpの値オブジェクトと高速パスの FastValue のどちらも受け付け、変換方法は型ごとに一度だけ決定します。
+    """
+    cls = type(value)
+    convert = _converters.get(cls)
+    if convert is None:
+        convert = _converters[cls] = _converter_for(cls)
+    return convert(value)
+
+
+# 小さい整数 (インデックス・状態値など) とOID値の表示文字列は共有し、滞留中のTrapごとに同じ文字列を持たない
+_SMALL_INT_TEXTS = tuple(str(i) for i in range(1024))
+_OID_TEXT_CACHE_SIZE = 4096
+_oid_texts = {}
+
+
+def _int_text(v):
+    if 0 <= v < 1024:
+        return _SMALL_INT_TEXTS[v]
+    return str(v)
+
+
+def _oid_text(arcs):
+    text = _oid_texts.get(arcs)
+    if text is None:
+        if len(_oid_texts) >= _OID_TEXT_CACHE_SIZE:
+            _oid_texts.clear()
+        text = _oid_texts[arcs] = ".".join([str(x) for x in arcs])
+    return text
+
+
+def _octets_text(data):
+    """
+    prettyPrint と同じく、印字可能なASCIIのみの場合は文字列、それ以外は "0x..." を返します。
+    """
+    if data.isascii():
+        text = data.decode("ascii")
+        if text.isprintable():
+            return text
+    return "0x" + data.hex()
+
+
+def _format_plain(value):
+    """
+    prettyPrint と同じ表記での整形。
+    """
+    v = native(value)
+    if isinstance(v, int):
+        return _int_text(v), v, v
+    if isinstance(v, bytes):
+        text = _octets_text(v)
+        return text, text, text
+    if isinstance(v, tuple):
+        text = _oid_text(v)
+        return text, text, text
+    text = value.prettyPrint() if hasattr(value, "prettyPrint") else ("" if value is None else str(value))
+    return text, text, text
+
+
+def _enum_formatter(enums):
+    def format_enum(value):
+        v = native(value)
+        if not isinstance(v, int):
+            return _format_plain(value)
+        label = enums.get(v)
+        if label is None:
+            return _int_text(v), v, v
+        return label, v, label
+    return format_enum
+
+
+def _format_text(value):
+    v = native(value)
+    if not isinstance(v, bytes):
+        return _format_plain(value)
+    text = v.decode("utf-8", "replace")
+    return text, _octets_text(v), text
+
+
+def _format_mac(value):
+    v = native(value)
+    if not isinstance(v, bytes):
+        return _format_plain(value)
+    text = v.hex(":")
+    return text, "0x" + v.hex(), text
+
+
+def _format_datetime(value):
+    """
+    DateAndTime (RFC 2579) をISO 8601形式で返します。長さが不正な場合は16進表記にします。
+    """
+    v = native(value)
+    if not isinstance(v, bytes) or len(v) not in (8, 11):
+        return _format_plain(value)
+    text = (
+        f"{int.from_bytes(v[0:2], 'big'):04d}-{v[2]:02d}-{v[3]:02d}"
+        f"T{v[4]:02d}:{v[5]:02d}:{v[6]:02d}.{v[7]}"
+    )
+    if len(v) == 11:
+        text += f"{chr(v[8])}{v[9]:02d}:{v[10]:02d}"
+    return text, "0x" + v.hex(), text
+
+
+def _format_inet(value):
+    v = native(value)
+    if not isinstance(v, bytes) or len(v) not in (4, 16):
+        return _format_plain(value)
+    text = str(ipaddress.ip_address(v))
+    return text, "0x" + v.hex(), text
+
+
+def _format_ip(value):
+    v = native(value)
+    if not isinstance(v, bytes) or len(v) != 4:
+        return _format_plain(value)
+    text = ".".join(map(str, v))
+    return text, text, text
+
+
+def _format_timeticks(value):
+    """
+    TimeTicks (1/100秒) を "N days, H:MM:SS.cc" 形式で返します。typed は秒数です。
+    """
+    v = native(value)
+    if not isinstance(v, int):
+        return _format_plain(value)
+    seconds, centis = divmod(v, 100)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    days, hours = divmod(hours, 24)
+    text = f"{hours}:{minutes:02d}:{seconds:02d}.{centis:02d}"
+    if days:
+        text = f"{days} day{'s' if days != 1 else ''}, {text}"
+    return text, v, v / 100
+
+
+_FORMATTERS = {
+    "text": _format_text,
+    "mac": _format_mac,
+    "datetime": _format_datetime,
+    "inet": _format_inet,
+    "ip": _format_ip,
+    "timeticks": _format_timeticks,
+}
+
+
+def _kind_for_hint(hint):
+    """
+    DISPLAY-HINTから整形の種類を推定します (文字列と区切り付き16進のみ対応)。
+    """
+    if not hint:
+        return None
+    if hint.endswith("a") or hint.endswith("t"):
+        return "text"
+    if hint in ("1x:", "1x-"):
+        return "mac"
+    return None
+
+
+def _format_integer(value):
+    v = value._value
+    return _int_text(v), v, v
+
+
+def _format_octets(value):
+    text = _octets_text(value._value)
+    return text, text, text
+
+
+def _format_oid(value):
+    text = _oid_text(value._value)
+    return text, text, text
+
+
+def _format_fast_generic(value):
+    if value.tag == TAG_IPADDRESS:
+        return _format_ip(value)
+    return _format_plain(value)
+
+
+def _generic_for(cls):
+    """
+    値の型に応じた整形関数を返します。pysnmpの主要な型は型判定を省いた専用の関数を使用します。
+    """
+    if cls is FastValue:
+        return _format_fast_generic
+    if issubclass(cls, univ.Null):
+        return _format_plain
+    if issubclass(cls, rfc1902.IpAddress):
+        return _format_ip
+    if issubclass(cls, univ.Integer):
+        return _format_integer
+    if issubclass(cls, univ.OctetString):
+        return _format_octets
+    if issubclass(cls, univ.ObjectIdentifier):
+        return _format_oid
+    return _format_plain
+
+
+# 値の型 -> 構文情報の無い場合の整形関数
+_generic_formatters = {}
+
+
+def format_generic(value):
+    """
+    構文情報の無い値 (MIBに定義の無いOIDなど) を値の型のみに基づいて整形します。
+    表示文字列は prettyPrint と同じ表記です。
+    """
+    cls = type(value)
+    formatter = _generic_formatters.get(cls)
+    if formatter is None:
+        formatter = _generic_formatters[cls] = _generic_for(cls)
+    return formatter(value)
+
+
+def syntax_kind(syntax_names=(), display_hint=""):
+    """
+    構文クラス名 (派生側から順) とDISPLAY-HINTから整形の種類を返します。
+
+    Returns:
+        str: "text", "mac" など (該当しない場合は "")
+    """
+    for name in syntax_names:
+        kind = _KINDS.get(name)
+        if kind is not None:
+            return kind
+    return _kind_for_hint(display_hint) or ""
+
+
+def build_formatter(syntax_names=(), enums=None, display_hint="", kind=None):
+    """
+    OBJECT-TYPEの構文情報から値の整形関数を生成します。
+    生成した関数は value -> (表示文字列, 生の値, 型に応じたJSON値) を返します。
+
+    Args:
+        syntax_names: 構文クラス名 (TEXTUAL-CONVENTION名を含む、派生側から順)
+        enums: 列挙値 {整数値: ラベル}
+        display_hint: DISPLAY-HINT
+        kind: syntax_kind() で求めた整形の種類 (指定時は syntax_names / display_hint を使用しない)
+    """
+    if enums:
+        return _enum_formatter(dict(enums))
+    if kind is None:
+        kind = syntax_kind(syntax_names, display_hint)
+    return _FORMATTERS.get(kind, format_generic)
+
+
+def _syntax_info(syntax):
+    names = [cls.__name__ for cls in type(syntax).__mro__]
+    named_values = getattr(syntax, "namedValues", None)
+    enums = {int(v): k for k, v in named_values.items()} if named_values else None
+    return names, enums, getattr(syntax, "displayHint", "") or ""
+
+
+def kind_for_syntax(syntax):
+    """
+    pysnmpの構文オブジェクトから整形の種類を返します (OIDインデックスに保存するため)。
+    """
+    if syntax is None:
+        return ""
+    names, _, display_hint = _syntax_info(syntax)
+    return syntax_kind(names, display_hint)
+
+
+def formatter_for_syntax(syntax):
+    """
+    pysnmpの構文オブジェクト (MIBノードの getSyntax()) から整形関数を生成します。
+    """
+    if syntax is None:
+        return format_generic
+    return build_formatter(*_syntax_info(syntax))
@@ -0,0 +1,403 @@
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from src.config import settings
+from src.router import Router, DEFAULT_SINK
+from src import metrics
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ("drop-newest", "drop-oldest", "block")
+SCHEDULERS = ("weighted", "strict")
+
+# INGEST_LANES_FILE を指定しない場合の唯一のレーン名
+DEFAULT_LANE = DEFAULT_SINK
+
+
+class Lane:
+    """
+    受信キューの優先度レーン。レーンごとに容量と満杯時の動作を持ちます。
+    """
+
+    __slots__ = ("name", "capacity", "policy", "weight", "items", "overflow", "current",
+                 "enqueued", "dropped", "dispatched", "failed", "wait_seconds")
+
+    def __init__(self, name, capacity, policy, weight=1):
+        """
+        Args:
+            name: レーン名
+            capacity: レーンの最大長 (0 の場合は無制限)
+            policy: レーンが満杯の場合の動作 (drop-newest / drop-oldest / block)
+            weight: weighted スケジューラで取り出す割合の重み
+        """
+        if not (name.isascii() and name.isidentifier()):
+            # レーン名はメトリクス名の一部になる
+            raise ValueError(f"lane name must consist of letters, digits and underscores: {name!r}")
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"lane '{name}': policy must be one of {', '.join(OVERFLOW_POLICIES)}")
+        if capacity < 0 or weight < 1:
+            raise ValueError(f"lane '{name}': capacity must be >= 0 and weight must be >= 1")
+        self.name = name
+        self.capacity = capacity
+        self.policy = policy
+        self.weight = weight
+        # (受け付けた時刻, Trap) の列
+        self.items = deque()
+        # block ポリシーで読み込み停止が反映されるまでに受信した分を保持する
+        self.overflow = deque()
+        # weighted スケジューラの現在の重み
+        self.current = 0
+
+        self.enqueued = 0
+        self.dropped = 0
+        self.dispatched = 0
+        self.failed = 0
+        self.wait_seconds = metrics.ingest_wait_seconds.child(name)
+
+    @property
+    def depth(self):
+        return len(self.items) + len(self.overflow)
+
+    def stats(self):
+        return {
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "dispatched": self.dispatched,
+            "failed": self.failed,
+            "depth": self.depth,
+            "capacity": self.capacity
+        }
+
+
+class LaneClassifier(Router):
+    """
+    snmpTrapOID・送信元・変数の条件でTrapのレーンを決めるルール。
+    ルーティング (Router) と同じ方法でコンパイルし、最初に一致したルールのレーンを返します。
+    """
+
+    def __init__(self, rules, lanes, default):
+        """
+        Args:
+            rules: ルール定義のリスト {"trap_oid", "source", "varbinds", "lane"}
+            lanes: レーン名のリスト
+            default: どのルールにも一致しないTrapのレーン名
+        """
+        if DEFAULT_SINK in lanes:
+            raise ValueError(f"lane name '{DEFAULT_SINK}' is reserved")
+        if default not in lanes:
+            raise ValueError(f"default: unknown lane '{default}'")
+        converted = []
+        for i, rule in enumerate(rules):
+            if not isinstance(rule, dict) or rule.get("lane") not in lanes:
+                raise ValueError(f"rule #{i}: 'lane' must be one of {', '.join(lanes)}")
+            converted.append({**rule, "sinks": [rule["lane"]], "continue": False})
+        super().__init__(converted, sinks=dict.fromkeys(lanes), default=(default,))
+
+    def _check_sink(self, name, spec):
+        # レーンの定義は Lane で検証する
+        pass
+
+    def __call__(self, trap):
+        try:
+            return self.match(trap.source_ip, trap.trap_oid, trap.variables)[0]
+        except AttributeError:
+            # TrapRecord 以外 (辞書) はルールを評価しない
+            return self.default[0]
+
+
+def load_lanes(path):
+    """
+    優先度レーンの設定ファイル (JSON) を読み込みます。
+
+    {"scheduler": "weighted" / "strict", "lanes": [{"name", "capacity", "policy", "weight"}],
+     "rules": [{"trap_oid", "source", "varbinds", "lane"}], "default": レーン名}
+
+    Returns:
+        tuple: (Lane のリスト, スケジューラ, LaneClassifier)
+
+    Raises:
+        ValueError: ファイルの内容が不正な場合
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        raise ValueError(f"Invalid lanes file {path}: {e}") from e
+    if not isinstance(config, dict):
+        raise ValueError(f"Invalid lanes file {path}: top level must be an object")
+    try:
+        scheduler = config.get("scheduler", "weighted")
+        if scheduler not in SCHEDULERS:
+            raise ValueError(f"scheduler must be one of {', '.join(SCHEDULERS)}")
+        specs = config.get("lanes")
+        if not isinstance(specs, list) or not specs:
+            raise ValueError("'lanes' must be a non-empty list")
+        lanes = []
+        for i, spec in enumerate(specs):
+            if not isinstance(spec, dict) or not spec.get("name"):
+                raise ValueError(f"lane #{i}: 'name' is required")
+            lanes.append(Lane(
+                spec["name"],
+                int(spec.get("capacity", settings.ingest_queue_size)),
+                spec.get("policy", settings.overflow_policy),
+                int(spec.get("weight", 1))
+            ))
+        names = [lane.name for lane in lanes]
+        if len(set(names)) != len(names):
+            raise ValueError("lane names must be unique")
+        classifier = LaneClassifier(config.get("rules", []), names, config.get("default", names[-1]))
+    except (ValueError, TypeError, AttributeError) as e:
+        raise ValueError(f"Invalid lanes file {path}: {e}") from e
+    logger.info(f"Loaded {len(lanes)} ingest lanes and {len(classifier)} lane rules from {path}")
+    return lanes, scheduler, classifier
+
+
+class IngestQueue:
+    """
+    TrapListenerとDispatcherの間に置く有界キュー。
+    固定数のワーカーがキューからTrapを取り出してDispatcherへ渡します。
+
+    キューは1つ以上の優先度レーンからなります (INGEST_LANES_FILE を指定しない場合は1レーン)。
+    受信したTrapは snmpTrapOID・送信元のルールでレーンに振り分け、ワーカーはスケジューラに従ってレーンを選びます。
+        weighted: 空でないレーンから重みに比例した割合で取り出す (平滑化した重み付きラウンドロビン)
+        strict: 定義順で先頭の空でないレーンから取り出す (後続のレーンは先頭のレーンが空の間のみ)
+
+    キューが満杯の場合の動作 (overflow_policy / レーンの policy):
+        drop-newest: 新しく受信したTrapを破棄する
+        drop-oldest: キュー先頭の最も古いTrapを破棄して新しいTrapを追加する
+        block: UDPソケットからの読み込みを一時停止し、カーネルバッファに滞留させる (全レーンの受信が止まる)
+    """
+
+    def __init__(self, dispatcher, maxsize=None, workers=None, overflow_policy=None,
+                 lanes=None, scheduler=None, classifier=None):
+        """
+        Args:
+            lanes: Lane のリスト (定義順が優先度順)。None の場合は settings.ingest_lanes_file から読み込み、
+                   未指定なら maxsize・overflow_policy の1レーン
+            scheduler: レーンのスケジューラ (weighted / strict)
+            classifier: Trapを受け取りレーン名を返す関数 (None の場合は最後のレーン)
+        """
+        self.dispatcher = dispatcher
+        self.worker_count = workers if workers is not None else settings.dispatch_workers
+        self.overflow_policy = overflow_policy or settings.overflow_policy
+
+        if lanes is None and settings.ingest_lanes_file:
+            lanes, scheduler, classifier = load_lanes(settings.ingest_lanes_file)
+        if lanes is None:
+            maxsize = maxsize if maxsize is not None else settings.ingest_queue_size
+            lanes = [Lane(DEFAULT_LANE, maxsize, self.overflow_policy)]
+        self.lanes = list(lanes)
+        self._lanes = {lane.name: lane for lane in self.lanes}
+        if len(self._lanes) != len(self.lanes):
+            raise ValueError("lane names must be unique")
+        self.scheduler = scheduler or "weighted"
+        if self.scheduler not in SCHEDULERS:
+            raise ValueError(f"scheduler must be one of {', '.join(SCHEDULERS)}")
+        self.classifier = classifier
+        self.maxsize = sum(lane.capacity for lane in self.lanes)
+
+        self._ready = None
+        self._idle = None
+        self._unfinished = 0
+        self._workers = []
+        self._pause_reading = None
+        self._resume_reading = None
+        self._paused = False
+        self._closed = False
+
+        self.enqueued = 0
+        self.dropped = 0
+        self.dispatched = 0
+        self.failed = 0
+
+    def set_flow_control(self, pause_reading, resume_reading):
+        """
+        block ポリシーで使用する読み込み停止・再開用のコールバックを設定します。
+        """
+        self._pause_reading = pause_reading
+        self._resume_reading = resume_reading
+
+    async def start(self):
+        """
+        キューとワーカーを起動します。
+        """
+        if self._ready is not None:
+            return
+        # レーンに入っているTrapの数を数えるセマフォ
+        self._ready = asyncio.Semaphore(0)
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._workers = [
+            asyncio.create_task(self._worker(i)) for i in range(self.worker_count)
+        ]
+        lanes = ", ".join(f"{lane.name}={lane.capacity}/{lane.policy}/{lane.weight}" for lane in self.lanes)
+        logger.info(
+            f"Ingest queue started (lanes={lanes}, scheduler={self.scheduler}, workers={self.worker_count})"
+        )
+
+    def put(self, trap_data) -> bool:
+        """
+        Trapデータをレーンに追加します。イベントループ上の同期コールバックから呼び出します。
+
+        Returns:
+            bool: キューに追加された場合は True、破棄された場合は False
+        """
+        if self._closed or self._ready is None:
+            self.dropped += 1
+            return False
+
+        lane = self._lanes[self.classifier(trap_data)] if self.classifier is not None else self.lanes[-1]
+        items = lane.items
+        capacity = lane.capacity
+        if not lane.overflow and (not capacity or len(items) < capacity):
+            items.append((time.monotonic(), trap_data))
+            self._unfinished += 1
+            self._idle.clear()
+            self._ready.release()
+            lane.enqueued += 1
+            self.enqueued += 1
+            return True
+
+        if lane.policy == "drop-oldest":
+            items.popleft()
+            items.append((time.monotonic(), trap_data))
+            lane.enqueued += 1
+            lane.dropped += 1
+            self.enqueued += 1
+            self.dropped += 1
+            return True
+
+        if lane.policy == "block" and self._pause_reading is not None:
+            lane.overflow.append((time.monotonic(), trap_data))
+            lane.enqueued += 1
+            self.enqueued += 1
+            if not self._paused:
+                self._paused = True
+                self._pause_reading()
+                logger.warning(f"Ingest lane '{lane.name}' is full, pausing UDP reception")
+            return True
+
+        lane.dropped += 1
+        self.dropped += 1
+        return False
+
+    def _next_lane(self):
+        """
+        次にTrapを取り出すレーンを選びます (呼び出し時点でいずれかのレーンは空でない)。
+        """
+        lanes = self.lanes
+        if len(lanes) == 1:
+            return lanes[0]
+        if self.scheduler == "strict":
+            for lane in lanes:
+                if lane.items:
+                    return lane
+        best = None
+        total = 0
+        for lane in lanes:
+            if lane.items:
+                lane.current += lane.weight
+                total += lane.weight
+                if best is None or lane.current > best.current:
+                    best = lane
+        best.current -= total
+        return best
+
+    def _refill(self, lane):
+        """
+        block ポリシーで保留していたTrapをレーンへ移し、全レーンの保留が無くなったら読み込みを再開します。
+        """
+        overflow = lane.overflow
+        while overflow and (not lane.capacity or len(lane.items) < lane.capacity):
+            lane.items.append(overflow.popleft())
+            self._unfinished += 1
+            self._ready.release()
+
+        if self._paused and not any(lane.overflow for lane in self.lanes):
+            self._paused = False
+            if self._resume_reading is not None:
+                self._resume_reading()
+            logger.info("Ingest queue has room again, resuming UDP reception")
+
+    def _task_done(self):
+        self._unfinished -= 1
+        if not self._unfinished:
+            self._idle.set()
+
+    async def _worker(self, worker_id):
+        """
+        レーンからTrapを取り出してDispatcherへ渡すワーカー。
+        """
+        ready = self._ready
+        while True:
+            await ready.acquire()
+            lane = self._next_lane()
+            enqueued_at, trap_data = lane.items.popleft()
+            if not lane.items:
+                lane.current = 0
+            try:
+                lane.wait_seconds.observe(time.monotonic() - enqueued_at)
+                self._refill(lane)
+                await self.dispatcher.dispatch(trap_data)
+                lane.dispatched += 1
+                self.dispatched += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                lane.failed += 1
+                self.failed += 1
+                logger.error(f"Dispatch worker {worker_id} failed to dispatch trap: {e}")
+            finally:
+                self._task_done()
+
+    async def drain(self, timeout=None):
+        """
+        新規の受け付けを停止し、キューに残っているTrapの送信完了を待ってからワーカーを停止します。
+
+        Args:
+            timeout: 待機する最大秒数 (None の場合は settings.shutdown_drain_timeout)
+        """
+        if self._ready is None:
+            return
+
+        self._closed = True
+        timeout = timeout if timeout is not None else settings.shutdown_drain_timeout
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            logger.info("Ingest queue drained")
+        except asyncio.TimeoutError:
+            logger.warning(f"Ingest queue drain timed out, {self.depth} traps discarded")
+
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    @property
+    def depth(self):
+        """
+        現在キューに滞留しているTrap数。
+        """
+        return sum(lane.depth for lane in self.lanes)
+
+    def stats(self):
+        """
+        キューの統計情報を返します。
+
+        Returns:
+            dict: enqueued, dropped, dispatched, failed, depth, maxsize
+                  (複数レーンの場合は lanes にレーンごとの統計情報)
+        """
+        stats = {
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "dispatched": self.dispatched,
+            "failed": self.failed,
+            "depth": self.depth,
+            "maxsize": self.maxsize
+        }
+        if len(self.lanes) > 1:
+            stats["lanes"] = {lane.name: lane.stats() for lane in self.lanes}
+        return stats
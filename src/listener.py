@@ -1,13 +1,23 @@
 from pysnmp.entity import engine, config
-from pysnmp.carrier.asyncio.dgram import udp
+from pysnmp.carrier.asyncio.dgram import udp, udp6
 from pysnmp.entity.rfc3413 import ntfrcv
 from pysnmp.proto.api import v2c
 from src.config import settings
 from src.resolver import MibResolver
 from src.dispatcher import Dispatcher
+from src.ingest import IngestQueue
+from src.dedup import Deduplicator
+from src.ratelimit import RateLimiter
+from src.fastpath import FastPathHandler, FastPathUdpTransport, FastPathUdp6Transport
+from src.udp_socket import UdpDropMonitor, create_udp_socket, format_address, parse_listen_addresses
+from src.usm import UsmUser, UsmCredentials, load_users, parse_engine_ids
+from src.trap_record import TrapRecord
+from src import metrics
 import logging
 import asyncio
-from datetime import datetime, timezone
+import socket
+import sys
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -16,9 +26,23 @@ class TrapListener:
     SNMP Trapを受信し、ResolverとDispatcherへ処理を委譲するクラス。
     """
 
-    def __init__(self, resolver: MibResolver, dispatcher: Dispatcher):
+    def __init__(self, resolver: MibResolver, dispatcher: Dispatcher, ingest_queue: IngestQueue = None,
+                 reuse_port: bool = False, deduplicator: Deduplicator = None, rate_limiter: RateLimiter = None):
         self.resolver = resolver
         self.dispatcher = dispatcher
+        self.ingest_queue = ingest_queue
+        # 重複Trapを抑止するステージ (None の場合は無効)
+        self.deduplicator = deduplicator
+        # 送信元ごとの受信レート制限 (None の場合は無効)
+        self.rate_limiter = rate_limiter
+        # マルチプロセス構成では各ワーカーが SO_REUSEPORT で同じポートをバインドする
+        self.reuse_port = reuse_port
+        # 受信アドレスごとのソケットとトランスポート
+        self.sockets = []
+        self.transports = []
+        self.udp_monitor = None
+        self.fast_path = None
+        self.usm_credentials = None
         
         # SnmpEngineの初期化
         # EngineIDが指定されている場合は設定
@@ -38,34 +62,94 @@ class TrapListener:
         Trap受信時のコールバック関数。
         """
         transportDomain, transportAddress = snmpEngine.msgAndPduDsp.get_transport_info(stateReference)
+        self._process_trap(transportAddress, "v3" if contextEngineId else "v2c", varBinds) # 簡易判定
+
+    def _process_trap(self, transportAddress, snmp_version, varBinds):
+        """
+        受信したTrapの変数を解決し、Dispatcherへ渡します。
+        SnmpEngine経由のコールバックと高速パスの両方から呼び出されます。
+        """
+        # レート超過の送信元はログ出力やMIB解決の前に破棄する
+        if self.rate_limiter is not None and not self.rate_limiter.allow(transportAddress[0]):
+            return
+
+        started = time.perf_counter()
         logger.info(f"Received Trap from {transportAddress}")
+        metrics.traps_received.inc(transportAddress[0], snmp_version)
 
-        resolved_vars = []
-        for name, val in varBinds:
-            resolved = self.resolver.resolve(name, val)
-            resolved_vars.append(resolved)
+        # 受信キューに滞留している間のメモリを抑えるため、辞書への変換はシンクの直前で行う
+        variables, trap_info = self.resolver.resolve_trap(varBinds)
+        trap_data = TrapRecord(
+            sys.intern(transportAddress[0]),
+            transportAddress[1],
+            snmp_version,
+            variables,
+            time.time(),
+            trap_info=trap_info
+        )
 
-        trap_data = {
-            "source_ip": transportAddress[0],
-            "source_port": transportAddress[1],
-            "snmp_version": "v3" if contextEngineId else "v2c", # 簡易判定
-            "variables": resolved_vars,
-            "timestamp": datetime.now(timezone.utc).isoformat()
-        }
+        if self.deduplicator is None or self.deduplicator.accept(trap_data):
+            self._enqueue(trap_data)
+        metrics.receive_seconds.observe(time.perf_counter() - started)
 
-        # 非同期処理としてDispatcherへ渡す
-        asyncio.create_task(self.dispatcher.dispatch(trap_data))
+    def _enqueue(self, trap_data):
+        """
+        受信キュー経由でDispatcherへ渡します (キューが無い場合は直接タスクとして実行)。
+        """
+        if self.ingest_queue is not None:
+            self.ingest_queue.put(trap_data)
+        else:
+            asyncio.create_task(self.dispatcher.dispatch(trap_data))
+
+    def _pause_reading(self):
+        """
+        UDPソケットからの読み込みを一時停止します。
+        """
+        for transport in self.transports:
+            if transport.transport is not None:
+                transport.transport.pause_reading()
+
+    def _resume_reading(self):
+        """
+        UDPソケットからの読み込みを再開します。
+        """
+        for transport in self.transports:
+            if transport.transport is not None:
+                transport.transport.resume_reading()
 
     def setup(self):
         """
         SNMPエンジンの設定（ユーザー、トランスポートなど）を行います。
         """
-        # トランスポート設定 (UDP/162)
-        config.addTransport(
-            self.snmpEngine,
-            udp.domainName,
-            udp.UdpTransport().openServerMode(('0.0.0.0', 162))
-        )
+        # トランスポート設定 (受信アドレスごとに UDP/IPv4 または UDP/IPv6)
+        # 高速パス有効時は v1/v2c の Trap/Inform をトランスポートで直接処理し、それ以外を SnmpEngine に渡す
+        if settings.fast_path and settings.snmp_version in ["v2c", "both"]:
+            self.fast_path = FastPathHandler(self._process_trap, settings.community_string)
+            logger.info("SNMP v1/v2c fast path enabled")
+
+        for i, address in enumerate(parse_listen_addresses(settings.listen_addresses, settings.listen_port)):
+            ipv6 = ":" in address[0]
+            if self.fast_path is not None:
+                transport = (FastPathUdp6Transport if ipv6 else FastPathUdpTransport)(self.fast_path)
+            else:
+                transport = udp6.Udp6Transport() if ipv6 else udp.UdpTransport()
+            sock = create_udp_socket(address, reuse_port=self.reuse_port, rcvbuf_bytes=settings.udp_rcvbuf_bytes)
+            transport = transport.openServerMode(sock=sock)
+            # 2つ目以降のトランスポートはドメインを分けて登録する
+            domain = udp6.domainName if ipv6 else udp.domainName
+            config.addTransport(self.snmpEngine, domain + (i,) if i else domain, transport)
+            self.sockets.append(sock)
+            self.transports.append(transport)
+            logger.info(
+                f"Listening on UDP {format_address(sock.getsockname())} "
+                f"(receive buffer {sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)} bytes)"
+            )
+
+        if settings.udp_drop_monitor_interval > 0:
+            self.udp_monitor = UdpDropMonitor(self.sockets, settings.udp_drop_monitor_interval)
+
+        if self.ingest_queue is not None:
+            self.ingest_queue.set_flow_control(self._pause_reading, self._resume_reading)
 
         # v2c設定
         if settings.snmp_version in ["v2c", "both"]:
@@ -74,35 +158,71 @@ class TrapListener:
 
         # v3設定
         if settings.snmp_version in ["v3", "both"]:
-            if settings.usm_user:
-                auth_proto = config.usmHMACMD5AuthProtocol # Default to MD5
-                priv_proto = config.usmDESPrivProtocol     # Default to DES
-                
-                # TODO: 認証・暗号化プロトコルの選択を詳細化する場合はここで分岐処理が必要
-                # 現状は簡易実装としてデフォルトを使用するが、必要に応じて設定値からパースする
-
-                config.addV3User(
-                    self.snmpEngine,
-                    settings.usm_user,
-                    auth_proto, settings.usm_auth_key,
-                    priv_proto, settings.usm_priv_key
-                )
-                logger.info(f"SNMP v3 enabled for user: {settings.usm_user}")
-            else:
-                logger.warning("SNMP v3 is enabled but USM user is not configured.")
+            self._setup_v3_users()
 
         # NotificationReceiverの登録
         ntfrcv.NotificationReceiver(self.snmpEngine, self._cbFun)
 
+    def _setup_v3_users(self):
+        """
+        usm_user と認証情報ファイルのSNMPv3ユーザーを登録します。
+        """
+        users = []
+        if settings.usm_user:
+            users.append(UsmUser(
+                settings.usm_user,
+                settings.usm_auth_protocol if settings.usm_auth_key else "none", settings.usm_auth_key,
+                settings.usm_priv_protocol if settings.usm_priv_key else "none", settings.usm_priv_key
+            ))
+        if settings.usm_credentials_file:
+            users.extend(load_users(settings.usm_credentials_file))
+        if not users:
+            logger.warning("SNMP v3 is enabled but USM user is not configured.")
+            return
+
+        self.usm_credentials = UsmCredentials(
+            users,
+            default_engine_ids=parse_engine_ids(settings.usm_engine_ids),
+            key_cache_path=settings.usm_key_cache_path
+        )
+        count = self.usm_credentials.register(self.snmpEngine)
+        stats = self.usm_credentials.stats()
+        logger.info(
+            f"SNMP v3 enabled for {len(users)} users ({count} user/engine ID entries, "
+            f"{stats['keys_derived']} keys derived, {stats['key_cache_hits']} from cache, "
+            f"{stats['derive_seconds'] + stats['register_seconds']:.2f}s)"
+        )
+
     async def run(self):
         """
         リスナーを開始します。
         """
         self.setup()
-        logger.info("SNMP Trap Listener started on UDP/162")
+        if self.deduplicator is not None:
+            self.deduplicator.start(self._enqueue)
+        if self.udp_monitor is not None:
+            self.udp_monitor.start()
+        logger.info(
+            f"SNMP Trap Listener started on UDP {', '.join(format_address(sock.getsockname()) for sock in self.sockets)}"
+        )
         
         # pysnmpの非同期ループへの統合はSnmpEngineが自動で行うため、
         # ここではループを維持するだけでよいが、
         # 実際にはメインループが動いていればよい。
         # SnmpEngineが内部でasyncioのトランスポートを使用しているため。
         pass
+
+    def close(self):
+        """
+        UDPトランスポートをクローズし、新たなTrapの受信を停止します。
+        重複抑止が有効な場合は、保持中の集約イベントを送信します。
+        """
+        for transport in self.transports:
+            transport.closeTransport()
+        self.transports = []
+        self.sockets = []
+        if self.udp_monitor is not None:
+            self.udp_monitor.close()
+        # 保持中の重複は集約イベントとして受信キューへ渡してから終了する
+        if self.deduplicator is not None:
+            self.deduplicator.close()
@@ -1,11 +1,18 @@
 import asyncio
 import logging
+import os
 import signal
 import sys
 from src.config import settings
 from src.resolver import MibResolver
 from src.listener import TrapListener
 from src.dispatcher import Dispatcher
+from src.ingest import IngestQueue
+from src.dedup import Deduplicator
+from src.ratelimit import RateLimiter
+from src.mib_watcher import MibWatcher
+from src.supervisor import Supervisor
+from src import metrics
 
 # ログ設定
 logging.basicConfig(
@@ -14,19 +21,75 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-async def main():
+def collect_stats(resolver, dispatcher, ingest_queue, listener):
+    """
+    各コンポーネントの統計情報をまとめて返します。
+    """
+    stats = {
+        "ingest": ingest_queue.stats(),
+        "resolver_cache": resolver.cache_info(),
+        "dispatcher": dispatcher.stats()
+    }
+    if listener.udp_monitor is not None:
+        stats["udp"] = listener.udp_monitor.stats()
+    return stats
+
+async def report_stats(worker_id, stats_queue, resolver, dispatcher, ingest_queue, listener):
+    """
+    ワーカーの統計情報を定期的にスーパーバイザーへ送信します。
+    """
+    while True:
+        await asyncio.sleep(settings.worker_stats_interval)
+        stats_queue.put((worker_id, collect_stats(resolver, dispatcher, ingest_queue, listener)))
+
+async def main(worker_id=None, stats_queue=None):
     """
     アプリケーションのメインエントリポイント。
+    マルチプロセス構成では各ワーカープロセスから worker_id を指定して呼び出されます。
     """
-    logger.info("Starting SNMP Trap Receiver...")
+    if worker_id is None:
+        logger.info("Starting SNMP Trap Receiver...")
+    else:
+        logger.info(f"Starting SNMP Trap Receiver worker {worker_id} (pid {os.getpid()})...")
+        # スプールはワーカーごとに分離する (ワーカーIDは再起動後も同じため再送を引き継げる)
+        if settings.spool_dir:
+            settings.spool_dir = os.path.join(settings.spool_dir, f"worker-{worker_id}")
     
     # コンポーネントの初期化
     resolver = MibResolver()
     dispatcher = Dispatcher()
-    listener = TrapListener(resolver, dispatcher)
+    ingest_queue = IngestQueue(dispatcher)
+    deduplicator = Deduplicator() if settings.dedup_enabled else None
+    rate_limiter = RateLimiter() if settings.rate_limit_enabled else None
+    listener = TrapListener(resolver, dispatcher, ingest_queue, reuse_port=worker_id is not None,
+                            deduplicator=deduplicator, rate_limiter=rate_limiter)
 
     # Dispatcherの初期化（Webhook用セッションなど）
     await dispatcher.initialize()
+    await ingest_queue.start()
+
+    # メトリクスエンドポイントの起動 (マルチプロセス構成ではワーカーごとに別ポート)
+    metrics_server = None
+    if settings.metrics_enabled:
+        metrics.registry.add_collector("snmp_ingest", ingest_queue.stats)
+        metrics.registry.add_collector("snmp_resolver_cache", resolver.cache_info)
+        metrics.registry.add_collector("snmp_mib_reload", resolver.reload_info)
+        metrics.registry.add_collector("snmp_mib_lazy", resolver.lazy_info)
+        metrics.registry.add_collector("snmp_dispatcher", dispatcher.stats)
+        if deduplicator is not None:
+            metrics.registry.add_collector("snmp_dedup", deduplicator.stats)
+        if rate_limiter is not None:
+            metrics.registry.add_collector("snmp_rate_limit", rate_limiter.stats)
+        metrics.registry.add_collector(
+            "snmp_fast_path", lambda: listener.fast_path.stats() if listener.fast_path else {}
+        )
+        metrics.registry.add_collector(
+            "snmp_udp", lambda: listener.udp_monitor.stats() if listener.udp_monitor else {}
+        )
+        metrics_server = metrics.MetricsServer(
+            settings.metrics_host, settings.metrics_port + (worker_id or 0)
+        )
+        await metrics_server.start()
 
     # Listenerのセットアップと起動
     try:
@@ -42,26 +105,75 @@ async def main():
         logger.info("Received stop signal")
         stop_event.set()
 
+    def handle_reload():
+        logger.info("Received SIGHUP, reloading MIBs")
+        resolver.request_reload("SIGHUP")
+
     loop = asyncio.get_running_loop()
     try:
         for sig in (signal.SIGINT, signal.SIGTERM):
             loop.add_signal_handler(sig, handle_signal)
+        loop.add_signal_handler(signal.SIGHUP, handle_reload)
     except NotImplementedError:
         # Windowsなど一部環境での対応
         logger.warning("Signal handling is not supported on this platform")
 
+    # MIBディレクトリの監視 (変更を検知したら再起動せずにリロードする)
+    mib_watcher = None
+    if settings.mib_reload_enabled:
+        mib_watcher = MibWatcher(resolver)
+        mib_watcher.start()
+
+    stats_task = None
+    if stats_queue is not None:
+        stats_task = asyncio.create_task(
+            report_stats(worker_id, stats_queue, resolver, dispatcher, ingest_queue, listener)
+        )
+
     # 実行ループ
     logger.info("Application is running. Press Ctrl+C to exit.")
     await stop_event.wait()
 
     # クリーンアップ
     logger.info("Shutting down...")
+    if mib_watcher is not None:
+        mib_watcher.close()
+    # 受信を停止し、受信キューに残っているTrapを送信し終えてからセッションを閉じる
+    listener.close()
+    await ingest_queue.drain()
+    logger.info(f"Ingest queue stats: {ingest_queue.stats()}")
+    if rate_limiter is not None and rate_limiter.dropped:
+        logger.info(f"Rate limited sources: {rate_limiter.top_sources()}")
     await dispatcher.close()
+    if metrics_server is not None:
+        await metrics_server.stop()
+
+    if stats_task is not None:
+        stats_task.cancel()
+        # 最終的な統計情報をスーパーバイザーへ送信
+        stats_queue.put((worker_id, collect_stats(resolver, dispatcher, ingest_queue, listener)))
     logger.info("Shutdown complete.")
 
-if __name__ == "__main__":
+def run_worker(worker_id, stats_queue):
+    """
+    ワーカープロセスのエントリポイント。
+    """
+    # スーパーバイザーから継承したシグナルハンドラを解除し、イベントループ側で処理する
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    # イベントループ側のハンドラを登録するまでにSIGHUPを受けても終了しないようにする
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
     try:
-        asyncio.run(main())
+        asyncio.run(main(worker_id, stats_queue))
     except KeyboardInterrupt:
-        # 既にシグナルハンドラで処理されているはずだが、念のため
         pass
+
+if __name__ == "__main__":
+    if settings.worker_processes > 1:
+        Supervisor(run_worker).run()
+    else:
+        try:
+            asyncio.run(main())
+        except KeyboardInterrupt:
+            # 既にシグナルハンドラで処理されているはずだが、念のため
+            pass
@@ -0,0 +1,263 @@
+import bisect
+import logging
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+# 処理時間ヒストグラムのデフォルトバケット (秒)
+DEFAULT_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0
+)
+
+# ラベルの種類数が上限を超えた場合に使用するラベル値
+OVERFLOW_LABEL = "other"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+class Counter:
+    """
+    ラベル付きのカウンター。
+    ラベルの組み合わせが max_series を超えた場合、以降の新しい組み合わせは "other" に集約します。
+    """
+
+    def __init__(self, name, help_text, labels=(), max_series=None):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.max_series = max_series
+        self._values = {}
+
+    def inc(self, *label_values, amount=1):
+        """
+        カウンターを加算します。ラベル値は labels と同じ順序で指定します。
+        """
+        values = self._values
+        if label_values not in values:
+            if self.max_series is not None and len(values) >= self.max_series:
+                label_values = (OVERFLOW_LABEL,) * len(self.labels)
+            values.setdefault(label_values, 0)
+        values[label_values] += amount
+
+    def value(self, *label_values):
+        return self._values.get(label_values, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for label_values, value in self._values.items():
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """
+    ヒストグラム。
+    observe() はバケット位置の二分探索と加算のみで、累積値は出力時に計算します。
+    labels を指定した場合は child() で取得したラベル値ごとの系列に記録します。
+    """
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS, labels=()):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self.labels = tuple(labels)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._children = {}
+        self.sum = 0.0
+        self.count = 0
+
+    def child(self, *label_values):
+        """
+        ラベル値に対応する系列を返します。ラベル値は labels と同じ順序で指定します。
+        """
+        child = self._children.get(label_values)
+        if child is None:
+            child = self._children[label_values] = Histogram(self.name, self.help, self.buckets, self.labels)
+        return child
+
+    def observe(self, value):
+        """
+        観測値 (秒) を記録します。
+        """
+        self._counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def _render_series(self, label_values, lines):
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self._counts):
+            cumulative += count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labels, label_values, le)} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(self.labels, label_values)} {self.sum}")
+        lines.append(f"{self.name}_count{_format_labels(self.labels, label_values)} {self.count}")
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        if not self.labels:
+            self._render_series((), lines)
+        for label_values, child in self._children.items():
+            child._render_series(label_values, lines)
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Prometheusテキスト形式で出力するメトリクスのレジストリ。
+    計測値は各コンポーネントから直接更新し、各コンポーネントの stats() はスクレイプ時にゲージとして出力します。
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help_text, labels=(), max_series=None):
+        metric = Counter(name, help_text, labels, max_series)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS, labels=()):
+        metric = Histogram(name, help_text, buckets, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, prefix, stats_fn):
+        """
+        スクレイプ時に呼び出す統計関数を登録します。
+        stats_fn が返す辞書の数値は <prefix>_<key> のゲージとして出力されます (ネストした辞書はキーを連結)。
+        """
+        self._collectors.append((prefix, stats_fn))
+
+    def clear_collectors(self):
+        self._collectors = []
+
+    def _flatten(self, prefix, stats, lines):
+        for key, value in stats.items():
+            name = f"{prefix}_{key}"
+            if isinstance(value, dict):
+                self._flatten(name, value, lines)
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {_format_value(value)}")
+
+    def render(self):
+        """
+        全メトリクスをPrometheusテキスト形式 (version 0.0.4) で返します。
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for prefix, stats_fn in self._collectors:
+            try:
+                self._flatten(prefix, stats_fn(), lines)
+            except Exception as e:
+                logger.warning(f"Failed to collect {prefix} stats: {e}")
+        return "\n".join(lines) + "\n"
+
+
+# アプリケーション全体で共有するレジストリと計測値
+registry = MetricsRegistry()
+
+traps_received = registry.counter(
+    "snmp_traps_received_total", "Number of traps received", ("source", "version"), max_series=1000
+)
+udp_kernel_drops = registry.counter(
+    "snmp_udp_kernel_drops_total", "Number of datagrams dropped by the kernel because the socket receive buffer was full",
+    ("address",)
+)
+rate_limited = registry.counter(
+    "snmp_traps_rate_limited_total", "Number of traps dropped by per-source rate limiting", ("source",), max_series=1000
+)
+resolve_failures = registry.counter(
+    "snmp_resolve_failures_total", "Number of variables that could not be resolved", ("result",)
+)
+dispatch_results = registry.counter(
+    "snmp_dispatch_total", "Number of dispatched traps", ("output", "result")
+)
+webhook_requests = registry.counter(
+    "snmp_webhook_requests_total", "Number of webhook requests per endpoint", ("endpoint", "result"), max_series=1000
+)
+webhook_lost = registry.counter(
+    "snmp_webhook_lost_traps_total",
+    "Number of traps never delivered to an endpoint in fanout mode because another endpoint accepted them",
+    ("endpoint",), max_series=1000
+)
+mib_lazy_loads = registry.counter(
+    "snmp_mib_lazy_loads_total", "Number of MIB modules loaded on first use in lazy mode", ("module", "result"),
+    max_series=1000
+)
+dispatch_retries = registry.counter(
+    "snmp_dispatch_retries_total", "Number of webhook delivery retries"
+)
+receive_seconds = registry.histogram(
+    "snmp_trap_receive_seconds", "Time spent processing a received trap in the listener callback"
+)
+resolve_seconds = registry.histogram(
+    "snmp_resolve_seconds", "Time spent resolving a single variable binding"
+)
+dispatch_seconds = registry.histogram(
+    "snmp_dispatch_seconds", "Time spent dispatching a trap to the output"
+)
+ingest_wait_seconds = registry.histogram(
+    "snmp_ingest_wait_seconds", "Time a trap waited in an ingest queue lane before dispatch", labels=("lane",)
+)
+
+
+class MetricsServer:
+    """
+    /metrics を提供する小さなHTTPサーバー。
+    """
+
+    def __init__(self, host, port, metrics_registry=None):
+        self.host = host
+        self.port = port
+        self.registry = metrics_registry or registry
+        self._runner = None
+
+    async def _handle_metrics(self, request):
+        return web.Response(
+            text=self.registry.render(),
+            content_type="text/plain",
+            headers={"X-Content-Type-Options": "nosniff"},
+            charset="utf-8"
+        )
+
+    async def start(self):
+        """
+        HTTPサーバーを起動します。
+        """
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle_metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        # ポート0を指定した場合に実際のポートを参照できるようにする
+        self.port = site._server.sockets[0].getsockname()[1]
+        logger.info(f"Metrics endpoint listening on http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        """
+        HTTPサーバーを停止します。
+        """
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,149 @@
+import json
+import os
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+# OIDプレフィックス -> MIBモジュール のレジストリ
+#
+# 遅延ロードモードで、どのモジュールをロードすればOIDを解決できるかを判定するために使用する。
+# ビルド時に compile_mibs.py が生成する mib_registry.json を優先し、
+# 存在しない場合はコンパイル済み .py ファイルを正規表現で高速スキャンして構築する。
+
+REGISTRY_FILENAME = "mib_registry.json"
+REGISTRY_VERSION = 1
+
+# pysmiが生成するオブジェクト定義 (例: "sysDescr = _SysDescr_Object(\n    (1, 3, 6, 1, 2, 1, 1, 1),")
+_OBJECT_DEF = re.compile(r"^[A-Za-z]\w* = \w+\(\s*\(\s*(\d+(?:\s*,\s*\d+)*)\s*,?\s*\)", re.M)
+
+
+def minimal_prefixes(oids):
+    """
+    OIDの集合から、他のOIDのプレフィックスとなっていない最小の被覆集合を返します。
+    """
+    result = []
+    for oid in sorted(set(oids)):
+        if result and oid[:len(result[-1])] == result[-1]:
+            continue
+        result.append(oid)
+    return result
+
+
+def scan_module_prefixes(mib_path):
+    """
+    コンパイル済みMIBディレクトリを高速スキャンし、モジュールごとのOIDプレフィックスを求めます。
+    モジュールのロード (Pythonコードの実行) は行いません。
+
+    Returns:
+        dict: {module_name: [oid_tuple, ...]}
+    """
+    modules = {}
+    for filename in os.listdir(mib_path):
+        if not filename.endswith('.py') or filename.startswith('__init__'):
+            continue
+        module_name = filename[:-3]
+        try:
+            with open(os.path.join(mib_path, filename), encoding='utf-8') as f:
+                source = f.read()
+        except OSError as e:
+            logger.warning(f"Failed to scan MIB module {module_name}: {e}")
+            continue
+
+        oids = [tuple(int(x) for x in m.split(',')) for m in _OBJECT_DEF.findall(source)]
+        modules[module_name] = minimal_prefixes(oids)
+    return modules
+
+
+def collect_module_prefixes(mibBuilder, module_names):
+    """
+    ロード済みのMibBuilderから、指定モジュールのOIDプレフィックスを求めます。
+    """
+    MibNode, = mibBuilder.importSymbols("SNMPv2-SMI", "MibNode")
+    modules = {}
+    for module_name in module_names:
+        symbols = mibBuilder.mibSymbols.get(module_name, {})
+        oids = [tuple(obj.name) for obj in symbols.values() if isinstance(obj, MibNode)]
+        modules[module_name] = minimal_prefixes(oids)
+    return modules
+
+
+def write_registry(modules, path):
+    """
+    モジュールごとのOIDプレフィックスをJSONファイルに書き出します。
+    """
+    data = {
+        "version": REGISTRY_VERSION,
+        "modules": {
+            name: [".".join(str(x) for x in oid) for oid in prefixes]
+            for name, prefixes in sorted(modules.items())
+        }
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=1)
+
+
+def read_registry(path):
+    """
+    mib_registry.json を読み込みます。
+
+    Returns:
+        dict: {module_name: [oid_tuple, ...]} / バージョン不一致などで使用できない場合は None
+    """
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Failed to read MIB registry {path}: {e}")
+        return None
+
+    if data.get("version") != REGISTRY_VERSION:
+        logger.warning(f"Unsupported MIB registry version in {path}: {data.get('version')}")
+        return None
+
+    return {
+        name: [tuple(int(x) for x in oid.split('.')) for oid in prefixes]
+        for name, prefixes in data.get("modules", {}).items()
+    }
+
+
+class MibRegistry:
+    """
+    OIDプレフィックスからロードすべきMIBモジュールを引くためのレジストリ。
+    """
+
+    def __init__(self):
+        self._prefixes = {}
+        self.modules = set()
+
+    def add_directory(self, mib_path):
+        """
+        ディレクトリ内のモジュールを登録します。
+        mib_registry.json があればそれを使用し、無ければ高速スキャンします。
+        """
+        registry_path = os.path.join(mib_path, REGISTRY_FILENAME)
+        modules = read_registry(registry_path) if os.path.exists(registry_path) else None
+        if modules is None:
+            modules = scan_module_prefixes(mib_path)
+            logger.info(f"Scanned {len(modules)} MIB modules in {mib_path}")
+        else:
+            logger.info(f"Loaded MIB registry with {len(modules)} modules from {registry_path}")
+
+        for module_name, prefixes in modules.items():
+            self.modules.add(module_name)
+            for prefix in prefixes:
+                self._prefixes.setdefault(prefix, []).append(module_name)
+
+    def __len__(self):
+        return len(self.modules)
+
+    def modules_for(self, oid):
+        """
+        OIDを包含するサブツリーを定義しているモジュール名を返します。
+        """
+        found = []
+        for length in range(len(oid), 0, -1):
+            names = self._prefixes.get(oid[:length])
+            if names:
+                found.extend(names)
+        return found
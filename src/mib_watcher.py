@@ -0,0 +1,103 @@
+import asyncio
+import logging
+import os
+from src.config import settings
+from src.oid_index import INDEX_FILENAME
+from src.mib_registry import REGISTRY_FILENAME
+
+logger = logging.getLogger(__name__)
+
+# 変更を監視するファイル (コンパイル済みMIBモジュール・OIDインデックス・遅延ロード用レジストリ)
+WATCHED_FILENAMES = (INDEX_FILENAME, REGISTRY_FILENAME)
+
+
+def snapshot(paths):
+    """
+    監視対象ファイルの (更新時刻, サイズ) を返します。
+
+    Returns:
+        dict: {ファイルパス: (mtime_ns, size)}
+    """
+    files = {}
+    for path in paths:
+        try:
+            entries = list(os.scandir(path))
+        except OSError:
+            continue
+        for entry in entries:
+            name = entry.name
+            if not (name.endswith(".py") and not name.startswith("__init__")) and name not in WATCHED_FILENAMES:
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            files[entry.path] = (stat.st_mtime_ns, stat.st_size)
+    return files
+
+
+class MibWatcher:
+    """
+    MIBディレクトリを定期的に走査し、コンパイル済みモジュールの追加・変更・削除を検知して
+    MibResolver のリロードを開始するクラス。
+
+    コピー途中のファイルを読み込まないよう、変更を検知した後、次の走査でも内容が変わっていない
+    (書き込みが落ち着いた) ことを確認してからリロードします。
+    """
+
+    def __init__(self, resolver, interval=None, paths=None):
+        """
+        Args:
+            resolver: リロード対象の MibResolver
+            interval: 走査間隔 (秒)
+            paths: 監視するディレクトリ (None の場合は resolver の読み込み元ディレクトリ)
+        """
+        self.resolver = resolver
+        self.interval = interval if interval is not None else settings.mib_reload_interval
+        self.paths = paths if paths is not None else resolver.source_directories()
+        self._task = None
+        self.changes = 0
+
+    def start(self):
+        """
+        監視タスクを開始します。
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._watch_loop())
+            logger.info(f"Watching MIB directories for changes: {', '.join(self.paths)} (every {self.interval}s)")
+
+    async def _watch_loop(self):
+        current = await asyncio.to_thread(snapshot, self.paths)
+        pending = None
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                # MIBディレクトリのファイル数が多い場合に備え、走査はスレッドで行う
+                files = await asyncio.to_thread(snapshot, self.paths)
+            except Exception as e:
+                logger.error(f"Failed to scan MIB directories: {e}")
+                continue
+
+            if files == current:
+                pending = None
+                continue
+            if files != pending:
+                # 変更を検知した直後は書き込み途中の可能性があるため、次の走査まで待つ
+                pending = files
+                continue
+
+            added = len(files.keys() - current.keys())
+            removed = len(current.keys() - files.keys())
+            changed = sum(1 for path in files.keys() & current.keys() if files[path] != current[path])
+            logger.info(f"MIB directory changed ({added} added, {changed} changed, {removed} removed)")
+            current, pending = files, None
+            self.changes += 1
+            await self.resolver.request_reload("file change")
+
+    def close(self):
+        """
+        監視タスクを停止します。
+        """
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
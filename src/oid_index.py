@@ -0,0 +1,275 @@
+import json
+import mmap
+import os
+import struct
+import logging
+from src.formatters import kind_for_syntax
+
+logger = logging.getLogger(__name__)
+
+# インデックスファイルのフォーマット (version 2)
+#
+#   ヘッダ      : magic(4s) version(H) reserved(H) count(I) keys_offset(I) strings_offset(I) checksum(32s)
+#   エントリ表  : count × (key_offset(I) key_len(H) parent(I) module(I) symbol(I) syntax(I) enums(I) kind(I))
+#   キー領域    : OIDの各アークをビッグエンディアンuint32で連結したバイト列
+#   文字列表    : 長さ(H) + UTF-8 バイト列 の連結
+#
+# checksum はインデックスの元になったMIBの識別に使用する任意の値 (リゾルバのスナップショットではMIBディレクトリのチェックサム)、
+# kind は値の整形の種類 (formatters.syntax_kind) で、TEXTUAL-CONVENTIONの継承関係やDISPLAY-HINTに基づく整形をMIBモジュール無しで再現する。
+# version 1 (checksum と kind が無い) のファイルも読み込める。
+#
+# アークを固定長ビッグエンディアンで符号化しているため、バイト列の辞書順が
+# OIDタプルの順序と一致し、OIDのプレフィックス関係がバイト列のプレフィックス関係と一致する。
+# parent には自身の最長の真プレフィックスとなるエントリ番号 (存在しない場合は NO_PARENT) を格納する。
+
+INDEX_MAGIC = b"OIDX"
+INDEX_VERSION = 2
+INDEX_FILENAME = "oid_index.bin"
+
+NO_PARENT = 0xFFFFFFFF
+
+_HEADER = struct.Struct("<4sHHIII32s")
+_ENTRY = struct.Struct("<IHIIIIII")
+_ARC = 4
+
+# version -> (ヘッダ, エントリ)
+_FORMATS = {
+    1: (struct.Struct("<4sHHIII"), struct.Struct("<IHIIIII")),
+    INDEX_VERSION: (_HEADER, _ENTRY),
+}
+
+
+class OidIndexError(Exception):
+    """
+    インデックスファイルの読み込みに失敗した場合の例外。
+    """
+
+
+def _encode_oid(oid):
+    return struct.pack(f">{len(oid)}I", *oid)
+
+
+def collect_oid_entries(mibBuilder):
+    """
+    ロード済みのMibBuilderからインデックス用のエントリを収集します。
+
+    MibViewControllerと同様に、モジュールをリビジョン順に並べ、
+    同一OIDが複数モジュールで定義されている場合は後勝ちとします。
+
+    Returns:
+        dict: {oid_tuple: (module, symbol, syntax, enums, kind)}
+    """
+    MibNode, MibScalarInstance = mibBuilder.importSymbols(
+        "SNMPv2-SMI", "MibNode", "MibScalarInstance"
+    )
+
+    def _revision(modName):
+        symbols = mibBuilder.mibSymbols[modName]
+        if mibBuilder.module_id in symbols:
+            revisions = symbols[mibBuilder.module_id].getRevisions()
+            if revisions:
+                return revisions[0][0]
+        return "1970-01-01 00:00"
+
+    entries = {}
+    for modName in sorted(mibBuilder.mibSymbols, key=_revision):
+        for symName, obj in mibBuilder.mibSymbols[modName].items():
+            if symName == mibBuilder.module_id:
+                continue
+            if not isinstance(obj, MibNode) or isinstance(obj, MibScalarInstance):
+                continue
+
+            syntax_name = ""
+            enums = {}
+            syntax = obj.getSyntax() if hasattr(obj, "getSyntax") else None
+            if syntax is not None:
+                syntax_name = syntax.__class__.__name__
+                named_values = getattr(syntax, "namedValues", None)
+                if named_values:
+                    enums = {int(v): k for k, v in named_values.items()}
+
+            entries[tuple(obj.name)] = (modName, symName, syntax_name, enums, kind_for_syntax(syntax))
+
+    return entries
+
+
+def write_oid_index(entries, path, checksum=b""):
+    """
+    OIDエントリをインデックスファイルに書き出します。
+
+    Args:
+        entries: collect_oid_entries() の戻り値
+        path: 出力先ファイルパス
+        checksum: ヘッダに格納する32バイト以下の値
+    """
+    oids = sorted(entries)
+    position = {oid: i for i, oid in enumerate(oids)}
+
+    strings = bytearray()
+    string_offsets = {}
+
+    def _intern(text):
+        if text not in string_offsets:
+            data = text.encode("utf-8")
+            string_offsets[text] = len(strings)
+            strings.extend(struct.pack("<H", len(data)))
+            strings.extend(data)
+        return string_offsets[text]
+
+    keys = bytearray()
+    table = bytearray()
+    for oid in oids:
+        module, symbol, syntax, enums, kind = entries[oid]
+
+        parent = NO_PARENT
+        for length in range(len(oid) - 1, 0, -1):
+            if oid[:length] in position:
+                parent = position[oid[:length]]
+                break
+
+        enums_text = json.dumps(enums, separators=(",", ":")) if enums else ""
+        table.extend(_ENTRY.pack(
+            len(keys), len(oid), parent,
+            _intern(module), _intern(symbol), _intern(syntax), _intern(enums_text), _intern(kind)
+        ))
+        keys.extend(_encode_oid(oid))
+
+    keys_offset = _HEADER.size + len(table)
+    strings_offset = keys_offset + len(keys)
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, 0, len(oids), keys_offset, strings_offset, checksum))
+        f.write(table)
+        f.write(keys)
+        f.write(strings)
+    os.replace(tmp_path, path)
+
+    return len(oids)
+
+
+class OidIndex:
+    """
+    事前生成されたOIDインデックスファイルをmmapで読み込み、
+    最長プレフィックス一致でOIDを解決するクラス。
+    pysnmpのMIBモジュールは一切ロードしません。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError as e:
+            self._file.close()
+            raise OidIndexError(f"Empty or invalid OID index: {path}") from e
+
+        if len(self._mm) < 8:
+            self.close()
+            raise OidIndexError(f"Truncated OID index: {path}")
+
+        magic, version = struct.unpack_from("<4sH", self._mm, 0)
+        if magic != INDEX_MAGIC:
+            self.close()
+            raise OidIndexError(f"Not an OID index file: {path}")
+        if version not in _FORMATS:
+            self.close()
+            raise OidIndexError(f"Unsupported OID index version {version} (expected {INDEX_VERSION}): {path}")
+        header, self._entry_struct = _FORMATS[version]
+        if len(self._mm) < header.size:
+            self.close()
+            raise OidIndexError(f"Truncated OID index: {path}")
+
+        _, _, _, count, keys_offset, strings_offset, *checksum = header.unpack_from(self._mm, 0)
+        self.version = version
+        # version 1 のファイルには checksum が無い
+        self.checksum = checksum[0] if checksum else b""
+        self._entries_offset = header.size
+        self.count = count
+        self._keys_offset = keys_offset
+        self._strings_offset = strings_offset
+        self._strings = {}
+        self._module_count = None
+
+    def close(self):
+        """
+        mmapとファイルをクローズします。
+        """
+        if getattr(self, "_mm", None) is not None:
+            self._mm.close()
+            self._mm = None
+        self._file.close()
+
+    def __len__(self):
+        return self.count
+
+    def module_count(self):
+        """
+        インデックスに含まれるMIBモジュール数を返します (初回のみエントリ表を走査します)。
+        """
+        if self._module_count is None:
+            self._module_count = len({self._entry(i)[3] for i in range(self.count)})
+        return self._module_count
+
+    def _entry(self, i):
+        entry = self._entry_struct
+        return entry.unpack_from(self._mm, self._entries_offset + i * entry.size)
+
+    def _key(self, i):
+        key_offset, key_len = self._entry(i)[:2]
+        start = self._keys_offset + key_offset
+        return self._mm[start:start + key_len * _ARC]
+
+    def _string(self, offset):
+        # 文字列はモジュール名・シンボル名など重複が多いため、デコード結果を保持する
+        text = self._strings.get(offset)
+        if text is None:
+            start = self._strings_offset + offset
+            (length,) = struct.unpack_from("<H", self._mm, start)
+            text = self._mm[start + 2:start + 2 + length].decode("utf-8")
+            self._strings[offset] = text
+        return text
+
+    def lookup(self, oid):
+        """
+        OIDに対して最長プレフィックス一致するエントリを検索します。
+
+        Args:
+            oid: OIDタプル
+
+        Returns:
+            tuple: (module, symbol, suffix_tuple, syntax, enums, kind) / 該当なしの場合は None
+                   (kind は version 1 のファイルでは None)
+        """
+        if not self.count:
+            return None
+
+        query = _encode_oid(oid)
+
+        # query 以下で最大のキーを二分探索で求める
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if query < self._key(mid):
+                hi = mid
+            else:
+                lo = mid + 1
+        i = lo - 1
+
+        # 最長プレフィックスは候補の祖先チェーン上に必ず存在する
+        while i >= 0 and i != NO_PARENT:
+            key_offset, key_len, parent, module, symbol, syntax, enums, *kind = self._entry(i)
+            start = self._keys_offset + key_offset
+            if query.startswith(self._mm[start:start + key_len * _ARC]):
+                enums_text = self._string(enums)
+                return (
+                    self._string(module),
+                    self._string(symbol),
+                    tuple(oid[key_len:]),
+                    self._string(syntax),
+                    {int(k): v for k, v in json.loads(enums_text).items()} if enums_text else {},
+                    self._string(kind[0]) if kind else None
+                )
+            i = parent
+
+        return None
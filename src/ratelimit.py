@@ -0,0 +1,165 @@
+import ipaddress
+import logging
+import time
+from collections import OrderedDict
+from src.config import settings
+from src import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def parse_overrides(text):
+    """
+    "CIDR=rate[:burst],..." 形式の上書き設定を解析します。
+    より長いプレフィックスが優先されるよう、プレフィックス長の降順で返します。
+
+    Returns:
+        list: [(ネットワーク, rate, burst)]
+    """
+    overrides = []
+    for item in text.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            cidr, _, limit = item.partition("=")
+            rate, _, burst = limit.partition(":")
+            network = ipaddress.ip_network(cidr.strip(), strict=False)
+            rate = float(rate)
+            overrides.append((network, rate, float(burst) if burst else rate * 2))
+        except ValueError as e:
+            raise ValueError(f"Invalid rate limit override '{item}': {e}") from e
+    overrides.sort(key=lambda o: o[0].prefixlen, reverse=True)
+    return overrides
+
+
+class _Bucket:
+    __slots__ = ("tokens", "updated_at", "rate", "burst", "dropped", "limited")
+
+    def __init__(self, rate, burst, now):
+        self.tokens = burst
+        self.updated_at = now
+        self.rate = rate
+        self.burst = burst
+        self.dropped = 0
+        self.limited = False
+
+
+class RateLimiter:
+    """
+    送信元IPごとのトークンバケットによる受信レート制限。
+    MIB解決の前に判定するため、制限されたTrapはほとんどコストをかけずに破棄されます。
+
+    送信元ごとのレートはデフォルト値 (rate, burst) で、CIDRごとの上書き設定があればそれを使用します。
+    バケットは最終受信順に保持し、idle_timeout 秒受信の無い送信元は先頭から追い出します。
+    送信元を詐称したTrapなどで送信元の数が max_entries を超えた場合も、最も長く受信していないものから追い出します。
+    """
+
+    def __init__(self, rate=None, burst=None, overrides=None, idle_timeout=None, max_entries=None):
+        """
+        Args:
+            rate: 送信元ごとの許容レート (件/秒)
+            burst: バケットの容量 (瞬間的に許容する件数)
+            overrides: "CIDR=rate[:burst],..." 形式の上書き設定
+            idle_timeout: バケットを保持する無通信時間 (秒)
+            max_entries: 保持するバケットの最大数
+        """
+        self.rate = rate if rate is not None else settings.rate_limit_rate
+        self.burst = burst if burst is not None else settings.rate_limit_burst
+        self.overrides = parse_overrides(overrides if overrides is not None else settings.rate_limit_overrides)
+        self.idle_timeout = idle_timeout if idle_timeout is not None else settings.rate_limit_idle_timeout
+        self.max_entries = max_entries if max_entries is not None else settings.rate_limit_max_entries
+
+        self._buckets = OrderedDict()
+        self.allowed = 0
+        self.dropped = 0
+        self.evicted = 0
+        self.overflow_evicted = 0
+
+    def _limit_for(self, source_ip):
+        """
+        送信元に適用するレートとバケット容量を返します。
+        """
+        if self.overrides:
+            try:
+                address = ipaddress.ip_address(source_ip)
+            except ValueError:
+                return self.rate, self.burst
+            for network, rate, burst in self.overrides:
+                if address.version == network.version and address in network:
+                    return rate, burst
+        return self.rate, self.burst
+
+    def allow(self, source_ip) -> bool:
+        """
+        送信元からのTrapを受け付けるかを判定します。
+
+        Returns:
+            bool: 受け付ける場合は True、レート超過で破棄する場合は False
+        """
+        now = time.monotonic()
+        buckets = self._buckets
+        bucket = buckets.get(source_ip)
+        if bucket is None:
+            self._evict_idle(now)
+            if len(buckets) >= self.max_entries:
+                buckets.popitem(last=False)
+                self.overflow_evicted += 1
+            bucket = buckets[source_ip] = _Bucket(*self._limit_for(source_ip), now)
+        else:
+            buckets.move_to_end(source_ip)
+            bucket.tokens = min(bucket.burst, bucket.tokens + (now - bucket.updated_at) * bucket.rate)
+            bucket.updated_at = now
+
+        if bucket.tokens >= 1:
+            bucket.tokens -= 1
+            bucket.limited = False
+            self.allowed += 1
+            return True
+
+        if not bucket.limited:
+            # 制限が始まった時点で1回だけ記録する
+            bucket.limited = True
+            logger.warning(f"Rate limiting traps from {source_ip} (limit {bucket.rate}/s, burst {bucket.burst})")
+        bucket.dropped += 1
+        self.dropped += 1
+        metrics.rate_limited.inc(source_ip)
+        return False
+
+    def _evict_idle(self, now):
+        """
+        idle_timeout 秒以上受信の無い送信元のバケットを削除します。
+        """
+        buckets = self._buckets
+        while buckets:
+            source_ip, bucket = next(iter(buckets.items()))
+            if now - bucket.updated_at < self.idle_timeout:
+                break
+            del buckets[source_ip]
+            self.evicted += 1
+
+    def top_sources(self, limit=10):
+        """
+        破棄したTrapが多い送信元を返します (保持中のバケットのみ)。
+
+        Returns:
+            list: [(送信元IP, 破棄数)]
+        """
+        dropped = [(ip, b.dropped) for ip, b in self._buckets.items() if b.dropped]
+        dropped.sort(key=lambda item: item[1], reverse=True)
+        return dropped[:limit]
+
+    def stats(self):
+        """
+        レート制限の統計情報を返します。
+
+        Returns:
+            dict: allowed, dropped, evicted (無通信), overflow_evicted (max_entries 超過), sources
+        """
+        return {
+            "allowed": self.allowed,
+            "dropped": self.dropped,
+            "evicted": self.evicted,
+            "overflow_evicted": self.overflow_evicted,
+            "sources": len(self._buckets)
+        }
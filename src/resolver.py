@@ -1,17 +1,250 @@
 from pysnmp.smi import builder, view, error
+from pyasn1.type import univ
+import pysnmp
 from src.config import settings
+from src.oid_index import OidIndex, OidIndexError, INDEX_FILENAME, INDEX_VERSION, collect_oid_entries, write_oid_index
+from src.mib_registry import MibRegistry
+from src.formatters import build_formatter, formatter_for_syntax, format_generic
+from src.fastpath import FastValue, TAG_OID
+from src.trap_record import OidInfo, Variable, PrettyVariable, SNMP_TRAP_OID
+from src import metrics
+from collections import OrderedDict
+import asyncio
+import hashlib
 import logging
 import os
+import time
 
 logger = logging.getLogger(__name__)
 
+_SNMP_TRAP_OID_KEY = tuple(int(x) for x in SNMP_TRAP_OID.split("."))
+# テンプレートの1つの位置で保持する OidInfo の最大数 (インデックスの種類の数)
+_TEMPLATE_SLOT_SIZE = 1024
+# snmpTrapOID と変数の数が同じで、変数の並びが異なるテンプレートの最大数
+_TEMPLATE_VARIANTS = 4
+
+
+def _oid_text(arcs):
+    return ".".join(map(str, arcs))
+
+
+class _TemplateSlot:
+    """
+    テンプレートの1つの変数位置。解決済みのオブジェクト (MIB名・オブジェクト名・整形関数) を保持し、
+    同じオブジェクトでサフィックス (インデックス) だけが異なるOIDを、MIBを参照せずに OidInfo にします。
+    """
+
+    __slots__ = ("info", "prefix", "infos")
+
+    def __init__(self, key, info):
+        self.info = info
+        self.infos = {key: info}
+        # サフィックスが異なるOIDに当てはめるのは構文を持つオブジェクト (OBJECT-TYPE の末端) のみ
+        # (構文を持たないノードや未解決のOIDは、より深いノードに解決される可能性があるため完全一致のみ)
+        if info.syntax:
+            suffix_len = info.suffix.count(".") + 1 if info.suffix else 0
+            self.prefix = key[:len(key) - suffix_len]
+        else:
+            self.prefix = None
+
+    def lookup(self, key):
+        """
+        OIDタプルの OidInfo を返します (この位置のオブジェクトに属さない場合は None)。
+        """
+        info = self.infos.get(key)
+        if info is not None:
+            return info
+        prefix = self.prefix
+        if prefix is None or key[:len(prefix)] != prefix:
+            return None
+        base = self.info
+        info = OidInfo(_oid_text(key), base.mib, base.name, _oid_text(key[len(prefix):]), base.formatter, base.syntax)
+        if len(self.infos) < _TEMPLATE_SLOT_SIZE:
+            self.infos[key] = info
+        return info
+
+
+class _TrapTemplate:
+    """
+    Trapの種類 (snmpTrapOID) と変数の並びごとの解決結果。
+    """
+
+    __slots__ = ("slots", "trap_info")
+
+    def __init__(self, slots, trap_info):
+        self.slots = slots
+        self.trap_info = trap_info
+
+
 class MibResolver:
     """
     MIB定義に基づいてOIDを解決するクラス。
     事前にコンパイルされたMIBモジュールを使用します。
     """
 
+    # reload() で新しいインスタンスから差し替える解決状態 (統計値は差し替えずに累積する)
+    _STATE_ATTRS = (
+        "mibBuilder", "mibViewController", "oidIndex", "mibRegistry",
+        "lazy_loaded_modules", "_lazy_attempted",
+        "_cache", "_cache_build_id", "_formatters", "_templates", "_value_format"
+    )
+
     def __init__(self):
+        """
+        解決モードに応じて、OIDインデックスまたは
+        MibBuilderとMibViewControllerを初期化します。
+        """
+        self.mibBuilder = None
+        self.mibViewController = None
+        self.oidIndex = None
+
+        # 遅延ロード用のレジストリと、実際にロードされたモジュール
+        self.mibRegistry = None
+        self.lazy_loaded_modules = []
+        self._lazy_attempted = set()
+
+        # OID解決結果のLRUキャッシュ (OIDタプル -> OidInfo)
+        # 未解決 (UNKNOWN) の結果もキャッシュし、同じ未知OIDでMIBツリーを再探索しない
+        # OidInfo は同じOIDの変数間で共有されるため、OID・名前の文字列は変数ごとに生成しない
+        self._cache = OrderedDict()
+        # オブジェクトごとの値の整形関数 ((mib, name) -> (整形関数, 構文名))
+        # インスタンス (サフィックス) が異なっても同じオブジェクトであれば構文情報の解析は一度だけ行う
+        self._formatters = {}
+        self._value_format = settings.value_format
+        self._cache_size = settings.resolve_cache_size
+        self._cache_build_id = None
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_evictions = 0
+
+        # Trapのテンプレート ((snmpTrapOID のタプル, 変数の数) -> [_TrapTemplate])
+        self._templates = {}
+        self._template_size = settings.trap_template_cache_size
+        self.template_hits = 0
+        self.template_misses = 0
+
+        # MIBのリロード状況
+        self._reload_task = None
+        self._reload_pending = False
+        self.reloads = 0
+        self.reload_failures = 0
+        self.last_reload_seconds = 0.0
+        self.last_reload_at = None
+
+        # indexモードではpysnmpのMIBモジュールをロードせず、事前生成したインデックスのみを使用する
+        if settings.resolver_mode == "index":
+            self.oidIndex = self._open_oid_index()
+            if self.oidIndex is not None:
+                return
+            logger.warning("Falling back to MIB module resolution")
+        elif settings.resolver_snapshot_path and settings.mib_load_mode == "eager":
+            # MIBディレクトリが前回の起動時から変わっていなければ、スナップショットから解決状態を復元する
+            checksum = self.snapshot_checksum()
+            self.oidIndex = self._open_snapshot(settings.resolver_snapshot_path, checksum)
+            if self.oidIndex is not None:
+                return
+            self._init_mib_builder()
+            self._write_snapshot(settings.resolver_snapshot_path, checksum)
+            return
+
+        self._init_mib_builder()
+
+    def _open_oid_index(self):
+        """
+        OIDインデックスファイルをmmapで開きます。
+
+        Returns:
+            OidIndex: 開けなかった場合は None
+        """
+        if settings.oid_index_path:
+            candidates = [settings.oid_index_path]
+        else:
+            candidates = [
+                os.path.join('/opt/mibs', INDEX_FILENAME),
+                os.path.join(os.path.abspath(settings.mib_dir), INDEX_FILENAME)
+            ]
+
+        for path in candidates:
+            if not os.path.exists(path):
+                continue
+            try:
+                index = OidIndex(path)
+            except (OSError, OidIndexError) as e:
+                logger.error(f"Failed to open OID index {path}: {e}")
+                continue
+            logger.info(f"Loaded OID index with {len(index)} entries from {path}")
+            return index
+
+        logger.warning(f"OID index not found: {', '.join(candidates)}")
+        return None
+
+    @classmethod
+    def snapshot_checksum(cls):
+        """
+        スナップショットの元になるMIBの状態 (コンパイル済みMIBモジュールの名前と内容、pysnmpのバージョン) のチェックサムを返します。
+        """
+        digest = hashlib.sha256(f"{INDEX_VERSION}:{pysnmp.__version__}".encode())
+        for position, path in enumerate(cls.source_directories()):
+            names = sorted(
+                name for name in os.listdir(path)
+                if name.endswith('.py') and not name.startswith('__init__')
+            )
+            for name in names:
+                try:
+                    with open(os.path.join(path, name), 'rb') as f:
+                        content = hashlib.sha256(f.read()).digest()
+                except OSError:
+                    continue
+                digest.update(f"{position}:{name}:".encode())
+                digest.update(content)
+        return digest.digest()
+
+    def _open_snapshot(self, path, checksum):
+        """
+        チェックサムが一致する場合にのみスナップショットを開きます。
+
+        Returns:
+            OidIndex: 存在しない・古い・壊れている場合は None
+        """
+        if not os.path.exists(path):
+            logger.info(f"Resolver snapshot not found, loading MIB modules: {path}")
+            return None
+        try:
+            index = OidIndex(path)
+        except (OSError, OidIndexError) as e:
+            logger.warning(f"Failed to open resolver snapshot {path}: {e}")
+            return None
+        if index.checksum != checksum:
+            index.close()
+            logger.info(f"Resolver snapshot is out of date, loading MIB modules: {path}")
+            return None
+        logger.info(f"Loaded resolver snapshot with {len(index)} entries from {path}")
+        return index
+
+    def _write_snapshot(self, path, checksum):
+        """
+        ロード済みのMIBモジュールから解決状態のスナップショットを書き出します。
+        書き出せなくても起動は継続します。
+        """
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            count = write_oid_index(collect_oid_entries(self.mibBuilder), path, checksum)
+        except Exception as e:
+            logger.warning(f"Failed to write resolver snapshot {path}: {e}")
+            return
+        logger.info(f"Wrote resolver snapshot with {count} entries to {path}")
+
+    @staticmethod
+    def source_directories():
+        """
+        MIBモジュール・インデックスを読み込むディレクトリ (存在するもののみ) を返します。
+        """
+        paths = ['/opt/mibs', os.path.abspath(settings.mib_dir)]
+        return [path for path in dict.fromkeys(paths) if os.path.isdir(path)]
+
+    def _init_mib_builder(self):
         """
         MibBuilderとMibViewControllerを初期化し、
         設定されたMIBディレクトリをロードパスに追加します。
@@ -48,6 +281,16 @@ class MibResolver:
             logger.warning(f"Failed to configure dynamic MIB compiler: {e}")
 
         self.mibViewController = view.MibViewController(self.mibBuilder)
+
+        # 遅延ロードモードでは起動時にモジュールをロードせず、
+        # OIDプレフィックス -> モジュール のレジストリのみを構築する
+        if settings.mib_load_mode == "lazy":
+            self.mibRegistry = MibRegistry()
+            for path in dict.fromkeys([compiled_mib_path, mib_path]):
+                if os.path.exists(path):
+                    self.mibRegistry.add_directory(path)
+            logger.info(f"Lazy MIB loading enabled ({len(self.mibRegistry)} modules registered)")
+            return
         
         # 指定ディレクトリ内のMIBモジュールをロード
         # コンパイル済みのMIBディレクトリからもロードを試みる
@@ -104,45 +347,406 @@ class MibResolver:
                 "oid": "1.3.6...", 
                 "name": "sysUpTime", 
                 "mib": "SNMPv2-MIB", 
-                "value": "12345" 
+                "value": "0:02:03.45",
+                "raw": 12345,
+                "typed": 123.45,
+                "syntax": "TimeTicks"
             }
+            value_format が "pretty" の場合、value は prettyPrint の文字列で raw/typed/syntax は含みません。
         """
+        return self.resolve_variable(oid, value).to_dict()
+
+    def resolve_variable(self, oid, value=None):
+        """
+        OIDと値を解決して、受信キューに保持する内部表現 (Variable) を返します。
+        OID・MIB名・オブジェクト名の文字列はOIDごとの解決結果 (OidInfo) を共有します。
+
+        Returns:
+            Variable: value_format が "pretty" の場合と解決エラーの場合は PrettyVariable
+        """
+        started = time.perf_counter()
         try:
-            # OID解決
-            varBind = view.MibViewController(self.mibBuilder).getNodeName(oid)
-            oid_obj, label, suffix = varBind
-            
+            info = self._lookup(oid, self._oid_key(oid))
+            if info.mib == "UNKNOWN":
+                metrics.resolve_failures.inc("unknown")
+            return self._variable(info, value)
+
+        except Exception as e:
+            logger.error(f"Unexpected error during resolution: {e}")
+            metrics.resolve_failures.inc("error")
+            return PrettyVariable(
+                OidInfo(str(oid), "ERROR", str(oid), "", format_generic, ""),
+                str(value) if value is not None else ""
+            )
+        finally:
+            metrics.resolve_seconds.observe(time.perf_counter() - started)
+
+    def _variable(self, info, value):
+        """
+        解決済みのOIDと値から Variable を作ります。
+        """
+        if self._value_format == "pretty":
+            if info.mib == "UNKNOWN":
+                formatted_value = str(value) if value is not None else ""
+            else:
+                formatted_value = value.prettyPrint() if hasattr(value, 'prettyPrint') else str(value)
+            return PrettyVariable(info, formatted_value)
+
+        # 構文 (TEXTUAL-CONVENTION・列挙値) に基づく整形関数はOIDごとにキャッシュ済み
+        return Variable(info, *info.formatter(value))
+
+    def resolve_trap(self, var_binds):
+        """
+        Trapの変数をまとめて解決します。
+
+        snmpTrapOID と変数のOIDの並びが記録済みのテンプレートに一致する場合は、変数ごとの解決を行わず、
+        テンプレートの各位置のオブジェクトにサフィックスと値を当てはめるだけで解決します。
+        一致しない場合は変数ごとに resolve_variable で解決し、その結果をテンプレートとして記録します。
+
+        Args:
+            var_binds: (OID, 値) のシーケンス
+
+        Returns:
+            tuple: (Variable のタプル, snmpTrapOID の値の解決結果 (OidInfo, 含まれない場合は None))
+        """
+        keys = [self._oid_key(name) for name, _ in var_binds]
+        trap_oid = None
+        for key, (_, value) in zip(keys, var_binds):
+            if key == _SNMP_TRAP_OID_KEY:
+                trap_oid = self._value_oid_key(value)
+                break
+        if trap_oid is None or self._template_size <= 0:
+            variables = tuple([self.resolve_variable(name, value) for name, value in var_binds])
+            return variables, self._resolve_trap_oid(trap_oid)
+
+        self._check_build_id()
+        signature = (trap_oid, len(keys))
+        for template in self._templates.get(signature, ()):
+            variables = self._fill_template(template, keys, var_binds)
+            if variables is not None:
+                self.template_hits += 1
+                return variables, template.trap_info
+        self.template_misses += 1
+
+        build_id = self._cache_build_id
+        variables = tuple([self.resolve_variable(name, value) for name, value in var_binds])
+        trap_info = self._resolve_trap_oid(trap_oid)
+        # 解決中に遅延ロードでモジュールが追加された場合は、先に解決した変数が古い可能性があるため記録しない
+        if trap_info is not None and self._cache_build_id == build_id:
+            self._learn(signature, keys, variables, trap_info)
+        return variables, trap_info
+
+    def _fill_template(self, template, keys, var_binds):
+        """
+        テンプレートに変数を当てはめます (一致しない位置がある場合は None)。
+        """
+        variables = []
+        unknown = 0
+        try:
+            for slot, key, (_, value) in zip(template.slots, keys, var_binds):
+                info = slot.lookup(key)
+                if info is None:
+                    return None
+                if info.mib == "UNKNOWN":
+                    unknown += 1
+                variables.append(self._variable(info, value))
+        except Exception:
+            # 値の整形に失敗した場合は変数ごとの解決でエラーとして扱う
+            return None
+        if unknown:
+            metrics.resolve_failures.inc("unknown", amount=unknown)
+        return tuple(variables)
+
+    def _learn(self, signature, keys, variables, trap_info):
+        """
+        変数ごとに解決した結果をテンプレートとして記録します。
+        """
+        slots = []
+        for key, variable in zip(keys, variables):
+            if variable.info.mib == "ERROR":
+                return
+            slots.append(_TemplateSlot(key, variable.info))
+        templates = self._templates.get(signature)
+        if templates is None:
+            if len(self._templates) >= self._template_size:
+                # 最も古く記録したTrapの種類のテンプレートを破棄する
+                del self._templates[next(iter(self._templates))]
+            templates = self._templates[signature] = []
+        elif len(templates) >= _TEMPLATE_VARIANTS:
+            templates.pop(0)
+        templates.append(_TrapTemplate(tuple(slots), trap_info))
+
+    def _resolve_trap_oid(self, key):
+        """
+        snmpTrapOID の値 (通知の種類) を OidInfo に解決します。
+        """
+        if key is None:
+            return None
+        try:
+            return self._lookup(key, key)
+        except Exception as e:
+            logger.error(f"Unexpected error during trap OID resolution: {e}")
+            return None
+
+    @staticmethod
+    def _value_oid_key(value):
+        """
+        snmpTrapOID の値をOIDタプルに変換します (OIDでない場合は None)。
+        """
+        if isinstance(value, FastValue):
+            return value.value if value.tag == TAG_OID else None
+        if isinstance(value, univ.ObjectIdentifier):
+            return tuple(value)
+        if isinstance(value, str):
+            try:
+                return MibResolver._oid_key(value) or None
+            except ValueError:
+                return None
+        return None
+
+    @staticmethod
+    def _oid_key(oid):
+        """
+        キャッシュキーとして使用するOIDタプルを返します。
+        """
+        if isinstance(oid, str):
+            return tuple(int(x) for x in oid.strip('.').split('.') if x)
+        return tuple(oid)
+
+    def _lookup(self, oid, key):
+        """
+        OIDを OidInfo に解決します。結果はLRUキャッシュに保持されます。
+        """
+        self._check_build_id()
+
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            self.cache_hits += 1
+            return cached
+
+        self.cache_misses += 1
+        if self.mibRegistry is not None and self._load_modules_for(key):
+            # 新たにモジュールをロードした場合はキャッシュを破棄する
+            self._clear_caches(self.mibBuilder.lastBuildId)
+
+        if self.oidIndex is not None:
+            entry = self.oidIndex.lookup(key)
+            if entry is None:
+                logger.debug(f"OID not found in index: {oid}")
+                result = self._unknown(key)
+            else:
+                modName, symName, suffix, syntax, enums, kind = entry
+                formatter = self._formatters.get((modName, symName))
+                if formatter is None:
+                    # インデックスには構文クラス名・列挙値と整形の種類のみが保持されている
+                    # (kind が無い version 1 のインデックスでは構文クラス名から整形の種類を求める)
+                    formatter = self._formatters[(modName, symName)] = (
+                        build_formatter((syntax,), enums, kind=kind), syntax
+                    )
+                result = OidInfo(_oid_text(key), modName, symName, _oid_text(suffix), *formatter)
+        else:
+            result = self._lookup_view(oid, key)
+
+        if self._cache_size > 0:
+            self._cache[key] = result
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+                self.cache_evictions += 1
+
+        return result
+
+    def _check_build_id(self):
+        """
+        MIBモジュールが追加ロードされた場合は、キャッシュ内容が古くなるため破棄します。
+        """
+        if self.mibBuilder is not None:
+            build_id = self.mibBuilder.lastBuildId
+            if build_id != self._cache_build_id:
+                self._clear_caches(build_id)
+
+    def _clear_caches(self, build_id):
+        self._cache.clear()
+        self._formatters.clear()
+        self._templates.clear()
+        self._cache_build_id = build_id
+
+    def _load_modules_for(self, key):
+        """
+        OIDのサブツリーを定義しているモジュールのうち、未ロードのものをロードします。
+
+        Returns:
+            bool: 新たにロードを試みたモジュールがあった場合は True
+        """
+        attempted = False
+        for module_name in self.mibRegistry.modules_for(key):
+            if module_name in self._lazy_attempted:
+                continue
+            self._lazy_attempted.add(module_name)
+            attempted = True
+            try:
+                self.mibBuilder.loadModules(module_name)
+                self.lazy_loaded_modules.append(module_name)
+                metrics.mib_lazy_loads.inc(module_name, "loaded")
+                logger.info(f"Lazily loaded MIB module: {module_name}")
+            except error.MibNotFoundError:
+                metrics.mib_lazy_loads.inc(module_name, "failed")
+                logger.warning(f"Failed to load MIB module: {module_name}")
+            except Exception as e:
+                metrics.mib_lazy_loads.inc(module_name, "failed")
+                logger.warning(f"Error loading {module_name}: {e}")
+        return attempted
+
+    @staticmethod
+    def _unknown(key):
+        """
+        MIBに定義の無いOIDの解決結果 (オブジェクト名はOIDの文字列) を返します。
+        """
+        oid_text = _oid_text(key)
+        return OidInfo(oid_text, "UNKNOWN", oid_text, "", format_generic, "")
+
+    def _lookup_view(self, oid, key):
+        """
+        MibViewControllerを使用してOIDを OidInfo に解決します。
+        """
+        try:
+            # 長寿命のMibViewControllerを使用してOIDを解決
+            oid_obj, label, suffix = self.mibViewController.getNodeName(key)
+
             # MIBモジュール名とオブジェクト名を取得
             modName, symName, _ = self.mibViewController.getNodeLocation(oid_obj)
-            
-            # 値の解決（型情報などに基づく整形）
-            # ここでは単純化のため、pysnmpのprettyPrintを使用
-            formatted_value = value.prettyPrint() if hasattr(value, 'prettyPrint') else str(value)
-            
-            return {
-                "oid": str(oid),
-                "mib": modName,
-                "name": symName,
-                "suffix": ".".join(str(x) for x in suffix),
-                "value": formatted_value
-            }
+            result = OidInfo(_oid_text(key), modName, symName, _oid_text(suffix), *self._formatter_for(modName, symName))
 
         except error.SmiError as e:
-            # 解決失敗時
+            # 解決失敗時 (ネガティブキャッシュとして保持)
             logger.debug(f"MIB resolution failed for OID {oid}: {e}")
-            return {
-                "oid": str(oid),
-                "mib": "UNKNOWN",
-                "name": str(oid),
-                "suffix": "",
-                "value": str(value) if value is not None else ""
-            }
-        except Exception as e:
-            logger.error(f"Unexpected error during resolution: {e}")
-            return {
-                "oid": str(oid),
-                "mib": "ERROR",
-                "name": str(oid),
-                "suffix": "",
-                "value": str(value) if value is not None else ""
-            }
+            result = self._unknown(key)
+
+        return result
+
+    def _formatter_for(self, modName, symName):
+        """
+        MIBオブジェクトのSYNTAXから値の整形関数を生成します。
+
+        Returns:
+            tuple: (整形関数, 構文名)
+        """
+        formatter = self._formatters.get((modName, symName))
+        if formatter is None:
+            syntax = None
+            try:
+                node, = self.mibBuilder.importSymbols(modName, symName)
+                syntax = node.getSyntax() if hasattr(node, "getSyntax") else None
+            except error.SmiError as e:
+                logger.debug(f"Failed to get syntax of {modName}::{symName}: {e}")
+            syntax_name = syntax.__class__.__name__ if syntax is not None else ""
+            formatter = self._formatters[(modName, symName)] = (formatter_for_syntax(syntax), syntax_name)
+        return formatter
+
+    def cache_info(self):
+        """
+        OID解決キャッシュの統計情報を返します。
+
+        Returns:
+            dict: hits, misses, evictions, size, maxsize, template_hits, template_misses, templates
+        """
+        return {
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "evictions": self.cache_evictions,
+            "size": len(self._cache),
+            "maxsize": self._cache_size,
+            "template_hits": self.template_hits,
+            "template_misses": self.template_misses,
+            "templates": sum(len(templates) for templates in self._templates.values())
+        }
+
+    def lazy_info(self):
+        """
+        遅延ロードの状況を返します (ロードしたモジュール名は lazy_loaded_modules と
+        snmp_mib_lazy_loads_total{module} で確認できます)。
+
+        Returns:
+            dict: registered (登録モジュール数), loaded (ロードしたモジュール数), failed (ロードに失敗したモジュール数)
+        """
+        loaded = len(self.lazy_loaded_modules)
+        return {
+            "registered": len(self.mibRegistry) if self.mibRegistry is not None else 0,
+            "loaded": loaded,
+            "failed": len(self._lazy_attempted) - loaded
+        }
+
+    def module_count(self):
+        """
+        現在の解決状態で使用しているMIBモジュール数を返します。
+        (lazyモードでは登録済みモジュール数、indexモードではインデックス内のモジュール数)
+        """
+        if self.oidIndex is not None:
+            return self.oidIndex.module_count()
+        if self.mibRegistry is not None:
+            return len(self.mibRegistry)
+        return len(self.mibBuilder.mibSymbols)
+
+    def request_reload(self, reason="manual"):
+        """
+        MIBのリロードを開始します。リロード中に要求された場合は、完了後にもう一度リロードします。
+        """
+        if self._reload_task is not None and not self._reload_task.done():
+            self._reload_pending = True
+            logger.info(f"MIB reload requested ({reason}) while reloading, will reload again")
+            return self._reload_task
+        self._reload_task = asyncio.create_task(self.reload(reason))
+        return self._reload_task
+
+    async def reload(self, reason="manual"):
+        """
+        MIBディレクトリから解決状態を作り直し、現在の状態と差し替えます。
+
+        新しい状態 (MibBuilder・インデックス・キャッシュ) の構築はイベントループを止めないよう
+        別スレッドで行います。resolve() はイベントループ上で同期的に実行されるため、
+        差し替えは解決処理の途中で起こることはなく、差し替え前に開始した解決は古い状態のまま完了します。
+
+        Returns:
+            bool: リロードに成功した場合は True (失敗した場合は現在の状態を維持します)
+        """
+        while True:
+            self._reload_pending = False
+            started = time.perf_counter()
+            try:
+                new_state = await asyncio.to_thread(type(self))
+            except Exception as e:
+                self.reload_failures += 1
+                logger.error(f"MIB reload ({reason}) failed, keeping the current MIB state: {e}")
+                succeeded = False
+            else:
+                old_index = self.oidIndex
+                for name in self._STATE_ATTRS:
+                    setattr(self, name, getattr(new_state, name))
+                if old_index is not None and old_index is not self.oidIndex:
+                    old_index.close()
+
+                self.reloads += 1
+                self.last_reload_seconds = time.perf_counter() - started
+                self.last_reload_at = time.time()
+                logger.info(
+                    f"Reloaded MIBs ({reason}): {self.module_count()} modules in {self.last_reload_seconds:.3f}s"
+                )
+                succeeded = True
+
+            if not self._reload_pending:
+                return succeeded
+            reason = "pending request"
+
+    def reload_info(self):
+        """
+        MIBリロードの統計情報を返します。
+
+        Returns:
+            dict: reloads, failures, last_duration_seconds, modules
+        """
+        return {
+            "reloads": self.reloads,
+            "failures": self.reload_failures,
+            "last_duration_seconds": self.last_reload_seconds,
+            "modules": self.module_count()
+        }
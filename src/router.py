@@ -0,0 +1,381 @@
+import ipaddress
+import json
+import logging
+import re
+from src.webhook_pool import WEBHOOK_MODES, parse_endpoints
+
+logger = logging.getLogger(__name__)
+
+# 受信機の既定の出力 (settings.output_mode) を表すシンク名
+DEFAULT_SINK = "default"
+SINK_TYPES = ("stdout", "file", "webhook")
+# シンクの種類ごとに指定できる項目
+SINK_FIELDS = {
+    "stdout": ("type",),
+    "file": ("type", "dir", "prefix"),
+    "webhook": ("type", "urls", "mode"),
+}
+
+_SOURCE_CACHE_SIZE = 65536
+
+
+def _oid_arcs(text, what):
+    arcs = text.strip().strip(".").split(".")
+    if not all(arc.isdigit() for arc in arcs):
+        raise ValueError(f"{what} must be a numeric OID: {text!r}")
+    # 先頭の0などの表記揺れを受信した値の表記 (str(int)) に揃える
+    return [str(int(arc)) for arc in arcs]
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+
+class _OidTrie:
+    """
+    OIDプレフィックスのトライ。各ノードはそのOIDのサブツリーを対象とするルールのビットマスクを持ちます。
+    照合はOIDのアークを根からたどり、経路上のマスクの論理和を返すため、ルール数によらずOIDの長さに比例します。
+    """
+
+    def __init__(self):
+        # ノード: [子ノードの辞書 (アークの文字列 -> ノード), ビットマスク]
+        self.root = [{}, 0]
+
+    def add(self, arcs, bit):
+        node = self.root
+        for arc in arcs:
+            child = node[0].get(arc)
+            if child is None:
+                child = node[0][arc] = [{}, 0]
+            node = child
+        node[1] |= bit
+
+    def match(self, oid):
+        node = self.root
+        mask = node[1]
+        if oid is None:
+            return mask
+        for arc in oid.split("."):
+            node = node[0].get(arc)
+            if node is None:
+                break
+            mask |= node[1]
+        return mask
+
+
+class _CidrTree:
+    """
+    CIDRの基数木 (IPv4 / IPv6 それぞれ、アドレスを8ビットずつ分岐する多分岐の基数木)。
+    8ビット単位でないプレフィックス長は、最後の1段で該当する範囲の分岐すべてにマスクを展開して登録します。
+    照合はアドレスのバイトを上位からたどり、経路上のマスクの論理和を返すため、
+    ルール数によらずIPv4で最大4段、IPv6で最大16段です。
+    """
+
+    def __init__(self):
+        # ノード: {バイト値: [子ノード (無い場合は None), ビットマスク]}
+        self.roots = {4: {}, 6: {}}
+        # 全アドレスを対象とする (送信元の条件が無い・/0 の) ルールのマスク
+        self.any = {4: 0, 6: 0}
+        self._sources = {}
+
+    def add(self, network, bit):
+        version = network.version
+        if network.prefixlen == 0:
+            self.any[version] |= bit
+            return
+        data = network.network_address.packed
+        full, rem = divmod(network.prefixlen, 8)
+        last = full if rem else full - 1
+        node = self.roots[version]
+        for byte in data[:last]:
+            entry = node.get(byte)
+            if entry is None:
+                entry = node[byte] = [None, 0]
+            if entry[0] is None:
+                entry[0] = {}
+            node = entry[0]
+        span = 1 << (8 - rem) if rem else 1
+        for byte in range(data[last], data[last] + span):
+            entry = node.get(byte)
+            if entry is None:
+                entry = node[byte] = [None, 0]
+            entry[1] |= bit
+
+    def add_any(self, bit):
+        for version in self.any:
+            self.any[version] |= bit
+
+    def _parse(self, source):
+        parsed = self._sources.get(source)
+        if parsed is None:
+            try:
+                address = ipaddress.ip_address(source)
+            except ValueError:
+                parsed = (None, b"")
+            else:
+                parsed = (address.version, address.packed)
+            if len(self._sources) >= _SOURCE_CACHE_SIZE:
+                self._sources.clear()
+            self._sources[source] = parsed
+        return parsed
+
+    def match(self, source):
+        version, data = self._parse(source)
+        if version is None:
+            # アドレスとして解釈できない送信元は送信元の条件が無いルールのみに一致する
+            return self.any[4] & self.any[6]
+        mask = self.any[version]
+        node = self.roots[version]
+        for byte in data:
+            entry = node.get(byte)
+            if entry is None:
+                break
+            mask |= entry[1]
+            node = entry[0]
+            if node is None:
+                break
+        return mask
+
+
+class _VarbindPredicate:
+    __slots__ = ("key", "values", "pattern")
+
+    def __init__(self, spec):
+        if not isinstance(spec, dict):
+            raise ValueError("varbind condition must be an object")
+        key = spec.get("name") or spec.get("oid")
+        if not key:
+            raise ValueError("varbind condition requires 'name' or 'oid'")
+        self.key = key.strip(".") if spec.get("oid") else key
+        self.values = None
+        self.pattern = None
+        if "equals" in spec:
+            self.values = frozenset(str(v) for v in _as_list(spec["equals"]))
+        elif "regex" in spec:
+            try:
+                self.pattern = re.compile(spec["regex"])
+            except re.error as e:
+                raise ValueError(f"invalid regex {spec['regex']!r}: {e}") from e
+        else:
+            raise ValueError("varbind condition requires 'equals' or 'regex'")
+
+    def __call__(self, variables):
+        key = self.key
+        prefix = key + "."
+        for variable in variables:
+            info = variable.info
+            if info.name == key or info.oid == key or info.oid.startswith(prefix):
+                value = str(variable.value)
+                if self.values is not None:
+                    if value in self.values:
+                        return True
+                elif self.pattern.search(value):
+                    return True
+        return False
+
+
+class RouteRule:
+    """
+    コンパイル済みのルーティングルール。
+    """
+
+    __slots__ = ("name", "sinks", "predicates", "continue_matching", "matched")
+
+    def __init__(self, name, sinks, predicates, continue_matching):
+        self.name = name
+        self.sinks = sinks
+        self.predicates = predicates
+        self.continue_matching = continue_matching
+        self.matched = 0
+
+
+class Router:
+    """
+    Trapの送信先シンクを決定するルーティングルールの集合。
+
+    ルールは起動時に、snmpTrapOID のサブツリー条件をOIDプレフィックスのトライに、送信元の条件をCIDRの基数木に
+    コンパイルします。各ルールはビットマスクの1ビットに対応し、Trapごとの照合は
+    トライと基数木を1回ずつたどって得たマスクの論理積で候補ルールを求め、候補のみ変数の条件を評価します。
+    このためルールが数千件に増えても、Trapごとの照合コストはほぼ一定です。
+
+    ルールは定義順に評価し、最初に一致したルールのシンクに送ります (continue が true のルールは後続のルールも評価します)。
+    どのルールにも一致しない場合は default のシンクに送ります。
+    """
+
+    def __init__(self, rules, sinks=None, default=(DEFAULT_SINK,)):
+        """
+        Args:
+            rules: ルール定義 (辞書) のリスト
+                   {"name", "trap_oid": OID / リスト, "source": CIDR / リスト,
+                    "varbinds": [{"name" / "oid", "equals" / "regex"}], "sinks": [シンク名], "continue": bool}
+            sinks: シンク名 -> シンク定義 ({"type": "stdout"}, {"type": "file", "dir", "prefix"},
+                   {"type": "webhook", "urls": "URL[|N],..." / ["URL[|N]" / {"url", "max_in_flight"}], "mode"})
+            default: どのルールにも一致しないTrapの送信先シンク名のリスト
+        """
+        self.sinks = dict(sinks or {})
+        for name, spec in self.sinks.items():
+            if name == DEFAULT_SINK:
+                raise ValueError(f"sink name '{DEFAULT_SINK}' is reserved")
+            if not (isinstance(name, str) and name.isascii() and name.isidentifier()):
+                # シンク名はメトリクス名 (snmp_dispatcher_routing_routed_<シンク名> など) の一部になる
+                raise ValueError(f"sink name must consist of letters, digits and underscores: {name!r}")
+            self._check_sink(name, spec)
+        self.default = self._sink_names(default, "default")
+
+        self.rules = []
+        self._oids = _OidTrie()
+        self._sources = _CidrTree()
+        for i, spec in enumerate(rules):
+            try:
+                self._add_rule(i, spec)
+            except (ValueError, TypeError, AttributeError) as e:
+                raise ValueError(f"rule #{i}: {e}") from e
+
+        self.routed = dict.fromkeys([DEFAULT_SINK, *self.sinks], 0)
+        self.unmatched = 0
+
+    def _check_sink(self, name, spec):
+        if not isinstance(spec, dict) or spec.get("type") not in SINK_TYPES:
+            raise ValueError(f"sink '{name}': type must be one of {', '.join(SINK_TYPES)}")
+        sink_type = spec["type"]
+        unknown = set(spec) - set(SINK_FIELDS[sink_type])
+        if unknown:
+            raise ValueError(f"sink '{name}': unknown fields for {sink_type} sink: {', '.join(sorted(unknown))}")
+        if sink_type == "file":
+            for field in ("dir", "prefix"):
+                if field in spec and (not isinstance(spec[field], str) or not spec[field]):
+                    raise ValueError(f"sink '{name}': {field} must be a non-empty string")
+            if "/" in spec.get("prefix", ""):
+                raise ValueError(f"sink '{name}': prefix must not contain '/'")
+        elif sink_type == "webhook":
+            if spec.get("mode", WEBHOOK_MODES[0]) not in WEBHOOK_MODES:
+                raise ValueError(f"sink '{name}': mode must be one of {', '.join(WEBHOOK_MODES)}")
+            # 最大同時送信数の既定値はここでは検証に使わないため仮の値を渡す
+            endpoints = parse_endpoints(spec.get("urls", ""), 1)
+            if not endpoints:
+                raise ValueError(f"sink '{name}': urls is required")
+            for url, _ in endpoints:
+                if not url.startswith(("http://", "https://")):
+                    raise ValueError(f"sink '{name}': invalid webhook URL {url!r}")
+
+    def _sink_names(self, names, what):
+        names = tuple(_as_list(names))
+        for name in names:
+            if name != DEFAULT_SINK and name not in self.sinks:
+                raise ValueError(f"{what}: unknown sink '{name}'")
+        return names
+
+    def _add_rule(self, i, spec):
+        if not isinstance(spec, dict):
+            raise ValueError("rule must be an object")
+        if "sinks" not in spec:
+            raise ValueError("'sinks' is required (use an empty list to discard matching traps)")
+        bit = 1 << i
+        rule = RouteRule(
+            spec.get("name") or f"rule{i}",
+            self._sink_names(spec["sinks"], "sinks"),
+            tuple(_VarbindPredicate(v) for v in _as_list(spec.get("varbinds"))),
+            bool(spec.get("continue", False))
+        )
+
+        trap_oids = _as_list(spec.get("trap_oid"))
+        for trap_oid in trap_oids:
+            self._oids.add(_oid_arcs(trap_oid, "trap_oid"), bit)
+        if not trap_oids:
+            self._oids.add([], bit)
+
+        sources = _as_list(spec.get("source"))
+        for source in sources:
+            try:
+                self._sources.add(ipaddress.ip_network(source, strict=False), bit)
+            except ValueError as e:
+                raise ValueError(f"invalid source {source!r}: {e}") from e
+        if not sources:
+            self._sources.add_any(bit)
+
+        self.rules.append(rule)
+
+    def __len__(self):
+        return len(self.rules)
+
+    def match(self, source_ip, trap_oid, variables):
+        """
+        一致したルールのシンク名を返します。
+
+        Args:
+            source_ip: 送信元IPアドレス
+            trap_oid: snmpTrapOID.0 の値 (ドット区切りのOID, 無い場合は None)
+            variables: Variable のシーケンス (変数の条件の評価に使用)
+
+        Returns:
+            tuple: シンク名 (どのルールにも一致しない場合は default)
+        """
+        candidates = self._oids.match(trap_oid) & self._sources.match(source_ip)
+        sinks = None
+        rules = self.rules
+        while candidates:
+            lowest = candidates & -candidates
+            candidates ^= lowest
+            rule = rules[lowest.bit_length() - 1]
+            if rule.predicates and not all(predicate(variables) for predicate in rule.predicates):
+                continue
+            rule.matched += 1
+            if not rule.continue_matching:
+                return rule.sinks if sinks is None else tuple(dict.fromkeys(sinks + rule.sinks))
+            sinks = rule.sinks if sinks is None else sinks + rule.sinks
+        if sinks is None:
+            self.unmatched += 1
+            return self.default
+        return tuple(dict.fromkeys(sinks))
+
+    def route(self, trap):
+        """
+        TrapRecord の送信先シンク名を返します。
+        """
+        sinks = self.match(trap.source_ip, trap.trap_oid, trap.variables)
+        for name in sinks:
+            self.routed[name] += 1
+        return sinks
+
+    def stats(self):
+        """
+        ルーティングの統計情報を返します。
+
+        Returns:
+            dict: rules, unmatched, routed (シンクごとの送信件数)
+        """
+        return {
+            "rules": len(self.rules),
+            "unmatched": self.unmatched,
+            "routed": dict(self.routed)
+        }
+
+
+def load_router(path):
+    """
+    ルーティング設定ファイル (JSON) を読み込んでコンパイルします。
+
+    {"sinks": {名前: {"type": ..., ...}}, "rules": [...], "default": [シンク名]}
+
+    Raises:
+        ValueError: ファイルの内容が不正な場合
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        raise ValueError(f"Invalid routing file {path}: {e}") from e
+    if not isinstance(config, dict):
+        raise ValueError(f"Invalid routing file {path}: top level must be an object")
+    try:
+        router = Router(
+            config.get("rules", []),
+            sinks=config.get("sinks"),
+            default=config.get("default", [DEFAULT_SINK])
+        )
+    except ValueError as e:
+        raise ValueError(f"Invalid routing file {path}: {e}") from e
+    logger.info(f"Loaded {len(router)} routing rules and {len(router.sinks)} sinks from {path}")
+    return router
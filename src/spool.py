@@ -0,0 +1,349 @@
+import asyncio
+import json
+import os
+import struct
+import time
+import zlib
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# スプールのディスクフォーマット
+#
+#   spool-<seq>.log : 追記専用のセグメントファイル
+#                     レコード = length(I) crc32(I) + JSON (UTF-8)
+#   checkpoint.json : 送信済み位置 {"segment": seq, "offset": bytes}
+#   dead-letter.ndjson : 送信先が恒久的に拒否したTrap (NDJSON, segment_bytes を超えると .1 に退避)
+#
+# 書き込み途中でプロセスが停止した場合、セグメント末尾の不完全なレコードは読み飛ばす。
+
+_RECORD_HEADER = struct.Struct("<II")
+_SEGMENT_PREFIX = "spool-"
+_SEGMENT_SUFFIX = ".log"
+_CHECKPOINT = "checkpoint.json"
+_DEAD_LETTER = "dead-letter.ndjson"
+
+
+class Spool:
+    """
+    Webhook送信に失敗したTrapを保持する、ディスク上の追記専用スプール。
+    セグメントファイルとチェックポイントにより、再起動後も順序通りに再送できます。
+    """
+
+    def __init__(self, directory, max_bytes, segment_bytes, fsync_batch=100):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.segment_bytes = segment_bytes
+        self.fsync_batch = fsync_batch
+
+        os.makedirs(directory, exist_ok=True)
+
+        # seq -> セグメントサイズ (バイト)
+        self._segments = {}
+        for filename in os.listdir(directory):
+            if filename.startswith(_SEGMENT_PREFIX) and filename.endswith(_SEGMENT_SUFFIX):
+                seq = int(filename[len(_SEGMENT_PREFIX):-len(_SEGMENT_SUFFIX)])
+                self._segments[seq] = os.path.getsize(self._segment_path(seq))
+
+        self._read_seq, self._read_offset = self._load_checkpoint()
+        for seq in [s for s in self._segments if s < self._read_seq]:
+            self._remove_segment(seq)
+
+        # 再起動時は既存セグメントに追記せず、新しいセグメントを開始する
+        self._write_seq = max(self._segments, default=self._read_seq - 1) + 1
+        self._file = None
+        # ローテーションで閉じた、fsync待ちのセグメントのファイルディスクリプタ (dup)
+        self._unsynced_fds = []
+        self._open_segment(self._write_seq)
+        if self._read_seq not in self._segments:
+            self._read_seq, self._read_offset = min(self._segments), 0
+
+        self._unsynced = 0
+        self.appended = 0
+        self.replayed = 0
+        self.evicted_segments = 0
+        self.evicted_bytes = 0
+        self.dead_lettered = 0
+        self.corrupt_records = 0
+        self._last_corrupt = None
+        self._replay_window = deque()
+
+        if self.has_pending():
+            logger.info(f"Spool has {self.pending_bytes} bytes pending replay in {directory}")
+
+    def _segment_path(self, seq):
+        return os.path.join(self.directory, f"{_SEGMENT_PREFIX}{seq:020d}{_SEGMENT_SUFFIX}")
+
+    def _load_checkpoint(self):
+        path = os.path.join(self.directory, _CHECKPOINT)
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            return int(data["segment"]), int(data["offset"])
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Invalid spool checkpoint {path}, replaying from the oldest segment: {e}")
+        return min(self._segments, default=0), 0
+
+    def _save_checkpoint(self):
+        path = os.path.join(self.directory, _CHECKPOINT)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"segment": self._read_seq, "offset": self._read_offset}, f)
+        os.replace(tmp_path, path)
+
+    def _open_segment(self, seq):
+        if self._file is not None:
+            self._file.flush()
+            if self._unsynced:
+                # fsync は sync() / sync_async() でまとめて行う
+                self._unsynced_fds.append(os.dup(self._file.fileno()))
+                self._unsynced = 0
+            self._file.close()
+        self._write_seq = seq
+        self._file = open(self._segment_path(seq), "ab")
+        self._segments.setdefault(seq, 0)
+
+    def _remove_segment(self, seq):
+        try:
+            os.remove(self._segment_path(seq))
+        except FileNotFoundError:
+            pass
+        return self._segments.pop(seq, 0)
+
+    @property
+    def total_bytes(self):
+        """
+        ディスク上のセグメントの合計サイズ。
+        """
+        return sum(self._segments.values())
+
+    @property
+    def pending_bytes(self):
+        """
+        未送信データのサイズ。
+        """
+        # 読み出し位置より前のセグメントは commit() 時に削除済み
+        return self.total_bytes - self._read_offset
+
+    def has_pending(self):
+        """
+        未送信のTrapが残っているかを返します。
+        """
+        return (self._read_seq, self._read_offset) != (self._write_seq, self._segments[self._write_seq])
+
+    def append(self, data: dict):
+        """
+        Trapをスプールに追記します。
+        fsyncはイベントループを止めないよう、ここでは行わずに sync_async() でまとめて行います。
+
+        Returns:
+            bool: 未fsyncの書き込みが fsync_batch 件に達した (sync_async() を呼び出すべき) 場合は True
+        """
+        payload = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        record = _RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+        if self._segments[self._write_seq] and self._segments[self._write_seq] + len(record) > self.segment_bytes:
+            self._open_segment(self._write_seq + 1)
+
+        self._file.write(record)
+        self._segments[self._write_seq] += len(record)
+        self.appended += 1
+
+        self._unsynced += 1
+        self._enforce_limit()
+        return self._unsynced >= self.fsync_batch
+
+    def _take_unsynced_fds(self):
+        """
+        書き込みバッファをフラッシュし、fsyncが必要なファイルディスクリプタ (dup) を返します。
+        """
+        fds, self._unsynced_fds = self._unsynced_fds, []
+        if self._file is not None and self._unsynced:
+            self._file.flush()
+            fds.append(os.dup(self._file.fileno()))
+            self._unsynced = 0
+        return fds
+
+    @staticmethod
+    def _fsync_fds(fds):
+        for fd in fds:
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def sync(self):
+        """
+        書き込みバッファをフラッシュしてfsyncします (終了時用。呼び出し元をブロックします)。
+        """
+        self._fsync_fds(self._take_unsynced_fds())
+
+    async def sync_async(self):
+        """
+        書き込みバッファをフラッシュし、fsyncを別スレッドで行います。
+        fsyncはdupしたファイルディスクリプタに対して行うため、その間にセグメントがローテーションされても問題ありません。
+        """
+        fds = self._take_unsynced_fds()
+        if fds:
+            await asyncio.to_thread(self._fsync_fds, fds)
+
+    def _enforce_limit(self):
+        """
+        サイズ上限を超えた場合、最も古いセグメントから削除します。
+        """
+        while self.total_bytes > self.max_bytes and len(self._segments) > 1:
+            oldest = min(self._segments)
+            if oldest == self._write_seq:
+                break
+            size = self._remove_segment(oldest)
+            self.evicted_segments += 1
+            self.evicted_bytes += size
+            if oldest == self._read_seq:
+                self._read_seq, self._read_offset = min(self._segments), 0
+                self._save_checkpoint()
+            logger.warning(f"Spool exceeded {self.max_bytes} bytes, evicted oldest segment ({size} bytes)")
+
+    def dead_letter(self, items):
+        """
+        送信先が恒久的に拒否した (再送しても受け入れられない) TrapをNDJSONでデッドレターファイルに書き出します。
+        ファイルが segment_bytes を超えた場合は1世代だけ残してローテーションします。
+        """
+        path = os.path.join(self.directory, _DEAD_LETTER)
+        data = "".join(json.dumps(item, ensure_ascii=False) + "\n" for item in items).encode("utf-8")
+        try:
+            if os.path.exists(path) and os.path.getsize(path) + len(data) > self.segment_bytes:
+                os.replace(path, path + ".1")
+            with open(path, "ab") as f:
+                f.write(data)
+        except OSError as e:
+            logger.error(f"Failed to write {len(items)} traps to dead letter file {path}: {e}")
+        self.dead_lettered += len(items)
+
+    def read(self, max_items):
+        """
+        チェックポイント位置から最大 max_items 件のTrapを読み出します。
+        読み出しただけでは位置は進まず、送信に成功した後に commit() を呼び出します。
+
+        Returns:
+            tuple: (Trapのリスト, commit() に渡す位置)
+        """
+        # 書き込みバッファに残っているレコードも読み出せるようにする
+        self._file.flush()
+
+        items = []
+        seq, offset = self._read_seq, self._read_offset
+        while len(items) < max_items and seq in self._segments:
+            corrupt = False
+            with open(self._segment_path(seq), "rb") as f:
+                f.seek(offset)
+                while len(items) < max_items:
+                    header = f.read(_RECORD_HEADER.size)
+                    if not header:
+                        break
+                    length, crc = _RECORD_HEADER.unpack(header) if len(header) == _RECORD_HEADER.size else (0, None)
+                    payload = f.read(length)
+                    if crc is None or len(payload) < length or zlib.crc32(payload) != crc:
+                        corrupt = True
+                        break
+                    items.append(json.loads(payload))
+                    offset += _RECORD_HEADER.size + length
+
+            if corrupt:
+                # 再送の再試行で同じレコードを読み直した場合は数えない
+                if (seq, offset) != self._last_corrupt:
+                    self._last_corrupt = (seq, offset)
+                    self.corrupt_records += 1
+                    logger.warning(f"Truncated or corrupt spool record in segment {seq} at offset {offset}")
+                if seq == self._write_seq:
+                    # 書き込み中のセグメントの壊れたレコード (書き込みの失敗) 以降は区切りが分からず読み出せないため、
+                    # 新しいセグメントに切り替えて残りを読み飛ばす (読み出し位置が進まず再送が止まるのを防ぐ)
+                    logger.warning(f"Skipping the rest of spool segment {seq} after a corrupt record")
+                    self._open_segment(self._write_seq + 1)
+
+            if len(items) >= max_items or seq == self._write_seq:
+                break
+            # このセグメントは読み終えた (末尾の不完全なレコードは読み飛ばす)
+            seq = min(s for s in self._segments if s > seq)
+            offset = 0
+
+        return items, (seq, offset)
+
+    def commit(self, position, count):
+        """
+        送信に成功した位置までチェックポイントを進め、不要になったセグメントを削除します。
+        """
+        # 送信中にサイズ上限で読み出し位置のセグメントが削除された場合は位置を戻さない
+        if position >= (self._read_seq, self._read_offset):
+            self._read_seq, self._read_offset = position
+        for seq in [s for s in self._segments if s < self._read_seq]:
+            self._remove_segment(seq)
+        self._save_checkpoint()
+
+        self.replayed += count
+        now = time.monotonic()
+        self._replay_window.append((now, count))
+        while self._replay_window and now - self._replay_window[0][0] > 10:
+            self._replay_window.popleft()
+
+    @property
+    def replay_rate(self):
+        """
+        直近10秒間の再送レート (件/秒)。
+        """
+        now = time.monotonic()
+        return sum(count for t, count in self._replay_window if now - t <= 10) / 10
+
+    def close(self):
+        """
+        バッファをfsyncしてセグメントファイルをクローズします。
+        """
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+    def remove(self):
+        """
+        スプールをクローズし、セグメントファイルとチェックポイントを削除します (デッドレターファイルは残します)。
+        """
+        self.close()
+        for seq in list(self._segments):
+            self._remove_segment(seq)
+        try:
+            os.remove(os.path.join(self.directory, _CHECKPOINT))
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def exists(directory):
+        """
+        ディレクトリにスプールのセグメントファイルがあるかを返します。
+        """
+        try:
+            filenames = os.listdir(directory)
+        except FileNotFoundError:
+            return False
+        return any(name.startswith(_SEGMENT_PREFIX) and name.endswith(_SEGMENT_SUFFIX) for name in filenames)
+
+    def stats(self):
+        """
+        スプールの統計情報を返します。
+
+        Returns:
+            dict: bytes, pending_bytes, appended, replayed, replay_rate, evicted_segments, evicted_bytes,
+                  dead_lettered, corrupt_records
+        """
+        return {
+            "bytes": self.total_bytes,
+            "pending_bytes": self.pending_bytes,
+            "appended": self.appended,
+            "replayed": self.replayed,
+            "replay_rate": self.replay_rate,
+            "evicted_segments": self.evicted_segments,
+            "evicted_bytes": self.evicted_bytes,
+            "dead_lettered": self.dead_lettered,
+            "corrupt_records": self.corrupt_records
+        }
@@ -0,0 +1,204 @@
+import asyncio
+import json
+import logging
+import sys
+import threading
+from collections import deque
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson はオプション
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+
+def _encode_json(data):
+    return (json.dumps(data, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def _encode_orjson(data):
+    return orjson.dumps(data, option=orjson.OPT_APPEND_NEWLINE)
+
+
+class StdoutSink:
+    """
+    TrapをNDJSONとして標準出力へ書き出すバッファ付きシンク。
+
+    write() はイベントループ上でJSONをバイト列のバッファに追記するだけで、
+    バッファが buffer_bytes に達するか flush_interval_ms が経過した時点で
+    まとめて書き込みスレッドへ渡します。標準出力への書き込み (パイプが詰まった場合のブロックを含む) は
+    書き込みスレッドで行うため、イベントループをブロックしません。
+    """
+
+    def __init__(self, stream=None, buffer_bytes=65536, flush_interval_ms=100,
+                 max_pending_bytes=64 * 1024 * 1024, encoder="auto"):
+        """
+        Args:
+            stream: 書き込み先のバイナリストリーム (None の場合は sys.stdout.buffer)
+            buffer_bytes: この量に達したら即座に書き込みスレッドへ渡すバッファサイズ
+            flush_interval_ms: バッファを書き込みスレッドへ渡すまでの最大待機時間 (ミリ秒)
+            max_pending_bytes: 書き込みスレッドが滞留させる最大量 (超過分は破棄)
+            encoder: "auto" (orjsonがあれば使用), "json", "orjson"
+        """
+        self.stream = stream if stream is not None else sys.stdout.buffer
+        self.buffer_bytes = buffer_bytes
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_pending_bytes = max_pending_bytes
+
+        if encoder == "orjson" and orjson is None:
+            logger.warning("orjson is not installed, falling back to the standard json encoder")
+        if encoder in ("auto", "orjson") and orjson is not None:
+            self.encoder = "orjson"
+            self._encode = _encode_orjson
+        else:
+            self.encoder = "json"
+            self._encode = _encode_json
+
+        self._buffer = bytearray()
+        self._flush_handle = None
+
+        # 書き込みスレッドへ渡すチャンク
+        self._chunks = deque()
+        self._pending_bytes = 0
+        self._condition = threading.Condition()
+        self._closed = False
+        self.written = 0
+        self.bytes_written = 0
+        self.writes = 0
+        self.dropped = 0
+        self.errors = 0
+
+        self._thread = threading.Thread(target=self._writer, name=self.thread_name, daemon=True)
+        self._thread.start()
+
+    thread_name = "stdout-sink"
+
+    def write(self, data: dict):
+        """
+        Trapデータをエンコードしてバッファに追記します。
+        """
+        self._buffer += self._encode(data)
+        self.written += 1
+
+        if len(self._buffer) >= self.buffer_bytes or self.flush_interval <= 0:
+            self.flush()
+        elif self._flush_handle is None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                # イベントループ外から呼ばれた場合はタイマーを使わず即座に渡す
+                self.flush()
+                return
+            self._flush_handle = loop.call_later(self.flush_interval, self.flush)
+
+    def flush(self):
+        """
+        バッファの内容を書き込みスレッドへ渡します。
+        """
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._buffer:
+            return
+
+        chunk = bytes(self._buffer)
+        self._buffer.clear()
+        with self._condition:
+            if self._pending_bytes + len(chunk) > self.max_pending_bytes:
+                # 標準出力の読み手が追いつかない場合、メモリを使い切らないよう破棄する
+                self.dropped += chunk.count(b"\n")
+                logger.warning(f"Stdout is not keeping up, dropped {len(chunk)} bytes of output")
+                return
+            self._chunks.append(chunk)
+            self._pending_bytes += len(chunk)
+            self._condition.notify()
+
+    def _writer(self):
+        """
+        チャンクをまとめて書き込むスレッド。
+        """
+        while True:
+            with self._condition:
+                if not self._chunks and not self._closed:
+                    self._condition.wait(self._idle_timeout())
+                if not self._chunks and self._closed:
+                    break
+                chunks = list(self._chunks)
+                self._chunks.clear()
+
+            if not chunks:
+                # ロックの外で行い、ローテーションやフラッシュの間も flush() を止めない
+                try:
+                    self._idle()
+                except Exception as e:
+                    self.errors += 1
+                    logger.error(f"Failed to flush {self.thread_name} output: {e}")
+                continue
+
+            data = b"".join(chunks)
+            try:
+                self._write(data)
+                self.bytes_written += len(data)
+                self.writes += 1
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Failed to write {self.thread_name} output: {e}")
+            finally:
+                with self._condition:
+                    self._pending_bytes -= len(data)
+
+        try:
+            self._finish()
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Failed to close {self.thread_name} output: {e}")
+
+    def _write(self, data):
+        """
+        書き込みスレッドから呼び出され、まとめたチャンクを書き込みます。
+        """
+        self.stream.write(data)
+        self.stream.flush()
+
+    def _idle_timeout(self):
+        """
+        書き込むチャンクが無い場合に書き込みスレッドが待機する最大秒数 (None の場合は無期限)。
+        """
+        return None
+
+    def _idle(self):
+        """
+        書き込むチャンクが無いまま待機がタイムアウトした場合に書き込みスレッドから呼び出されます。
+        """
+
+    def _finish(self):
+        """
+        close() で全てのチャンクを書き込んだ後、書き込みスレッドの終了直前に呼び出されます。
+        """
+
+    def close(self, timeout=5.0):
+        """
+        バッファを書き出してから書き込みスレッドを停止します。
+        """
+        self.flush()
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join(timeout)
+
+    def stats(self):
+        """
+        シンクの統計情報を返します。
+
+        Returns:
+            dict: written, bytes_written, writes, dropped, errors, pending_bytes
+        """
+        return {
+            "written": self.written,
+            "bytes_written": self.bytes_written,
+            "writes": self.writes,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "pending_bytes": self._pending_bytes + len(self._buffer)
+        }
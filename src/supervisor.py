@@ -0,0 +1,151 @@
+import multiprocessing
+import os
+import queue
+import signal
+import time
+import logging
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+def merge_stats(total: dict, stats: dict):
+    """
+    ワーカーの統計情報を集計用の辞書に加算します (数値のみ、ネストした辞書は再帰的に)。
+    """
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            merge_stats(total.setdefault(key, {}), value)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            total[key] = total.get(key, 0) + value
+
+class Supervisor:
+    """
+    複数のワーカープロセスを起動・監視するクラス。
+    各ワーカーは SO_REUSEPORT で UDP/162 をバインドし、独立した SnmpEngine・MibResolver・Dispatcher を持ちます。
+    異常終了したワーカーは再起動し、ワーカーから定期的に送られる統計情報を集計します。
+    """
+
+    def __init__(self, target, worker_count=None):
+        """
+        Args:
+            target: ワーカープロセスで実行する関数 target(worker_id, stats_queue)
+            worker_count: ワーカー数 (None の場合は settings.worker_processes)
+        """
+        self.target = target
+        self.worker_count = worker_count or settings.worker_processes
+        self._context = multiprocessing.get_context("fork")
+        self.stats_queue = self._context.Queue()
+
+        self._workers = {}
+        self._restart_at = {}
+        self.worker_stats = {}
+        self.restarts = 0
+        self._stopping = False
+
+    def _start_worker(self, worker_id):
+        process = self._context.Process(
+            target=self.target,
+            args=(worker_id, self.stats_queue),
+            name=f"trap-worker-{worker_id}"
+        )
+        process.start()
+        self._workers[worker_id] = (process, time.monotonic())
+        logger.info(f"Started worker {worker_id} (pid {process.pid})")
+
+    def _handle_signal(self, signum, frame):
+        logger.info(f"Supervisor received signal {signum}, stopping workers")
+        self._stopping = True
+
+    def _handle_reload(self, signum, frame):
+        # MIBのリロードは各ワーカーが行うため、SIGHUPを全ワーカーへ転送する
+        logger.info("Supervisor received SIGHUP, forwarding to workers")
+        for process, _ in self._workers.values():
+            if process.is_alive():
+                try:
+                    os.kill(process.pid, signal.SIGHUP)
+                except OSError as e:
+                    logger.warning(f"Failed to forward SIGHUP to pid {process.pid}: {e}")
+
+    def aggregated_stats(self):
+        """
+        全ワーカーの最新の統計情報を合算して返します。
+        """
+        total = {}
+        for stats in self.worker_stats.values():
+            merge_stats(total, stats)
+        return {"workers": len(self._workers), "restarts": self.restarts, **total}
+
+    def _collect_stats(self, timeout):
+        try:
+            worker_id, stats = self.stats_queue.get(timeout=timeout)
+            self.worker_stats[worker_id] = stats
+        except queue.Empty:
+            pass
+
+    def _check_workers(self):
+        now = time.monotonic()
+        for worker_id, (process, started_at) in list(self._workers.items()):
+            if process.is_alive():
+                continue
+            if worker_id not in self._restart_at:
+                # 起動直後に落ち続けるワーカーで再起動が暴走しないよう、待機してから再起動する
+                delay = settings.worker_restart_delay if now - started_at < settings.worker_restart_delay else 0
+                logger.error(f"Worker {worker_id} (pid {process.pid}) exited with code {process.exitcode}, "
+                             f"restarting in {delay:.1f}s")
+                self._restart_at[worker_id] = now + delay
+            if now >= self._restart_at[worker_id]:
+                del self._restart_at[worker_id]
+                self.restarts += 1
+                self._start_worker(worker_id)
+
+    def _stop_workers(self):
+        """
+        全ワーカーにSIGTERMを送り、受信キューの送信完了を待ってから終了させます。
+        """
+        for process, _ in self._workers.values():
+            if process.is_alive():
+                process.terminate()
+
+        deadline = time.monotonic() + settings.shutdown_drain_timeout + 5
+        for worker_id, (process, _) in self._workers.items():
+            while process.is_alive() and time.monotonic() < deadline:
+                # 終了時に送られる最終統計を取りこぼさないよう、待機中もキューを読む
+                self._collect_stats(timeout=0.1)
+            if process.is_alive():
+                logger.warning(f"Worker {worker_id} (pid {process.pid}) did not stop in time, killing")
+                process.kill()
+                process.join()
+
+        while True:
+            try:
+                worker_id, stats = self.stats_queue.get_nowait()
+                self.worker_stats[worker_id] = stats
+            except queue.Empty:
+                break
+
+    def run(self):
+        """
+        ワーカーを起動し、終了シグナルを受けるまで監視します。
+        """
+        signal.signal(signal.SIGTERM, self._handle_signal)
+        signal.signal(signal.SIGINT, self._handle_signal)
+        signal.signal(signal.SIGHUP, self._handle_reload)
+
+        logger.info(f"Starting supervisor with {self.worker_count} workers")
+        for worker_id in range(self.worker_count):
+            self._start_worker(worker_id)
+
+        last_report = time.monotonic()
+        while not self._stopping:
+            self._collect_stats(timeout=0.5)
+            if self._stopping:
+                break
+            self._check_workers()
+
+            if time.monotonic() - last_report >= settings.worker_stats_interval:
+                last_report = time.monotonic()
+                logger.info(f"Aggregated worker stats: {self.aggregated_stats()}")
+
+        self._stop_workers()
+        logger.info(f"Final aggregated worker stats: {self.aggregated_stats()}")
+        logger.info("Supervisor shutdown complete.")
@@ -0,0 +1,152 @@
+import sys
+from datetime import datetime, timezone
+
+SNMP_TRAP_OID = "1.3.6.1.6.3.1.1.4.1.0"
+
+
+def format_timestamp(timestamp):
+    """
+    UNIX時刻を出力用のISO 8601形式 (UTC) の文字列に変換します。
+    """
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+
+class OidInfo:
+    """
+    OIDの解決結果。MibResolverの解決キャッシュに保持され、同じOIDの変数間で共有されます。
+    MIB名・オブジェクト名はインターンし、OID・サフィックスの文字列もOIDごとに1つだけ生成します。
+    """
+
+    __slots__ = ("oid", "mib", "name", "suffix", "formatter", "syntax")
+
+    def __init__(self, oid, mib, name, suffix, formatter, syntax):
+        self.oid = oid
+        self.mib = sys.intern(mib)
+        self.name = sys.intern(name)
+        self.suffix = suffix
+        self.formatter = formatter
+        self.syntax = sys.intern(syntax)
+
+
+class Variable:
+    """
+    解決済みの変数 (value_format が typed の場合)。
+    """
+
+    __slots__ = ("info", "value", "raw", "typed")
+
+    def __init__(self, info, value, raw=None, typed=None):
+        self.info = info
+        self.value = value
+        self.raw = raw
+        self.typed = typed
+
+    @property
+    def oid(self):
+        return self.info.oid
+
+    @property
+    def mib(self):
+        return self.info.mib
+
+    @property
+    def name(self):
+        return self.info.name
+
+    def to_dict(self):
+        info = self.info
+        return {
+            "oid": info.oid,
+            "mib": info.mib,
+            "name": info.name,
+            "suffix": info.suffix,
+            "value": self.value,
+            "raw": self.raw,
+            "typed": self.typed,
+            "syntax": info.syntax
+        }
+
+
+class PrettyVariable(Variable):
+    """
+    解決済みの変数 (value_format が pretty の場合、および解決中にエラーが発生した場合)。
+    出力には raw / typed / syntax を含みません。
+    """
+
+    __slots__ = ()
+
+    def to_dict(self):
+        info = self.info
+        return {
+            "oid": info.oid,
+            "mib": info.mib,
+            "name": info.name,
+            "suffix": info.suffix,
+            "value": self.value
+        }
+
+
+class TrapRecord:
+    """
+    受信したTrapの内部表現。
+
+    受信キューや重複抑止で滞留している間のメモリ使用量を抑えるため、変数ごとの辞書は作らず、
+    シンクに渡す直前 (Dispatcher.dispatch) で to_dict() によりJSONと同じ形の辞書に変換します。
+    timestamp は受信時刻 (UNIX時刻) で、文字列への変換も to_dict() で行います。
+    """
+
+    __slots__ = ("source_ip", "source_port", "snmp_version", "variables", "timestamp", "extra", "trap_info")
+
+    def __init__(self, source_ip, source_port, snmp_version, variables, timestamp=None, extra=None, trap_info=None):
+        """
+        Args:
+            source_ip: 送信元IPアドレス
+            source_port: 送信元ポート
+            snmp_version: "v1" / "v2c" / "v3"
+            variables: Variable のタプル
+            timestamp: 受信時刻 (UNIX時刻, None の場合は出力時に Dispatcher が付与)
+            extra: 出力に追加するフィールドの辞書 (重複抑止の集約情報など)
+            trap_info: snmpTrapOID の値の解決結果 (OidInfo, 出力の trap_name / trap_mib)
+        """
+        self.source_ip = source_ip
+        self.source_port = source_port
+        self.snmp_version = snmp_version
+        self.variables = variables
+        self.timestamp = timestamp
+        self.extra = extra
+        self.trap_info = trap_info
+
+    @property
+    def trap_oid(self):
+        """
+        snmpTrapOID.0 の値 (含まれない場合は None)。
+        """
+        for variable in self.variables:
+            if variable.info.oid == SNMP_TRAP_OID:
+                return variable.value
+        return None
+
+    def to_dict(self):
+        data = {
+            "source_ip": self.source_ip,
+            "source_port": self.source_port,
+            "snmp_version": self.snmp_version
+        }
+        if self.trap_info is not None:
+            data["trap_name"] = self.trap_info.name
+            data["trap_mib"] = self.trap_info.mib
+        data["variables"] = [variable.to_dict() for variable in self.variables]
+        if self.timestamp is not None:
+            data["timestamp"] = format_timestamp(self.timestamp)
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+def as_dict(trap):
+    """
+    TrapRecord をシンクに渡す辞書に変換します (辞書の場合はそのまま返します)。
+    """
+    if isinstance(trap, TrapRecord):
+        return trap.to_dict()
+    return trap
@@ -0,0 +1,211 @@
+import asyncio
+import ipaddress
+import logging
+import os
+import socket
+import sys
+from src import metrics
+
+logger = logging.getLogger(__name__)
+
+# Pythonの socket モジュールは SO_RCVBUFFORCE を定義していないため、Linuxの値を使用する
+SO_RCVBUFFORCE = getattr(socket, "SO_RCVBUFFORCE", 33 if sys.platform.startswith("linux") else None)
+
+PROC_NET_FILES = ("/proc/net/udp", "/proc/net/udp6")
+
+
+def parse_listen_addresses(text, default_port):
+    """
+    受信アドレスの設定を (ホスト, ポート) のリストに変換します。
+
+    カンマ区切りで、各要素は "0.0.0.0", "0.0.0.0:1162", "::", "[::]:1162" のいずれかの形式です。
+
+    Raises:
+        ValueError: アドレスの形式が不正な場合
+    """
+    addresses = []
+    for item in text.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        host, port = item, default_port
+        if item.startswith("["):
+            host, sep, rest = item[1:].partition("]")
+            if not sep or (rest and not rest.startswith(":")):
+                raise ValueError(f"Invalid listen address: {item}")
+            if rest:
+                port = rest[1:]
+        elif item.count(":") == 1:
+            host, port = item.split(":")
+        try:
+            host = str(ipaddress.ip_address(host))
+            port = int(port)
+        except ValueError as e:
+            raise ValueError(f"Invalid listen address {item}: {e}") from e
+        if not 0 <= port <= 65535:
+            raise ValueError(f"Invalid listen address {item}: port out of range")
+        addresses.append((host, port))
+    if not addresses:
+        raise ValueError("No listen address configured")
+    return list(dict.fromkeys(addresses))
+
+
+def format_address(address):
+    host, port = address[0], address[1]
+    return f"[{host}]:{port}" if ":" in host else f"{host}:{port}"
+
+
+def set_receive_buffer(sock, size):
+    """
+    ソケットの受信バッファサイズを設定します。
+    権限 (CAP_NET_ADMIN) があれば SO_RCVBUFFORCE で net.core.rmem_max を超えて設定し、
+    無ければ SO_RCVBUF で rmem_max までの値を設定します。
+
+    Returns:
+        int: 実際に設定された受信バッファサイズ (Linuxではカーネルが管理領域の分を含めた2倍の値を返す)
+    """
+    forced = False
+    if SO_RCVBUFFORCE is not None:
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, SO_RCVBUFFORCE, size)
+            forced = True
+        except OSError:
+            pass
+    if not forced:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, size)
+
+    actual = sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+    effective = actual // 2 if sys.platform.startswith("linux") else actual
+    if effective < size:
+        logger.warning(
+            f"UDP receive buffer is {effective} bytes, smaller than the requested {size} bytes "
+            f"(raise net.core.rmem_max or grant CAP_NET_ADMIN)"
+        )
+    return actual
+
+
+def create_udp_socket(address, reuse_port=False, rcvbuf_bytes=0):
+    """
+    受信用のUDPソケットを作成してバインドします。
+
+    Args:
+        address: (ホスト, ポート)。ホストがIPv6アドレスの場合は IPV6_V6ONLY のソケットを作成する
+        reuse_port: SO_REUSEPORT を設定する (マルチプロセス構成)
+        rcvbuf_bytes: 受信バッファサイズ (0 の場合はOSの既定値)
+    """
+    family = socket.AF_INET6 if ":" in address[0] else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_DGRAM)
+    try:
+        if family == socket.AF_INET6:
+            # 0.0.0.0 と :: を同じポートで併用できるよう、IPv4射影アドレスは受け付けない
+            sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_V6ONLY, 1)
+        if reuse_port:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        if rcvbuf_bytes > 0:
+            set_receive_buffer(sock, rcvbuf_bytes)
+        sock.bind(address)
+        sock.setblocking(False)
+    except Exception:
+        sock.close()
+        raise
+    return sock
+
+
+class UdpDropMonitor:
+    """
+    受信ソケットのカーネル側の受信キュー長とドロップ数を /proc/net/udp・udp6 から定期的に読み取ります。
+
+    ドロップ数は受信バッファが溢れてカーネルが破棄したデータグラム数 (ソケットごとの累積値) で、
+    アプリケーション側の破棄 (受信キュー・レート制限) とは別に数えられます。
+    ソケットはinode番号で照合するため、SO_REUSEPORT で同じポートを共有する他のワーカーのソケットとは区別されます。
+    """
+
+    def __init__(self, sockets, interval, proc_files=PROC_NET_FILES):
+        """
+        Args:
+            sockets: 監視するソケットのリスト
+            interval: 読み取り間隔 (秒)
+            proc_files: 読み取るファイル (テスト用)
+        """
+        self.interval = interval
+        self.proc_files = proc_files
+        # inode -> 受信アドレスの表記
+        self._sockets = {os.fstat(sock.fileno()).st_ino: format_address(sock.getsockname()) for sock in sockets}
+        self._rcvbuf = sum(sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF) for sock in sockets)
+        self._task = None
+
+        # 受信アドレス -> (受信キューのバイト数, ドロップ数)
+        self.counters = {}
+        self.polls = 0
+        self.errors = 0
+
+    def start(self):
+        """
+        読み取りを開始します (/proc/net/udp が無い環境では何もしません)。
+        """
+        if not any(os.path.exists(path) for path in self.proc_files):
+            logger.info("UDP drop monitor disabled: /proc/net/udp is not available")
+            return
+        self.poll()
+        self._task = asyncio.create_task(self._poll_loop())
+
+    async def _poll_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            self.poll()
+
+    def poll(self):
+        """
+        /proc/net/udp・udp6 を読み取り、監視対象のソケットの受信キュー長とドロップ数を更新します。
+        """
+        counters = {}
+        try:
+            for path in self.proc_files:
+                if not os.path.exists(path):
+                    continue
+                with open(path, "r") as f:
+                    next(f, None)  # ヘッダー行
+                    for line in f:
+                        fields = line.split()
+                        # sl local_address rem_address st tx_queue:rx_queue tr tm->when retrnsmt uid timeout inode ref pointer drops
+                        if len(fields) < 13:
+                            continue
+                        address = self._sockets.get(int(fields[9]))
+                        if address is not None:
+                            counters[address] = (int(fields[4].split(":")[1], 16), int(fields[-1]))
+        except (OSError, ValueError) as e:
+            self.errors += 1
+            logger.warning(f"Failed to read UDP socket counters: {e}")
+            return
+
+        for address, (rx_queue, drops) in counters.items():
+            previous = self.counters.get(address, (0, 0))[1]
+            if drops > previous:
+                metrics.udp_kernel_drops.inc(address, amount=drops - previous)
+                logger.warning(
+                    f"Kernel dropped {drops - previous} datagrams on {address} "
+                    f"(receive queue {rx_queue} bytes)"
+                )
+        self.counters.update(counters)
+        self.polls += 1
+
+    def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self):
+        """
+        受信ソケットの統計情報を返します。
+
+        Returns:
+            dict: sockets, rcvbuf_bytes, rx_queue_bytes, drops, polls, errors
+        """
+        return {
+            "sockets": len(self._sockets),
+            "rcvbuf_bytes": self._rcvbuf,
+            "rx_queue_bytes": sum(rx_queue for rx_queue, _ in self.counters.values()),
+            "drops": sum(drops for _, drops in self.counters.values()),
+            "polls": self.polls,
+            "errors": self.errors
+        }
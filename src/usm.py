@@ -0,0 +1,412 @@
+import hashlib
+import json
+import logging
+import os
+import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pysnmp.entity import config
+from pysnmp.proto.api import v2c
+
+logger = logging.getLogger(__name__)
+
+# 認証プロトコル名 -> (プロトコルOID, パスフレーズのハッシュ関数)
+# 名前は大文字小文字と "-" / "_" を無視して照合します (例: "SHA-256", "sha256")
+AUTH_PROTOCOLS = {
+    "none": (config.USM_AUTH_NONE, None),
+    "md5": (config.USM_AUTH_HMAC96_MD5, hashlib.md5),
+    "sha": (config.USM_AUTH_HMAC96_SHA, hashlib.sha1),
+    "sha1": (config.USM_AUTH_HMAC96_SHA, hashlib.sha1),
+    "sha224": (config.USM_AUTH_HMAC128_SHA224, hashlib.sha224),
+    "sha256": (config.USM_AUTH_HMAC192_SHA256, hashlib.sha256),
+    "sha384": (config.USM_AUTH_HMAC256_SHA384, hashlib.sha384),
+    "sha512": (config.USM_AUTH_HMAC384_SHA512, hashlib.sha512),
+}
+
+# 暗号化プロトコル名 -> プロトコルOID
+PRIV_PROTOCOLS = {
+    "none": config.USM_PRIV_NONE,
+    "des": config.USM_PRIV_CBC56_DES,
+    "3des": config.USM_PRIV_CBC168_3DES,
+    "aes": config.USM_PRIV_CFB128_AES,
+    "aes128": config.USM_PRIV_CFB128_AES,
+    "aes192": config.USM_PRIV_CFB192_AES,
+    "aes256": config.USM_PRIV_CFB256_AES,
+    "aes192blumenthal": config.USM_PRIV_CFB192_AES_BLUMENTHAL,
+    "aes256blumenthal": config.USM_PRIV_CFB256_AES_BLUMENTHAL,
+}
+
+KEY_TYPES = ("passphrase", "master", "localized")
+
+# RFC 3414 A.2: パスフレーズを繰り返した先頭1MiBをハッシュしたものがマスターキー
+_PASSPHRASE_EXPANSION = 1024 * 1024
+
+
+def _protocol_name(name):
+    return name.lower().replace("-", "").replace("_", "")
+
+
+def lookup_auth_protocol(name):
+    """
+    認証プロトコル名から (プロトコルOID, ハッシュ関数) を返します。
+    """
+    try:
+        return AUTH_PROTOCOLS[_protocol_name(name)]
+    except KeyError:
+        raise ValueError(f"Unknown SNMPv3 auth protocol '{name}' (expected one of {', '.join(AUTH_PROTOCOLS)})") from None
+
+
+def lookup_priv_protocol(name):
+    """
+    暗号化プロトコル名からプロトコルOIDを返します。
+    """
+    try:
+        return PRIV_PROTOCOLS[_protocol_name(name)]
+    except KeyError:
+        raise ValueError(f"Unknown SNMPv3 priv protocol '{name}' (expected one of {', '.join(PRIV_PROTOCOLS)})") from None
+
+
+def parse_hex(text):
+    """
+    "0x..." または "..." 形式の16進文字列をbytesに変換します (":" 区切りも可)。
+    """
+    text = text.strip().replace(":", "")
+    if text[:2].lower() == "0x":
+        text = text[2:]
+    return bytes.fromhex(text)
+
+
+def parse_engine_ids(text):
+    """
+    カンマ区切りのEngine ID (16進) を解析します。
+    """
+    engine_ids = []
+    for item in text.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            engine_id = parse_hex(item)
+        except ValueError as e:
+            raise ValueError(f"Invalid SNMP engine ID '{item}': {e}") from e
+        # RFC 3411: snmpEngineID は5〜32オクテット
+        if not 5 <= len(engine_id) <= 32:
+            raise ValueError(f"Invalid SNMP engine ID '{item}': must be 5 to 32 octets")
+        engine_ids.append(engine_id)
+    return engine_ids
+
+
+def hash_passphrase(passphrase: bytes, hash_func) -> bytes:
+    """
+    パスフレーズからマスターキーを生成します (RFC 3414 A.2)。
+    pysnmp の localkey.hash_passphrase と同じ結果を、64バイトごとのループではなく1回のハッシュ計算で求めます。
+    hashlib は大きな入力のハッシュ計算中にGILを解放するため、複数スレッドで並列に計算できます。
+    """
+    buffer = passphrase * (_PASSPHRASE_EXPANSION // len(passphrase) + 1)
+    return hash_func(memoryview(buffer)[:_PASSPHRASE_EXPANSION]).digest()
+
+
+class UsmUser:
+    """
+    SNMPv3 (USM) ユーザーの認証情報。
+    """
+    __slots__ = ("name", "auth_protocol", "auth_hash", "auth_key", "priv_protocol", "priv_key", "key_type", "engine_ids")
+
+    def __init__(self, name, auth_protocol="none", auth_key=None, priv_protocol="none", priv_key=None,
+                 key_type="passphrase", engine_ids=()):
+        """
+        Args:
+            name: ユーザー名
+            auth_protocol: 認証プロトコル名 (AUTH_PROTOCOLS のキー)
+            auth_key: 認証キー (key_type が passphrase の場合はパスフレーズ、それ以外は16進表記のキー)
+            priv_protocol: 暗号化プロトコル名 (PRIV_PROTOCOLS のキー)
+            priv_key: 暗号化キー (auth_key と同じ形式)
+            key_type: passphrase, master (マスターキー), localized (Engine IDでローカライズ済みのキー)
+            engine_ids: このユーザーでTrapを送信する機器のEngine ID (bytes または16進文字列)
+        """
+        if not name:
+            raise ValueError("SNMPv3 user name is required")
+        if key_type not in KEY_TYPES:
+            raise ValueError(f"User '{name}': invalid key type '{key_type}' (expected one of {', '.join(KEY_TYPES)})")
+        self.name = name
+        self.key_type = key_type
+        self.auth_protocol, self.auth_hash = lookup_auth_protocol(auth_protocol)
+        self.priv_protocol = lookup_priv_protocol(priv_protocol)
+        if self.auth_hash is None and self.priv_protocol != config.USM_PRIV_NONE:
+            raise ValueError(f"User '{name}': priv protocol '{priv_protocol}' requires an auth protocol")
+        if self.auth_hash is not None and not auth_key:
+            raise ValueError(f"User '{name}': auth key is required for auth protocol '{auth_protocol}'")
+        if self.priv_protocol != config.USM_PRIV_NONE and not priv_key:
+            raise ValueError(f"User '{name}': priv key is required for priv protocol '{priv_protocol}'")
+        self.auth_key = self._key(auth_key) if self.auth_hash is not None else None
+        self.priv_key = self._key(priv_key) if self.priv_protocol != config.USM_PRIV_NONE else None
+        if isinstance(engine_ids, str):
+            engine_ids = parse_engine_ids(engine_ids)
+        self.engine_ids = tuple(
+            parse_engine_ids(e)[0] if isinstance(e, str) else bytes(e) for e in engine_ids
+        )
+        if key_type == "localized" and len(self.engine_ids) != 1:
+            raise ValueError(f"User '{name}': localized keys require exactly one engine ID")
+
+    def _key(self, key):
+        if self.key_type == "passphrase":
+            key = key.encode("utf-8") if isinstance(key, str) else bytes(key)
+            # pysnmp (PYSNMP-USM-MIB) と同じく、RFC 3414 の推奨に従い8オクテット未満のパスフレーズは受け付けない
+            if len(key) < 8:
+                raise ValueError(f"User '{self.name}': passphrase must be at least 8 octets")
+            return key
+        return parse_hex(key) if isinstance(key, str) else bytes(key)
+
+
+def load_users(path):
+    """
+    SNMPv3ユーザーの認証情報ファイル (JSON) を読み込みます。
+
+    ファイルの形式:
+        {"engine_ids": ["0x8000..."],
+         "users": [{"name": "ops", "auth_protocol": "sha256", "auth_key": "...",
+                    "priv_protocol": "aes", "priv_key": "...", "engine_ids": ["0x8000..."]}]}
+
+    トップレベルの engine_ids は engine_ids を指定していないユーザーに適用します。
+
+    Returns:
+        list: UsmUser のリスト
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        try:
+            data = json.load(f)
+        except ValueError as e:
+            raise ValueError(f"Invalid SNMPv3 credentials file {path}: {e}") from e
+    if isinstance(data, list):
+        data = {"users": data}
+    default_engine_ids = data.get("engine_ids", ())
+
+    users = []
+    for i, entry in enumerate(data.get("users", ())):
+        try:
+            entry = dict(entry)
+            entry.setdefault("engine_ids", default_engine_ids)
+            users.append(UsmUser(**entry))
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Invalid SNMPv3 credentials file {path}: user #{i}: {e}") from e
+    return users
+
+
+class _UsmUserTable:
+    """
+    SNMP-USER-BASED-SM-MIB の usmUserTable にユーザーを追加します。
+
+    config.add_v3_user は列ごとにSMIの書き込み処理 (test / commit) を行い1ユーザーあたり数ミリ秒かかるため、
+    pysnmp がEngine IDごとのユーザーを複製する際 (USM の __clone_user_info) と同じく、
+    行の作成のみを書き込み処理で行い、各列の値は直接設定します。
+    Trapの受信に必要なローカライズ済みのキーのみを設定し、マスターキーやパスフレーズは保持しません。
+    """
+
+    def __init__(self, snmp_engine):
+        mib_builder = snmp_engine.get_mib_builder()
+        (self.user_entry,) = mib_builder.import_symbols("SNMP-USER-BASED-SM-MIB", "usmUserEntry")
+        (self.key_entry,) = mib_builder.import_symbols("PYSNMP-USM-MIB", "pysnmpUsmKeyEntry")
+        (self.zero_dot_zero,) = mib_builder.import_symbols("SNMPv2-SMI", "zeroDotZero")
+        self.snmp_engine = snmp_engine
+        self.write_variables = snmp_engine.message_dispatcher.mib_instrum_controller.write_variables
+
+    @staticmethod
+    def _set(entry, column, index, value):
+        node = entry.getNode(entry.name + (column,) + index)
+        node.syntax = node.syntax.clone(value)
+
+    def add(self, user_name, engine_id, auth_protocol, priv_protocol, auth_key, priv_key):
+        user_entry = self.user_entry
+        index = user_entry.getInstIdFromIndices(v2c.OctetString(engine_id), user_name)
+        # usmUserStatus = createAndGo
+        self.write_variables((user_entry.name + (13,) + index, 4), snmpEngine=self.snmp_engine)
+        self._set(user_entry, 2, index, user_name)
+        self._set(user_entry, 3, index, user_name)
+        self._set(user_entry, 4, index, self.zero_dot_zero.name)
+        self._set(user_entry, 5, index, auth_protocol)
+        self._set(user_entry, 8, index, priv_protocol)
+        if auth_key is not None:
+            self._set(self.key_entry, 1, index, auth_key)
+        if priv_key is not None:
+            self._set(self.key_entry, 2, index, priv_key)
+
+
+class UsmCredentials:
+    """
+    SNMPv3ユーザーを SnmpEngine に登録するクラス。
+
+    Trapでは送信元の機器が authoritative なので、ユーザーは送信元のEngine IDごとにローカライズしたキーで登録します。
+    パスフレーズからのマスターキー生成 (1MiBのハッシュ計算) は同じパスフレーズ・ハッシュ関数の組み合わせごとに1回だけ行い、
+    key_cache_path を指定した場合は生成したマスターキーをファイルに保存して、次回以降の起動では再計算しません。
+    登録時にローカライズ済みのキーを設定するため、pysnmp が登録時や受信時にパスフレーズのハッシュ計算を行うことはありません。
+    """
+
+    def __init__(self, users, default_engine_ids=(), key_cache_path=None, workers=None):
+        """
+        Args:
+            users: UsmUser のリスト
+            default_engine_ids: engine_ids を指定していないユーザーを登録するEngine ID
+                                (空の場合は受信機自身のEngine ID。Informのみ受信可能)
+            key_cache_path: マスターキーのキャッシュファイルのパス (None の場合はキャッシュしない)
+            workers: マスターキーを並列に生成するスレッド数 (None の場合はCPU数)
+        """
+        self.users = list(users)
+        self.default_engine_ids = tuple(default_engine_ids)
+        self.key_cache_path = key_cache_path
+        self.workers = workers or os.cpu_count() or 1
+
+        self._salt = None
+        self._cached_keys = {}
+
+        self.registered = 0
+        self.keys_derived = 0
+        self.key_cache_hits = 0
+        self.derive_seconds = 0.0
+        self.register_seconds = 0.0
+
+    def _load_cache(self):
+        """
+        マスターキーのキャッシュを読み込みます。キャッシュのキーはソルト付きのパスフレーズのハッシュです。
+        """
+        self._salt = None
+        self._cached_keys = {}
+        if not self.key_cache_path or not os.path.exists(self.key_cache_path):
+            return
+        try:
+            with open(self.key_cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self._salt = bytes.fromhex(data["salt"])
+            self._cached_keys = {k: bytes.fromhex(v) for k, v in data["keys"].items()}
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            logger.warning(f"Ignoring invalid SNMPv3 key cache {self.key_cache_path}: {e}")
+            self._salt = None
+            self._cached_keys = {}
+
+    def _save_cache(self, keys):
+        """
+        今回使用したマスターキーのみをキャッシュファイルに書き込みます (削除されたユーザーのキーは残さない)。
+        """
+        data = {"salt": self._salt.hex(), "keys": {k: v.hex() for k, v in keys.items()}}
+        tmp = f"{self.key_cache_path}.{os.getpid()}.tmp"
+        try:
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp, self.key_cache_path)
+        except OSError as e:
+            logger.warning(f"Failed to write SNMPv3 key cache {self.key_cache_path}: {e}")
+
+    def _fingerprint(self, passphrase, hash_func):
+        return hashlib.sha256(
+            self._salt + hash_func().name.encode() + b"\0" + passphrase
+        ).hexdigest()
+
+    def _master_keys(self):
+        """
+        パスフレーズで指定されたユーザーのマスターキーを生成します。
+
+        Returns:
+            dict: {(パスフレーズ, ハッシュ関数): マスターキー}
+        """
+        needed = set()
+        for user in self.users:
+            if user.key_type != "passphrase" or user.auth_hash is None:
+                continue
+            needed.add((user.auth_key, user.auth_hash))
+            if user.priv_key is not None:
+                # 暗号化キーも認証プロトコルのハッシュ関数でマスターキーにする
+                needed.add((user.priv_key, user.auth_hash))
+        if not needed:
+            return {}
+
+        self._load_cache()
+        if self._salt is None:
+            self._salt = secrets.token_bytes(16)
+        fingerprints = {item: self._fingerprint(*item) for item in needed}
+        masters = {}
+        missing = []
+        for item, fingerprint in fingerprints.items():
+            key = self._cached_keys.get(fingerprint)
+            if key is None:
+                missing.append(item)
+            else:
+                masters[item] = key
+        self.key_cache_hits += len(masters)
+
+        if missing:
+            if self.workers > 1 and len(missing) > 1:
+                with ThreadPoolExecutor(min(self.workers, len(missing))) as executor:
+                    keys = executor.map(lambda item: hash_passphrase(*item), missing)
+                    masters.update(zip(missing, keys))
+            else:
+                masters.update((item, hash_passphrase(*item)) for item in missing)
+            self.keys_derived += len(missing)
+
+        if self.key_cache_path and (missing or len(self._cached_keys) != len(masters)):
+            self._save_cache({fingerprints[item]: key for item, key in masters.items()})
+        return masters
+
+    def register(self, snmp_engine):
+        """
+        全てのユーザーを SnmpEngine に登録します。
+
+        Returns:
+            int: 登録した (ユーザー, Engine ID) の数
+        """
+        started = time.perf_counter()
+        masters = self._master_keys()
+        self.derive_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        table = _UsmUserTable(snmp_engine)
+        local_engine_ids = (bytes(snmp_engine.snmpEngineID),)
+        registered = set()
+        for user in self.users:
+            for engine_id in user.engine_ids or self.default_engine_ids or local_engine_ids:
+                if (user.name, engine_id) in registered:
+                    logger.warning(f"Ignoring duplicate SNMPv3 user '{user.name}' for engine ID 0x{engine_id.hex()}")
+                    continue
+                registered.add((user.name, engine_id))
+                table.add(user.name, engine_id, user.auth_protocol, user.priv_protocol,
+                          *self._localized_keys(user, engine_id, masters))
+        self.register_seconds = time.perf_counter() - started
+        self.registered += len(registered)
+        return len(registered)
+
+    @staticmethod
+    def _localized_keys(user, engine_id, masters):
+        if user.key_type == "localized":
+            return user.auth_key, user.priv_key
+        if user.key_type == "passphrase":
+            master_auth = masters.get((user.auth_key, user.auth_hash))
+            master_priv = masters.get((user.priv_key, user.auth_hash))
+        else:
+            master_auth, master_priv = user.auth_key, user.priv_key
+        # ローカライズは1回の短いハッシュ計算のみ
+        engine_id = v2c.OctetString(engine_id)
+        auth_key = priv_key = None
+        if master_auth is not None:
+            auth_key = bytes(config.AUTH_SERVICES[user.auth_protocol].localize_key(
+                v2c.OctetString(master_auth), engine_id
+            ))
+        if master_priv is not None:
+            priv_key = bytes(config.PRIV_SERVICES[user.priv_protocol].localize_key(
+                user.auth_protocol, v2c.OctetString(master_priv), engine_id
+            ))
+        return auth_key, priv_key
+
+    def stats(self):
+        """
+        登録の統計情報を返します。
+
+        Returns:
+            dict: users, registered, keys_derived, key_cache_hits, derive_seconds, register_seconds
+        """
+        return {
+            "users": len(self.users),
+            "registered": self.registered,
+            "keys_derived": self.keys_derived,
+            "key_cache_hits": self.key_cache_hits,
+            "derive_seconds": round(self.derive_seconds, 3),
+            "register_seconds": round(self.register_seconds, 3)
+        }
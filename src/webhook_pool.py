@@ -0,0 +1,327 @@
+import aiohttp
+import asyncio
+import functools
+import itertools
+import logging
+from src.config import settings
+from src.circuit_breaker import CircuitBreaker
+from src import metrics
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_MODES = ("fanout", "round-robin", "least-loaded")
+
+
+class EndpointUnavailable(aiohttp.ClientError):
+    """
+    送信可能なWebhook送信先が無い (全てサーキットブレーカーで遮断中、または同時送信数の上限に達している) 場合の例外。
+    スプールやリトライの対象になるよう aiohttp.ClientError を継承しています。
+    """
+
+
+def is_permanent_error(error):
+    """
+    送信先がリクエストを恒久的に拒否したか (再送しても受け入れられないか) を判定します。
+    408 (Request Timeout) と 429 (Too Many Requests) 以外の4xx応答が該当します。
+    """
+    return (isinstance(error, aiohttp.ClientResponseError) and 400 <= error.status < 500
+            and error.status not in (408, 429))
+
+
+def is_retryable_error(error):
+    """
+    送信の失敗が再送によって回復し得るか (接続エラー・タイムアウト・5xx・408・429) を判定します。
+    """
+    return isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError)) and not is_permanent_error(error)
+
+
+def parse_endpoints(endpoints, default_max_in_flight):
+    """
+    送信先リストを解析します。
+    "URL[|最大同時送信数],..." 形式の文字列 ("|" はURLにそのまま含めることができない文字のため区切りに使用します)、
+    または "URL[|最大同時送信数]" / {"url": URL, "max_in_flight": 最大同時送信数} のリスト (ルーティング設定ファイル) を受け付けます。
+
+    Returns:
+        list: [(URL, 最大同時送信数)]
+
+    Raises:
+        ValueError: 送信先の指定が不正な場合
+    """
+    items = endpoints.split(",") if isinstance(endpoints, str) else endpoints
+    if not isinstance(items, (list, tuple)):
+        raise ValueError(f"Invalid webhook endpoints {endpoints!r}: must be a string or a list")
+    result = []
+    for item in items:
+        if isinstance(item, dict):
+            unknown = set(item) - {"url", "max_in_flight"}
+            if unknown:
+                raise ValueError(f"Invalid webhook endpoint {item!r}: unknown keys {', '.join(sorted(unknown))}")
+            url = item.get("url")
+            max_in_flight = item.get("max_in_flight", default_max_in_flight)
+            if not isinstance(url, str) or not url.strip():
+                raise ValueError(f"Invalid webhook endpoint {item!r}: 'url' is required")
+            if not isinstance(max_in_flight, int) or isinstance(max_in_flight, bool):
+                raise ValueError(f"Invalid webhook endpoint {item!r}: 'max_in_flight' must be an integer")
+        elif isinstance(item, str):
+            item = item.strip()
+            if not item:
+                continue
+            url, _, limit = item.partition("|")
+            try:
+                max_in_flight = int(limit) if limit else default_max_in_flight
+            except ValueError as e:
+                raise ValueError(f"Invalid webhook endpoint '{item}': {e}") from e
+        else:
+            raise ValueError(f"Invalid webhook endpoint {item!r}: must be a string or an object")
+        if max_in_flight < 1:
+            raise ValueError(f"Invalid webhook endpoint {item!r}: concurrency must be at least 1")
+        result.append((url.strip(), max_in_flight))
+    return result
+
+
+class WebhookEndpoint:
+    """
+    1つのWebhook送信先。同時送信数の上限とサーキットブレーカーを持ちます。
+    """
+
+    def __init__(self, url, max_in_flight, breaker):
+        self.url = url
+        self.max_in_flight = max_in_flight
+        self.breaker = breaker
+        self._slots = asyncio.Semaphore(max_in_flight)
+
+        # 送信中 (空き待ちを含む) のリクエスト数
+        self.load = 0
+        self.sent = 0
+        self.failed = 0
+        self.rejected = 0
+        self.shed = 0
+        # fanout で他の送信先が受け付けたため、この送信先には再送されずに失われたTrap数
+        self.lost = 0
+
+    @property
+    def saturated(self):
+        return self.load >= self.max_in_flight
+
+    async def post(self, session, body, headers, count):
+        """
+        エンコード済みのボディを1回POSTします。失敗した場合は例外を送出します。
+        """
+        self.load += 1
+        try:
+            async with self._slots:
+                async with session.post(self.url, data=body, headers=headers) as response:
+                    if response.status >= 400:
+                        logger.error(
+                            f"Webhook {self.url} failed with status {response.status} "
+                            f"({count} traps): {await response.text()}"
+                        )
+                        response.raise_for_status()
+                    logger.debug(f"Webhook {self.url} sent {count} traps: {response.status}")
+        except Exception as e:
+            self.failed += 1
+            # 恒久的な拒否は送信先が応答している (障害ではない) ため、ブレーカーの失敗には数えない
+            if is_permanent_error(e):
+                self.breaker.record_success()
+            else:
+                self.breaker.record_failure()
+            metrics.webhook_requests.inc(self.url, "failure")
+            logger.warning(f"Webhook dispatch to {self.url} failed: {e!r}")
+            raise
+        except asyncio.CancelledError:
+            # half-open の試行がキャンセルされた場合も、次の試行を許可する
+            self.breaker.release()
+            raise
+        else:
+            self.sent += 1
+            self.breaker.record_success()
+            metrics.webhook_requests.inc(self.url, "success")
+        finally:
+            self.load -= 1
+
+    def record_lost(self, count):
+        self.lost += count
+        metrics.webhook_lost.inc(self.url, amount=count)
+
+    def stats(self):
+        return {
+            "in_flight": self.load,
+            "sent": self.sent,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "shed": self.shed,
+            "lost": self.lost,
+            "circuit_open": int(self.breaker.state != "closed"),
+            "circuit_opened": self.breaker.opened
+        }
+
+
+class WebhookPool:
+    """
+    複数のWebhook送信先への送信を行うクラス。
+
+    - fanout: 全ての送信先に送信します。いずれかの送信先で成功した時点で呼び出し元に戻り、
+      残りの送信はバックグラウンドで完了させます。同時送信数の上限に達している送信先にはそのTrapを送りません (shed)。
+      これにより、遅い送信先があっても他の送信先への送信や受信処理は遅延しません。
+      送信先ごとの配信は at-most-once で、いずれかの送信先で成功したTrapは、送れなかった (shed・遮断中・失敗)
+      送信先に対してリトライもスプールへの退避も行いません (送信先ごとの lost として数えます)。
+    - round-robin: 送信先を順番に使用します。上限に達している送信先は後回しにします。
+    - least-loaded: 送信中のリクエストが最も少ない (上限に対する割合が小さい) 送信先を使用します。
+
+    round-robin / least-loaded では、送信に失敗した場合やブレーカーで遮断中の場合は次の送信先に切り替えます。
+    """
+
+    def __init__(self, urls=None, mode=None, max_in_flight=None):
+        """
+        Args:
+            urls: "URL[|最大同時送信数],..." 形式の送信先またはそのリスト (None の場合は webhook_urls、未設定なら webhook_url)
+            mode: fanout / round-robin / least-loaded
+            max_in_flight: 送信先ごとの最大同時送信数のデフォルト値
+        """
+        if urls is None:
+            urls = settings.webhook_urls or settings.webhook_url or ""
+        self.mode = mode or settings.webhook_mode
+        max_in_flight = max_in_flight if max_in_flight is not None else settings.webhook_max_in_flight
+        self.endpoints = [
+            WebhookEndpoint(url, limit, CircuitBreaker(url, settings.webhook_breaker_failures, settings.webhook_breaker_reset))
+            for url, limit in parse_endpoints(urls, max_in_flight)
+        ]
+        self.session = None
+        self._rotation = itertools.count()
+        self._background = set()
+
+    def __len__(self):
+        return len(self.endpoints)
+
+    def start(self):
+        """
+        送信先間で共有するHTTPセッション (コネクションプール) を作成します。
+        """
+        if self.session is not None:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=settings.webhook_pool_size,
+            limit_per_host=settings.webhook_pool_size_per_host,
+            keepalive_timeout=settings.webhook_keepalive_timeout,
+            use_dns_cache=True,
+            ttl_dns_cache=settings.webhook_dns_cache_ttl
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=settings.webhook_timeout,
+            sock_connect=settings.webhook_connect_timeout
+        )
+        self.session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        logger.info(
+            f"Webhook endpoints ({self.mode}): "
+            + ", ".join(f"{e.url} (max {e.max_in_flight} in flight)" for e in self.endpoints)
+        )
+
+    async def close(self):
+        """
+        バックグラウンドで送信中のリクエストの完了を待ってからセッションをクローズします。
+        """
+        if self._background:
+            await asyncio.wait(self._background, timeout=settings.webhook_timeout)
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def post(self, body, headers, count):
+        """
+        エンコード済みのボディを送信モードに応じて送信します。
+        送信できなかった場合は例外 (aiohttp.ClientError / asyncio.TimeoutError) を送出します。
+        """
+        if self.session is None:
+            self.start()
+        if self.mode == "fanout":
+            await self._post_fanout(body, headers, count)
+        else:
+            await self._post_balanced(body, headers, count)
+
+    def _order(self):
+        """
+        round-robin / least-loaded で送信先を試す順序を返します。
+        """
+        if self.mode == "least-loaded":
+            return sorted(self.endpoints, key=lambda e: e.load / e.max_in_flight)
+        start = next(self._rotation) % len(self.endpoints)
+        order = self.endpoints[start:] + self.endpoints[:start]
+        # 上限に達している送信先は後回しにする (sortedは安定なので順番は保たれる)
+        return sorted(order, key=lambda e: e.saturated)
+
+    async def _post_balanced(self, body, headers, count):
+        last_error = None
+        for endpoint in self._order():
+            if not endpoint.breaker.allow():
+                endpoint.rejected += 1
+                metrics.webhook_requests.inc(endpoint.url, "rejected")
+                continue
+            try:
+                await endpoint.post(self.session, body, headers, count)
+                return
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                last_error = e
+        raise last_error or EndpointUnavailable("No webhook endpoint is available")
+
+    async def _post_fanout(self, body, headers, count):
+        # 送信タスク -> 送信先
+        tasks = {}
+        skipped = []
+        for endpoint in self.endpoints:
+            if endpoint.saturated:
+                endpoint.shed += 1
+                metrics.webhook_requests.inc(endpoint.url, "shed")
+                skipped.append(endpoint)
+                continue
+            if not endpoint.breaker.allow():
+                endpoint.rejected += 1
+                metrics.webhook_requests.inc(endpoint.url, "rejected")
+                skipped.append(endpoint)
+                continue
+            tasks[asyncio.create_task(endpoint.post(self.session, body, headers, count))] = endpoint
+        if not tasks:
+            raise EndpointUnavailable("No webhook endpoint is available")
+
+        # いずれかの送信先で成功するまで待つ
+        pending = set(tasks)
+        error = None
+        while pending:
+            try:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            except asyncio.CancelledError:
+                # 呼び出し元がキャンセルされても送信中のタスクは放置せず、バックグラウンドで完了させる
+                self._keep_in_background(pending, tasks, count)
+                raise
+            if any(not task.exception() for task in done):
+                break
+            error = error or next(task.exception() for task in done)
+            skipped.extend(tasks[task] for task in done)
+        else:
+            # どの送信先にも届いていないため、呼び出し元でリトライ (スプールへの退避) を行う
+            raise error
+
+        # 成功した時点で、送れなかった送信先にはこのTrapが届かないことが確定する
+        skipped.extend(tasks[task] for task in done if task.exception())
+        for endpoint in skipped:
+            endpoint.record_lost(count)
+        self._keep_in_background(pending, tasks, count)
+
+    def _keep_in_background(self, pending, tasks, count):
+        for task in pending:
+            self._background.add(task)
+            task.add_done_callback(functools.partial(self._background_done, tasks[task], count))
+
+    def _background_done(self, endpoint, count, task):
+        self._background.discard(task)
+        # 失敗は WebhookEndpoint.post で記録済み
+        if task.cancelled() or task.exception():
+            endpoint.record_lost(count)
+
+    def stats(self):
+        """
+        送信先ごとの統計情報を返します。
+
+        Returns:
+            dict: {"endpoint0": {...}, ...} (キーの番号は送信先の指定順)
+        """
+        return {f"endpoint{i}": endpoint.stats() for i, endpoint in enumerate(self.endpoints)}
@@ -0,0 +1,64 @@
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+from scripts.compile_mibs import scan_sources, dependency_levels, source_hashes, compile_mibs
+
+TEST_MIB_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mibs", "src")
+
+DEP_MIB = """DEP-TEST-MIB DEFINITIONS ::= BEGIN
+IMPORTS
+    OBJECT-TYPE FROM SNMPv2-SMI -- comment FROM IGNORED-MIB
+    DisplayString FROM SNMPv2-TC
+    testMib FROM TEST-MIB;
+
+depName OBJECT-TYPE
+    SYNTAX DisplayString
+    MAX-ACCESS read-only
+    STATUS current
+    DESCRIPTION "name"
+    ::= { testMib 2 }
+END
+"""
+
+class TestCompileMibs(unittest.TestCase):
+    def setUp(self):
+        self.src_dir = tempfile.mkdtemp()
+        self.dest_dir = tempfile.mkdtemp()
+        shutil.copy(os.path.join(TEST_MIB_DIR, "TEST-MIB.my"), self.src_dir)
+        os.makedirs(os.path.join(self.src_dir, "vendor"))
+        with open(os.path.join(self.src_dir, "vendor", "DEP-TEST-MIB.txt"), "w") as f:
+            f.write(DEP_MIB)
+
+    def tearDown(self):
+        shutil.rmtree(self.src_dir)
+        shutil.rmtree(self.dest_dir)
+
+    def test_dependency_levels(self):
+        modules = scan_sources(self.src_dir)
+        self.assertEqual(modules["DEP-TEST-MIB"]["imports"], ["SNMPv2-SMI", "SNMPv2-TC", "TEST-MIB"])
+        self.assertEqual(dependency_levels(modules), [["TEST-MIB"], ["DEP-TEST-MIB"]])
+
+        # 依存先のソースが変わると依存元のハッシュも変わる
+        hashes = source_hashes(modules, dependency_levels(modules))
+        with open(modules["TEST-MIB"]["path"], "a") as f:
+            f.write("\n-- changed\n")
+        changed = source_hashes(modules, dependency_levels(modules))
+        self.assertNotEqual(hashes["DEP-TEST-MIB"], changed["DEP-TEST-MIB"])
+
+    def test_offline_incremental_compile(self):
+        with redirect_stdout(StringIO()):
+            compile_mibs(self.src_dir, self.dest_dir, jobs=1, offline=True)
+        self.assertTrue(os.path.exists(os.path.join(self.dest_dir, "TEST-MIB.py")))
+        self.assertTrue(os.path.exists(os.path.join(self.dest_dir, "DEP-TEST-MIB.py")))
+
+        # 変更の無いモジュールはスキップされる
+        output = StringIO()
+        with redirect_stdout(output):
+            compile_mibs(self.src_dir, self.dest_dir, jobs=1, offline=True)
+        self.assertIn("0 compiled, 2 unchanged, 0 failed", output.getvalue())
+
+if __name__ == '__main__':
+    unittest.main()
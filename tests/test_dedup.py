@@ -0,0 +1,87 @@
+import unittest
+from unittest.mock import patch
+from src.dedup import Deduplicator, SNMP_TRAP_OID
+from src.formatters import format_generic
+from src.trap_record import OidInfo, PrettyVariable, TrapRecord, format_timestamp
+
+TRAP_OID_INFO = OidInfo(SNMP_TRAP_OID, "SNMPv2-MIB", "snmpTrapOID", "0", format_generic, "ObjectName")
+IF_INDEX_INFO = OidInfo("1.3.6.1.2.1.2.2.1.1.1", "IF-MIB", "ifIndex", "1", format_generic, "Integer32")
+
+def make_trap(source_ip, trap_oid, if_index, timestamp):
+    return TrapRecord(source_ip, 162, "v2c", (
+        PrettyVariable(TRAP_OID_INFO, trap_oid),
+        PrettyVariable(IF_INDEX_INFO, str(if_index)),
+    ), timestamp)
+
+class TestDeduplicator(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.emitted = []
+        self.deduplicator = Deduplicator(window=60, key_varbinds=["ifIndex"], max_entries=100)
+        self.deduplicator.start(self.emitted.append)
+
+    async def asyncTearDown(self):
+        self.deduplicator.close()
+
+    async def test_repeats_are_summarized(self):
+        link_down = "1.3.6.1.6.3.1.1.5.3"
+        self.assertTrue(self.deduplicator.accept(make_trap("192.0.2.1", link_down, 1, 1700000001.0)))
+        self.assertFalse(self.deduplicator.accept(make_trap("192.0.2.1", link_down, 1, 1700000002.0)))
+        self.assertFalse(self.deduplicator.accept(make_trap("192.0.2.1", link_down, 1, 1700000003.0)))
+        # 送信元・Trap種別・キー変数のいずれかが異なれば別のTrapとして転送する
+        self.assertTrue(self.deduplicator.accept(make_trap("192.0.2.2", link_down, 1, 1700000004.0)))
+        self.assertTrue(self.deduplicator.accept(make_trap("192.0.2.1", "1.3.6.1.6.3.1.1.5.4", 1, 1700000005.0)))
+        self.assertTrue(self.deduplicator.accept(make_trap("192.0.2.1", link_down, 2, 1700000006.0)))
+        self.assertEqual(self.emitted, [])
+
+        # 期間終了後に集約イベントを1件だけ送信する
+        self.deduplicator.expire(now=float("inf"))
+        self.assertEqual(len(self.emitted), 1)
+        emitted = self.emitted[0].to_dict()
+        summary = emitted["dedup_summary"]
+        self.assertEqual(summary["count"], 3)
+        self.assertEqual((summary["first_seen"], summary["last_seen"]),
+                         (format_timestamp(1700000001.0), format_timestamp(1700000003.0)))
+        self.assertEqual(emitted["source_ip"], "192.0.2.1")
+        self.assertNotIn("timestamp", emitted)
+        self.assertEqual(emitted["variables"][1], {
+            "oid": "1.3.6.1.2.1.2.2.1.1.1", "mib": "IF-MIB", "name": "ifIndex", "suffix": "1", "value": "1"
+        })
+
+        # 期間終了後の同じTrapは再び転送される
+        self.assertTrue(self.deduplicator.accept(make_trap("192.0.2.1", link_down, 1, 1700000007.0)))
+
+    async def test_window_slides_on_repeat(self):
+        link_down = "1.3.6.1.6.3.1.1.5.3"
+        with patch("src.dedup.time.monotonic") as monotonic:
+            monotonic.return_value = 1000.0
+            self.assertTrue(self.deduplicator.accept(make_trap("192.0.2.1", link_down, 1, 1700000000.0)))
+            self.assertTrue(self.deduplicator.accept(make_trap("192.0.2.2", link_down, 1, 1700000000.0)))
+            monotonic.return_value = 1050.0
+            self.assertFalse(self.deduplicator.accept(make_trap("192.0.2.1", link_down, 1, 1700000050.0)))
+
+            # 重複の無いTrapは最初の受信から、重複したTrapは最後の受信から window 秒間保持する
+            self.deduplicator.expire(now=1061.0)
+            self.assertEqual(self.deduplicator.stats()["entries"], 1)
+            monotonic.return_value = 1100.0
+            self.assertFalse(self.deduplicator.accept(make_trap("192.0.2.1", link_down, 1, 1700000100.0)))
+            self.deduplicator.expire(now=1159.0)
+            self.assertEqual(self.emitted, [])
+
+            self.deduplicator.expire(now=1160.0)
+            self.assertEqual(len(self.emitted), 1)
+            self.assertEqual(self.emitted[0].to_dict()["dedup_summary"]["count"], 3)
+
+    async def test_state_is_bounded(self):
+        for i in range(1000):
+            trap = make_trap(f"10.0.{i // 256}.{i % 256}", "1.3.6.1.6.3.1.1.5.3", 1, 1700000000.0)
+            self.deduplicator.accept(trap)
+            self.deduplicator.accept(trap)
+
+        stats = self.deduplicator.stats()
+        self.assertEqual(stats["entries"], 100)
+        self.assertEqual(stats["evicted"], 900)
+        # 追い出したエントリの重複も集約イベントとして失わずに送信する
+        self.assertEqual(len(self.emitted), 900)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import asyncio
+import json
+import unittest
+from aiohttp import web
+from src.dispatcher import Dispatcher
+from src.config import settings
+
+class TestDispatcherBatching(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.requests = []
+        self.encodings = []
+
+        async def handler(request):
+            # aiohttpのサーバーはContent-Encodingに従って自動的に展開する
+            body = await request.read()
+            self.requests.append((request.headers.get("Content-Type"), body))
+            self.encodings.append(request.headers.get("Content-Encoding"))
+            return web.Response(text="ok")
+
+        app = web.Application()
+        app.router.add_post("/hook", handler)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+
+        self.original = (settings.output_mode, settings.webhook_url, settings.webhook_batch_size,
+                         settings.webhook_batch_linger_ms, settings.webhook_batch_format,
+                         settings.webhook_compression)
+        settings.output_mode = "webhook"
+        settings.webhook_url = f"http://127.0.0.1:{port}/hook"
+
+    async def asyncTearDown(self):
+        await self.runner.cleanup()
+        (settings.output_mode, settings.webhook_url, settings.webhook_batch_size,
+         settings.webhook_batch_linger_ms, settings.webhook_batch_format,
+         settings.webhook_compression) = self.original
+
+    async def test_flush_on_batch_size(self):
+        settings.webhook_batch_size = 3
+        settings.webhook_batch_linger_ms = 10000
+        settings.webhook_batch_format = "json"
+        settings.webhook_compression = "none"
+
+        dispatcher = Dispatcher()
+        await dispatcher.initialize()
+        for i in range(6):
+            await dispatcher.dispatch({"id": i})
+        await dispatcher.close()
+
+        self.assertEqual(len(self.requests), 2)
+        content_type, body = self.requests[0]
+        self.assertEqual(content_type, "application/json")
+        self.assertEqual([item["id"] for item in json.loads(body)], [0, 1, 2])
+
+    async def test_flush_on_linger_with_gzip_ndjson(self):
+        settings.webhook_batch_size = 100
+        settings.webhook_batch_linger_ms = 20
+        settings.webhook_batch_format = "ndjson"
+        settings.webhook_compression = "gzip"
+
+        dispatcher = Dispatcher()
+        await dispatcher.initialize()
+        await dispatcher.dispatch({"id": 1})
+        await dispatcher.dispatch({"id": 2})
+        await asyncio.sleep(0.2)
+
+        self.assertEqual(len(self.requests), 1)
+        content_type, body = self.requests[0]
+        self.assertEqual(content_type, "application/x-ndjson")
+        self.assertEqual(self.encodings, ["gzip"])
+        lines = body.decode("utf-8").splitlines()
+        self.assertEqual([json.loads(line)["id"] for line in lines], [1, 2])
+        await dispatcher.close()
+        self.assertEqual(dispatcher.batched_traps_sent, 2)
+
+    async def test_close_flushes_pending_batch(self):
+        settings.webhook_batch_size = 100
+        settings.webhook_batch_linger_ms = 10000
+        settings.webhook_batch_format = "json"
+        settings.webhook_compression = "none"
+
+        dispatcher = Dispatcher()
+        await dispatcher.initialize()
+        await dispatcher.dispatch({"id": 1})
+        self.assertEqual(len(self.requests), 0)
+        await dispatcher.close()
+        self.assertEqual(len(self.requests), 1)
+
+if __name__ == '__main__':
+    unittest.main()
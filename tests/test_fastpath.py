@@ -0,0 +1,120 @@
+import unittest
+from pyasn1.codec.ber import encoder, decoder
+from pysnmp.proto import api, rfc1902
+from src.fastpath import (
+    FastPathHandler, decode_message, encode_response, BerDecodeError,
+    PDU_INFORM, PDU_V2_TRAP, SNMP_TRAP_OID
+)
+
+V2C = api.PROTOCOL_MODULES[api.SNMP_VERSION_2C]
+V1 = api.PROTOCOL_MODULES[api.SNMP_VERSION_1]
+
+VARBINDS = [
+    (rfc1902.ObjectName('1.3.6.1.2.1.1.3.0'), rfc1902.TimeTicks(12345)),
+    (rfc1902.ObjectName('1.3.6.1.6.3.1.1.4.1.0'), rfc1902.ObjectName('1.3.6.1.6.3.1.1.5.3')),
+    (rfc1902.ObjectName('1.3.6.1.2.1.2.2.1.1.1'), rfc1902.Integer(-1)),
+    (rfc1902.ObjectName('1.3.6.1.2.1.1.5.0'), rfc1902.OctetString('Test Trap Message')),
+    (rfc1902.ObjectName('1.3.6.1.2.1.2.2.1.6.1'), rfc1902.OctetString(b'\x00\x1b\x21\x3a\x4f\x5e')),
+    (rfc1902.ObjectName('1.3.6.1.4.1.99999.1.2'), rfc1902.IpAddress('192.0.2.1')),
+    (rfc1902.ObjectName('1.3.6.1.4.1.99999.1.3'), rfc1902.Counter64(2 ** 40)),
+    (rfc1902.ObjectName('1.3.6.1.4.1.99999.1.4'), rfc1902.Gauge32(4294967295)),
+]
+
+def build_v2c_message(pdu, community='public', varbinds=VARBINDS):
+    V2C.apiPDU.set_defaults(pdu)
+    V2C.apiPDU.set_request_id(pdu, 4242)
+    V2C.apiPDU.set_varbinds(pdu, varbinds)
+    message = V2C.Message()
+    V2C.apiMessage.set_defaults(message)
+    V2C.apiMessage.set_community(message, community)
+    V2C.apiMessage.set_pdu(message, pdu)
+    return encoder.encode(message)
+
+class StubTransport:
+    def __init__(self):
+        self.sent = []
+
+    def send_message(self, data, address):
+        self.sent.append((data, address))
+
+class TestFastPathDecoder(unittest.TestCase):
+    def test_v2c_trap_matches_pysnmp(self):
+        message = decode_message(build_v2c_message(V2C.TrapPDU()))
+        self.assertEqual(message.version, 1)
+        self.assertEqual(message.community, b'public')
+        self.assertEqual(message.pdu_type, PDU_V2_TRAP)
+
+        # pysnmpの値オブジェクトと同じOID・表示文字列になること
+        for (oid, value), (expected_oid, expected_value) in zip(message.varbinds, VARBINDS):
+            self.assertEqual(oid, tuple(expected_oid))
+            self.assertEqual(value.prettyPrint(), expected_value.prettyPrint())
+
+    def test_v1_trap_is_translated(self):
+        pdu = V1.TrapPDU()
+        V1.apiTrapPDU.set_defaults(pdu)
+        V1.apiTrapPDU.set_enterprise(pdu, (1, 3, 6, 1, 4, 1, 99999))
+        V1.apiTrapPDU.set_agent_address(pdu, '192.0.2.10')
+        V1.apiTrapPDU.set_generic_trap(pdu, 2)
+        V1.apiTrapPDU.set_timestamp(pdu, 100)
+        V1.apiTrapPDU.set_varbinds(pdu, [(rfc1902.ObjectName('1.3.6.1.2.1.2.2.1.1.3'), rfc1902.Integer(3))])
+        message = V1.Message()
+        V1.apiMessage.set_defaults(message)
+        V1.apiMessage.set_community(message, 'public')
+        V1.apiMessage.set_pdu(message, pdu)
+
+        decoded = decode_message(encoder.encode(message))
+        self.assertEqual(decoded.version, 0)
+        varbinds = dict(decoded.varbinds)
+        # generic-trap 2 (linkDown) は snmpTraps.3 に変換される
+        self.assertEqual(varbinds[SNMP_TRAP_OID].prettyPrint(), '1.3.6.1.6.3.1.1.5.3')
+        self.assertEqual(varbinds[(1, 3, 6, 1, 6, 3, 18, 1, 3, 0)].prettyPrint(), '192.0.2.10')
+        self.assertEqual(decoded.varbinds[-1][1].prettyPrint(), '3')
+
+    def test_non_notification_is_passed_through(self):
+        self.assertIsNone(decode_message(build_v2c_message(V2C.GetRequestPDU())))
+
+    def test_malformed_datagram(self):
+        data = build_v2c_message(V2C.TrapPDU())
+        with self.assertRaises(BerDecodeError):
+            decode_message(data[:-5])
+
+class TestFastPathHandler(unittest.TestCase):
+    def setUp(self):
+        self.traps = []
+        self.handler = FastPathHandler(
+            lambda address, version, varbinds: self.traps.append((address, version, varbinds)),
+            'public'
+        )
+        self.transport = StubTransport()
+
+    def test_inform_response(self):
+        data = build_v2c_message(V2C.InformRequestPDU())
+        self.assertTrue(self.handler.handle(self.transport, data, ('192.0.2.1', 1162)))
+        self.assertEqual(len(self.traps), 1)
+        self.assertEqual(self.traps[0][1], 'v2c')
+
+        # 応答はpysnmpでデコードでき、同じrequest-idと変数を持つこと
+        response_data, address = self.transport.sent[0]
+        self.assertEqual(address, ('192.0.2.1', 1162))
+        response, _ = decoder.decode(response_data, asn1Spec=V2C.Message())
+        pdu = V2C.apiMessage.get_pdu(response)
+        self.assertEqual(pdu.tagSet, V2C.ResponsePDU.tagSet)
+        self.assertEqual(int(V2C.apiPDU.get_request_id(pdu)), 4242)
+        self.assertEqual(int(V2C.apiPDU.get_error_status(pdu)), 0)
+        self.assertEqual(len(V2C.apiPDU.get_varbinds(pdu)), len(VARBINDS))
+        self.assertEqual(self.handler.stats()["informs"], 1)
+
+    def test_bad_community_is_dropped(self):
+        data = build_v2c_message(V2C.TrapPDU(), community='wrong')
+        self.assertTrue(self.handler.handle(self.transport, data, ('192.0.2.1', 1162)))
+        self.assertEqual(self.traps, [])
+        self.assertEqual(self.handler.stats()["bad_community"], 1)
+
+    def test_v3_is_passed_to_engine(self):
+        # SNMPv3 メッセージ (version=3) は SnmpEngine へ渡す
+        data = bytes.fromhex('3011020103300402020400040430020400')
+        self.assertFalse(self.handler.handle(self.transport, data, ('192.0.2.1', 1162)))
+        self.assertEqual(self.handler.stats()["passed_through"], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,168 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from src.file_sink import FileSink
+
+class TestFileSink(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    @staticmethod
+    def _write(sink, item):
+        # 1件ずつ書き込みスレッドに渡し、書き込み単位でローテーションされるようにする
+        sink.write(item)
+        sink.flush()
+        deadline = time.monotonic() + 5
+        while sink.stats()["pending_bytes"] and time.monotonic() < deadline:
+            time.sleep(0.001)
+
+    def _read_all(self):
+        items = []
+        for name in sorted(os.listdir(self.test_dir)):
+            path = os.path.join(self.test_dir, name)
+            opener = gzip.open if name.endswith(".gz") else open
+            with opener(path, "rb") as f:
+                items.extend(json.loads(line) for line in f.read().splitlines())
+        return items
+
+    def test_size_rotation_and_compression(self):
+        sink = FileSink(self.test_dir, max_bytes=1000, rotate_interval=0, buffer_bytes=100, flush_interval_ms=0)
+        for i in range(100):
+            self._write(sink, {"seq": i, "value": "x" * 20})
+        sink.close()
+
+        names = os.listdir(self.test_dir)
+        self.assertGreater(len(names), 1)
+        self.assertTrue(all(name.endswith(".ndjson.gz") for name in names), names)
+        self.assertEqual([item["seq"] for item in self._read_all()], list(range(100)))
+
+        stats = sink.stats()
+        self.assertEqual(stats["written"], 100)
+        self.assertEqual(stats["rotations"], len(names) - 1)
+        self.assertEqual(stats["compressed"], len(names))
+
+    def test_retention(self):
+        sink = FileSink(self.test_dir, max_bytes=100, rotate_interval=0, retention_files=2,
+                        buffer_bytes=100, flush_interval_ms=0)
+        for i in range(50):
+            self._write(sink, {"seq": i, "value": "x" * 100})
+        sink.close()
+
+        self.assertEqual(len(os.listdir(self.test_dir)), 2)
+        self.assertGreater(sink.stats()["deleted"], 0)
+        # 残るのは最新のセグメント
+        self.assertEqual(self._read_all()[-1]["seq"], 49)
+
+    def test_time_rotation_while_idle(self):
+        sink = FileSink(self.test_dir, rotate_interval=0.2, compression="none", flush_interval_ms=0)
+        sink.write({"seq": 1})
+        deadline = time.monotonic() + 5
+        while sink.stats()["rotations"] == 0 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        sink.write({"seq": 2})
+        sink.close()
+
+        self.assertEqual(sink.stats()["rotations"], 1)
+        self.assertEqual(len(os.listdir(self.test_dir)), 2)
+        self.assertEqual([item["seq"] for item in self._read_all()], [1, 2])
+
+    def test_idle_error_does_not_stop_writer(self):
+        class FailingSink(FileSink):
+            failures = 1
+
+            def _idle(self):
+                if self.failures:
+                    self.failures -= 1
+                    raise OSError("No space left on device")
+                super()._idle()
+
+        sink = FailingSink(self.test_dir, compression="none", flush_interval_ms=0)
+        deadline = time.monotonic() + 5
+        while sink.stats()["errors"] == 0 and time.monotonic() < deadline:
+            time.sleep(0.02)
+        # 待機中の処理で失敗しても書き込みスレッドは停止しない
+        self._write(sink, {"seq": 1})
+        sink.close()
+        self.assertEqual(sink.stats()["errors"], 1)
+        self.assertEqual([item["seq"] for item in self._read_all()], [1])
+
+    def test_close_while_writer_is_busy(self):
+        release = threading.Event()
+
+        class SlowSink(FileSink):
+            def _write(self, data):
+                release.wait(5)
+                super()._write(data)
+
+        sink = SlowSink(self.test_dir, compression="none", flush_interval_ms=0)
+        sink.write({"seq": 1})
+        sink.close(timeout=0.1)
+        # 書き込みスレッドが停止していない間はセグメントに触れず、書き込みを終えたスレッドが閉じる
+        self.assertTrue(sink._thread.is_alive())
+        release.set()
+        sink._thread.join(5)
+        self.assertIsNone(sink._file)
+        self.assertEqual(sink.stats()["errors"], 0)
+        self.assertEqual([item["seq"] for item in self._read_all()], [1])
+
+    def test_leftover_segment_is_compressed(self):
+        with open(os.path.join(self.test_dir, "traps-20240101T000000-1-000001.ndjson"), "w") as f:
+            f.write('{"seq": 0}\n')
+        sink = FileSink(self.test_dir)
+        sink.close()
+        self.assertEqual(os.listdir(self.test_dir), ["traps-20240101T000000-1-000001.ndjson.gz"])
+
+    def test_sinks_sharing_directory(self):
+        # マルチプロセス構成のワーカーと同じく、2つのシンクが同じディレクトリに書き出す
+        first = FileSink(self.test_dir, buffer_bytes=100, flush_interval_ms=0)
+        self._write(first, {"seq": 0})
+        second = FileSink(self.test_dir, buffer_bytes=100, flush_interval_ms=0)
+        self._write(second, {"seq": 1})
+        self._write(first, {"seq": 2})
+        second.close()
+        first.close()
+
+        self.assertEqual(sorted(item["seq"] for item in self._read_all()), [0, 1, 2])
+        self.assertEqual(first.stats()["errors"] + second.stats()["errors"], 0)
+        self.assertTrue(all(name.endswith(".ndjson.gz") for name in os.listdir(self.test_dir)))
+
+    def test_prefix_of_other_sink(self):
+        # 接頭辞が前方一致する別のシンクのセグメントは圧縮・保持数の対象にしない
+        other = os.path.join(self.test_dir, "traps-x-20240101T000000-1-000001.ndjson")
+        with open(other, "w") as f:
+            f.write('{"seq": 0}\n')
+        sink = FileSink(self.test_dir, max_bytes=10, rotate_interval=0, retention_files=1,
+                        buffer_bytes=10, flush_interval_ms=0)
+        for i in range(1, 4):
+            self._write(sink, {"seq": i})
+        sink.close()
+        self.assertTrue(os.path.exists(other))
+        self.assertEqual(len(os.listdir(self.test_dir)), 2)
+
+    def test_retention_skips_open_segment_of_other_sink(self):
+        first = FileSink(self.test_dir, compression="none", flush_interval_ms=0)
+        first.write({"seq": 0})
+        first.flush()
+        second = FileSink(self.test_dir, max_bytes=10, rotate_interval=0, compression="none",
+                          retention_files=1, buffer_bytes=10, flush_interval_ms=0)
+        for i in range(1, 6):
+            self._write(second, {"seq": i})
+        second.close()
+        self._write(first, {"seq": 6})
+        first.close()
+
+        # 書き込み中だった最初のシンクのセグメントは削除されない
+        seqs = sorted(item["seq"] for item in self._read_all())
+        self.assertEqual((seqs[0], seqs[-1]), (0, 6))
+        self.assertGreater(second.stats()["deleted"], 0)
+
+if __name__ == '__main__':
+    unittest.main()
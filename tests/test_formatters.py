@@ -0,0 +1,94 @@
+import unittest
+import shutil
+import tempfile
+from pyasn1.type import univ
+from pysnmp.proto import rfc1902, rfc1905
+from src.formatters import build_formatter, format_generic
+from src.fastpath import FastValue, TAG_IPADDRESS
+from src.resolver import MibResolver
+from src.config import settings
+
+class TestFormatters(unittest.TestCase):
+    def test_enum(self):
+        formatter = build_formatter(("Integer32",), {1: "up", 2: "down"})
+        self.assertEqual(formatter(rfc1902.Integer(2)), ("down", 2, "down"))
+        # 定義外の値は整数のまま
+        self.assertEqual(formatter(rfc1902.Integer(7)), ("7", 7, 7))
+
+    def test_display_string(self):
+        formatter = build_formatter(("DisplayString", "TextualConvention", "OctetString"))
+        self.assertEqual(formatter(rfc1902.OctetString("ルーター".encode())), ("ルーター", "0x" + "ルーター".encode().hex(), "ルーター"))
+
+    def test_mac_address(self):
+        formatter = build_formatter(("MacAddress",))
+        self.assertEqual(formatter(rfc1902.OctetString(b'\x00\x11\x22\xaa\xbb\xcc'))[0], "00:11:22:aa:bb:cc")
+
+    def test_date_and_time(self):
+        formatter = build_formatter(("DateAndTime",))
+        value = rfc1902.OctetString(bytes([0x07, 0xe8, 3, 15, 13, 5, 9, 3, ord('+'), 9, 0]))
+        self.assertEqual(formatter(value)[2], "2024-03-15T13:05:09.3+09:00")
+        # 長さが不正な場合は16進表記
+        self.assertEqual(formatter(rfc1902.OctetString(b'\x01\x02\x03'))[0], "0x010203")
+
+    def test_inet_address(self):
+        formatter = build_formatter(("InetAddress",))
+        self.assertEqual(formatter(rfc1902.OctetString(bytes([192, 0, 2, 1])))[0], "192.0.2.1")
+        self.assertEqual(formatter(rfc1902.OctetString(bytes(15) + b'\x01'))[0], "::1")
+
+    def test_timeticks(self):
+        formatter = build_formatter(("TimeTicks",))
+        self.assertEqual(formatter(rfc1902.TimeTicks(9000123)), ("1 day, 1:00:01.23", 9000123, 90001.23))
+
+    def test_display_hint(self):
+        self.assertEqual(build_formatter(("OwnerString",), display_hint="255a")(rfc1902.OctetString(b'ops'))[0], "ops")
+
+    def test_generic_matches_pretty_print(self):
+        for value in (rfc1902.Integer(-3), rfc1902.OctetString(b'abc'), rfc1902.OctetString(b'\x00\xff'),
+                      rfc1902.ObjectName('1.3.6.1'), rfc1902.IpAddress('10.0.0.1'), rfc1902.Counter64(2 ** 40),
+                      rfc1905.NoSuchInstance(''), univ.Null('')):
+            self.assertEqual(format_generic(value)[0], value.prettyPrint())
+
+    def test_fast_value(self):
+        self.assertEqual(format_generic(FastValue(TAG_IPADDRESS, (10, 0, 0, 1))), ("10.0.0.1", "10.0.0.1", "10.0.0.1"))
+        self.assertEqual(build_formatter(("Integer32",), {1: "up"})(FastValue(0x02, 1))[0], "up")
+
+
+class TestResolverValueFormat(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.original = (settings.mib_dir, settings.value_format)
+        settings.mib_dir = self.test_dir
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+        settings.mib_dir, settings.value_format = self.original
+
+    def _create_resolver(self):
+        resolver = MibResolver()
+        resolver.mibBuilder.loadModules('SNMPv2-MIB')
+        return resolver
+
+    def test_syntax_from_mib(self):
+        resolver = self._create_resolver()
+        result = resolver.resolve(rfc1902.ObjectName('1.3.6.1.2.1.11.30.0'), rfc1902.Integer(1))
+        self.assertEqual(result["name"], "snmpEnableAuthenTraps")
+        self.assertEqual((result["value"], result["raw"], result["typed"]), ("enabled", 1, "enabled"))
+
+        result = resolver.resolve(rfc1902.ObjectName('1.3.6.1.2.1.1.1.0'), rfc1902.OctetString(b'\xe6\x97\xa5'))
+        self.assertEqual((result["value"], result["syntax"]), ("日", "DisplayString"))
+
+    def test_formatter_shared_between_instances(self):
+        resolver = self._create_resolver()
+        resolver.resolve(rfc1902.ObjectName('1.3.6.1.2.1.1.9.1.3.1'), rfc1902.OctetString(b'a'))
+        resolver.resolve(rfc1902.ObjectName('1.3.6.1.2.1.1.9.1.3.2'), rfc1902.OctetString(b'b'))
+        self.assertEqual(list(resolver._formatters), [("SNMPv2-MIB", "sysORDescr")])
+
+    def test_pretty_mode(self):
+        settings.value_format = "pretty"
+        resolver = self._create_resolver()
+        result = resolver.resolve(rfc1902.ObjectName('1.3.6.1.2.1.11.30.0'), rfc1902.Integer(1))
+        self.assertEqual(result["value"], "1")
+        self.assertNotIn("typed", result)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,166 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from src import metrics
+from src.formatters import format_generic
+from src.ingest import IngestQueue, Lane, load_lanes
+from src.trap_record import OidInfo, PrettyVariable, TrapRecord, SNMP_TRAP_OID
+
+class SlowDispatcher:
+    """
+    dispatch() の完了をテスト側で制御できるDispatcherのスタブ。
+    """
+    def __init__(self):
+        self.dispatched = []
+        self.release = asyncio.Event()
+
+    async def dispatch(self, trap_data):
+        await self.release.wait()
+        self.dispatched.append(trap_data["id"])
+
+class TestIngestQueue(unittest.IsolatedAsyncioTestCase):
+    async def test_drop_newest(self):
+        dispatcher = SlowDispatcher()
+        ingest_queue = IngestQueue(dispatcher, maxsize=2, workers=1, overflow_policy="drop-newest")
+        await ingest_queue.start()
+
+        ingest_queue.put({"id": 0})
+        await asyncio.sleep(0)  # 1件目はワーカーが保持
+        for i in range(1, 5):
+            ingest_queue.put({"id": i})
+
+        stats = ingest_queue.stats()
+        self.assertEqual(stats["enqueued"], 3)
+        self.assertEqual(stats["dropped"], 2)
+        self.assertEqual(stats["depth"], 2)
+
+        dispatcher.release.set()
+        await ingest_queue.drain(timeout=1)
+        self.assertEqual(dispatcher.dispatched, [0, 1, 2])
+
+    async def test_drop_oldest(self):
+        dispatcher = SlowDispatcher()
+        ingest_queue = IngestQueue(dispatcher, maxsize=2, workers=1, overflow_policy="drop-oldest")
+        await ingest_queue.start()
+
+        ingest_queue.put({"id": 0})
+        await asyncio.sleep(0)
+        for i in range(1, 5):
+            ingest_queue.put({"id": i})
+
+        self.assertEqual(ingest_queue.stats()["dropped"], 2)
+
+        dispatcher.release.set()
+        await ingest_queue.drain(timeout=1)
+        self.assertEqual(dispatcher.dispatched, [0, 3, 4])
+
+    async def test_block_pauses_reading(self):
+        dispatcher = SlowDispatcher()
+        ingest_queue = IngestQueue(dispatcher, maxsize=1, workers=1, overflow_policy="block")
+        events = []
+        ingest_queue.set_flow_control(lambda: events.append("pause"), lambda: events.append("resume"))
+        await ingest_queue.start()
+
+        ingest_queue.put({"id": 0})
+        await asyncio.sleep(0)
+        for i in range(1, 4):
+            ingest_queue.put({"id": i})
+
+        self.assertEqual(events, ["pause"])
+        self.assertEqual(ingest_queue.stats()["dropped"], 0)
+
+        dispatcher.release.set()
+        await ingest_queue.drain(timeout=1)
+        self.assertEqual(dispatcher.dispatched, [0, 1, 2, 3])
+        self.assertEqual(events, ["pause", "resume"])
+
+    async def test_drain_rejects_new_traps(self):
+        dispatcher = SlowDispatcher()
+        dispatcher.release.set()
+        ingest_queue = IngestQueue(dispatcher, maxsize=10, workers=2, overflow_policy="drop-newest")
+        await ingest_queue.start()
+        for i in range(5):
+            ingest_queue.put({"id": i})
+
+        await ingest_queue.drain(timeout=1)
+        self.assertEqual(sorted(dispatcher.dispatched), [0, 1, 2, 3, 4])
+        self.assertFalse(ingest_queue.put({"id": 5}))
+        self.assertEqual(ingest_queue.stats()["dispatched"], 5)
+
+def by_lane(trap_data):
+    return trap_data["lane"]
+
+class TestIngestLanes(unittest.IsolatedAsyncioTestCase):
+    async def _run(self, ingest_queue, dispatcher, traps):
+        await ingest_queue.start()
+        ingest_queue.put({"id": "held", "lane": "bulk"})
+        await asyncio.sleep(0)  # 1件目はワーカーが保持
+        for trap_data in traps:
+            ingest_queue.put(trap_data)
+        stats = ingest_queue.stats()
+        dispatcher.release.set()
+        await ingest_queue.drain(timeout=1)
+        return stats
+
+    async def test_strict_priority(self):
+        dispatcher = SlowDispatcher()
+        lanes = [Lane("critical", 10, "drop-newest"), Lane("bulk", 10, "drop-newest")]
+        ingest_queue = IngestQueue(dispatcher, workers=1, lanes=lanes, scheduler="strict", classifier=by_lane)
+        traps = [{"id": f"b{i}", "lane": "bulk"} for i in range(3)] + [{"id": "c0", "lane": "critical"}]
+        await self._run(ingest_queue, dispatcher, traps)
+        self.assertEqual(dispatcher.dispatched, ["held", "c0", "b0", "b1", "b2"])
+
+    async def test_weighted_fair(self):
+        dispatcher = SlowDispatcher()
+        lanes = [Lane("critical", 10, "drop-newest", weight=3), Lane("bulk", 10, "drop-newest")]
+        ingest_queue = IngestQueue(dispatcher, workers=1, lanes=lanes, scheduler="weighted", classifier=by_lane)
+        traps = [{"id": f"b{i}", "lane": "bulk"} for i in range(3)] + [{"id": f"c{i}", "lane": "critical"} for i in range(5)]
+        await self._run(ingest_queue, dispatcher, traps)
+        self.assertEqual(dispatcher.dispatched, ["held", "c0", "c1", "b0", "c2", "c3", "c4", "b1", "b2"])
+
+    async def test_lane_capacity_and_policy(self):
+        dispatcher = SlowDispatcher()
+        lanes = [Lane("critical", 2, "drop-oldest"), Lane("bulk", 2, "drop-newest")]
+        ingest_queue = IngestQueue(dispatcher, workers=1, lanes=lanes, scheduler="strict", classifier=by_lane)
+        traps = [{"id": f"b{i}", "lane": "bulk"} for i in range(4)] + [{"id": f"c{i}", "lane": "critical"} for i in range(4)]
+        stats = await self._run(ingest_queue, dispatcher, traps)
+        self.assertEqual(dispatcher.dispatched, ["held", "c2", "c3", "b0", "b1"])
+        self.assertEqual(stats["depth"], 4)
+        self.assertEqual(stats["dropped"], 4)
+        self.assertEqual(stats["lanes"]["critical"]["dropped"], 2)
+        self.assertEqual(stats["lanes"]["bulk"]["dropped"], 2)
+        self.assertEqual(ingest_queue.stats()["lanes"]["critical"]["dispatched"], 2)
+        self.assertIn('snmp_ingest_wait_seconds_count{lane="critical"}', metrics.registry.render())
+
+    def test_load_lanes(self):
+        trap_oid_info = OidInfo(SNMP_TRAP_OID, "SNMPv2-MIB", "snmpTrapOID", "0", format_generic, "ObjectName")
+        with tempfile.TemporaryDirectory() as test_dir:
+            path = os.path.join(test_dir, "lanes.json")
+            with open(path, "w") as f:
+                json.dump({
+                    "scheduler": "strict",
+                    "lanes": [{"name": "critical", "capacity": 100, "policy": "drop-oldest"},
+                              {"name": "bulk", "weight": 1}],
+                    "rules": [{"trap_oid": ["1.3.6.1.6.3.1.1.5.3", "1.3.6.1.6.3.1.1.5.4"], "lane": "critical"},
+                              {"source": "10.0.0.0/24", "lane": "critical"}]
+                }, f)
+            lanes, scheduler, classifier = load_lanes(path)
+            self.assertEqual(scheduler, "strict")
+            self.assertEqual([(lane.name, lane.capacity, lane.policy) for lane in lanes],
+                             [("critical", 100, "drop-oldest"), ("bulk", 10000, "drop-newest")])
+
+            def trap(source_ip, trap_oid):
+                return TrapRecord(source_ip, 162, "v2c", (PrettyVariable(trap_oid_info, trap_oid),))
+            self.assertEqual(classifier(trap("192.0.2.1", "1.3.6.1.6.3.1.1.5.3")), "critical")
+            self.assertEqual(classifier(trap("10.0.0.9", "1.3.6.1.4.1.9.9.41.2.0.1")), "critical")
+            self.assertEqual(classifier(trap("192.0.2.1", "1.3.6.1.4.1.9.9.41.2.0.1")), "bulk")
+
+            with open(path, "w") as f:
+                json.dump({"lanes": [{"name": "bulk"}], "rules": [{"trap_oid": "1.3.6.1", "lane": "critical"}]}, f)
+            with self.assertRaisesRegex(ValueError, "Invalid lanes file .*rule #0: 'lane' must be one of bulk"):
+                load_lanes(path)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import io
+import unittest
+import aiohttp
+from src import metrics
+from src.config import settings
+from src.dispatcher import Dispatcher
+from src.metrics import MetricsRegistry, MetricsServer
+from src.stdout_sink import StdoutSink
+
+class TestMetricsRegistry(unittest.TestCase):
+    def test_counter_and_histogram_format(self):
+        registry = MetricsRegistry()
+        counter = registry.counter("test_total", "Test counter", ("source",))
+        histogram = registry.histogram("test_seconds", "Test histogram", buckets=(0.1, 1.0))
+        counter.inc("192.0.2.1")
+        counter.inc("192.0.2.1")
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        histogram.observe(2.0)
+
+        text = registry.render()
+        self.assertIn('test_total{source="192.0.2.1"} 2', text)
+        self.assertIn('test_seconds_bucket{le="0.1"} 1', text)
+        self.assertIn('test_seconds_bucket{le="1"} 2', text)
+        self.assertIn('test_seconds_bucket{le="+Inf"} 3', text)
+        self.assertIn('test_seconds_count 3', text)
+
+    def test_counter_series_limit(self):
+        registry = MetricsRegistry()
+        counter = registry.counter("test_total", "Test counter", ("source",), max_series=2)
+        for source in ["a", "b", "c", "d"]:
+            counter.inc(source)
+        self.assertEqual(counter.value("a"), 1)
+        self.assertEqual(counter.value("other"), 2)
+
+    def test_collector_flattens_stats(self):
+        registry = MetricsRegistry()
+        registry.add_collector("snmp_dispatcher", lambda: {"batches_sent": 3, "spool": {"bytes": 10}})
+        text = registry.render()
+        self.assertIn("snmp_dispatcher_batches_sent 3", text)
+        self.assertIn("snmp_dispatcher_spool_bytes 10", text)
+
+class TestMetricsEndpoint(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.original_output_mode = settings.output_mode
+        settings.output_mode = "stdout"
+
+    def tearDown(self):
+        settings.output_mode = self.original_output_mode
+
+    async def test_dispatch_is_instrumented(self):
+        before = metrics.dispatch_results.value("stdout", "success")
+        count_before = metrics.dispatch_seconds.count
+        dispatcher = Dispatcher()
+        dispatcher.stdout_sink = StdoutSink(stream=io.BytesIO())
+        await dispatcher.dispatch({"source_ip": "127.0.0.1", "variables": []})
+        await dispatcher.close()
+        self.assertEqual(metrics.dispatch_results.value("stdout", "success"), before + 1)
+        self.assertEqual(metrics.dispatch_seconds.count, count_before + 1)
+
+        server = MetricsServer("127.0.0.1", 0)
+        await server.start()
+        try:
+            async with aiohttp.ClientSession() as session:
+                async with session.get(f"http://127.0.0.1:{server.port}/metrics") as response:
+                    self.assertEqual(response.status, 200)
+                    text = await response.text()
+        finally:
+            await server.stop()
+        self.assertIn('snmp_dispatch_total{output="stdout",result="success"}', text)
+        self.assertIn("# TYPE snmp_resolve_seconds histogram", text)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+from pysnmp.proto import rfc1902
+from src.resolver import MibResolver
+from src.mib_watcher import MibWatcher
+from src.config import settings
+
+# テスト用のコンパイル済みMIBモジュール (pysmiの出力と同じ形式)
+MODULE_TEMPLATE = '''
+(NamedValues,) = mibBuilder.import_symbols("ASN1-ENUMERATION", "NamedValues")
+(Integer32, MibScalar) = mibBuilder.import_symbols("SNMPv2-SMI", "Integer32", "MibScalar")
+reloadTestObject = MibScalar((1, 3, 6, 1, 4, 1, 99998, 1), Integer32(){enums})
+mibBuilder.export_symbols("RELOAD-TEST-MIB", reloadTestObject=reloadTestObject)
+'''
+TEST_OID = rfc1902.ObjectName('1.3.6.1.4.1.99998.1.0')
+
+
+class TestMibReload(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.original_mib_dir = settings.mib_dir
+        settings.mib_dir = self.test_dir
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+        settings.mib_dir = self.original_mib_dir
+
+    def _write_module(self, enums=""):
+        path = os.path.join(self.test_dir, 'RELOAD-TEST-MIB.py')
+        with open(path, 'w') as f:
+            f.write(MODULE_TEMPLATE.replace("{enums}", enums))
+        # 同じ秒内の書き換えでも変更として検知されるよう更新時刻をずらす
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    async def test_reload_picks_up_new_module(self):
+        resolver = MibResolver()
+        # モジュールが無いため上位の enterprises として解決される
+        self.assertEqual(resolver.resolve(TEST_OID, rfc1902.Integer(1))["name"], "enterprises")
+        old_builder = resolver.mibBuilder
+
+        self._write_module()
+        self.assertTrue(await resolver.reload())
+
+        result = resolver.resolve(TEST_OID, rfc1902.Integer(1))
+        self.assertEqual((result["mib"], result["name"]), ("RELOAD-TEST-MIB", "reloadTestObject"))
+        self.assertIsNot(resolver.mibBuilder, old_builder)
+        info = resolver.reload_info()
+        self.assertEqual(info["reloads"], 1)
+        self.assertGreater(info["modules"], 0)
+
+    async def test_failed_reload_keeps_state(self):
+        resolver = MibResolver()
+        old_builder = resolver.mibBuilder
+        original_init = MibResolver._init_mib_builder
+
+        def broken(self):
+            raise RuntimeError("broken")
+
+        MibResolver._init_mib_builder = broken
+        try:
+            self.assertFalse(await resolver.reload())
+        finally:
+            MibResolver._init_mib_builder = original_init
+        self.assertIs(resolver.mibBuilder, old_builder)
+        self.assertEqual(resolver.reload_info()["failures"], 1)
+
+    async def test_watcher_reloads_on_change(self):
+        self._write_module()
+        resolver = MibResolver()
+        self.assertEqual(resolver.resolve(TEST_OID, rfc1902.Integer(1))["value"], "1")
+
+        watcher = MibWatcher(resolver, interval=0.05, paths=[self.test_dir])
+        watcher.start()
+        try:
+            await asyncio.sleep(0.1)
+            self._write_module(enums='.clone(namedValues=NamedValues(("up", 1)))')
+
+            for _ in range(100):
+                if resolver.reloads:
+                    break
+                await asyncio.sleep(0.05)
+        finally:
+            watcher.close()
+
+        self.assertEqual(watcher.changes, 1)
+        self.assertEqual(resolver.resolve(TEST_OID, rfc1902.Integer(1))["value"], "up")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+import os
+import shutil
+import tempfile
+from pysnmp.smi import builder, view
+from pysnmp.proto import rfc1902
+from src.oid_index import OidIndex, OidIndexError, collect_oid_entries, write_oid_index, INDEX_FILENAME
+from src.resolver import MibResolver
+from src.config import settings
+
+class TestOidIndex(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.index_path = os.path.join(self.test_dir, INDEX_FILENAME)
+
+        self.mibBuilder = builder.MibBuilder()
+        self.mibBuilder.loadModules('SNMPv2-MIB')
+        write_oid_index(collect_oid_entries(self.mibBuilder), self.index_path)
+        self.index = OidIndex(self.index_path)
+
+    def tearDown(self):
+        self.index.close()
+        shutil.rmtree(self.test_dir)
+
+    def test_exact_and_prefix_match(self):
+        module, symbol, suffix, syntax, enums, kind = self.index.lookup((1, 3, 6, 1, 2, 1, 1, 3, 0))
+        self.assertEqual((module, symbol, suffix), ('SNMPv2-MIB', 'sysUpTime', (0,)))
+        self.assertEqual(syntax, 'TimeTicks')
+
+        module, symbol, suffix, _, _, _ = self.index.lookup((1, 3, 6, 1, 6, 3, 1, 1, 5, 3))
+        self.assertEqual((module, symbol, suffix), ('SNMPv2-MIB', 'snmpTraps', (3,)))
+
+    def test_enums(self):
+        _, symbol, _, _, enums, _ = self.index.lookup((1, 3, 6, 1, 2, 1, 11, 30, 0))
+        self.assertEqual(symbol, 'snmpEnableAuthenTraps')
+        self.assertEqual(enums, {1: 'enabled', 2: 'disabled'})
+
+    def test_unknown_oid(self):
+        self.assertIsNone(self.index.lookup((3, 1)))
+
+    def test_matches_view_controller(self):
+        # MibViewControllerと同じ解決結果になること
+        mibViewController = view.MibViewController(self.mibBuilder)
+        for oid in [(1, 3, 6, 1, 2, 1, 1, 5, 0), (1, 3, 6, 1, 4, 1, 99999, 1),
+                    (1, 3, 6, 1, 6, 3, 1, 1, 4, 1, 0), (1, 3, 6, 1, 2, 1, 1, 9, 1, 3, 7)]:
+            oid_obj, _, suffix = mibViewController.getNodeName(oid)
+            modName, symName, _ = mibViewController.getNodeLocation(oid_obj)
+            module, symbol, index_suffix, _, _, _ = self.index.lookup(oid)
+            self.assertEqual((module, symbol, index_suffix), (modName, symName, tuple(suffix)), oid)
+
+    def test_version_mismatch(self):
+        with open(self.index_path, 'r+b') as f:
+            f.seek(4)
+            f.write(b'\xff\x00')
+        with self.assertRaises(OidIndexError):
+            OidIndex(self.index_path)
+
+    def test_resolver_index_mode(self):
+        original = (settings.resolver_mode, settings.oid_index_path)
+        settings.resolver_mode = "index"
+        settings.oid_index_path = self.index_path
+        try:
+            resolver = MibResolver()
+            self.assertIsNone(resolver.mibBuilder)
+            result = resolver.resolve(rfc1902.ObjectName('1.3.6.1.2.1.1.3.0'), rfc1902.TimeTicks(5))
+            self.assertEqual(result["mib"], "SNMPv2-MIB")
+            self.assertEqual(result["name"], "sysUpTime")
+            self.assertEqual(result["suffix"], "0")
+            self.assertEqual(result["value"], "0:00:00.05")
+            self.assertEqual(result["syntax"], "TimeTicks")
+            self.assertEqual(resolver.resolve(rfc1902.ObjectName('3.1'))["mib"], "UNKNOWN")
+        finally:
+            settings.resolver_mode, settings.oid_index_path = original
+
+if __name__ == '__main__':
+    unittest.main()
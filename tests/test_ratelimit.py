@@ -0,0 +1,62 @@
+import unittest
+from unittest import mock
+from src.ratelimit import RateLimiter, parse_overrides
+
+class TestRateLimiter(unittest.TestCase):
+    def test_token_bucket(self):
+        limiter = RateLimiter(rate=10, burst=5, overrides="", idle_timeout=60)
+        with mock.patch("src.ratelimit.time.monotonic", return_value=100.0):
+            results = [limiter.allow("192.0.2.1") for _ in range(8)]
+            # 他の送信元は影響を受けない
+            self.assertTrue(limiter.allow("192.0.2.2"))
+        self.assertEqual(results, [True] * 5 + [False] * 3)
+
+        # 0.2秒後には 10件/秒 × 0.2秒 = 2件分のトークンが補充される
+        with mock.patch("src.ratelimit.time.monotonic", return_value=100.2):
+            results = [limiter.allow("192.0.2.1") for _ in range(3)]
+        self.assertEqual(results, [True, True, False])
+        self.assertEqual(limiter.top_sources(), [("192.0.2.1", 4)])
+        self.assertEqual(limiter.stats()["dropped"], 4)
+
+    def test_cidr_overrides(self):
+        overrides = parse_overrides("10.0.0.0/8=1000:2000, 10.1.0.0/16=1, 2001:db8::/32=50")
+        self.assertEqual([str(o[0]) for o in overrides], ["2001:db8::/32", "10.1.0.0/16", "10.0.0.0/8"])
+        self.assertEqual(overrides[1][1:], (1.0, 2.0))
+
+        limiter = RateLimiter(rate=10, burst=20, overrides="10.0.0.0/8=1000:2000,10.1.0.0/16=1:1")
+        self.assertEqual(limiter._limit_for("10.2.3.4"), (1000.0, 2000.0))
+        self.assertEqual(limiter._limit_for("10.1.3.4"), (1.0, 1.0))
+        self.assertEqual(limiter._limit_for("192.0.2.1"), (10, 20))
+
+        with self.assertRaises(ValueError):
+            parse_overrides("not-a-network=10")
+
+    def test_idle_sources_are_evicted(self):
+        limiter = RateLimiter(rate=10, burst=5, overrides="", idle_timeout=60)
+        with mock.patch("src.ratelimit.time.monotonic", return_value=0.0):
+            for i in range(100):
+                limiter.allow(f"192.0.2.{i}")
+        with mock.patch("src.ratelimit.time.monotonic", return_value=30.0):
+            limiter.allow("192.0.2.0")
+        with mock.patch("src.ratelimit.time.monotonic", return_value=61.0):
+            limiter.allow("198.51.100.1")
+
+        # 最近受信した 192.0.2.0 と新しい送信元だけが残る
+        self.assertEqual(limiter.stats()["sources"], 2)
+        self.assertEqual(limiter.stats()["evicted"], 99)
+
+    def test_sources_are_bounded(self):
+        limiter = RateLimiter(rate=10, burst=1, overrides="", idle_timeout=60, max_entries=100)
+        with mock.patch("src.ratelimit.time.monotonic", return_value=0.0):
+            self.assertTrue(limiter.allow("198.51.100.1"))
+            for i in range(1000):
+                limiter.allow(f"10.0.{i // 256}.{i % 256}")
+                # 受信が続いている送信元は追い出されず、制限も解除されない
+                self.assertFalse(limiter.allow("198.51.100.1"))
+
+        stats = limiter.stats()
+        self.assertEqual(stats["sources"], 100)
+        self.assertEqual((stats["evicted"], stats["overflow_evicted"]), (0, 901))
+
+if __name__ == '__main__':
+    unittest.main()
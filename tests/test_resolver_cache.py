@@ -0,0 +1,154 @@
+import unittest
+import shutil
+import tempfile
+from pysnmp.proto import rfc1902
+from src.fastpath import FastValue, TAG_OID, TAG_OCTET_STRING
+from src.resolver import MibResolver
+from src.config import settings
+
+class TestMibResolverCache(unittest.TestCase):
+    def setUp(self):
+        # 空のMIBディレクトリを使用し、標準MIBのみで検証する
+        self.test_dir = tempfile.mkdtemp()
+        self.original_mib_dir = settings.mib_dir
+        self.original_cache_size = settings.resolve_cache_size
+        settings.mib_dir = self.test_dir
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+        settings.mib_dir = self.original_mib_dir
+        settings.resolve_cache_size = self.original_cache_size
+
+    def _create_resolver(self, cache_size):
+        settings.resolve_cache_size = cache_size
+        resolver = MibResolver()
+        resolver.mibBuilder.loadModules('SNMPv2-MIB')
+        return resolver
+
+    def test_cache_hit(self):
+        resolver = self._create_resolver(10)
+        oid = rfc1902.ObjectName('1.3.6.1.2.1.1.3.0')
+
+        first = resolver.resolve(oid, rfc1902.TimeTicks(100))
+        second = resolver.resolve(oid, rfc1902.TimeTicks(200))
+
+        self.assertEqual(first["name"], "sysUpTime")
+        self.assertEqual(second["name"], "sysUpTime")
+        self.assertEqual(second["suffix"], "0")
+        self.assertEqual(second["value"], "0:00:02.00")
+        self.assertEqual(second["raw"], 200)
+
+        info = resolver.cache_info()
+        self.assertEqual(info["misses"], 1)
+        self.assertEqual(info["hits"], 1)
+
+    def test_negative_result_is_cached(self):
+        resolver = self._create_resolver(10)
+        # どのMIBツリーにも属さないOID
+        oid = rfc1902.ObjectName('3.1')
+
+        first = resolver.resolve(oid, rfc1902.Integer(1))
+        second = resolver.resolve(oid, rfc1902.Integer(1))
+
+        self.assertEqual(first["mib"], "UNKNOWN")
+        self.assertEqual(second["mib"], "UNKNOWN")
+        self.assertEqual(second["name"], "3.1")
+        self.assertEqual(resolver.cache_info()["hits"], 1)
+
+    def test_eviction(self):
+        resolver = self._create_resolver(2)
+        for sub in (1, 2, 3):
+            resolver.resolve(rfc1902.ObjectName(f'1.3.6.1.2.1.1.{sub}.0'))
+
+        info = resolver.cache_info()
+        self.assertEqual(info["size"], 2)
+        self.assertEqual(info["evictions"], 1)
+
+        # 最も古いエントリが追い出されているため再度ミスになる
+        resolver.resolve(rfc1902.ObjectName('1.3.6.1.2.1.1.1.0'))
+        self.assertEqual(resolver.cache_info()["misses"], 4)
+
+    def test_cache_invalidated_on_module_load(self):
+        resolver = self._create_resolver(10)
+        oid = rfc1902.ObjectName('1.3.6.1.6.3.1.1.4.1.0')
+        resolver.resolve(oid)
+        self.assertEqual(resolver.cache_info()["size"], 1)
+
+        # 新しいモジュールのロードでキャッシュが破棄される
+        resolver.mibBuilder.loadModules('SNMP-FRAMEWORK-MIB')
+        resolver.resolve(oid)
+        self.assertEqual(resolver.cache_info()["misses"], 2)
+
+    def test_cache_disabled(self):
+        resolver = self._create_resolver(0)
+        oid = rfc1902.ObjectName('1.3.6.1.2.1.1.3.0')
+        resolver.resolve(oid)
+        resolver.resolve(oid)
+        info = resolver.cache_info()
+        self.assertEqual(info["size"], 0)
+        self.assertEqual(info["hits"], 0)
+
+class TestTrapTemplates(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.original = (settings.mib_dir, settings.trap_template_cache_size)
+        settings.mib_dir = self.test_dir
+        settings.trap_template_cache_size = 10
+        self.resolver = MibResolver()
+        self.resolver.mibBuilder.loadModules('SNMPv2-MIB', 'SNMP-NOTIFICATION-MIB')
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+        settings.mib_dir, settings.trap_template_cache_size = self.original
+
+    @staticmethod
+    def _var_binds(index, enterprise_oid='1.3.6.1.4.1.99999.1.2'):
+        # snmpNotifyTag はテーブルの列 (サフィックスはインデックス)
+        return [
+            (rfc1902.ObjectName('1.3.6.1.2.1.1.3.0'), rfc1902.TimeTicks(12345)),
+            (rfc1902.ObjectName('1.3.6.1.6.3.1.1.4.1.0'), rfc1902.ObjectName('1.3.6.1.6.3.1.1.5.1')),
+            (rfc1902.ObjectName(f'1.3.6.1.6.3.13.1.1.1.2.{index}'), rfc1902.OctetString(f'tag{index}')),
+            (rfc1902.ObjectName(enterprise_oid), rfc1902.Integer(index)),
+        ]
+
+    def _resolve(self, var_binds):
+        variables, trap_info = self.resolver.resolve_trap(var_binds)
+        expected = [self.resolver.resolve(oid, value) for oid, value in var_binds]
+        self.assertEqual([variable.to_dict() for variable in variables], expected)
+        return variables, trap_info
+
+    def test_suffix_only_differs(self):
+        self._resolve(self._var_binds(1))
+        variables, trap_info = self._resolve(self._var_binds(2))
+        variables, trap_info = self._resolve(self._var_binds(3))
+        self.assertEqual((trap_info.mib, trap_info.name), ("SNMPv2-MIB", "coldStart"))
+        self.assertEqual((variables[2].name, variables[2].info.suffix), ("snmpNotifyTag", "3"))
+        info = self.resolver.cache_info()
+        self.assertEqual((info["template_hits"], info["template_misses"], info["templates"]), (2, 1, 1))
+
+    def test_unresolved_node_requires_exact_match(self):
+        self._resolve(self._var_binds(1))
+        # 構文を持たないノード (enterprises) に解決されたOIDはサフィックスが異なると別のテンプレートになる
+        self._resolve(self._var_binds(1, '1.3.6.1.4.1.99999.1.3'))
+        self._resolve(self._var_binds(2, '1.3.6.1.4.1.99999.1.3'))
+        info = self.resolver.cache_info()
+        self.assertEqual((info["template_hits"], info["template_misses"], info["templates"]), (1, 2, 2))
+
+    def test_fast_path_values(self):
+        var_binds = [
+            ((1, 3, 6, 1, 6, 3, 1, 1, 4, 1, 0), FastValue(TAG_OID, (1, 3, 6, 1, 6, 3, 1, 1, 5, 1))),
+            ((1, 3, 6, 1, 6, 3, 13, 1, 1, 1, 2, 7), FastValue(TAG_OCTET_STRING, b'tag7')),
+        ]
+        self.resolver.resolve_trap(var_binds)
+        variables, trap_info = self.resolver.resolve_trap(var_binds)
+        self.assertEqual(trap_info.name, "coldStart")
+        self.assertEqual(variables[1].value, "tag7")
+        self.assertEqual(self.resolver.cache_info()["template_hits"], 1)
+
+        # snmpTrapOID が含まれない場合は変数ごとに解決する
+        variables, trap_info = self.resolver.resolve_trap(var_binds[1:])
+        self.assertIsNone(trap_info)
+        self.assertEqual(variables[0].name, "snmpNotifyTag")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,8 +3,15 @@ from unittest.mock import MagicMock, patch
 import os
 import shutil
 import tempfile
+from pysnmp.smi import builder
+from pysnmp.proto import rfc1902
 from src.resolver import MibResolver
+from src.mib_registry import scan_module_prefixes, collect_module_prefixes, write_registry, REGISTRY_FILENAME
 from src.config import settings
+from src import metrics
+
+# pysnmp同梱のコンパイル済みMIBをテスト用のMIBとして使用する
+PYSNMP_MIB_DIR = os.path.dirname(builder.__file__) + '/mibs'
 
 class TestMibResolverLoading(unittest.TestCase):
     def setUp(self):
@@ -72,5 +79,58 @@ class TestMibResolverLoading(unittest.TestCase):
         # 実装ではループ内で呼ばれるので、ファイルがなければ呼ばれないはず
         self.assertEqual(mock_builder.loadModules.call_count, 0)
 
+class TestMibResolverLazyLoading(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        for module_name in ('SNMPv2-MIB', 'SNMP-FRAMEWORK-MIB'):
+            shutil.copy(os.path.join(PYSNMP_MIB_DIR, module_name + '.py'), self.test_dir)
+        self.original = (settings.mib_dir, settings.mib_load_mode)
+        settings.mib_dir = self.test_dir
+        settings.mib_load_mode = "lazy"
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+        settings.mib_dir, settings.mib_load_mode = self.original
+
+    def test_scan_matches_loaded_modules(self):
+        # 高速スキャンの結果が、実際にロードした場合のプレフィックスと一致すること
+        mibBuilder = builder.MibBuilder()
+        mibBuilder.loadModules('SNMPv2-MIB', 'SNMP-FRAMEWORK-MIB')
+        expected = collect_module_prefixes(mibBuilder, ['SNMPv2-MIB', 'SNMP-FRAMEWORK-MIB'])
+        self.assertEqual(scan_module_prefixes(self.test_dir), expected)
+        self.assertIn((1, 3, 6, 1, 2, 1, 1), expected['SNMPv2-MIB'])
+
+    def test_modules_loaded_on_demand(self):
+        resolver = MibResolver()
+        self.assertEqual(resolver.lazy_info(), {"registered": 2, "loaded": 0, "failed": 0})
+        self.assertEqual(resolver.lazy_loaded_modules, [])
+        loads = metrics.mib_lazy_loads.value('SNMPv2-MIB', 'loaded')
+
+        result = resolver.resolve(rfc1902.ObjectName('1.3.6.1.2.1.1.3.0'), rfc1902.TimeTicks(1))
+        self.assertEqual(result["mib"], "SNMPv2-MIB")
+        self.assertEqual(result["name"], "sysUpTime")
+        self.assertEqual(resolver.lazy_loaded_modules, ['SNMPv2-MIB'])
+        self.assertEqual(metrics.mib_lazy_loads.value('SNMPv2-MIB', 'loaded') - loads, 1)
+
+        # サブツリー外のOIDでは追加ロードされない
+        resolver.resolve(rfc1902.ObjectName('1.3.6.1.4.1.99999.1'))
+        self.assertEqual(resolver.lazy_loaded_modules, ['SNMPv2-MIB'])
+
+        # スクレイプ時にはモジュール数をゲージとして出力する
+        registry = metrics.MetricsRegistry()
+        registry.add_collector("snmp_mib_lazy", resolver.lazy_info)
+        text = registry.render()
+        self.assertIn("snmp_mib_lazy_registered 2\n", text)
+        self.assertIn("snmp_mib_lazy_loaded 1\n", text)
+        self.assertIn("snmp_mib_lazy_failed 0\n", text)
+
+    def test_build_time_registry_is_used(self):
+        # ビルド時に生成されたレジストリがあれば、スキャン結果ではなくそちらを使用する
+        write_registry({'SNMP-FRAMEWORK-MIB': [(1, 3, 6, 1, 2, 1, 1)]},
+                       os.path.join(self.test_dir, REGISTRY_FILENAME))
+        resolver = MibResolver()
+        resolver.resolve(rfc1902.ObjectName('1.3.6.1.2.1.1.3.0'))
+        self.assertEqual(resolver.lazy_loaded_modules, ['SNMP-FRAMEWORK-MIB'])
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,94 @@
+import os
+import shutil
+import tempfile
+import unittest
+from pysnmp.proto import rfc1902
+from src.resolver import MibResolver
+from src.config import settings
+
+# テスト用のコンパイル済みMIBモジュール (pysmiの出力と同じ形式)
+MODULE_TEMPLATE = '''
+(NamedValues,) = mibBuilder.import_symbols("ASN1-ENUMERATION", "NamedValues")
+(Integer32, MibScalar) = mibBuilder.import_symbols("SNMPv2-SMI", "Integer32", "MibScalar")
+(DisplayString, MacAddress) = mibBuilder.import_symbols("SNMPv2-TC", "DisplayString", "MacAddress")
+snapshotTestState = MibScalar((1, 3, 6, 1, 4, 1, 99997, 1), Integer32().clone(namedValues=NamedValues({enums})))
+snapshotTestLabel = MibScalar((1, 3, 6, 1, 4, 1, 99997, 2), DisplayString())
+snapshotTestMac = MibScalar((1, 3, 6, 1, 4, 1, 99997, 3), MacAddress())
+mibBuilder.export_symbols("SNAPSHOT-TEST-MIB", snapshotTestState=snapshotTestState,
+                          snapshotTestLabel=snapshotTestLabel, snapshotTestMac=snapshotTestMac)
+'''
+
+VARBINDS = [
+    (rfc1902.ObjectName('1.3.6.1.4.1.99997.1.0'), rfc1902.Integer(2)),
+    (rfc1902.ObjectName('1.3.6.1.4.1.99997.2.0'), rfc1902.OctetString(b'core-sw1')),
+    (rfc1902.ObjectName('1.3.6.1.4.1.99997.3.0'), rfc1902.OctetString(b'\x00\x11\x22\x33\x44\x55')),
+    (rfc1902.ObjectName('1.3.6.1.2.1.1.3.0'), rfc1902.TimeTicks(12345)),
+    (rfc1902.ObjectName('1.3.6.1.6.3.1.1.4.1.0'), rfc1902.ObjectName('1.3.6.1.6.3.1.1.5.3')),
+    (rfc1902.ObjectName('1.3.6.1.4.1.99996.1'), rfc1902.Integer(7)),
+]
+
+
+class TestResolverSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.snapshot_path = os.path.join(self.test_dir, 'snapshot', 'resolver_snapshot.bin')
+        self.original = (settings.mib_dir, settings.resolver_snapshot_path)
+        settings.mib_dir = self.test_dir
+        settings.resolver_snapshot_path = self.snapshot_path
+        self._write_module('("up", 1), ("down", 2)')
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+        settings.mib_dir, settings.resolver_snapshot_path = self.original
+
+    def _write_module(self, enums):
+        with open(os.path.join(self.test_dir, 'SNAPSHOT-TEST-MIB.py'), 'w') as f:
+            f.write(MODULE_TEMPLATE.replace("{enums}", enums))
+
+    def _resolve_all(self, resolver):
+        return [resolver.resolve(oid, value) for oid, value in VARBINDS]
+
+    def test_snapshot_matches_mib_modules(self):
+        loaded = MibResolver()
+        self.assertIsNotNone(loaded.mibBuilder)
+        self.assertTrue(os.path.exists(self.snapshot_path))
+
+        restored = MibResolver()
+        # スナップショットから復元した場合はMIBモジュールをロードしない
+        self.assertIsNone(restored.mibBuilder)
+        self.assertIsNotNone(restored.oidIndex)
+        self.assertEqual(self._resolve_all(restored), self._resolve_all(loaded))
+        self.assertEqual(restored.resolve(*VARBINDS[0])["value"], "down")
+        self.assertEqual(restored.resolve(*VARBINDS[2])["value"], "00:11:22:33:44:55")
+        restored.oidIndex.close()
+
+    def test_changed_mib_rebuilds_snapshot(self):
+        MibResolver()
+        self._write_module('("up", 1), ("down", 2), ("testing", 3)')
+
+        resolver = MibResolver()
+        # チェックサムが一致しないためMIBモジュールからロードし、スナップショットを書き直す
+        self.assertIsNotNone(resolver.mibBuilder)
+        self.assertEqual(resolver.resolve(VARBINDS[0][0], rfc1902.Integer(3))["value"], "testing")
+
+        restored = MibResolver()
+        self.assertIsNone(restored.mibBuilder)
+        self.assertEqual(restored.resolve(VARBINDS[0][0], rfc1902.Integer(3))["value"], "testing")
+        restored.oidIndex.close()
+
+    def test_corrupt_snapshot_falls_back(self):
+        os.makedirs(os.path.dirname(self.snapshot_path))
+        with open(self.snapshot_path, 'wb') as f:
+            f.write(b'garbage')
+
+        resolver = MibResolver()
+        self.assertIsNotNone(resolver.mibBuilder)
+        self.assertEqual(resolver.resolve(*VARBINDS[1])["value"], "core-sw1")
+
+        restored = MibResolver()
+        self.assertIsNone(restored.mibBuilder)
+        restored.oidIndex.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,188 @@
+import glob
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from aiohttp import web
+from src.dispatcher import Dispatcher
+from src.formatters import format_generic
+from src.router import Router, load_router
+from src.stdout_sink import StdoutSink
+from src.trap_record import OidInfo, PrettyVariable, TrapRecord, SNMP_TRAP_OID
+from src.config import settings
+
+LINK_DOWN = "1.3.6.1.6.3.1.1.5.3"
+LINK_UP = "1.3.6.1.6.3.1.1.5.4"
+ENV_TRAP = "1.3.6.1.4.1.9.9.13.3.0.1"
+
+TRAP_OID_INFO = OidInfo(SNMP_TRAP_OID, "SNMPv2-MIB", "snmpTrapOID", "0", format_generic, "ObjectName")
+IF_DESCR_INFO = OidInfo("1.3.6.1.2.1.2.2.1.2.3", "IF-MIB", "ifDescr", "3", format_generic, "DisplayString")
+
+RULES = [
+    {"name": "core-linkdown", "trap_oid": LINK_DOWN, "source": ["10.0.0.0/24", "2001:db8::/32"], "sinks": ["paging"]},
+    {"name": "uplinks", "trap_oid": [LINK_DOWN, LINK_UP],
+     "varbinds": [{"name": "ifDescr", "regex": "^TenGig"}], "sinks": ["paging", "archive"]},
+    {"name": "environment", "trap_oid": "1.3.6.1.4.1.9.9.13", "sinks": ["archive"], "continue": True},
+    {"name": "lab", "source": "192.0.2.0/24", "sinks": []},
+]
+SINKS = {"paging": {"type": "stdout"}, "archive": {"type": "file"}}
+
+
+def make_trap(source_ip, trap_oid, if_descr="GigabitEthernet0/3"):
+    return TrapRecord(source_ip, 162, "v2c", (
+        PrettyVariable(TRAP_OID_INFO, trap_oid),
+        PrettyVariable(IF_DESCR_INFO, if_descr),
+    ), 1700000000.0)
+
+
+class TestRouter(unittest.TestCase):
+    def setUp(self):
+        self.router = Router(RULES, sinks=SINKS)
+
+    def test_match(self):
+        route = self.router.route
+        self.assertEqual(route(make_trap("10.0.0.7", LINK_DOWN)), ("paging",))
+        self.assertEqual(route(make_trap("2001:db8::1", LINK_DOWN)), ("paging",))
+        # 送信元が一致しないため、変数の条件を持つ次のルールを評価する
+        self.assertEqual(route(make_trap("10.0.1.7", LINK_DOWN)), ("default",))
+        self.assertEqual(route(make_trap("10.0.1.7", LINK_UP, "TenGigE0/1")), ("paging", "archive"))
+        # continue のルールは後続のルールも評価する (lab ルールのシンクは空)
+        self.assertEqual(route(make_trap("10.0.1.7", ENV_TRAP)), ("archive",))
+        self.assertEqual(route(make_trap("192.0.2.9", ENV_TRAP)), ("archive",))
+        self.assertEqual(route(make_trap("192.0.2.9", LINK_UP)), ())
+        # サブツリーの途中までしか一致しないOIDとアドレスでないsource_ip
+        self.assertEqual(route(make_trap("not-an-address", "1.3.6.1.4.1.9.9")), ("default",))
+
+        stats = self.router.stats()
+        self.assertEqual(stats["rules"], 4)
+        self.assertEqual(stats["unmatched"], 2)
+        self.assertEqual(stats["routed"], {"default": 2, "paging": 3, "archive": 3})
+        self.assertEqual([rule.matched for rule in self.router.rules], [2, 1, 2, 2])
+
+    def test_many_rules(self):
+        rules = [{"trap_oid": f"1.3.6.1.4.1.{i}", "source": f"10.{i // 256}.{i % 256}.0/24", "sinks": ["archive"]}
+                 for i in range(2000)]
+        router = Router(rules + [{"trap_oid": "1.3.6.1.4.1", "sinks": ["paging"]}], sinks=SINKS)
+        self.assertEqual(router.route(make_trap("10.3.231.1", "1.3.6.1.4.1.999.0.1")), ("archive",))
+        self.assertEqual(router.route(make_trap("10.3.232.1", "1.3.6.1.4.1.999.0.1")), ("paging",))
+        self.assertEqual(router.rules[999].matched, 1)
+
+    def test_cidr_prefix_lengths(self):
+        router = Router([
+            {"source": "172.16.0.0/12", "sinks": ["paging"]},
+            {"source": "10.1.2.128/25", "sinks": ["archive"]},
+            {"source": "0.0.0.0/0", "sinks": []},
+        ], sinks=SINKS)
+        for source, sinks in [("172.31.255.1", ("paging",)), ("172.32.0.1", ()), ("10.1.2.200", ("archive",)),
+                              ("10.1.2.127", ()), ("2001:db8::1", ("default",))]:
+            self.assertEqual(router.match(source, LINK_DOWN, ()), sinks, source)
+
+    def test_invalid(self):
+        with self.assertRaisesRegex(ValueError, "rule #0: sinks: unknown sink 'pager'"):
+            Router([{"trap_oid": LINK_DOWN, "sinks": ["pager"]}], sinks=SINKS)
+        with self.assertRaisesRegex(ValueError, "rule #1: invalid source"):
+            Router([{"sinks": []}, {"source": "10.0.0.300/8", "sinks": []}])
+        with self.assertRaisesRegex(ValueError, "numeric OID"):
+            Router([{"trap_oid": "IF-MIB::linkDown", "sinks": []}])
+        with self.assertRaisesRegex(ValueError, "type must be one of"):
+            Router([], sinks={"pager": {"type": "sms"}})
+        with self.assertRaisesRegex(ValueError, "sink name must consist of letters, digits and underscores"):
+            Router([], sinks={"core-pager": {"type": "stdout"}})
+
+    def test_invalid_sink_fields(self):
+        for spec, message in [
+            ({"type": "webhook", "url": "http://a/hook"}, "unknown fields for webhook sink: url"),
+            ({"type": "webhook"}, "urls is required"),
+            ({"type": "webhook", "urls": ["a/hook"]}, "invalid webhook URL 'a/hook'"),
+            ({"type": "webhook", "urls": [{"url": "http://a/hook", "max_in_flight": "4"}]}, "must be an integer"),
+            ({"type": "webhook", "urls": "http://a/hook", "mode": "broadcast"}, "mode must be one of"),
+            ({"type": "file", "dir": 1}, "dir must be a non-empty string"),
+            ({"type": "file", "prefix": "a/b"}, "prefix must not contain"),
+        ]:
+            with self.assertRaisesRegex(ValueError, message, msg=spec):
+                Router([], sinks={"pager": spec})
+
+
+class TestRoutedDispatch(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.original = (settings.output_mode, settings.routing_file, settings.file_compression)
+        settings.output_mode = "stdout"
+        settings.file_compression = "none"
+        settings.routing_file = os.path.join(self.test_dir, "routing.json")
+        with open(settings.routing_file, "w") as f:
+            json.dump({
+                "sinks": {"archive": {"type": "file", "dir": os.path.join(self.test_dir, "archive")}},
+                "rules": [{"trap_oid": "1.3.6.1.4.1.9.9.13", "sinks": ["archive"]},
+                          {"trap_oid": LINK_DOWN, "sinks": ["default", "archive"]}]
+            }, f)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+        settings.output_mode, settings.routing_file, settings.file_compression = self.original
+
+    async def test_dispatch_to_sinks(self):
+        stream = io.BytesIO()
+        dispatcher = Dispatcher()
+        dispatcher.stdout_sink = StdoutSink(stream=stream, flush_interval_ms=0)
+        await dispatcher.initialize()
+        for trap_oid in (ENV_TRAP, LINK_DOWN, LINK_UP):
+            await dispatcher.dispatch(make_trap("10.0.0.1", trap_oid))
+        stats = dispatcher.stats()
+        await dispatcher.close()
+
+        def trap_oids(data):
+            return [json.loads(line)["variables"][0]["value"] for line in data.splitlines()]
+
+        self.assertEqual(trap_oids(stream.getvalue()), [LINK_DOWN, LINK_UP])
+        (segment,) = glob.glob(os.path.join(self.test_dir, "archive", "archive-*.ndjson"))
+        with open(segment, "rb") as f:
+            self.assertEqual(trap_oids(f.read()), [ENV_TRAP, LINK_DOWN])
+        self.assertEqual(stats["routing"]["routed"], {"default": 2, "archive": 2})
+        self.assertEqual(stats["sinks"]["archive"]["file"]["written"], 2)
+
+    async def test_dispatch_to_webhook_sink(self):
+        received = []
+
+        async def handler(request):
+            received.append((request.query["to"], json.loads(await request.read())["variables"][0]["value"]))
+            return web.Response(text="ok")
+
+        app = web.Application()
+        app.router.add_post("/hook", handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/hook"
+        with open(settings.routing_file, "w") as f:
+            json.dump({
+                "sinks": {"paging": {"type": "webhook", "mode": "fanout",
+                                     "urls": [f"{url}?to=a", {"url": f"{url}?to=b", "max_in_flight": 2}]}},
+                "rules": [{"trap_oid": LINK_DOWN, "sinks": ["paging"]}, {"sinks": []}]
+            }, f)
+
+        try:
+            dispatcher = Dispatcher()
+            await dispatcher.initialize()
+            for trap_oid in (LINK_DOWN, LINK_UP):
+                await dispatcher.dispatch(make_trap("10.0.0.1", trap_oid))
+            stats = dispatcher.stats()
+            await dispatcher.close()
+        finally:
+            await runner.cleanup()
+
+        self.assertEqual(sorted(received), [("a", LINK_DOWN), ("b", LINK_DOWN)])
+        self.assertEqual(stats["routing"]["routed"]["paging"], 1)
+
+    def test_load_router_errors(self):
+        with open(settings.routing_file, "w") as f:
+            json.dump({"rules": [{"trap_oid": LINK_DOWN}]}, f)
+        with self.assertRaisesRegex(ValueError, "Invalid routing file .*rule #0: 'sinks' is required"):
+            load_router(settings.routing_file)
+
+
+if __name__ == '__main__':
+    unittest.main()
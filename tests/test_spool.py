@@ -0,0 +1,288 @@
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from aiohttp import web
+from src.spool import Spool
+from src.dispatcher import Dispatcher
+from src.config import settings
+from src import metrics
+
+class TestSpool(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def _spool(self, max_bytes=1024 * 1024, segment_bytes=1024):
+        return Spool(self.test_dir, max_bytes=max_bytes, segment_bytes=segment_bytes, fsync_batch=10)
+
+    def test_append_read_commit(self):
+        spool = self._spool()
+        for i in range(5):
+            spool.append({"id": i})
+        self.assertTrue(spool.has_pending())
+
+        items, position = spool.read(3)
+        self.assertEqual([item["id"] for item in items], [0, 1, 2])
+        # commit前は同じ位置から読み出される
+        self.assertEqual(spool.read(3)[0], items)
+
+        spool.commit(position, len(items))
+        items, position = spool.read(10)
+        self.assertEqual([item["id"] for item in items], [3, 4])
+        spool.commit(position, len(items))
+        self.assertFalse(spool.has_pending())
+        self.assertEqual(spool.stats()["replayed"], 5)
+        spool.close()
+
+    def test_resume_after_restart(self):
+        spool = self._spool(segment_bytes=64)
+        for i in range(10):
+            spool.append({"id": i})
+        items, position = spool.read(4)
+        spool.commit(position, len(items))
+        spool.close()
+
+        spool = self._spool(segment_bytes=64)
+        spool.append({"id": 10})
+        items, _ = spool.read(100)
+        self.assertEqual([item["id"] for item in items], list(range(4, 11)))
+        spool.close()
+
+    def test_truncated_record_is_skipped(self):
+        spool = self._spool()
+        spool.append({"id": 0})
+        spool.append({"id": 1})
+        spool.close()
+
+        # 書き込み途中で停止した状態を再現
+        segment = sorted(f for f in os.listdir(self.test_dir) if f.endswith('.log'))[0]
+        path = os.path.join(self.test_dir, segment)
+        with open(path, 'r+b') as f:
+            f.truncate(os.path.getsize(path) - 3)
+
+        spool = self._spool()
+        spool.append({"id": 2})
+        items, _ = spool.read(100)
+        self.assertEqual([item["id"] for item in items], [0, 2])
+        spool.close()
+
+    def test_corrupt_record_in_write_segment(self):
+        spool = self._spool()
+        spool.append({"id": 0})
+        # 書き込み中のセグメントへの書き込みが途中で失敗した状態を再現
+        spool._file.write(b"\x10\x00\x00")
+        spool.append({"id": 1})
+
+        items, position = spool.read(100)
+        self.assertEqual([item["id"] for item in items], [0])
+        spool.commit(position, len(items))
+        # 壊れたレコード以降は読み飛ばし、以降の追記は新しいセグメントから読み出される
+        self.assertFalse(spool.has_pending())
+        spool.append({"id": 2})
+        items, position = spool.read(100)
+        self.assertEqual([item["id"] for item in items], [2])
+        self.assertEqual(spool.stats()["corrupt_records"], 1)
+        spool.close()
+
+    def test_evicts_oldest_segment(self):
+        spool = self._spool(max_bytes=200, segment_bytes=60)
+        for i in range(20):
+            spool.append({"id": i})
+
+        self.assertLessEqual(spool.total_bytes, 200)
+        self.assertGreater(spool.stats()["evicted_segments"], 0)
+        items, _ = spool.read(100)
+        # 残っているのは最新のTrapで、順序は保たれる
+        ids = [item["id"] for item in items]
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(ids[-1], 19)
+        spool.close()
+
+class TestDispatcherSpool(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.available = False
+        self.received = []
+        self.failed_once = set()
+        self.other_available = False
+        self.other_received = []
+
+        async def handler(request):
+            if not self.available:
+                return web.Response(status=503)
+            data = json.loads(await request.read())
+            items = data if isinstance(data, list) else [data]
+            # "bad" を含むTrapは受け付けない (恒久的な拒否)
+            if any(item.get("bad") for item in items):
+                return web.Response(status=400, text="invalid payload")
+            # "flaky" を含むTrapは初回のみ一時的なエラーにする
+            flaky = [item["id"] for item in items if item.get("flaky") and item["id"] not in self.failed_once]
+            if flaky:
+                self.failed_once.update(flaky)
+                return web.Response(status=503)
+            self.received.extend(item["id"] for item in items)
+            return web.Response(text="ok")
+
+        async def other_handler(request):
+            if not self.other_available:
+                return web.Response(status=503)
+            self.other_received.append(json.loads(await request.read())["id"])
+            return web.Response(text="ok")
+
+        app = web.Application()
+        app.router.add_post("/hook", handler)
+        app.router.add_post("/other", other_handler)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.other_url = f"http://127.0.0.1:{port}/other"
+
+        self.original = (settings.output_mode, settings.webhook_url, settings.webhook_batch_size,
+                         settings.webhook_batch_linger_ms, settings.spool_dir, settings.spool_retry_interval,
+                         settings.spool_fsync_interval_ms, settings.webhook_urls, settings.webhook_mode,
+                         settings.webhook_breaker_reset)
+        settings.output_mode = "webhook"
+        settings.webhook_url = f"http://127.0.0.1:{port}/hook"
+        settings.webhook_batch_size = 1
+        settings.spool_dir = self.test_dir
+        settings.spool_retry_interval = 0.05
+        settings.spool_fsync_interval_ms = 10
+
+    async def asyncTearDown(self):
+        await self.runner.cleanup()
+        shutil.rmtree(self.test_dir)
+        (settings.output_mode, settings.webhook_url, settings.webhook_batch_size,
+         settings.webhook_batch_linger_ms, settings.spool_dir, settings.spool_retry_interval,
+         settings.spool_fsync_interval_ms, settings.webhook_urls, settings.webhook_mode,
+         settings.webhook_breaker_reset) = self.original
+
+    async def test_replay_in_order_after_outage(self):
+        dispatcher = Dispatcher()
+        await dispatcher.initialize()
+
+        for i in range(5):
+            await dispatcher.dispatch({"id": i})
+        self.assertEqual(dispatcher.spool.stats()["appended"], 5)
+
+        # 復旧後は、新しいTrapもスプール内のTrapの後に送信される
+        self.available = True
+        await dispatcher.dispatch({"id": 5})
+        for _ in range(100):
+            if len(self.received) == 6:
+                break
+            await asyncio.sleep(0.02)
+
+        self.assertEqual(self.received, [0, 1, 2, 3, 4, 5])
+        self.assertFalse(dispatcher.spool.has_pending())
+        await dispatcher.close()
+
+    async def _replay_with_rejected_trap(self):
+        dispatcher = Dispatcher()
+        await dispatcher.initialize()
+
+        for i in range(4):
+            await dispatcher.dispatch({"id": i, "bad": i == 1})
+        # 復旧後、拒否されたTrapで再送が止まらず後続のTrapも送信される
+        self.available = True
+        await dispatcher.dispatch({"id": 4})
+        await dispatcher.dispatch({"id": 5, "bad": True})
+        for _ in range(100):
+            if len(self.received) == 4 and not dispatcher.spool.has_pending():
+                break
+            await asyncio.sleep(0.02)
+        await dispatcher.close()
+
+        self.assertEqual(self.received, [0, 2, 3, 4])
+        self.assertEqual(dispatcher.stats()["rejected_traps"], 2)
+        self.assertEqual(dispatcher.spool.stats()["dead_lettered"], 2)
+        with open(os.path.join(self.test_dir, "dead-letter.ndjson")) as f:
+            self.assertEqual([json.loads(line)["id"] for line in f], [1, 5])
+
+    async def test_transient_error_during_one_by_one_replay(self):
+        dispatcher = Dispatcher()
+        await dispatcher.initialize()
+        for i in range(5):
+            await dispatcher.dispatch({"id": i, "bad": i == 1, "flaky": i == 3})
+        self.available = True
+        for _ in range(100):
+            if not dispatcher.spool.has_pending():
+                break
+            await asyncio.sleep(0.02)
+        await dispatcher.close()
+
+        # 一時的なエラーの前に送信済み・デッドレターに移したTrapは再試行で重複しない
+        self.assertEqual(self.received, [0, 2, 3, 4])
+        self.assertEqual(dispatcher.spool.stats()["dead_lettered"], 1)
+        self.assertEqual(dispatcher.spool.stats()["replayed"], 4)
+
+    async def test_corrupt_record_does_not_stall_replay(self):
+        dispatcher = Dispatcher()
+        await dispatcher.initialize()
+        await dispatcher.dispatch({"id": 0})
+        dispatcher.spool._file.write(b"\x10\x00\x00")
+        await dispatcher.dispatch({"id": 1})
+        self.available = True
+
+        # 再送タスクがイベントループを占有せず、壊れたレコードの後も送信が再開される
+        for _ in range(100):
+            if not dispatcher.spool.has_pending():
+                break
+            await asyncio.sleep(0.02)
+        self.assertFalse(dispatcher.spool.has_pending())
+        await dispatcher.dispatch({"id": 2})
+        await dispatcher.close()
+        self.assertEqual(self.received, [0, 2])
+
+    async def test_rejected_trap_does_not_block_replay(self):
+        await self._replay_with_rejected_trap()
+
+    async def test_rejected_batch_is_replayed_one_by_one(self):
+        settings.webhook_batch_size = 10
+        settings.webhook_batch_linger_ms = 10
+        await self._replay_with_rejected_trap()
+
+    async def test_fanout_spools_per_endpoint(self):
+        # 送信先ごとのスプールを使う前のスプールに残っていたTrap
+        spool = Spool(self.test_dir, max_bytes=1024 * 1024, segment_bytes=1024)
+        spool.append({"id": -1})
+        spool.close()
+
+        settings.webhook_urls = f"{settings.webhook_url},{self.other_url}"
+        settings.webhook_mode = "fanout"
+        settings.webhook_breaker_reset = 0.05
+        self.available = True
+        lost = metrics.webhook_lost.value(self.other_url)
+        dispatcher = Dispatcher()
+        await dispatcher.initialize()
+        self.assertFalse(Spool.exists(self.test_dir))
+
+        for i in range(3):
+            await dispatcher.dispatch({"id": i})
+        for _ in range(100):
+            if len(self.received) == 4:
+                break
+            await asyncio.sleep(0.02)
+        self.assertEqual(self.received, [-1, 0, 1, 2])
+        # 受け付けなかった送信先のTrapは失われず、その送信先のスプールに残る
+        self.assertGreater(dispatcher.stats()["endpoint_spools"]["endpoint1"]["pending_bytes"], 0)
+        self.assertEqual(metrics.webhook_lost.value(self.other_url), lost)
+
+        self.other_available = True
+        await dispatcher.dispatch({"id": 3})
+        for _ in range(200):
+            if len(self.other_received) == 5:
+                break
+            await asyncio.sleep(0.02)
+        await dispatcher.close()
+        self.assertEqual(self.other_received, [-1, 0, 1, 2, 3])
+        self.assertEqual(self.received, [-1, 0, 1, 2, 3])
+
+if __name__ == '__main__':
+    unittest.main()
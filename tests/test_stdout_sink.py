@@ -0,0 +1,56 @@
+import asyncio
+import io
+import json
+import threading
+import unittest
+from src.stdout_sink import StdoutSink
+
+class BlockingStream(io.BytesIO):
+    """
+    release が設定されるまで write() がブロックするストリーム (読み手が詰まったパイプの代わり)。
+    """
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+
+    def write(self, data):
+        self.release.wait()
+        return super().write(data)
+
+class TestStdoutSink(unittest.IsolatedAsyncioTestCase):
+    async def test_flush_interval_batches_writes(self):
+        stream = io.BytesIO()
+        sink = StdoutSink(stream=stream, buffer_bytes=1 << 20, flush_interval_ms=20, encoder="json")
+        for i in range(100):
+            sink.write({"id": i, "name": "リンクダウン"})
+        self.assertEqual(stream.getvalue(), b"")
+
+        await asyncio.sleep(0.1)
+        lines = stream.getvalue().splitlines()
+        self.assertEqual([json.loads(line)["id"] for line in lines], list(range(100)))
+        self.assertEqual(json.loads(lines[0])["name"], "リンクダウン")
+        self.assertEqual(sink.stats()["writes"], 1)
+        sink.close()
+
+    async def test_size_threshold_flushes_immediately(self):
+        stream = io.BytesIO()
+        sink = StdoutSink(stream=stream, buffer_bytes=64, flush_interval_ms=60000)
+        sink.write({"value": "x" * 100})
+        sink.close()
+        self.assertEqual(len(stream.getvalue().splitlines()), 1)
+
+    async def test_blocked_stream_does_not_block_loop(self):
+        stream = BlockingStream()
+        sink = StdoutSink(stream=stream, buffer_bytes=1, flush_interval_ms=0, max_pending_bytes=200)
+        for i in range(50):
+            sink.write({"id": i})
+        # 書き込みスレッドが詰まっていても write() は戻り、上限を超えた分は破棄される
+        self.assertGreater(sink.stats()["dropped"], 0)
+
+        stream.release.set()
+        sink.close()
+        written = len(stream.getvalue().splitlines())
+        self.assertEqual(written + sink.stats()["dropped"], 50)
+
+if __name__ == '__main__':
+    unittest.main()
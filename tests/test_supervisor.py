@@ -0,0 +1,42 @@
+import os
+import signal
+import threading
+import time
+import unittest
+from src.supervisor import Supervisor, merge_stats
+from src.config import settings
+
+def crashing_worker(worker_id, stats_queue):
+    # 統計情報を1回送信してから異常終了する
+    stats_queue.put((worker_id, {"ingest": {"enqueued": 1}}))
+    stats_queue.close()
+    stats_queue.join_thread()
+    os._exit(1)
+
+class TestSupervisor(unittest.TestCase):
+    def test_merge_stats(self):
+        total = {}
+        merge_stats(total, {"ingest": {"enqueued": 2, "depth": 1}, "mode": "lazy"})
+        merge_stats(total, {"ingest": {"enqueued": 3, "depth": 0}})
+        self.assertEqual(total, {"ingest": {"enqueued": 5, "depth": 1}})
+
+    def test_crashed_worker_is_restarted(self):
+        original = settings.worker_restart_delay
+        settings.worker_restart_delay = 0.1
+        try:
+            supervisor = Supervisor(crashing_worker, worker_count=2)
+            # 一定時間後に停止を要求する
+            threading.Timer(1.5, supervisor._handle_signal, args=(signal.SIGTERM, None)).start()
+            started = time.monotonic()
+            supervisor.run()
+        finally:
+            settings.worker_restart_delay = original
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.default_int_handler)
+
+        self.assertLess(time.monotonic() - started, 10)
+        self.assertGreater(supervisor.restarts, 0)
+        self.assertEqual(supervisor.aggregated_stats()["ingest"]["enqueued"], 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import io
+import json
+import unittest
+from pysnmp.proto import rfc1902
+from src.resolver import MibResolver
+from src.listener import TrapListener
+from src.dispatcher import Dispatcher
+from src.stdout_sink import StdoutSink
+from src.trap_record import TrapRecord
+from src.config import settings
+
+VARBINDS = [
+    (rfc1902.ObjectName('1.3.6.1.2.1.1.3.0'), rfc1902.TimeTicks(12345)),
+    (rfc1902.ObjectName('1.3.6.1.6.3.1.1.4.1.0'), rfc1902.ObjectName('1.3.6.1.6.3.1.1.5.3')),
+    (rfc1902.ObjectName('1.3.6.1.2.1.1.5.0'), rfc1902.OctetString(b'core-sw1')),
+    (rfc1902.ObjectName('1.3.6.1.4.1.99999.1.2'), rfc1902.Integer(7)),
+]
+
+
+class CaptureQueue:
+    def __init__(self):
+        self.items = []
+
+    def put(self, trap_data):
+        self.items.append(trap_data)
+        return True
+
+
+class TestTrapRecord(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.resolver = MibResolver()
+        self.queue = CaptureQueue()
+        self.listener = TrapListener(self.resolver, None, ingest_queue=self.queue)
+
+    def _receive(self, source_ip):
+        # 受信ごとに別の文字列オブジェクトになる送信元アドレスを再現する
+        self.listener._process_trap(("".join(source_ip), 50162), "v2c", VARBINDS)
+        return self.queue.items[-1]
+
+    def test_to_dict_matches_resolve(self):
+        record = self._receive("192.0.2.1")
+        self.assertIsInstance(record, TrapRecord)
+        data = record.to_dict()
+        self.assertEqual(
+            [k for k in data],
+            ["source_ip", "source_port", "snmp_version", "trap_name", "trap_mib", "variables", "timestamp"]
+        )
+        self.assertEqual(data["variables"], [self.resolver.resolve(oid, value) for oid, value in VARBINDS])
+        trap = self.resolver.resolve('1.3.6.1.6.3.1.1.5.3')
+        self.assertEqual((data["trap_name"], data["trap_mib"]), (trap["name"], trap["mib"]))
+        self.assertEqual(record.trap_oid, "1.3.6.1.6.3.1.1.5.3")
+
+        original = settings.value_format
+        settings.value_format = "pretty"
+        try:
+            resolver = MibResolver()
+            listener = TrapListener(resolver, None, ingest_queue=self.queue)
+            listener._process_trap(("192.0.2.1", 50162), "v2c", VARBINDS)
+            self.assertEqual(
+                self.queue.items[-1].to_dict()["variables"],
+                [resolver.resolve(oid, value) for oid, value in VARBINDS]
+            )
+        finally:
+            settings.value_format = original
+
+    def test_strings_are_shared(self):
+        self._receive("192.0.2.1")
+        first = self._receive("192.0.2.1")
+        second = self._receive("192.0.2.1")
+        self.assertIs(first.source_ip, second.source_ip)
+        for a, b in zip(first.variables, second.variables):
+            # OID・MIB名・オブジェクト名はOIDごとの解決結果を共有する
+            self.assertIs(a.info, b.info)
+        self.assertIs(first.variables[1].value, second.variables[1].value)
+
+    async def test_dispatch_converts_record(self):
+        stream = io.BytesIO()
+        original = settings.output_mode
+        settings.output_mode = "stdout"
+        dispatcher = Dispatcher()
+        dispatcher.stdout_sink = StdoutSink(stream=stream, flush_interval_ms=0)
+        try:
+            record = self._receive("192.0.2.1")
+            await dispatcher.dispatch(record)
+            await dispatcher.close()
+        finally:
+            settings.output_mode = original
+        self.assertEqual(json.loads(stream.getvalue()), json.loads(json.dumps(record.to_dict())))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import socket
+import tempfile
+import unittest
+from src import metrics
+from src.udp_socket import UdpDropMonitor, create_udp_socket, format_address, parse_listen_addresses
+
+
+class TestListenAddresses(unittest.TestCase):
+    def test_parse(self):
+        self.assertEqual(parse_listen_addresses("0.0.0.0", 162), [("0.0.0.0", 162)])
+        self.assertEqual(
+            parse_listen_addresses(" 0.0.0.0, [::]:1162, 192.0.2.1:10162, ::1, 0.0.0.0:162 ", 162),
+            [("0.0.0.0", 162), ("::", 1162), ("192.0.2.1", 10162), ("::1", 162)]
+        )
+        self.assertEqual(format_address(("::", 1162, 0, 0)), "[::]:1162")
+        self.assertEqual(format_address(("0.0.0.0", 162)), "0.0.0.0:162")
+
+    def test_invalid(self):
+        for text in ("localhost", "0.0.0.0:abc", "[::1", "[::1]x", "10.0.0.1:70000", " , "):
+            with self.assertRaises(ValueError, msg=text):
+                parse_listen_addresses(text, 162)
+
+
+class TestUdpSocket(unittest.TestCase):
+    def test_create_socket(self):
+        for host in ("127.0.0.1", "::1"):
+            sock = create_udp_socket((host, 0), reuse_port=True, rcvbuf_bytes=262144)
+            try:
+                self.assertEqual(sock.getsockname()[0], host)
+                self.assertFalse(sock.getblocking())
+                self.assertGreaterEqual(sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF), 4096)
+            finally:
+                sock.close()
+
+    @unittest.skipUnless(os.path.exists("/proc/net/udp"), "requires /proc/net/udp")
+    def test_kernel_drops(self):
+        # 読み込まないソケットの小さな受信バッファを溢れさせ、カーネルのドロップ数を読み取る
+        sock = create_udp_socket(("127.0.0.1", 0), rcvbuf_bytes=4096)
+        client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            monitor = UdpDropMonitor([sock], interval=10)
+            address = format_address(sock.getsockname())
+            before = metrics.udp_kernel_drops.value(address)
+            for _ in range(200):
+                client.sendto(b"x" * 512, sock.getsockname())
+            monitor.poll()
+
+            stats = monitor.stats()
+            self.assertEqual(stats["sockets"], 1)
+            self.assertEqual(stats["polls"], 1)
+            self.assertGreater(stats["drops"], 0)
+            self.assertGreater(stats["rx_queue_bytes"], 0)
+            self.assertEqual(metrics.udp_kernel_drops.value(address) - before, stats["drops"])
+        finally:
+            client.close()
+            sock.close()
+
+    def test_proc_file_parsing(self):
+        sock = create_udp_socket(("127.0.0.1", 0))
+        inode = os.fstat(sock.fileno()).st_ino
+        with tempfile.NamedTemporaryFile("w", suffix="udp", delete=False) as f:
+            f.write("   sl  local_address rem_address   st tx_queue rx_queue tr tm->when retrnsmt"
+                    "   uid  timeout inode ref pointer drops\n")
+            f.write(f"  1: 0100007F:00A2 00000000:0000 07 00000000:00000000 00:00000000 00000000"
+                    f"     0        0 {inode + 1} 2 0000000000000000 99\n")
+            f.write(f"  2: 0100007F:00A2 00000000:0000 07 00000000:00000300 00:00000000 00000000"
+                    f"     0        0 {inode} 2 0000000000000000 5\n")
+        try:
+            monitor = UdpDropMonitor([sock], interval=10, proc_files=(f.name, "/nonexistent/udp6"))
+            monitor.poll()
+            stats = monitor.stats()
+            self.assertEqual((stats["rx_queue_bytes"], stats["drops"], stats["errors"]), (0x300, 5, 0))
+        finally:
+            os.unlink(f.name)
+            sock.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import socket
+import stat
+import tempfile
+import unittest
+from pysnmp.carrier.asyncio.dgram import udp
+from pysnmp.entity import engine, config
+from pysnmp.entity.rfc3413 import ntfrcv
+from pysnmp.hlapi import asyncio as hlapi
+from pysnmp.proto.api import v2c
+from pysnmp.proto.secmod.rfc3414 import localkey
+from src.usm import UsmUser, UsmCredentials, hash_passphrase, load_users
+
+ENGINE_ID = bytes.fromhex("8000000001020304")
+
+def localized_keys(snmp_engine, user_name, engine_id):
+    """
+    SnmpEngine に登録されたローカライズ済みのキーを返します。
+    """
+    mib_builder = snmp_engine.get_mib_builder()
+    (usmUserEntry,) = mib_builder.import_symbols("SNMP-USER-BASED-SM-MIB", "usmUserEntry")
+    (pysnmpUsmKeyEntry,) = mib_builder.import_symbols("PYSNMP-USM-MIB", "pysnmpUsmKeyEntry")
+    index = usmUserEntry.getInstIdFromIndices(v2c.OctetString(engine_id), user_name)
+    return tuple(
+        bytes(pysnmpUsmKeyEntry.getNode(pysnmpUsmKeyEntry.name + (column,) + index).syntax)
+        for column in (1, 2)
+    )
+
+class TestUsmKeys(unittest.TestCase):
+    def test_hash_passphrase_matches_pysnmp(self):
+        for hash_func in (hashlib.md5, hashlib.sha1, hashlib.sha256, hashlib.sha512):
+            for passphrase in (b"a", b"authpass123", b"x" * 100):
+                self.assertEqual(
+                    hash_passphrase(passphrase, hash_func),
+                    bytes(localkey.hash_passphrase(passphrase, hash_func))
+                )
+
+    def test_registered_keys_match_pysnmp(self):
+        # pysnmp にパスフレーズを渡して登録した場合と同じローカライズ済みのキーになること
+        for auth, priv, auth_oid, priv_oid in [
+            ("md5", "des", config.USM_AUTH_HMAC96_MD5, config.USM_PRIV_CBC56_DES),
+            ("SHA", "3DES", config.USM_AUTH_HMAC96_SHA, config.USM_PRIV_CBC168_3DES),
+            ("sha-256", "aes", config.USM_AUTH_HMAC192_SHA256, config.USM_PRIV_CFB128_AES),
+            ("sha512", "aes256-blumenthal", config.USM_AUTH_HMAC384_SHA512, config.USM_PRIV_CFB256_AES_BLUMENTHAL),
+        ]:
+            with self.subTest(auth=auth, priv=priv):
+                expected_engine = engine.SnmpEngine()
+                config.add_v3_user(expected_engine, "ops", auth_oid, "authpass123", priv_oid, "privpass123",
+                                   securityEngineId=v2c.OctetString(ENGINE_ID))
+
+                snmp_engine = engine.SnmpEngine()
+                user = UsmUser("ops", auth, "authpass123", priv, "privpass123", engine_ids=["0x8000000001020304"])
+                self.assertEqual(UsmCredentials([user]).register(snmp_engine), 1)
+                self.assertEqual(
+                    localized_keys(snmp_engine, "ops", ENGINE_ID),
+                    localized_keys(expected_engine, "ops", ENGINE_ID)
+                )
+
+class TestUsmCredentials(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_load_users(self):
+        path = os.path.join(self.test_dir, "users.json")
+        with open(path, "w") as f:
+            json.dump({
+                "engine_ids": ["0x8000000001020304"],
+                "users": [
+                    {"name": "ops", "auth_protocol": "sha256", "auth_key": "authpass123",
+                     "priv_protocol": "aes", "priv_key": "privpass123"},
+                    {"name": "noc", "auth_protocol": "md5", "auth_key": "0x" + "11" * 16,
+                     "key_type": "master", "engine_ids": ["80:00:00:00:01:02:03:05", "0x8000000001020306"]},
+                ]
+            }, f)
+        users = load_users(path)
+        self.assertEqual([u.name for u in users], ["ops", "noc"])
+        self.assertEqual(users[0].engine_ids, (ENGINE_ID,))
+        self.assertEqual(users[0].priv_protocol, config.USM_PRIV_CFB128_AES)
+        self.assertEqual(len(users[1].engine_ids), 2)
+        self.assertEqual(users[1].auth_key, b"\x11" * 16)
+        self.assertEqual(users[1].priv_protocol, config.USM_PRIV_NONE)
+
+        with open(path, "w") as f:
+            json.dump({"users": [{"name": "ops", "auth_protocol": "sha3", "auth_key": "x"}]}, f)
+        with self.assertRaisesRegex(ValueError, "user #0: Unknown SNMPv3 auth protocol"):
+            load_users(path)
+        with self.assertRaisesRegex(ValueError, "at least 8 octets"):
+            UsmUser("ops", "sha", "short")
+
+    def test_key_cache(self):
+        cache_path = os.path.join(self.test_dir, "keys.json")
+        users = [UsmUser(f"user{i}", "sha", f"passphrase-{i % 3}", "aes", "shared-priv", engine_ids=[ENGINE_ID])
+                 for i in range(10)]
+
+        credentials = UsmCredentials(users, key_cache_path=cache_path, workers=2)
+        credentials.register(engine.SnmpEngine())
+        # 同じパスフレーズのマスターキーは1回だけ生成する
+        self.assertEqual(credentials.stats()["keys_derived"], 4)
+        self.assertEqual(stat.S_IMODE(os.stat(cache_path).st_mode), 0o600)
+        with open(cache_path) as f:
+            self.assertNotIn("passphrase", f.read())
+
+        snmp_engine = engine.SnmpEngine()
+        cached = UsmCredentials(users, key_cache_path=cache_path)
+        cached.register(snmp_engine)
+        self.assertEqual(cached.stats()["keys_derived"], 0)
+        self.assertEqual(cached.stats()["key_cache_hits"], 4)
+
+        expected_engine = engine.SnmpEngine()
+        config.add_v3_user(expected_engine, "user4", config.USM_AUTH_HMAC96_SHA, "passphrase-1",
+                           config.USM_PRIV_CFB128_AES, "shared-priv", securityEngineId=v2c.OctetString(ENGINE_ID))
+        self.assertEqual(localized_keys(snmp_engine, "user4", ENGINE_ID), localized_keys(expected_engine, "user4", ENGINE_ID))
+
+class TestUsmReceive(unittest.IsolatedAsyncioTestCase):
+    async def test_trap_from_registered_engine(self):
+        received = []
+        receiver = engine.SnmpEngine()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind(("127.0.0.1", 0))
+        sock.setblocking(False)
+        port = sock.getsockname()[1]
+        transport = udp.UdpTransport().open_server_mode(sock=sock)
+        config.add_transport(receiver, udp.DOMAIN_NAME, transport)
+        UsmCredentials([UsmUser("ops", "sha256", "authpass123", engine_ids=[ENGINE_ID])]).register(receiver)
+        ntfrcv.NotificationReceiver(receiver, lambda *args: received.append(args[4]))
+
+        sender = hlapi.SnmpEngine(snmpEngineID=v2c.OctetString(ENGINE_ID))
+        target = await hlapi.UdpTransportTarget.create(("127.0.0.1", port))
+        error_indication, _, _, _ = await hlapi.send_notification(
+            sender, hlapi.UsmUserData("ops", "authpass123", authProtocol=hlapi.usmHMAC192SHA256AuthProtocol),
+            target, hlapi.ContextData(), "trap",
+            hlapi.NotificationType(hlapi.ObjectIdentity("1.3.6.1.6.3.1.1.5.3"))
+        )
+        self.assertIsNone(error_indication)
+        for _ in range(50):
+            if received:
+                break
+            await asyncio.sleep(0.02)
+        transport.close_transport()
+        self.assertEqual(len(received), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,167 @@
+import asyncio
+import socket
+import time
+import unittest
+from aiohttp import web
+from src.circuit_breaker import CircuitBreaker
+from src.webhook_pool import WebhookPool, EndpointUnavailable, parse_endpoints
+from src.config import settings
+
+def unused_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_open_and_half_open(self):
+        breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=0.05)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+
+        time.sleep(0.06)
+        # half-open では1件のみ試行できる
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record_success()
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.opened, 1)
+
+    def test_parse_endpoints(self):
+        self.assertEqual(
+            parse_endpoints("http://a/hook, http://b/hook|4", 64),
+            [("http://a/hook", 64), ("http://b/hook", 4)]
+        )
+        with self.assertRaises(ValueError):
+            parse_endpoints("http://a/hook|x", 64)
+
+class TestWebhookPool(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.received = {"fast": 0, "slow": 0}
+        self.runners = []
+        self.fast_url = await self._start_server("fast", 0)
+        self.slow_url = await self._start_server("slow", 1.0)
+        self.original = (settings.webhook_breaker_failures, settings.webhook_breaker_reset)
+
+    async def asyncTearDown(self):
+        settings.webhook_breaker_failures, settings.webhook_breaker_reset = self.original
+        for runner in self.runners:
+            await runner.cleanup()
+
+    async def _start_server(self, name, delay):
+        async def handler(request):
+            await request.read()
+            await asyncio.sleep(delay)
+            self.received[name] += 1
+            return web.Response(text="ok")
+
+        app = web.Application()
+        app.router.add_post("/hook", handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        self.runners.append(runner)
+        return f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/hook"
+
+    async def test_fanout_slow_endpoint_does_not_block(self):
+        pool = WebhookPool(f"{self.fast_url},{self.slow_url}|2", mode="fanout")
+        started = time.monotonic()
+        for _ in range(20):
+            await pool.post(b"{}", {"Content-Type": "application/json"}, 1)
+        elapsed = time.monotonic() - started
+
+        # 遅い送信先を待たずに戻り、上限を超えた分は遅い送信先にのみ送らない
+        self.assertLess(elapsed, 1.0)
+        self.assertEqual(self.received["fast"], 20)
+        stats = pool.stats()
+        self.assertEqual(stats["endpoint1"]["shed"], 18)
+        self.assertEqual(stats["endpoint1"]["lost"], 18)
+
+        await pool.close()
+        self.assertEqual(self.received["slow"], 2)
+
+    async def test_failover_and_circuit_breaker(self):
+        settings.webhook_breaker_failures = 2
+        settings.webhook_breaker_reset = 60
+        dead_url = f"http://127.0.0.1:{unused_port()}/hook"
+        pool = WebhookPool(f"{dead_url},{self.fast_url}", mode="least-loaded")
+        for _ in range(5):
+            await pool.post(b"{}", {}, 1)
+        await pool.close()
+
+        self.assertEqual(self.received["fast"], 5)
+        stats = pool.stats()
+        self.assertEqual(stats["endpoint0"]["failed"], 2)
+        self.assertEqual(stats["endpoint0"]["circuit_open"], 1)
+        self.assertEqual(stats["endpoint0"]["rejected"], 3)
+
+    async def test_fanout_counts_lost_traps(self):
+        settings.webhook_breaker_failures = 2
+        settings.webhook_breaker_reset = 60
+        dead_url = f"http://127.0.0.1:{unused_port()}/hook"
+        pool = WebhookPool(f"{self.fast_url},{dead_url}", mode="fanout")
+        for _ in range(5):
+            await pool.post(b"{}", {}, 3)
+        await pool.close()
+
+        # 停止中の送信先の分は、失敗・遮断中のいずれでもリトライされずに失われる
+        self.assertEqual(self.received["fast"], 5)
+        stats = pool.stats()
+        self.assertEqual((stats["endpoint1"]["failed"], stats["endpoint1"]["rejected"]), (2, 3))
+        self.assertEqual(stats["endpoint1"]["lost"], 15)
+        self.assertEqual(stats["endpoint0"]["lost"], 0)
+
+    async def test_cancelled_half_open_probe(self):
+        settings.webhook_breaker_failures = 1
+        settings.webhook_breaker_reset = 0.05
+        pool = WebhookPool(self.slow_url, mode="round-robin")
+        breaker = pool.endpoints[0].breaker
+        breaker.record_failure()
+        await asyncio.sleep(0.06)
+
+        # half-open の試行をキャンセルしても、次の試行は許可される
+        task = asyncio.create_task(pool.post(b"{}", {}, 1))
+        await asyncio.sleep(0.1)
+        self.assertFalse(breaker.allow())
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        self.assertTrue(breaker.allow())
+        await pool.close()
+
+    async def test_cancelled_fanout_keeps_sending(self):
+        pool = WebhookPool(f"{self.slow_url},{self.slow_url}", mode="fanout")
+        task = asyncio.create_task(pool.post(b"{}", {}, 1))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+
+        # 呼び出し元がキャンセルされても送信中のタスクは close() まで追跡される
+        self.assertEqual(len(pool._background), 2)
+        await pool.close()
+        self.assertEqual(self.received["slow"], 2)
+        self.assertEqual(pool.stats()["endpoint0"]["lost"], 0)
+
+    async def test_round_robin(self):
+        other_url = await self._start_server("slow", 0)
+        pool = WebhookPool(f"{self.fast_url},{other_url}", mode="round-robin")
+        for _ in range(4):
+            await pool.post(b"{}", {}, 1)
+        await pool.close()
+        self.assertEqual(self.received, {"fast": 2, "slow": 2})
+
+    async def test_all_endpoints_unavailable(self):
+        settings.webhook_breaker_failures = 1
+        settings.webhook_breaker_reset = 60
+        pool = WebhookPool(f"http://127.0.0.1:{unused_port()}/hook", mode="fanout")
+        with self.assertRaises(Exception):
+            await pool.post(b"{}", {}, 1)
+        with self.assertRaises(EndpointUnavailable):
+            await pool.post(b"{}", {}, 1)
+        await pool.close()
+
+if __name__ == '__main__':
+    unittest.main()